@@ -71,6 +71,10 @@ def main() -> None:
             elif AudioStop.is_type(event.type):
                 break
 
+        tail_chunk = converter.flush()
+        if tail_chunk is not None:
+            proc.stdin.write(tail_chunk.audio)
+
         stdout, _stderr = proc.communicate()
         text = stdout.decode()
 
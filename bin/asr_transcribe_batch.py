@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Transcribes many WAV files with a bounded number of concurrent asr programs."""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from rhasspy3.asr import BatchStats, transcribe_batch
+from rhasspy3.core import Rhasspy
+
+_FILE = Path(__file__)
+_DIR = _FILE.parent
+_LOGGER = logging.getLogger(_FILE.stem)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-c",
+        "--config",
+        default=_DIR.parent / "config",
+        help="Configuration directory",
+    )
+    parser.add_argument(
+        "-p", "--pipeline", default="default", help="Name of pipeline to use"
+    )
+    parser.add_argument(
+        "--asr-program", help="Name of asr program to use (overrides pipeline)"
+    )
+    #
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of asr programs running at once (default: 4)",
+    )
+    parser.add_argument(
+        "--samples-per-chunk",
+        type=int,
+        help="Samples per audio chunk when sending WAV files (default: 1 second)",
+    )
+    parser.add_argument(
+        "--stats-every",
+        type=int,
+        default=100,
+        help="Log throughput statistics after this many files (default: 100)",
+    )
+    #
+    parser.add_argument(
+        "wav", nargs="+", help="Path to WAV file(s) or directories of WAV files"
+    )
+    #
+    parser.add_argument(
+        "--debug", action="store_true", help="Print DEBUG messages to console"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    rhasspy = Rhasspy.load(args.config)
+    asr_program = args.asr_program
+    pipeline = rhasspy.config.pipelines.get(args.pipeline)
+
+    if not asr_program:
+        assert pipeline is not None, f"No pipeline named {args.pipeline}"
+        asr_program = pipeline.asr
+
+    assert asr_program, "No asr program"
+    _LOGGER.debug("asr program: %s", asr_program)
+
+    stats = BatchStats()
+    async for result in transcribe_batch(
+        rhasspy,
+        asr_program,
+        get_wavs(args.wav),
+        args.samples_per_chunk,
+        concurrency=args.concurrency,
+    ):
+        stats.add(result)
+        json.dump(result.to_dict(), sys.stdout, ensure_ascii=False)
+        print("", flush=True)
+
+        if (args.stats_every > 0) and ((stats.count % args.stats_every) == 0):
+            _LOGGER.info(stats.to_dict())
+
+    _LOGGER.info(stats.to_dict())
+
+
+def get_wavs(paths: Iterable[str]) -> Iterable[Tuple[str, bytes]]:
+    """Yields (path, WAV bytes) for files and directories (recursive)."""
+    for path_str in paths:
+        path = Path(path_str)
+        if path.is_dir():
+            wav_paths: Iterable[Path] = sorted(path.rglob("*.wav"))
+        else:
+            wav_paths = [path]
+
+        for wav_path in wav_paths:
+            _LOGGER.debug("Processing %s", wav_path)
+            yield str(wav_path), wav_path.read_bytes()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
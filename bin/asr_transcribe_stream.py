@@ -136,6 +136,10 @@ async def main() -> None:
             )
             audio_bytes = sys.stdin.buffer.read(bytes_per_chunk)
 
+        tail_chunk = converter.flush()
+        if tail_chunk is not None:
+            await async_write_event(tail_chunk.event(), asr_proc.stdin)
+
         await async_write_event(AudioStop(timestamp=timestamp).event(), asr_proc.stdin)
 
         # Read transcript
@@ -17,7 +17,6 @@ from rhasspy3.audio import (
     DEFAULT_IN_CHANNELS,
     DEFAULT_IN_RATE,
     DEFAULT_IN_WIDTH,
-    DEFAULT_SAMPLES_PER_CHUNK,
     AudioChunkConverter,
     AudioStart,
     AudioStop,
@@ -57,7 +56,9 @@ async def main() -> None:
         "--channels", type=int, default=DEFAULT_IN_CHANNELS, help="Sample channel count"
     )
     parser.add_argument(
-        "--samples-per-chunk", type=int, default=DEFAULT_SAMPLES_PER_CHUNK
+        "--samples-per-chunk",
+        type=int,
+        help="Samples per audio chunk when sending WAV files (default: 1 second)",
     )
     #
     parser.add_argument("wav", nargs="*", help="Path to WAV file(s)")
@@ -104,6 +105,10 @@ async def main() -> None:
                 await async_write_event(chunk.event(), asr_proc.stdin)
                 last_timestamp = chunk.timestamp
 
+            tail_chunk = converter.flush()
+            if tail_chunk is not None:
+                await async_write_event(tail_chunk.event(), asr_proc.stdin)
+
             await async_write_event(
                 AudioStop(timestamp=last_timestamp).event(),
                 asr_proc.stdin,
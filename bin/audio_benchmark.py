@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Benchmarks AudioChunkConverter against audioop (if available).
+
+Resamples a sine wave in chunks and prints a JSON line per rate pair with
+the time per chunk, real-time factor, and RMS error against an ideal sine.
+"""
+import argparse
+import json
+import logging
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from rhasspy3.audio import AudioChunk, AudioChunkConverter
+
+_FILE = Path(__file__)
+_DIR = _FILE.parent
+_LOGGER = logging.getLogger(_FILE.stem)
+
+_AMPLITUDE = 10000
+_WIDTH = 2
+_CHANNELS = 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--rates",
+        nargs="+",
+        default=["22050:16000", "16000:22050", "44100:16000"],
+        help="in_rate:out_rate pairs to benchmark",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=10.0, help="Seconds of audio to convert"
+    )
+    parser.add_argument(
+        "--samples-per-chunk",
+        type=int,
+        default=1024,
+        help="Samples in each input chunk",
+    )
+    parser.add_argument("--hz", type=float, default=440.0, help="Sine frequency")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per converter (best is kept)"
+    )
+    parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    ratecv = _get_ratecv()
+    if ratecv is None:
+        _LOGGER.warning("audioop is not available, only numpy is benchmarked")
+
+    for rate_pair in args.rates:
+        in_rate, out_rate = (int(r) for r in rate_pair.split(":", maxsplit=1))
+        audio = _sine(in_rate, args.seconds, args.hz).tobytes()
+        bytes_per_chunk = args.samples_per_chunk * _WIDTH * _CHANNELS
+        chunks = [
+            audio[i : i + bytes_per_chunk]
+            for i in range(0, len(audio), bytes_per_chunk)
+        ]
+        expected = _sine(out_rate, args.seconds, args.hz)
+
+        result: Dict[str, Dict[str, float]] = {}
+
+        def convert_numpy() -> Callable[[bytes], bytes]:
+            converter = AudioChunkConverter(rate=out_rate)
+
+            def convert(chunk_bytes: bytes) -> bytes:
+                return converter.convert(
+                    AudioChunk(in_rate, _WIDTH, _CHANNELS, chunk_bytes)
+                ).audio
+
+            return convert
+
+        result["numpy"] = _benchmark(
+            convert_numpy, chunks, expected, args.seconds, args.repeat
+        )
+
+        if ratecv is not None:
+            audioop_ratecv = ratecv
+
+            def convert_audioop() -> Callable[[bytes], bytes]:
+                state = None
+
+                def convert(chunk_bytes: bytes) -> bytes:
+                    nonlocal state
+                    converted, state = audioop_ratecv(
+                        chunk_bytes, _WIDTH, _CHANNELS, in_rate, out_rate, state
+                    )
+                    return converted
+
+                return convert
+
+            result["audioop"] = _benchmark(
+                convert_audioop, chunks, expected, args.seconds, args.repeat
+            )
+
+        print(
+            json.dumps({"in_rate": in_rate, "out_rate": out_rate, **result}),
+            flush=True,
+        )
+
+
+def _benchmark(
+    make_convert: Callable[[], Callable[[bytes], bytes]],
+    chunks: List[bytes],
+    expected: np.ndarray,
+    seconds: float,
+    repeat: int,
+) -> Dict[str, float]:
+    best_seconds: Optional[float] = None
+    chunk_seconds: List[float] = []
+    output = bytes()
+    for _ in range(max(1, repeat)):
+        convert = make_convert()
+        run_chunk_seconds: List[float] = []
+        run_output: List[bytes] = []
+        for chunk_bytes in chunks:
+            start_time = time.perf_counter()
+            run_output.append(convert(chunk_bytes))
+            run_chunk_seconds.append(time.perf_counter() - start_time)
+
+        run_seconds = sum(run_chunk_seconds)
+        if (best_seconds is None) or (run_seconds < best_seconds):
+            best_seconds = run_seconds
+            chunk_seconds = run_chunk_seconds
+            output = b"".join(run_output)
+
+    assert best_seconds is not None
+    actual = np.frombuffer(output, dtype=np.int16).astype(np.float64)
+
+    # Skip edges, where the converters delay and taper differently
+    num_compare = min(len(actual), len(expected)) - 200
+    error = _best_error(actual, expected.astype(np.float64), num_compare)
+
+    return {
+        "total_ms": best_seconds * 1_000,
+        "chunk_us_mean": float(np.mean(chunk_seconds)) * 1_000_000,
+        "chunk_us_p99": float(np.percentile(chunk_seconds, 99)) * 1_000_000,
+        "realtime_factor": seconds / best_seconds,
+        "rms_error": error,
+    }
+
+
+def _best_error(actual: np.ndarray, expected: np.ndarray, num_compare: int) -> float:
+    """RMS error at the output delay (in samples) that matches best."""
+    best_error = float("inf")
+    for delay in range(0, 50):
+        start = 100 + delay
+        if (start + num_compare - 100) > len(actual):
+            break
+
+        difference = (
+            actual[start : start + num_compare - 100] - expected[100:num_compare]
+        )
+        best_error = min(best_error, float(np.sqrt(np.mean(difference**2))))
+
+    return best_error
+
+
+def _sine(rate: int, seconds: float, hz: float) -> np.ndarray:
+    times = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * hz * times) * _AMPLITUDE).astype(np.int16)
+
+
+def _get_ratecv() -> Optional[Callable]:
+    # pylint: disable=import-outside-toplevel,deprecated-module
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import audioop
+
+        return audioop.ratecv
+    except ImportError:
+        return None
+
+
+if __name__ == "__main__":
+    main()
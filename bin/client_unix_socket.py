@@ -2,9 +2,10 @@
 import argparse
 import logging
 import socket
+import sys
 import threading
 
-from rhasspy3.event import read_event, write_event
+from rhasspy3.event import forward_events
 
 _LOGGER = logging.getLogger("wrapper_unix_socket")
 
@@ -23,14 +24,13 @@ def main():
     _LOGGER.debug("Connected")
 
     try:
-        with sock.makefile(mode="rwb") as conn_file:
-            read_thread = threading.Thread(
-                target=read_proc, args=(conn_file,), daemon=True
-            )
+        with sock:
+            # Events are passed through as-is in both directions
+            read_thread = threading.Thread(target=read_proc, args=(sock,), daemon=True)
             read_thread.start()
 
             write_thread = threading.Thread(
-                target=write_proc, args=(conn_file,), daemon=True
+                target=write_proc, args=(sock,), daemon=True
             )
             write_thread.start()
             write_thread.join()
@@ -38,26 +38,16 @@ def main():
         pass
 
 
-def read_proc(conn_file):
+def read_proc(sock: socket.socket):
     try:
-        while True:
-            event = read_event(conn_file)
-            if event is None:
-                break
-
-            write_event(event)
+        forward_events(sock.fileno(), sys.stdout.fileno())
     except Exception:
         _LOGGER.exception("Unexpected error in read thread")
 
 
-def write_proc(conn_file):
+def write_proc(sock: socket.socket):
     try:
-        while True:
-            event = read_event()
-            if event is None:
-                break
-
-            write_event(event, conn_file)
+        forward_events(sys.stdin.fileno(), sock.fileno())
     except Exception:
         _LOGGER.exception("Unexpected error in write thread")
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Record the events a program receives and sends, with their arrival times.
+
+Wraps a program's command (streams: stdin, stdout), or proxies websocket
+connections to the HTTP API (streams: <connection>/client, <connection>/server).
+Replay with event_replay.py.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from rhasspy3.capture import WEBSOCKET_CONNECT_TYPE, CaptureWriter, websocket_event
+from rhasspy3.event import Event, RawEvent, read_raw_event, write_raw_event
+
+_FILE = Path(__file__)
+_DIR = _FILE.parent
+_LOGGER = logging.getLogger(_FILE.stem)
+
+STDIN_STREAM = "stdin"
+STDOUT_STREAM = "stdout"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", required=True, help="Path to write capture")
+    parser.add_argument("command", nargs="?", help="Program command to capture")
+    parser.add_argument("--shell", action="store_true", help="Run command with shell")
+    #
+    parser.add_argument(
+        "--websocket",
+        help="Proxy websocket connections to this URL (e.g., ws://localhost:13331)",
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="Websocket proxy address")
+    parser.add_argument("--port", type=int, help="Websocket proxy port")
+    #
+    parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    if args.websocket:
+        assert args.port is not None, "--port is required with --websocket"
+    else:
+        assert args.command, "Command or --websocket is required"
+
+    # Stop cleanly when the program is terminated, so the capture is indexed
+    signal.signal(signal.SIGTERM, lambda *_args: sys.exit(0))
+
+    with open(args.output, "wb") as capture_file, CaptureWriter(
+        capture_file
+    ) as capture:
+        try:
+            if args.websocket:
+                asyncio.run(capture_websocket(args, capture))
+            else:
+                capture_program(args, capture)
+        except KeyboardInterrupt:
+            pass
+
+
+def capture_program(args: argparse.Namespace, capture: CaptureWriter) -> None:
+    command = args.command if args.shell else shlex.split(args.command)
+    proc = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, shell=args.shell
+    )
+    assert proc.stdin is not None
+    assert proc.stdout is not None
+
+    def read_proc() -> None:
+        assert proc.stdout is not None
+        try:
+            while True:
+                raw_event = read_raw_event(proc.stdout)
+                if raw_event is None:
+                    break
+
+                capture.write_event(STDOUT_STREAM, raw_event)
+                write_raw_event(raw_event)
+        except Exception:
+            _LOGGER.exception("Unexpected error in read thread")
+
+    read_thread = threading.Thread(target=read_proc, daemon=True)
+    read_thread.start()
+
+    try:
+        while True:
+            raw_event = read_raw_event()
+            if raw_event is None:
+                break
+
+            capture.write_event(STDIN_STREAM, raw_event)
+            write_raw_event(raw_event, proc.stdin)
+
+        proc.stdin.close()
+        read_thread.join()
+    except BrokenPipeError:
+        pass
+    finally:
+        if proc.poll() is None:
+            proc.terminate()
+
+        proc.wait()
+
+
+async def capture_websocket(args: argparse.Namespace, capture: CaptureWriter) -> None:
+    # pylint: disable=import-outside-toplevel
+    try:
+        from websockets import connect, serve
+    except ImportError:
+        _LOGGER.fatal("pip install websockets")
+        raise
+
+    connection_ids = itertools.count(1)
+
+    async def handle_connection(client_websocket, *_args) -> None:
+        request = getattr(client_websocket, "request", None)
+        path = request.path if request is not None else client_websocket.path
+        connection_id = next(connection_ids)
+        client_stream = f"{connection_id}/client"
+        server_stream = f"{connection_id}/server"
+
+        _LOGGER.debug("Connection %s: %s", connection_id, path)
+        capture.write_event(
+            client_stream,
+            RawEvent.from_event(
+                Event(type=WEBSOCKET_CONNECT_TYPE, data={"path": path})
+            ),
+        )
+
+        async with connect(args.websocket.rstrip("/") + path) as server_websocket:
+
+            async def relay(from_websocket, to_websocket, stream: str) -> None:
+                try:
+                    async for message in from_websocket:
+                        capture.write_event(stream, websocket_event(message))
+                        await to_websocket.send(message)
+                finally:
+                    await to_websocket.close()
+
+            await asyncio.gather(
+                relay(client_websocket, server_websocket, client_stream),
+                relay(server_websocket, client_websocket, server_stream),
+                return_exceptions=True,
+            )
+
+    async with serve(handle_connection, args.host, args.port):
+        _LOGGER.info(
+            "Capturing websockets on %s:%s for %s", args.host, args.port, args.websocket
+        )
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    main()
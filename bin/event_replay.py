@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Replay a capture from event_capture.py into a program, server, or websocket.
+
+Prints a JSON line for each event received (except audio chunks) with the
+seconds since replay started, then a summary of each stream.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import shlex
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from rhasspy3.audio import AudioChunk
+from rhasspy3.capture import (
+    WEBSOCKET_BINARY_TYPE,
+    WEBSOCKET_CONNECT_TYPE,
+    CaptureReader,
+    CaptureRecord,
+    CaptureWriter,
+    replay,
+    websocket_event,
+    websocket_message,
+)
+from rhasspy3.event import RawEvent, async_read_raw_event, async_write_raw_event
+
+_FILE = Path(__file__)
+_DIR = _FILE.parent
+_LOGGER = logging.getLogger(_FILE.stem)
+
+_CLIENT_SUFFIX = "/client"
+
+
+@dataclass
+class StreamSummary:
+    stream: str
+    events_sent: int = 0
+    events_received: int = 0
+    audio_chunks_received: int = 0
+    first_received_seconds: Optional[float] = None
+    """Seconds since replay started (as are the other times)."""
+
+    last_sent_seconds: Optional[float] = None
+    last_received_seconds: Optional[float] = None
+
+    @property
+    def response_seconds(self) -> Optional[float]:
+        """Seconds from the last event sent to the last event received."""
+        if (self.last_sent_seconds is None) or (self.last_received_seconds is None):
+            return None
+
+        return self.last_received_seconds - self.last_sent_seconds
+
+
+class Replayer:
+    """Sends captured events and reports what comes back."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.start_time = time.monotonic()
+        self.summaries: Dict[str, StreamSummary] = {}
+        self.output: Optional[CaptureWriter] = None
+        if args.output:
+            self.output = CaptureWriter(open(args.output, "wb"))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start_time
+
+    def sent(self, stream: str, raw_event: RawEvent) -> None:
+        summary = self._get_summary(stream)
+        summary.events_sent += 1
+        summary.last_sent_seconds = self.elapsed()
+        if self.output is not None:
+            self.output.write_event(stream, raw_event)
+
+    def received(self, stream: str, raw_event: RawEvent) -> None:
+        seconds = self.elapsed()
+        summary = self._get_summary(stream)
+        summary.events_received += 1
+        summary.last_received_seconds = seconds
+        if summary.first_received_seconds is None:
+            summary.first_received_seconds = seconds
+
+        if self.output is not None:
+            self.output.write_event(f"{stream}/received", raw_event)
+
+        if AudioChunk.is_type(raw_event.type) or (
+            raw_event.type == WEBSOCKET_BINARY_TYPE
+        ):
+            summary.audio_chunks_received += 1
+            return
+
+        event_dict: Dict[str, Any] = {
+            "stream": stream,
+            "seconds": seconds,
+            "type": raw_event.type,
+        }
+        if self.args.data:
+            event_dict["data"] = raw_event.event().data
+
+        print(json.dumps(event_dict, ensure_ascii=False), flush=True)
+
+    def close(self) -> None:
+        for summary in self.summaries.values():
+            summary_dict = asdict(summary)
+            summary_dict["response_seconds"] = summary.response_seconds
+            print(json.dumps({"summary": summary_dict}), flush=True)
+
+        if self.output is not None:
+            self.output.close()
+
+    def _get_summary(self, stream: str) -> StreamSummary:
+        summary = self.summaries.get(stream)
+        if summary is None:
+            summary = StreamSummary(stream=stream)
+            self.summaries[stream] = summary
+
+        return summary
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", help="Path to capture from event_capture.py")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Multiple of original speed (0 = as fast as possible)",
+    )
+    parser.add_argument(
+        "--start", type=float, default=0.0, help="Seconds into capture to start"
+    )
+    parser.add_argument(
+        "--stream",
+        action="append",
+        help="Stream(s) to replay (default: stdin, or websocket clients)",
+    )
+    #
+    parser.add_argument("--command", help="Program command to replay into")
+    parser.add_argument("--shell", action="store_true", help="Run command with shell")
+    parser.add_argument("--socket", help="Unix socket of server to replay into")
+    parser.add_argument(
+        "--websocket", help="URL of HTTP API to replay websocket connections into"
+    )
+    #
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        help="Seconds to wait for responses after the last event is sent",
+    )
+    parser.add_argument("--output", help="Write sent and received events to capture")
+    parser.add_argument(
+        "--data", action="store_true", help="Print data of received events"
+    )
+    parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    targets = [t for t in (args.command, args.socket, args.websocket) if t]
+    if len(targets) != 1:
+        _LOGGER.fatal("Exactly one of --command, --socket, or --websocket is required")
+        sys.exit(1)
+
+    with open(args.capture, "rb") as capture_file:
+        reader = CaptureReader(capture_file)
+        if not reader.is_complete:
+            _LOGGER.warning("Capture wasn't closed, reading without index")
+
+        replayer = Replayer(args)
+        try:
+            if args.websocket:
+                streams = args.stream or [
+                    s for s in _get_streams(reader) if s.endswith(_CLIENT_SUFFIX)
+                ]
+                await replay_websockets(
+                    replayer, reader.records(args.start, streams), args
+                )
+            else:
+                streams = args.stream or ["stdin"]
+                await replay_program(
+                    replayer, reader.records(args.start, streams), streams, args
+                )
+        finally:
+            replayer.close()
+
+
+async def replay_program(
+    replayer: Replayer,
+    records: Iterable[CaptureRecord],
+    streams: List[str],
+    args: argparse.Namespace,
+) -> None:
+    """Replay events into a program's stdin or a server's socket."""
+    proc: Optional[asyncio.subprocess.Process] = None
+    if args.command:
+        if args.shell:
+            proc = await asyncio.create_subprocess_shell(
+                args.command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+        else:
+            program, *program_args = shlex.split(args.command)
+            proc = await asyncio.create_subprocess_exec(
+                program,
+                *program_args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+
+        assert proc.stdin is not None
+        assert proc.stdout is not None
+        reader, writer = proc.stdout, proc.stdin
+    else:
+        reader, writer = await asyncio.open_unix_connection(args.socket)
+
+    stream = "+".join(streams)
+
+    async def receive() -> None:
+        while True:
+            raw_event = await async_read_raw_event(reader)
+            if raw_event is None:
+                break
+
+            replayer.received(stream, raw_event)
+
+    receive_task = asyncio.create_task(receive())
+    try:
+        async for record in replay(records, args.speed):
+            await async_write_raw_event(record.event, writer)
+            replayer.sent(stream, record.event)
+
+        if writer.can_write_eof():
+            writer.write_eof()
+
+        await asyncio.wait_for(receive_task, timeout=args.timeout)
+    except asyncio.TimeoutError:
+        _LOGGER.warning("Timeout waiting for responses")
+    except (BrokenPipeError, ConnectionResetError):
+        _LOGGER.warning("Stopped reading events")
+    finally:
+        receive_task.cancel()
+        writer.close()
+        if (proc is not None) and (proc.returncode is None):
+            proc.terminate()
+            await proc.wait()
+
+
+async def replay_websockets(
+    replayer: Replayer, records: Iterable[CaptureRecord], args: argparse.Namespace
+) -> None:
+    """Replay websocket connections concurrently with their original timing."""
+    # pylint: disable=import-outside-toplevel
+    try:
+        from websockets import connect
+    except ImportError:
+        _LOGGER.fatal("pip install websockets")
+        raise
+
+    queues: Dict[str, "asyncio.Queue[Optional[RawEvent]]"] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_connection(
+        stream: str, path: str, queue: "asyncio.Queue[Optional[RawEvent]]"
+    ) -> None:
+        url = args.websocket.rstrip("/") + path
+        async with connect(url) as websocket:
+
+            async def receive() -> None:
+                async for message in websocket:
+                    replayer.received(stream, websocket_event(message))
+
+            receive_task = asyncio.create_task(receive())
+            try:
+                while True:
+                    raw_event = await queue.get()
+                    if raw_event is None:
+                        break
+
+                    await websocket.send(websocket_message(raw_event))
+                    replayer.sent(stream, raw_event)
+
+                await asyncio.wait_for(receive_task, timeout=args.timeout)
+            except asyncio.TimeoutError:
+                _LOGGER.warning("Timeout waiting for responses: %s", stream)
+            finally:
+                receive_task.cancel()
+
+    skipped: Set[str] = set()
+    async for record in replay(records, args.speed):
+        if record.event.type == WEBSOCKET_CONNECT_TYPE:
+            queue: "asyncio.Queue[Optional[RawEvent]]" = asyncio.Queue()
+            queues[record.stream] = queue
+            path = record.event.event().data["path"]
+            tasks[record.stream] = asyncio.create_task(
+                run_connection(record.stream, path, queue)
+            )
+        elif record.stream in queues:
+            queues[record.stream].put_nowait(record.event)
+        elif record.stream not in skipped:
+            _LOGGER.warning("Skipping %s (connected before --start)", record.stream)
+            skipped.add(record.stream)
+
+    for queue in queues.values():
+        queue.put_nowait(None)
+
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    for stream, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            _LOGGER.error("Connection failed: %s (%s)", stream, result)
+
+
+def _get_streams(reader: CaptureReader) -> List[str]:
+    if reader.streams:
+        return reader.streams
+
+    # Capture wasn't closed
+    return list(dict.fromkeys(record.stream for record in reader.records()))
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
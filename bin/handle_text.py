@@ -7,11 +7,12 @@ import logging
 import os
 import sys
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
 
 from rhasspy3.asr import Transcript
+from rhasspy3.config import HandleGroupConfig
 from rhasspy3.core import Rhasspy
-from rhasspy3.handle import handle
+from rhasspy3.handle import handle, handle_group
 
 _FILE = Path(__file__)
 _DIR = _FILE.parent
@@ -42,18 +43,27 @@ async def main() -> None:
 
     rhasspy = Rhasspy.load(args.config)
     handle_program = args.handle_program
+    handle_group_config: Optional[HandleGroupConfig] = None
     pipeline = rhasspy.config.pipelines.get(args.pipeline)
 
     if not handle_program:
         assert pipeline is not None, f"No pipeline named {args.pipeline}"
         handle_program = pipeline.handle
+        handle_group_config = pipeline.handle_group
 
-    assert handle_program, "No handle program"
+    assert handle_program or handle_group_config, "No handle program"
 
     for line in get_input(args):
         # Text
         handle_input = Transcript(text=line)
-        handle_result = await handle(rhasspy, handle_program, handle_input)
+        if handle_group_config is not None:
+            handle_result = await handle_group(
+                rhasspy, handle_group_config, handle_input
+            )
+        else:
+            assert handle_program
+            handle_result = await handle(rhasspy, handle_program, handle_input)
+
         if handle_result is None:
             _LOGGER.warning("No result")
             continue
@@ -6,14 +6,21 @@ import shlex
 import subprocess
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
 
 from rhasspy3.audio import DEFAULT_SAMPLES_PER_CHUNK, AudioChunk, AudioStart
 from rhasspy3.event import write_event
 
+if TYPE_CHECKING:
+    from rhasspy3.shm import SharedAudioBuffer
+
 _FILE = Path(__file__)
 _DIR = _FILE.parent
 _LOGGER = logging.getLogger(_FILE.stem)
 
+# Seconds to wait for the reader to copy out the last audio before exiting
+_SHARED_MEMORY_DRAIN_SECONDS = 1.0
+
 
 def main() -> None:
     parser = argparse.ArgumentParser()
@@ -47,6 +54,11 @@ def main() -> None:
         required=True,
         help="Sample channel count",
     )
+    parser.add_argument(
+        "--shared-memory-bytes",
+        type=int,
+        help="Send audio through a shared memory ring buffer of this size",
+    )
     #
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to console"
@@ -61,6 +73,26 @@ def main() -> None:
     else:
         command = shlex.split(args.command)
 
+    shared_buffer: "Optional[SharedAudioBuffer]" = None
+    if args.shared_memory_bytes:
+        # Only imported when used
+        from rhasspy3.shm import get_shared_buffer
+
+        shared_buffer = get_shared_buffer(args.shared_memory_bytes)
+
+    try:
+        _run_command(command, args, bytes_per_chunk, shared_buffer)
+    finally:
+        if shared_buffer is not None:
+            _close_shared_buffer(shared_buffer)
+
+
+def _run_command(
+    command: Union[str, List[str]],
+    args: argparse.Namespace,
+    bytes_per_chunk: int,
+    shared_buffer: "Optional[SharedAudioBuffer]",
+) -> None:
     proc = subprocess.Popen(command, stdout=subprocess.PIPE)
     with proc:
         assert proc.stdout is not None
@@ -75,15 +107,25 @@ def main() -> None:
             if not audio_bytes:
                 break
 
-            write_event(
-                AudioChunk(
-                    args.rate,
-                    args.width,
-                    args.channels,
-                    audio_bytes,
-                    timestamp=time.monotonic_ns(),
-                ).event()
-            )
+            chunk_event = AudioChunk(
+                args.rate,
+                args.width,
+                args.channels,
+                audio_bytes,
+                timestamp=time.monotonic_ns(),
+            ).event()
+            if shared_buffer is not None:
+                chunk_event = shared_buffer.encode(chunk_event)
+
+            write_event(chunk_event)
+
+
+def _close_shared_buffer(shared_buffer: "SharedAudioBuffer") -> None:
+    deadline = time.monotonic() + _SHARED_MEMORY_DRAIN_SECONDS
+    while (shared_buffer.unread_bytes > 0) and (time.monotonic() < deadline):
+        time.sleep(0.01)
+
+    shared_buffer.close()
 
 
 if __name__ == "__main__":
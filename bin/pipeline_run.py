@@ -9,7 +9,6 @@ from pathlib import Path
 from typing import IO, Optional, Union
 
 from rhasspy3.asr import Transcript
-from rhasspy3.audio import DEFAULT_SAMPLES_PER_CHUNK
 from rhasspy3.core import Rhasspy
 from rhasspy3.event import Event
 from rhasspy3.handle import Handled, NotHandled
@@ -60,7 +59,9 @@ async def main() -> None:
     )
 
     parser.add_argument(
-        "--samples-per-chunk", type=int, default=DEFAULT_SAMPLES_PER_CHUNK
+        "--samples-per-chunk",
+        type=int,
+        help="Samples per audio chunk when sending WAV files (default: 1 second)",
     )
     parser.add_argument("--asr-chunks-to-buffer", type=int, default=0)
     parser.add_argument("--loop", action="store_true", help="Keep pipeline running")
@@ -1,20 +1,29 @@
 #!/usr/bin/env python3
 """Run satellite loop."""
 import argparse
-import asyncio
 import logging
 from collections import deque
+from contextlib import AsyncExitStack
 from pathlib import Path
-from typing import Deque, List
+from typing import Deque, Iterable, List, Optional
 
 from rhasspy3.audio import AudioChunk, AudioStop
 from rhasspy3.core import Rhasspy
-from rhasspy3.event import Event, async_read_event, async_write_event
+from rhasspy3.event import (
+    Event,
+    async_read_event,
+    async_read_raw_event,
+    async_write_event,
+    async_write_raw_event,
+)
 from rhasspy3.mic import DOMAIN as MIC_DOMAIN
-from rhasspy3.program import create_process
+from rhasspy3.program import create_event_writer, create_process
 from rhasspy3.remote import DOMAIN as REMOTE_DOMAIN
 from rhasspy3.snd import DOMAIN as SND_DOMAIN
 from rhasspy3.snd import Played
+from rhasspy3.stream import BufferedEventWriter, StreamMux, run
+from rhasspy3.vad import DOMAIN as VAD_DOMAIN
+from rhasspy3.vad import SpeechGate, VoiceStarted, VoiceStopped
 from rhasspy3.wake import detect
 
 _FILE = Path(__file__)
@@ -42,6 +51,10 @@ async def main() -> None:
         "--wake-program",
         help="Program to use for wake word detection (overiddes satellite)",
     )
+    parser.add_argument(
+        "--vad-program",
+        help="Program to use for local voice activity detection (overrides satellite)",
+    )
     parser.add_argument(
         "--remote-program",
         help="Program to use for remote communication with base station (overrides satellite)",
@@ -52,6 +65,12 @@ async def main() -> None:
     )
     #
     parser.add_argument("--asr-chunks-to-buffer", type=int, default=0)
+    parser.add_argument(
+        "--vad-buffer-seconds",
+        type=float,
+        default=1.0,
+        help="Seconds of audio to send from before local VAD detected speech",
+    )
     #
     parser.add_argument("--loop", action="store_true", help="Keep satellite running")
     parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
@@ -77,6 +96,11 @@ async def main() -> None:
 
     assert wake_program, "No wake program"
 
+    # Optional
+    vad_program = args.vad_program
+    if (not vad_program) and (satellite is not None):
+        vad_program = satellite.vad
+
     if not remote_program:
         assert satellite is not None, f"No satellite named {args.satellite}"
         remote_program = satellite.remote
@@ -102,49 +126,95 @@ async def main() -> None:
             if detection is None:
                 continue
 
-            async with (
-                await create_process(rhasspy, REMOTE_DOMAIN, remote_program)
-            ) as remote_proc:
+            async with AsyncExitStack() as stack:
+                remote_proc = await stack.enter_async_context(
+                    await create_process(rhasspy, REMOTE_DOMAIN, remote_program)
+                )
                 assert remote_proc.stdin is not None
                 assert remote_proc.stdout is not None
+                remote_writer = await stack.enter_async_context(
+                    create_event_writer(
+                        rhasspy, REMOTE_DOMAIN, remote_program, remote_proc.stdin
+                    )
+                )
+
+                mux = StreamMux()
+                mux.add_reader(mic_proc.stdout)
+                mux.add_reader(remote_proc.stdout)
+
+                vad_proc = None
+                vad_writer: Optional[BufferedEventWriter] = None
+                gate: Optional[SpeechGate] = None
+                if vad_program:
+                    # Only stream audio once speech has started locally
+                    vad_proc = await stack.enter_async_context(
+                        await create_process(rhasspy, VAD_DOMAIN, vad_program)
+                    )
+                    assert vad_proc.stdin is not None
+                    assert vad_proc.stdout is not None
+                    mux.add_reader(vad_proc.stdout)
+                    vad_writer = await stack.enter_async_context(
+                        create_event_writer(
+                            rhasspy, VAD_DOMAIN, vad_program, vad_proc.stdin
+                        )
+                    )
+                    gate = SpeechGate(buffer_seconds=args.vad_buffer_seconds)
+
+                async def send_chunk(mic_event: Event) -> None:
+                    if (gate is None) or (vad_writer is None):
+                        await remote_writer.write(mic_event)
+                        return
 
-                while chunk_buffer:
-                    await async_write_event(chunk_buffer.pop(), remote_proc.stdin)
+                    if not gate.stopped:
+                        await vad_writer.write(mic_event)
 
-                mic_task = asyncio.create_task(async_read_event(mic_proc.stdout))
-                remote_task = asyncio.create_task(async_read_event(remote_proc.stdout))
-                pending = {mic_task, remote_task}
+                    chunk = AudioChunk.from_event(mic_event)
+                    await send_chunks(gate.process_chunk(chunk), remote_writer)
 
                 try:
+                    while chunk_buffer:
+                        buffered_event = chunk_buffer.popleft()
+                        if AudioChunk.is_type(buffered_event.type):
+                            await send_chunk(buffered_event)
+
                     # Stream to remote until audio is received
                     while True:
-                        done, pending = await asyncio.wait(
-                            pending, return_when=asyncio.FIRST_COMPLETED
-                        )
-
-                        if mic_task in done:
-                            mic_event = mic_task.result()
-                            if mic_event is None:
+                        source, event = await mux.get()
+                        if source is mic_proc.stdout:
+                            if event is None:
                                 break
 
-                            if AudioChunk.is_type(mic_event.type):
-                                await async_write_event(mic_event, remote_proc.stdin)
-
-                            mic_task = asyncio.create_task(
-                                async_read_event(mic_proc.stdout)
-                            )
-                            pending.add(mic_task)
-
-                        if remote_task in done:
-                            remote_event = remote_task.result()
-                            if remote_event is not None:
-                                snd_buffer.append(remote_event)
-
-                            for task in pending:
-                                task.cancel()
+                            if AudioChunk.is_type(event.type):
+                                await send_chunk(event)
+                        elif (vad_proc is not None) and (source is vad_proc.stdout):
+                            assert gate is not None
+                            if event is None:
+                                # Local VAD failed, so stream everything
+                                _LOGGER.warning("Local VAD stopped unexpectedly")
+                                await send_chunks(gate.start(), remote_writer)
+                                gate = None
+                            elif VoiceStarted.is_type(event.type):
+                                _LOGGER.debug("Speech started")
+                                await send_chunks(gate.start(), remote_writer)
+                            elif VoiceStopped.is_type(event.type):
+                                # Hint to base station that speech has ended
+                                _LOGGER.debug("Speech stopped")
+                                voice_stopped = VoiceStopped.from_event(event)
+                                await send_chunks(gate.stop(), remote_writer)
+                                await remote_writer.write(
+                                    AudioStop(timestamp=voice_stopped.timestamp).event()
+                                )
+                                await mux.stop(vad_proc.stdout)
+                        else:
+                            if event is not None:
+                                snd_buffer.append(event)
 
                             break
 
+                    # Hand remote events that are already in flight to snd
+                    await mux.stop(mic_proc.stdout)
+                    snd_buffer.extend(await mux.stop(remote_proc.stdout))
+
                     # Output audio
                     async with (
                         await create_process(rhasspy, SND_DOMAIN, snd_program)
@@ -152,22 +222,25 @@ async def main() -> None:
                         assert snd_proc.stdin is not None
                         assert snd_proc.stdout is not None
 
+                        audio_stopped = False
                         for remote_event in snd_buffer:
                             if AudioChunk.is_type(remote_event.type):
                                 await async_write_event(remote_event, snd_proc.stdin)
                             elif AudioStop.is_type(remote_event.type):
-                                # Unexpected, but it could happen
-                                continue
+                                await async_write_event(remote_event, snd_proc.stdin)
+                                audio_stopped = True
+                                break
 
-                        while True:
-                            remote_event = await async_read_event(remote_proc.stdout)
-                            if remote_event is None:
+                        # Pass the rest through without decoding
+                        while not audio_stopped:
+                            raw_event = await async_read_raw_event(remote_proc.stdout)
+                            if raw_event is None:
                                 break
 
-                            if AudioChunk.is_type(remote_event.type):
-                                await async_write_event(remote_event, snd_proc.stdin)
-                            elif AudioStop.is_type(remote_event.type):
-                                await async_write_event(remote_event, snd_proc.stdin)
+                            if AudioChunk.is_type(raw_event.type):
+                                await async_write_raw_event(raw_event, snd_proc.stdin)
+                            elif AudioStop.is_type(raw_event.type):
+                                await async_write_raw_event(raw_event, snd_proc.stdin)
                                 break
 
                         # Wait for audio to finish playing
@@ -182,13 +255,20 @@ async def main() -> None:
                     _LOGGER.exception(
                         "Unexpected error communicating with remote base station"
                     )
+                finally:
+                    await mux.close()
 
         if not args.loop:
             break
 
 
+async def send_chunks(chunks: Iterable[AudioChunk], writer: BufferedEventWriter):
+    for chunk in chunks:
+        await writer.write(chunk.event())
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         pass
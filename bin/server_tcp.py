@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Accept TCP connections for a server that listens on a Unix socket."""
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from rhasspy3.backend import serve_tcp
+
+_FILE = Path(__file__)
+_DIR = _FILE.parent
+_LOGGER = logging.getLogger(_FILE.stem)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("socketfile", help="Path to server's Unix domain socket file")
+    parser.add_argument("--port", type=int, required=True, help="TCP port to bind")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to bind")
+    parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    tcp_server = await serve_tcp(args.socketfile, args.host, args.port)
+    _LOGGER.info("Relaying %s:%s to %s", args.host, args.port, args.socketfile)
+
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -72,6 +72,10 @@ def main() -> None:
                     proc.stdin.flush()
                 elif AudioStop.is_type(event.type):
                     break
+
+            tail_chunk = converter.flush()
+            if tail_chunk is not None:
+                proc.stdin.write(tail_chunk.audio)
     finally:
         write_event(Played().event())
 
@@ -6,7 +6,6 @@ import os
 import sys
 from pathlib import Path
 
-from rhasspy3.audio import DEFAULT_SAMPLES_PER_CHUNK
 from rhasspy3.core import Rhasspy
 from rhasspy3.snd import play
 
@@ -29,8 +28,7 @@ async def main() -> None:
     parser.add_argument(
         "--samples-per-chunk",
         type=int,
-        default=DEFAULT_SAMPLES_PER_CHUNK,
-        help="Samples to send to snd program at a time",
+        help="Samples to send to snd program at a time (default: 1 second)",
     )
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to console"
@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 import argparse
 import logging
-import wave
+from http.client import HTTPConnection, HTTPException, HTTPResponse, HTTPSConnection
 from pathlib import Path
-from urllib.parse import urlencode
-from urllib.request import urlopen
+from typing import Optional
+from urllib.parse import urlencode, urlparse
 
-from rhasspy3.audio import DEFAULT_SAMPLES_PER_CHUNK, AudioChunk, AudioStart, AudioStop
+from rhasspy3.audio import (
+    DEFAULT_OUT_CHANNELS,
+    DEFAULT_OUT_RATE,
+    DEFAULT_OUT_WIDTH,
+    DEFAULT_SAMPLES_PER_CHUNK,
+    AudioChunk,
+    AudioStart,
+    AudioStop,
+    WavHeader,
+    read_wav_header,
+)
 from rhasspy3.event import read_event, write_event
 from rhasspy3.tts import Synthesize
 
@@ -33,6 +43,24 @@ def main():
         "--samples-per-chunk", type=int, default=DEFAULT_SAMPLES_PER_CHUNK
     )
     #
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Response is raw PCM audio instead of WAV (see --rate/--width/--channels)",
+    )
+    parser.add_argument(
+        "--rate", type=int, default=DEFAULT_OUT_RATE, help="Sample rate of raw audio"
+    )
+    parser.add_argument(
+        "--width", type=int, default=DEFAULT_OUT_WIDTH, help="Sample width of raw audio"
+    )
+    parser.add_argument(
+        "--channels",
+        type=int,
+        default=DEFAULT_OUT_CHANNELS,
+        help="Sample channel count of raw audio",
+    )
+    #
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to console"
     )
@@ -41,11 +69,13 @@ def main():
 
     params = {}
     if args.param:
-        for key, value in params.items():
+        for key, value in args.param:
             # Don't include empty parameters
             if value:
                 params[key] = value
 
+    client = HttpClient(args.url)
+
     try:
         while True:
             event = read_event()
@@ -54,39 +84,124 @@ def main():
 
             if Synthesize.is_type(event.type):
                 synthesize = Synthesize.from_event(event)
-
                 params["text"] = synthesize.text
-                url = args.url + "?" + urlencode(params)
-
-                with urlopen(url) as response:
-                    with wave.open(response, "rb") as wav_file:
-                        rate = wav_file.getframerate()
-                        width = wav_file.getsampwidth()
-                        channels = wav_file.getnchannels()
-
-                        num_frames = wav_file.getnframes()
-                        audio_bytes = wav_file.readframes(num_frames)
-
-                bytes_per_chunk = args.samples_per_chunk * width
-                timestamp = 0
-                write_event(
-                    AudioStart(rate, width, channels, timestamp=timestamp).event()
-                )
-                while audio_bytes:
-                    chunk = AudioChunk(
-                        rate,
-                        width,
-                        channels,
-                        audio_bytes[:bytes_per_chunk],
-                        timestamp=timestamp,
-                    )
-                    write_event(chunk.event())
-                    timestamp += chunk.milliseconds
-                    audio_bytes = audio_bytes[bytes_per_chunk:]
-
-                write_event(AudioStop(timestamp=timestamp).event())
+
+                with client.get(params) as response:
+                    if args.raw:
+                        header = WavHeader(args.rate, args.width, args.channels)
+                    else:
+                        header = read_wav_header(response)
+
+                    write_audio(response, header, args.samples_per_chunk)
+
+                    # Drain anything after the audio so the connection can be reused
+                    response.read()
     except KeyboardInterrupt:
         pass
+    finally:
+        client.close()
+
+
+def write_audio(response: HTTPResponse, header: WavHeader, samples_per_chunk: int):
+    """Write audio events as soon as each chunk has arrived."""
+    bytes_per_sample = header.width * header.channels
+    bytes_per_chunk = samples_per_chunk * bytes_per_sample
+    bytes_left = header.data_size
+
+    timestamp = 0
+    write_event(
+        AudioStart(
+            header.rate, header.width, header.channels, timestamp=timestamp
+        ).event()
+    )
+
+    while (bytes_left is None) or (bytes_left > 0):
+        num_bytes = (
+            bytes_per_chunk if bytes_left is None else min(bytes_per_chunk, bytes_left)
+        )
+        audio_bytes = response.read(num_bytes)
+        if not audio_bytes:
+            break
+
+        if bytes_left is not None:
+            bytes_left -= len(audio_bytes)
+
+        # Only whole samples (response may end early)
+        audio_bytes = audio_bytes[
+            : len(audio_bytes) - (len(audio_bytes) % bytes_per_sample)
+        ]
+        if not audio_bytes:
+            break
+
+        chunk = AudioChunk(
+            header.rate,
+            header.width,
+            header.channels,
+            audio_bytes,
+            timestamp=timestamp,
+        )
+        write_event(chunk.event())
+        timestamp += chunk.milliseconds
+
+    write_event(AudioStop(timestamp=timestamp).event())
+
+
+class HttpClient:
+    """Sends GET requests over a single keep-alive connection."""
+
+    def __init__(self, url: str) -> None:
+        parsed_url = urlparse(url)
+        self.is_https = parsed_url.scheme == "https"
+        self.host = parsed_url.hostname or "localhost"
+        self.port = parsed_url.port
+        self.path = parsed_url.path or "/"
+        self.query = parsed_url.query
+        self._connection: Optional[HTTPConnection] = None
+
+    def get(self, params) -> HTTPResponse:
+        """Send request and return response once headers have arrived."""
+        query = urlencode(params)
+        if self.query:
+            query = f"{self.query}&{query}"
+
+        url = f"{self.path}?{query}"
+        _LOGGER.debug(url)
+
+        is_reused = self._connection is not None
+        while True:
+            if self._connection is None:
+                self._connection = self._connect()
+
+            try:
+                self._connection.request("GET", url)
+                response = self._connection.getresponse()
+                break
+            except (HTTPException, ConnectionError):
+                self.close()
+                if not is_reused:
+                    raise
+
+                # Server closed the idle connection; try a new one
+                _LOGGER.debug("Reconnecting to %s", self.host)
+                is_reused = False
+
+        if response.status != 200:
+            self.close()
+            raise HTTPException(f"Unexpected response: {response.status}")
+
+        return response
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> HTTPConnection:
+        _LOGGER.debug("Connecting to %s", self.host)
+        if self.is_https:
+            return HTTPSConnection(self.host, self.port)
+
+        return HTTPConnection(self.host, self.port)
 
 
 if __name__ == "__main__":
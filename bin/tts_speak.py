@@ -33,8 +33,7 @@ async def main() -> None:
     parser.add_argument(
         "--samples-per-chunk",
         type=int,
-        default=1024,
-        help="Samples to send to snd program at a time",
+        help="Samples to send to snd program at a time (default: 1 second)",
     )
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to console"
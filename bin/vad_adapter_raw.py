@@ -2,11 +2,15 @@
 """Voice activity detection programs that accept raw PCM audio and print a speech probability for each chunk."""
 import argparse
 import logging
+import os
+import select
 import shlex
 import subprocess
 import time
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Deque, Optional, Tuple
 
 from rhasspy3.audio import AudioChunk, AudioChunkConverter, AudioStop
 from rhasspy3.event import read_event, write_event
@@ -17,6 +21,25 @@ _DIR = _FILE.parent
 _LOGGER = logging.getLogger(_FILE.stem)
 
 
+@dataclass
+class State:
+    segmenter: Segmenter
+    threshold: float
+    seconds_per_chunk: float
+
+    # (frame, timestamp) for frames waiting on a speech probability
+    frames: Deque[Tuple[bytes, int]] = field(default_factory=deque)
+
+    # Partial line of output from command
+    line_buffer: bytes = b""
+
+    sent_started: bool = False
+    sent_stopped: bool = False
+
+    command_running: bool = True
+    """False once the command has closed its output or stdin."""
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -75,6 +98,12 @@ def main() -> None:
         type=float,
         default=1,
     )
+    parser.add_argument(
+        "--max-frames-in-flight",
+        type=int,
+        default=8,
+        help="Frames sent to command before waiting for a probability (1 = lock-step)",
+    )
     #
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to console"
@@ -92,17 +121,25 @@ def main() -> None:
         assert proc.stdin is not None
         assert proc.stdout is not None
 
-        segmenter = Segmenter(
-            args.speech_seconds,
-            args.silence_seconds,
-            args.timeout_seconds,
-            args.reset_seconds,
+        state = State(
+            segmenter=Segmenter(
+                args.speech_seconds,
+                args.silence_seconds,
+                args.timeout_seconds,
+                args.reset_seconds,
+            ),
+            threshold=args.threshold,
+            seconds_per_chunk=seconds_per_chunk,
         )
+        max_frames_in_flight = max(1, args.max_frames_in_flight)
+        proc_stdout = proc.stdout.fileno()
+
+        # Written without buffering, so nothing is left to flush if the
+        # command exits early
+        proc_stdin = proc.stdin.fileno()
         converter = AudioChunkConverter(args.rate, args.width, args.channels)
         audio_bytes = bytes()
         is_first_audio = True
-        sent_started = False
-        sent_stopped = False
         last_stop_timestamp: Optional[int] = None
 
         while True:
@@ -123,54 +160,118 @@ def main() -> None:
                 )
                 last_stop_timestamp = timestamp + chunk.milliseconds
 
-                # Handle uneven chunk sizes
-                while len(audio_bytes) >= bytes_per_chunk:
-                    chunk_bytes = audio_bytes[:bytes_per_chunk]
-                    proc.stdin.write(chunk_bytes)
-                    proc.stdin.flush()
-
-                    line = proc.stdout.readline().decode()
-                    if line:
-                        speech_probability = float(line)
-                        is_speech = speech_probability > args.threshold
-                        segmenter.process(
-                            chunk=chunk_bytes,
-                            chunk_seconds=seconds_per_chunk,
-                            is_speech=is_speech,
-                            timestamp=timestamp,
-                        )
-
-                        if (not sent_started) and segmenter.started:
-                            _LOGGER.debug("Voice started")
-                            write_event(
-                                VoiceStarted(
-                                    timestamp=segmenter.start_timestamp
-                                ).event()
-                            )
-                            sent_started = True
-
-                        if (not sent_stopped) and segmenter.stopped:
-                            if segmenter.timeout:
-                                _LOGGER.info("Voice timeout")
-                            else:
-                                _LOGGER.debug("Voice stopped")
-
-                            write_event(
-                                VoiceStopped(timestamp=segmenter.stop_timestamp).event()
-                            )
-                            sent_stopped = True
-
-                    audio_bytes = audio_bytes[bytes_per_chunk:]
+                # Handle uneven chunk sizes.
+                # Frames are written in batches, and their probabilities are
+                # read back as they become available.
+                while state.command_running and (len(audio_bytes) >= bytes_per_chunk):
+                    num_frames = min(
+                        len(audio_bytes) // bytes_per_chunk, max_frames_in_flight
+                    )
+                    while state.command_running and (
+                        len(state.frames) > (max_frames_in_flight - num_frames)
+                    ):
+                        read_probabilities(proc_stdout, state, block=True)
+
+                    if not state.command_running:
+                        break
+
+                    batch_bytes = audio_bytes[: num_frames * bytes_per_chunk]
+                    for frame_start in range(0, len(batch_bytes), bytes_per_chunk):
+                        frame_bytes = batch_bytes[
+                            frame_start : frame_start + bytes_per_chunk
+                        ]
+                        state.frames.append((frame_bytes, timestamp))
+
+                    try:
+                        write_all(proc_stdin, batch_bytes)
+                    except BrokenPipeError:
+                        state.command_running = False
+                        break
+
+                    audio_bytes = audio_bytes[len(batch_bytes) :]
+
+                if state.command_running:
+                    read_probabilities(proc_stdout, state, block=False)
+
+                if not state.command_running:
+                    _LOGGER.error("Command exited unexpectedly")
+                    break
 
             elif AudioStop.is_type(event.type):
                 _LOGGER.debug("Audio stopped")
-                if not sent_stopped:
+
+                # Finish frames that are still in flight
+                while state.command_running and state.frames:
+                    read_probabilities(proc_stdout, state, block=True)
+
+                if not state.sent_stopped:
                     write_event(VoiceStopped(timestamp=last_stop_timestamp).event())
-                    sent_stopped = True
+                    state.sent_stopped = True
 
-                proc.stdin.close()
                 break
 
 
+def write_all(fd: int, data: bytes) -> None:
+    """Write all of data to a file descriptor."""
+    data_view = memoryview(data)
+    while data_view:
+        data_view = data_view[os.write(fd, data_view) :]
+
+
+def read_probabilities(fd: int, state: State, block: bool) -> None:
+    """Read available speech probabilities from command and process them.
+
+    Clears state.command_running if the command has no more output.
+    """
+    if (not block) and (not select.select([fd], [], [], 0)[0]):
+        return
+
+    data = os.read(fd, 4096)
+    if not data:
+        state.command_running = False
+        return
+
+    lines = (state.line_buffer + data).split(b"\n")
+    state.line_buffer = lines.pop()
+
+    for line in lines:
+        if state.frames:
+            frame, timestamp = state.frames.popleft()
+        else:
+            _LOGGER.warning("Unexpected output from command: %s", line)
+            continue
+
+        line = line.strip()
+        if line:
+            process_probability(float(line), frame, timestamp, state)
+
+
+def process_probability(
+    speech_probability: float, frame: bytes, timestamp: int, state: State
+) -> None:
+    """Feed a frame's speech probability to the segmenter."""
+    is_speech = speech_probability > state.threshold
+    state.segmenter.process(
+        chunk=frame,
+        chunk_seconds=state.seconds_per_chunk,
+        is_speech=is_speech,
+        timestamp=timestamp,
+    )
+
+    if (not state.sent_started) and state.segmenter.started:
+        _LOGGER.debug("Voice started")
+        write_event(VoiceStarted(timestamp=state.segmenter.start_timestamp).event())
+        state.sent_started = True
+
+    if (not state.sent_stopped) and state.segmenter.stopped:
+        if state.segmenter.timeout:
+            _LOGGER.info("Voice timeout")
+        else:
+            _LOGGER.debug("Voice stopped")
+
+        write_event(VoiceStopped(timestamp=state.segmenter.stop_timestamp).event())
+        state.sent_stopped = True
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from rhasspy3.asr import Transcript
+from rhasspy3.event import read_event, write_event
+from rhasspy3.handle import Handled, NotHandled
+
+_FILE = Path(__file__)
+_DIR = _FILE.parent
+_LOGGER = logging.getLogger(_FILE.stem)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "url",
+        help="URL of API endpoint",
+    )
+    parser.add_argument("token_file", help="Path to file with authorization token")
+    parser.add_argument("--language", help="Language code to use")
+    parser.add_argument(
+        "--socketfile", required=True, help="Path to Unix domain socket file"
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=4,
+        help="Maximum number of requests to Home Assistant at once",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        help="Seconds to wait for Home Assistant",
+    )
+    parser.add_argument(
+        "--debug", action="store_true", help="Print DEBUG messages to console"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    client = ConversationClient(
+        args.url,
+        Path(args.token_file),
+        language=args.language,
+        max_connections=args.max_connections,
+        timeout=args.timeout,
+    )
+
+    # Need to unlink socket if it exists
+    try:
+        os.unlink(args.socketfile)
+    except OSError:
+        pass
+
+    try:
+        # Create socket server
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(args.socketfile)
+        sock.listen()
+        _LOGGER.info("Ready")
+
+        # Listen for connections
+        while True:
+            try:
+                connection, client_address = sock.accept()
+                _LOGGER.debug("Connection from %s", client_address)
+
+                # Start new thread for client
+                threading.Thread(
+                    target=handle_client,
+                    args=(connection, client),
+                    daemon=True,
+                ).start()
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                _LOGGER.exception("Error communicating with socket client")
+    finally:
+        os.unlink(args.socketfile)
+
+
+def handle_client(connection: socket.socket, client: "ConversationClient") -> None:
+    try:
+        with connection, connection.makefile(mode="rwb") as conn_file:
+            while True:
+                event = read_event(conn_file)  # type: ignore
+                if event is None:
+                    break
+
+                if not Transcript.is_type(event.type):
+                    continue
+
+                transcript = Transcript.from_event(event)
+                try:
+                    response_text = client.process(transcript.text)
+                except Exception:
+                    _LOGGER.exception("Error sending text to Home Assistant")
+                    response_text = ""
+
+                if response_text:
+                    write_event(Handled(text=response_text).event(), conn_file)  # type: ignore
+                else:
+                    write_event(NotHandled().event(), conn_file)  # type: ignore
+
+                # One request per connection
+                break
+    except Exception:
+        _LOGGER.exception("Unexpected error in client thread")
+
+
+class ConversationClient:
+    """Sends text to Home Assistant's conversation API.
+
+    Connections are kept alive and reused, so only the first request pays for
+    the TCP/TLS handshake. Up to max_connections requests are sent at once.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token_file: Path,
+        language: Optional[str] = None,
+        max_connections: int = 4,
+        timeout: float = 10.0,
+    ) -> None:
+        parsed_url = urlparse(url)
+        self.is_https = parsed_url.scheme == "https"
+        self.host = parsed_url.hostname or "localhost"
+        self.port = parsed_url.port
+        self.path = parsed_url.path or "/"
+        if parsed_url.query:
+            self.path += f"?{parsed_url.query}"
+
+        self.token_file = token_file
+        self.language = language
+        self.timeout = timeout
+
+        # None is a slot for a connection that hasn't been opened yet
+        self._pool: "queue.LifoQueue[Optional[HTTPConnection]]" = queue.LifoQueue()
+        for _ in range(max_connections):
+            self._pool.put(None)
+
+        self._token_lock = threading.Lock()
+        self._token: Optional[Tuple[float, str]] = None
+
+    def process(self, text: str) -> str:
+        """Send text and return the speech response."""
+        data_dict = {"text": text}
+        if self.language:
+            data_dict["language"] = self.language
+
+        body = json.dumps(data_dict, ensure_ascii=False).encode("utf-8")
+
+        try:
+            connection = self._pool.get(timeout=self.timeout)
+        except queue.Empty as err:
+            raise TimeoutError("Too many requests to Home Assistant") from err
+
+        try:
+            is_reused = connection is not None
+            while True:
+                if connection is None:
+                    connection = self._connect()
+
+                try:
+                    connection.request(
+                        "POST",
+                        self.path,
+                        body=body,
+                        headers={
+                            "Authorization": f"Bearer {self._get_token()}",
+                            "Content-Type": "application/json",
+                        },
+                    )
+                    response = connection.getresponse()
+                    response_bytes = response.read()
+                    break
+                except (HTTPException, ConnectionError):
+                    connection.close()
+                    connection = None
+                    if not is_reused:
+                        raise
+
+                    # Home Assistant closed the idle connection; try a new one
+                    _LOGGER.debug("Reconnecting to %s", self.host)
+                    is_reused = False
+
+            if response.status != 200:
+                raise HTTPException(
+                    f"Unexpected response from Home Assistant: {response.status}"
+                )
+
+            response_dict = json.loads(response_bytes)
+        except Exception:
+            if connection is not None:
+                connection.close()
+                connection = None
+
+            raise
+        finally:
+            self._pool.put(connection)
+
+        return (
+            response_dict.get("response", {})
+            .get("speech", {})
+            .get("plain", {})
+            .get("speech", "")
+        )
+
+    def _connect(self) -> HTTPConnection:
+        _LOGGER.debug("Connecting to %s", self.host)
+        if self.is_https:
+            return HTTPSConnection(self.host, self.port, timeout=self.timeout)
+
+        return HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _get_token(self) -> str:
+        """Read token, re-reading if the file has changed."""
+        mtime = self.token_file.stat().st_mtime
+        with self._token_lock:
+            if (self._token is None) or (self._token[0] != mtime):
+                token = self.token_file.read_text(encoding="utf-8").strip()
+                self._token = (mtime, token)
+
+            return self._token[1]
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 import argparse
+import logging
 import socketserver
+import time
+from dataclasses import dataclass
 from functools import partial
+from pathlib import Path
+from typing import Any, Optional, Tuple
 
 from rhasspy3.audio import (
     DEFAULT_IN_CHANNELS,
     DEFAULT_IN_RATE,
     DEFAULT_IN_WIDTH,
+    DEFAULT_SAMPLES_PER_CHUNK,
     AudioChunk,
 )
+from rhasspy3.codec import CODEC_PCM, AudioDecoder, get_decoder
 from rhasspy3.event import write_event
+from rhasspy3.jitter import UDP_HEADER, JitterBuffer
+
+_FILE = Path(__file__)
+_LOGGER = logging.getLogger(_FILE.stem)
 
 
 def main() -> None:
@@ -29,33 +40,193 @@ def main() -> None:
         default=DEFAULT_IN_CHANNELS,
         help="Sample channel count",
     )
+    parser.add_argument(
+        "--codec", default=CODEC_PCM, help="Codec of received audio (default: pcm)"
+    )
+    parser.add_argument(
+        "--samples-per-chunk",
+        type=int,
+        default=DEFAULT_SAMPLES_PER_CHUNK,
+        help="Number of samples in each audio chunk, independent of packet size",
+    )
+    #
+    parser.add_argument(
+        "--header",
+        action="store_true",
+        help="Packets start with a sequence number and timestamp (see rhasspy3.jitter)",
+    )
+    parser.add_argument(
+        "--jitter-packets",
+        type=int,
+        default=4,
+        help="Packets to wait for a missing packet before it's concealed (with --header)",
+    )
+    parser.add_argument(
+        "--stream-timeout",
+        type=float,
+        default=1.0,
+        help="Seconds without packets before another sender can take over",
+    )
+    parser.add_argument(
+        "--debug", action="store_true", help="Print DEBUG messages to console"
+    )
     args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
 
+    # There's no handshake over UDP, so the sender must use the same codec.
+    # Fail early if it isn't available.
+    get_decoder(args.codec, args.rate, args.width, args.channels)
+
+    state = State()
     with socketserver.UDPServer(
         (args.host, args.port),
-        partial(MicUDPHandler, args.rate, args.width, args.channels),
+        partial(MicUDPHandler, args, state),
     ) as server:
         server.serve_forever()
 
 
+@dataclass
+class UdpStream:
+    """Audio from a single sender."""
+
+    address: Any
+    decoder: AudioDecoder
+    jitter: Optional[JitterBuffer[Tuple[int, bytes]]]
+
+    start_time: float
+    """Monotonic time when first packet arrived (seconds)."""
+
+    audio: bytes = bytes()
+    """Audio not yet sent in a chunk."""
+
+    timestamp: Optional[float] = None
+    """Timestamp of start of audio, relative to the stream (milliseconds)."""
+
+    last_packet_size: int = 0
+    """Size of last decoded packet (used to conceal lost packets)."""
+
+    last_packet_time: float = 0.0
+    """Monotonic time when last packet arrived (seconds)."""
+
+    timestamp_offset: Optional[int] = None
+    """Added to sender timestamps so the first packet is 0 (milliseconds)."""
+
+
+@dataclass
+class State:
+    stream: Optional[UdpStream] = None
+    """Sender whose audio is being written. Others are ignored until it's idle."""
+
+
 class MicUDPHandler(socketserver.BaseRequestHandler):
-    def __init__(self, rate: int, width: int, channels: int, *args, **kwargs):
-        self.rate = rate
-        self.width = width
-        self.channels = channels
-        self.state = None
-        super().__init__(*args, **kwargs)
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        state: State,
+        *handler_args,
+        **handler_kwargs,
+    ):
+        self.args = args
+        self.state = state
+        self.bytes_per_sample = args.width * args.channels
+        self.bytes_per_chunk = args.samples_per_chunk * self.bytes_per_sample
+        super().__init__(*handler_args, **handler_kwargs)
 
     def handle(self):
-        audio_bytes = self.request[0]
-        write_event(
-            AudioChunk(
-                rate=self.rate,
-                width=self.width,
-                channels=self.channels,
-                audio=audio_bytes,
-            ).event()
-        )
+        data = self.request[0]
+        now = time.monotonic()
+        stream = self.state.stream
+        if (stream is not None) and (
+            (now - stream.last_packet_time) > self.args.stream_timeout
+        ):
+            _LOGGER.debug("Stream from %s timed out", stream.address)
+            stream = self.state.stream = None
+
+        if stream is None:
+            _LOGGER.debug("New stream from %s", self.client_address)
+            stream = UdpStream(
+                address=self.client_address,
+                start_time=now,
+                decoder=get_decoder(
+                    self.args.codec, self.args.rate, self.args.width, self.args.channels
+                ),
+                jitter=(
+                    JitterBuffer(depth=self.args.jitter_packets)
+                    if self.args.header
+                    else None
+                ),
+            )
+            self.state.stream = stream
+        elif stream.address != self.client_address:
+            # Only one sender at a time, so chunks aren't interleaved
+            return
+
+        stream.last_packet_time = now
+        stream_ms = int((now - stream.start_time) * 1_000)
+
+        if stream.jitter is None:
+            self.add_packet(stream, stream_ms, data)
+        else:
+            if len(data) < UDP_HEADER.size:
+                return
+
+            sequence, timestamp = UDP_HEADER.unpack_from(data)
+
+            # Make sender's timestamps relative to the start of the stream.
+            # Re-sync if the sender restarts or the clocks drift too far.
+            if (stream.timestamp_offset is None) or (
+                abs(timestamp + stream.timestamp_offset - stream_ms)
+                > (self.args.stream_timeout * 1_000)
+            ):
+                stream.timestamp_offset = stream_ms - timestamp
+
+            for packet in stream.jitter.add(
+                sequence, (timestamp + stream.timestamp_offset, data[UDP_HEADER.size :])
+            ):
+                if packet is None:
+                    self.conceal_packet(stream)
+                else:
+                    self.add_packet(stream, *packet)
+
+        self.write_chunks(stream)
+
+    def add_packet(self, stream: UdpStream, timestamp: float, data: bytes) -> None:
+        """Decode packet audio in sequence."""
+        if (stream.timestamp is None) or (not stream.audio):
+            stream.timestamp = timestamp
+
+        audio = stream.decoder.decode(data)
+        stream.last_packet_size = len(audio)
+        stream.audio += audio
+
+    def conceal_packet(self, stream: UdpStream) -> None:
+        """Fill in a lost packet with silence so timing is kept."""
+        if stream.jitter is not None:
+            _LOGGER.debug(
+                "Packets lost=%s, late=%s",
+                stream.jitter.packets_lost,
+                stream.jitter.packets_late,
+            )
+
+        stream.audio += bytes(stream.last_packet_size)
+
+    def write_chunks(self, stream: UdpStream) -> None:
+        """Send audio in fixed-size chunks."""
+        while len(stream.audio) >= self.bytes_per_chunk:
+            chunk = AudioChunk(
+                rate=self.args.rate,
+                width=self.args.width,
+                channels=self.args.channels,
+                audio=stream.audio[: self.bytes_per_chunk],
+                timestamp=(
+                    int(stream.timestamp) if stream.timestamp is not None else None
+                ),
+            )
+            write_event(chunk.event())
+
+            stream.audio = stream.audio[self.bytes_per_chunk :]
+            if stream.timestamp is not None:
+                stream.timestamp += chunk.seconds * 1_000
 
 
 if __name__ == "__main__":
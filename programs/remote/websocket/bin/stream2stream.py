@@ -11,6 +11,13 @@ from websockets import connect
 from websockets.exceptions import ConnectionClosedOK
 
 from rhasspy3.audio import AudioChunk, AudioStart, AudioStop
+from rhasspy3.codec import (
+    CODEC_PCM,
+    AudioEncoder,
+    get_decoder,
+    get_encoder,
+    negotiate_codec,
+)
 from rhasspy3.event import Event, read_event, write_event
 
 _FILE = Path(__file__)
@@ -21,22 +28,65 @@ _LOGGER = logging.getLogger(_FILE.stem)
 async def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("uri")
+    parser.add_argument(
+        "--codec",
+        default=CODEC_PCM,
+        help="Comma-separated list of preferred codecs for sending audio",
+    )
     args = parser.parse_args()
+    codecs = [codec.strip() for codec in args.codec.split(",") if codec.strip()]
 
     async with connect(args.uri) as websocket:
         recv_task = asyncio.create_task(websocket.recv())
         pending = {recv_task}
+        encoder: Optional[AudioEncoder] = None
 
         while True:
             mic_event = read_event()
-            if mic_event is None:
+            if (mic_event is None) or AudioStop.is_type(mic_event.type):
+                if encoder is not None:
+                    # Send audio buffered by the encoder
+                    data = encoder.flush()
+                    if data:
+                        await websocket.send(data)
+
+                if mic_event is not None:
+                    # Satellite detected the end of speech
+                    await websocket.send(json.dumps(mic_event.to_dict()))
+
                 break
 
             if not AudioChunk.is_type(mic_event.type):
                 continue
 
             mic_chunk = AudioChunk.from_event(mic_event)
-            send_task = asyncio.create_task(websocket.send(mic_chunk.audio))
+            if encoder is None:
+                # Tell the server which codec the audio is in
+                codec = negotiate_codec(
+                    codecs, mic_chunk.rate, mic_chunk.width, mic_chunk.channels
+                )
+                encoder = get_encoder(
+                    codec, mic_chunk.rate, mic_chunk.width, mic_chunk.channels
+                )
+                _LOGGER.debug("Sending audio with codec: %s", codec)
+                await websocket.send(
+                    json.dumps(
+                        AudioStart(
+                            mic_chunk.rate,
+                            mic_chunk.width,
+                            mic_chunk.channels,
+                            codec=codec,
+                        )
+                        .event()
+                        .to_dict()
+                    )
+                )
+
+            data = encoder.encode(mic_chunk.audio)
+            if not data:
+                continue
+
+            send_task = asyncio.create_task(websocket.send(data))
             pending.add(send_task)
 
             done, pending = await asyncio.wait(
@@ -51,18 +101,24 @@ async def main() -> None:
                 await send_task
 
         try:
+            # First message was already requested while streaming
+            start: Optional[AudioStart] = None
+            data = await recv_task
             while True:
-                start: Optional[AudioStart] = None
-                data = await websocket.recv()
                 try:
                     event = Event.from_dict(json.loads(data))
                     if AudioStart.is_type(event.type):
                         start = AudioStart.from_event(event)
                         break
                 except Exception:
-                    continue
+                    pass
+
+                data = await websocket.recv()
 
             assert start is not None
+            decoder = get_decoder(
+                start.codec or CODEC_PCM, start.rate, start.width, start.channels
+            )
 
             while True:
                 data = await websocket.recv()
@@ -72,7 +128,7 @@ async def main() -> None:
                             start.rate,
                             start.width,
                             start.channels,
-                            data,
+                            decoder.decode(data),
                         ).event()
                     )
                 else:
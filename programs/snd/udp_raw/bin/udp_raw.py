@@ -6,11 +6,14 @@ from rhasspy3.audio import (
     DEFAULT_OUT_CHANNELS,
     DEFAULT_OUT_RATE,
     DEFAULT_OUT_WIDTH,
+    DEFAULT_SAMPLES_PER_CHUNK,
     AudioChunk,
     AudioChunkConverter,
     AudioStop,
 )
+from rhasspy3.codec import CODEC_PCM, get_encoder
 from rhasspy3.event import read_event, write_event
+from rhasspy3.jitter import UDP_HEADER
 from rhasspy3.snd import Played
 
 
@@ -31,11 +34,53 @@ def main() -> None:
         default=DEFAULT_OUT_CHANNELS,
         help="Sample channel count",
     )
+    parser.add_argument(
+        "--codec", default=CODEC_PCM, help="Codec of sent audio (default: pcm)"
+    )
+    parser.add_argument(
+        "--samples-per-packet",
+        type=int,
+        default=DEFAULT_SAMPLES_PER_CHUNK,
+        help="Maximum number of samples in each packet",
+    )
+    parser.add_argument(
+        "--header",
+        action="store_true",
+        help="Start packets with a sequence number and timestamp (see rhasspy3.jitter)",
+    )
     #
     args = parser.parse_args()
 
     converter = AudioChunkConverter(args.rate, args.width, args.channels)
+    encoder = get_encoder(args.codec, args.rate, args.width, args.channels)
+    bytes_per_packet = args.samples_per_packet * args.width * args.channels
+    bytes_per_ms = (args.rate * args.width * args.channels) / 1_000
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sequence = 0
+
+    # Audio sent so far, for timestamps relative to the start of the stream
+    audio_bytes = 0
+
+    def send(data: bytes, timestamp: int) -> None:
+        nonlocal sequence
+        if args.header:
+            data = UDP_HEADER.pack(sequence, timestamp) + data
+            sequence = (sequence + 1) % (2**32)
+
+        sock.sendto(data, (args.host, args.port))
+
+    def send_audio(audio: bytes) -> None:
+        nonlocal audio_bytes
+
+        # Large chunks won't fit in a single datagram
+        for offset in range(0, len(audio), bytes_per_packet):
+            packet_audio = audio[offset : offset + bytes_per_packet]
+            data = encoder.encode(packet_audio)
+            if data:
+                send(data, int(audio_bytes / bytes_per_ms))
+
+            audio_bytes += len(packet_audio)
+
     while True:
         event = read_event()
         if event is None:
@@ -43,11 +88,18 @@ def main() -> None:
 
         if AudioChunk.is_type(event.type):
             chunk = AudioChunk.from_event(event)
-            chunk = converter.convert(chunk)
-            sock.sendto(chunk.audio, (args.host, args.port))
+            send_audio(converter.convert(chunk).audio)
         elif AudioStop.is_type(event.type):
             break
 
+    tail_chunk = converter.flush()
+    if tail_chunk is not None:
+        send_audio(tail_chunk.audio)
+
+    data = encoder.flush()
+    if data:
+        send(data, int(audio_bytes / bytes_per_ms))
+
     write_event(Played().event())
 
 
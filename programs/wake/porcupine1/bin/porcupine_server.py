@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Wake word server for many audio streams with porcupine.
+
+Each connection is one audio stream with its own porcupine instance, since
+porcupine keeps internal state and can't batch audio from different streams.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from typing import IO, Optional
+
+from porcupine_shared import get_arg_parser, load_porcupine
+
+_LOGGER = logging.getLogger("porcupine_server")
+
+
+def main() -> None:
+    parser = get_arg_parser()
+    parser.add_argument(
+        "--socketfile", required=True, help="Path to Unix domain socket file"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    # Need to unlink socket if it exists
+    try:
+        os.unlink(args.socketfile)
+    except OSError:
+        pass
+
+    try:
+        # Create socket server
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(args.socketfile)
+        sock.listen()
+
+        # Listen for connections
+        while True:
+            try:
+                connection, client_address = sock.accept()
+                _LOGGER.debug("Connection from %s", client_address)
+
+                # Start new thread for client
+                threading.Thread(
+                    target=handle_client,
+                    args=(connection, args),
+                    daemon=True,
+                ).start()
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                _LOGGER.exception("Error communicating with socket client")
+    finally:
+        os.unlink(args.socketfile)
+
+
+def handle_client(connection: socket.socket, args: argparse.Namespace) -> None:
+    try:
+        porcupine, names = load_porcupine(args)
+        try:
+            chunk_format = "h" * porcupine.frame_length
+            bytes_per_chunk = porcupine.frame_length * 2  # 16-bit width
+            audio_bytes = bytes()
+            is_first_audio = True
+            is_detected = False
+
+            with connection, connection.makefile(mode="rwb") as conn_file:
+                while True:
+                    line = conn_file.readline()
+                    if not line:
+                        break
+
+                    event_info = json.loads(line)
+                    event_type = event_info["type"]
+
+                    payload: Optional[bytes] = None
+                    payload_length = event_info.get("payload_length")
+                    if payload_length is not None:
+                        payload = conn_file.read(payload_length)
+
+                    if (event_type == "audio-chunk") and payload:
+                        if is_first_audio:
+                            _LOGGER.debug("Receiving audio")
+                            is_first_audio = False
+
+                        audio_bytes += payload
+                        timestamp = (event_info.get("data") or {}).get("timestamp")
+
+                        while len(audio_bytes) >= bytes_per_chunk:
+                            unpacked_chunk = struct.unpack_from(
+                                chunk_format, audio_bytes[:bytes_per_chunk]
+                            )
+                            keyword_index = porcupine.process(unpacked_chunk)
+                            if keyword_index >= 0:
+                                _LOGGER.debug("Detected %s", names[keyword_index])
+                                write_event(
+                                    conn_file,
+                                    "detection",
+                                    {
+                                        "name": names[keyword_index],
+                                        "timestamp": timestamp,
+                                    },
+                                )
+                                is_detected = True
+
+                            audio_bytes = audio_bytes[bytes_per_chunk:]
+                    elif event_type == "audio-stop":
+                        _LOGGER.debug("Audio stopped")
+                        if not is_detected:
+                            write_event(conn_file, "not-detected")
+
+                        break
+        finally:
+            porcupine.delete()
+    except Exception:
+        _LOGGER.exception("Unexpected error in client thread")
+
+
+def write_event(conn_file: IO[bytes], event_type: str, data: Optional[dict] = None):
+    event_str = json.dumps({"type": event_type, "data": data or {}}) + "\n"
+    conn_file.write(event_str.encode())
+    conn_file.flush()
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -21,10 +21,11 @@ from dataclasses import dataclass
 from enum import IntEnum
 from math import floor
 from pathlib import Path
-from typing import Any, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import tflite_runtime.interpreter as tflite
+from numpy.lib.stride_tricks import sliding_window_view
 from sonopy import mfcc_spec
 
 MAX_WAV_VALUE = 32768
@@ -33,7 +34,11 @@ _log = logging.getLogger("mycroft_hotword")
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("model", help="Path to TFLite model")
+    parser.add_argument(
+        "model",
+        nargs="+",
+        help="Path to TFLite model(s). Features are shared between models.",
+    )
     parser.add_argument(
         "--sensitivity",
         type=float,
@@ -56,7 +61,6 @@ def main():
     args = parser.parse_args()
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
 
-    args.model = Path(args.model).absolute()
     engine = TFLiteHotWordEngine(
         local_model_file=args.model,
         sensitivity=args.sensitivity,
@@ -81,7 +85,8 @@ def main():
             engine.update(chunk)
 
             if engine.found_wake_word(None):
-                print(args.model.name, flush=True)
+                assert engine.found_model_path is not None
+                print(engine.found_model_path.name, flush=True)
     except KeyboardInterrupt:
         pass
 
@@ -89,10 +94,227 @@ def main():
 # -----------------------------------------------------------------------------
 
 
+class HotWordModel:
+    """TFLite wake word model, which may be shared between audio streams."""
+
+    def __init__(self, model_path: Union[str, Path]):
+        self.path = Path(model_path).absolute()
+
+        # False if model gives different results when batched
+        self.supports_batch = True
+        self._batch_checked = False
+
+        # batch size -> interpreter with input resized to that batch size
+        self._interpreters: Dict[int, Any] = {}
+
+        _log.debug("Loading model from %s", self.path)
+        self._get_interpreter(1)
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        """Get probabilities for a batch of MFCC windows.
+
+        Input shape is (batch, n_features, n_mfcc). Batches are padded to a
+        power of two so only a few interpreter sizes are ever allocated.
+        """
+        batch_size = inputs.shape[0]
+        if batch_size == 1:
+            return self._invoke(1, inputs)
+
+        if not self._batch_checked:
+            return self._check_batch(inputs)
+
+        if not self.supports_batch:
+            return np.concatenate(
+                [self._invoke(1, inputs[i : i + 1]) for i in range(batch_size)]
+            )
+
+        padded_size = 1 << (batch_size - 1).bit_length()
+        if padded_size != batch_size:
+            padding = np.zeros(
+                (padded_size - batch_size,) + inputs.shape[1:], dtype=inputs.dtype
+            )
+            inputs = np.concatenate((inputs, padding))
+
+        return self._invoke(padded_size, inputs)[:batch_size]
+
+    def _invoke(self, batch_size: int, inputs: np.ndarray) -> np.ndarray:
+        interpreter, input_index, output_index = self._get_interpreter(batch_size)
+        interpreter.set_tensor(input_index, inputs)
+        interpreter.invoke()
+
+        # raw_output
+        return interpreter.get_tensor(output_index)[:, 0]
+
+    def _get_interpreter(self, batch_size: int) -> Tuple[Any, int, int]:
+        interpreter = self._interpreters.get(batch_size)
+        if interpreter is None:
+            interpreter = tflite.Interpreter(model_path=str(self.path))
+            if batch_size != 1:
+                input_details = interpreter.get_input_details()[0]
+                interpreter.resize_tensor_input(
+                    input_details["index"],
+                    [batch_size] + list(input_details["shape"][1:]),
+                )
+
+            interpreter.allocate_tensors()
+            self._interpreters[batch_size] = interpreter
+
+        return (
+            interpreter,
+            interpreter.get_input_details()[0]["index"],
+            interpreter.get_output_details()[0]["index"],
+        )
+
+    def _check_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """Verify that batched inference matches one window at a time.
+
+        Returns the one-at-a-time probabilities.
+        """
+        self._batch_checked = True
+        expected = np.concatenate(
+            [self._invoke(1, inputs[i : i + 1]) for i in range(inputs.shape[0])]
+        )
+        try:
+            padded_size = 1 << (inputs.shape[0] - 1).bit_length()
+            padding = np.zeros(
+                (padded_size - inputs.shape[0],) + inputs.shape[1:], dtype=inputs.dtype
+            )
+            actual = self._invoke(padded_size, np.concatenate((inputs, padding)))
+            self.supports_batch = np.allclose(
+                actual[: inputs.shape[0]], expected, atol=1e-5
+            )
+        except Exception:
+            _log.debug("Batch inference failed for %s", self.path, exc_info=True)
+            self.supports_batch = False
+
+        if not self.supports_batch:
+            _log.info("Model doesn't support batching: %s", self.path.name)
+
+        return expected
+
+
+@dataclass
+class ActivationDecoder:
+    """Turns probabilities from one model into detections for one stream."""
+
+    sensitivity: float
+    trigger_level: int
+    chunk_size: int
+
+    # Activation level (> trigger_level = wake word found)
+    activation: int = 0
+
+    def process(self, prob: float) -> bool:
+        """Returns True if wake word was detected."""
+        if (prob < 0.0) or (prob > 1.0):
+            # TODO: Handle out of range.
+            # Not seeing these currently, so ignoring.
+            return False
+
+        # Decode
+        activated = prob > 1.0 - self.sensitivity
+        triggered = False
+        if activated or (self.activation < 0):
+            # Increase activation
+            self.activation += 1
+
+            triggered = self.activation > self.trigger_level
+            if triggered or (activated and (self.activation < 0)):
+                # Push activation down far to avoid an accidental re-activation
+                self.activation = -(8 * 2048) // self.chunk_size
+        elif self.activation > 0:
+            # Decrease activation
+            self.activation -= 1
+
+        return triggered
+
+
+def decode_probabilities(
+    decoders: Sequence[ActivationDecoder], probabilities: Sequence[float]
+) -> Optional[int]:
+    """Run each model's decoder. Returns index of winning model, if any."""
+    found_idx: Optional[int] = None
+    for model_idx, (decoder, prob) in enumerate(zip(decoders, probabilities)):
+        if not decoder.process(prob):
+            continue
+
+        if (found_idx is None) or (prob > probabilities[found_idx]):
+            found_idx = model_idx
+
+    return found_idx
+
+
+class MfccWindow:
+    """Sliding window of MFCCs for one audio stream."""
+
+    def __init__(self, params: "ListenerParams"):
+        self.params = params
+
+        # Computes MFCCs for new audio only
+        self._features = MfccFeatures(params)
+
+        # Ring buffer of MFCCs, stored twice so that the current window is
+        # always a contiguous view: _inputs[_inputs_idx : _inputs_idx + n_features]
+        self._inputs = np.zeros(
+            (2 * params.n_features, params.n_mfcc), dtype=np.float32
+        )
+
+        # Index of oldest MFCC timestep in ring buffer
+        self._inputs_idx: int = 0
+
+        # Number of MFCC timesteps in ring buffer (up to n_features)
+        self._inputs_count: int = 0
+
+    def add_audio(self, audio: np.ndarray) -> bool:
+        """Add audio samples. Returns True if window is full and has new MFCCs."""
+        # Only new hops of audio are processed
+        mfccs = self._features.process(audio)
+        if mfccs.shape[0] == 0:
+            return False
+
+        self._add_mfccs(mfccs)
+
+        # Don't have a full set of inputs until window is filled
+        return self._inputs_count >= self.params.n_features
+
+    @property
+    def inputs(self) -> np.ndarray:
+        """Current window of MFCCs (n_features x n_mfcc), oldest first."""
+        return self._inputs[
+            self._inputs_idx : self._inputs_idx + self.params.n_features
+        ]
+
+    def reset(self):
+        self._inputs.fill(0)
+        self._inputs_idx = 0
+        self._inputs_count = 0
+        self._features.reset()
+
+    def _add_mfccs(self, mfccs: np.ndarray):
+        """Write MFCC timesteps into the ring buffer, overwriting the oldest."""
+        n_features = self.params.n_features
+        mfccs = mfccs[-n_features:]
+        num_timesteps = mfccs.shape[0]
+
+        end_idx = self._inputs_idx + num_timesteps
+        if end_idx <= n_features:
+            self._inputs[self._inputs_idx : end_idx] = mfccs
+            self._inputs[self._inputs_idx + n_features : end_idx + n_features] = mfccs
+        else:
+            timestep_idxs = (self._inputs_idx + np.arange(num_timesteps)) % n_features
+            self._inputs[timestep_idxs] = mfccs
+            self._inputs[timestep_idxs + n_features] = mfccs
+
+        self._inputs_idx = end_idx % n_features
+        self._inputs_count = min(n_features, self._inputs_count + num_timesteps)
+
+
 class TFLiteHotWordEngine:
+    """Runs one or more models on the same window of MFCCs."""
+
     def __init__(
         self,
-        local_model_file: Union[str, Path],
+        local_model_file: Union[str, Path, Sequence[Union[str, Path]]],
         sensitivity: float = 0.7,
         trigger_level: int = 4,
         chunk_size: int = 2048,
@@ -101,133 +323,60 @@ class TFLiteHotWordEngine:
         self.trigger_level = trigger_level
         self.chunk_size = chunk_size
 
-        self.model_path = Path(local_model_file).absolute()
-
-        self._interpreter: Optional[tflite.Interpreter] = None
-        self._params: Optional[ListenerParams] = None
-        self._input_details: Optional[Any] = None
-        self._output_details: Optional[Any] = None
-
-        # Rolling window of MFCCs (fixed sized)
-        self._inputs: Optional[np.ndarray] = None
-
-        # Current MFCC timestep
-        self._inputs_idx: int = 0
-
-        # Bytes for one window of audio
-        self._window_bytes: int = 0
-
-        # Bytes for one MFCC hop
-        self._hop_bytes: int = 0
+        if isinstance(local_model_file, (str, Path)):
+            local_model_file = [local_model_file]
 
-        # Raw audio
-        self._chunk_buffer = bytes()
+        self.model_paths = [Path(p).absolute() for p in local_model_file]
+        self.model_path = self.model_paths[0]
 
-        # Activation level (> trigger_level = wake word found)
-        self._activation: int = 0
+        self._models: List[HotWordModel] = []
+        self._decoders: List[ActivationDecoder] = []
+        self._params: Optional[ListenerParams] = None
+        self._window: Optional[MfccWindow] = None
 
         # True if wake word was found during last update
         self._is_found = False
 
-        # There doesn't seem to be an initialize() method for wake word plugins,
-        # so we'll load the model here.
-        self._load_model()
+        # Index of model that triggered during last update
+        self._found_idx: Optional[int] = None
 
         # Last probability
         self._probability: Optional[float] = None
 
+        # There doesn't seem to be an initialize() method for wake word plugins,
+        # so we'll load the model here.
+        self._load_model()
+
     def _load_model(self):
-        _log.debug("Loading model from %s", self.model_path)
-        self._interpreter = tflite.Interpreter(model_path=str(self.model_path))
-        self._interpreter.allocate_tensors()
-        self._input_details = self._interpreter.get_input_details()
-        self._output_details = self._interpreter.get_output_details()
+        for model_path in self.model_paths:
+            self._models.append(HotWordModel(model_path))
+            self._decoders.append(
+                ActivationDecoder(self.sensitivity, self.trigger_level, self.chunk_size)
+            )
 
         # TODO: Load these from adjacent file
         self._params = ListenerParams()
-
-        self._window_bytes = self._params.window_samples * self._params.sample_depth
-        self._hop_bytes = self._params.hop_samples * self._params.sample_depth
-
-        # Rolling window of MFCCs (fixed sized)
-        self._inputs = np.zeros(
-            (1, self._params.n_features, self._params.n_mfcc), dtype=np.float32
-        )
+        self._window = MfccWindow(self._params)
 
     def update(self, chunk):
         self._is_found = False
-        self._chunk_buffer += chunk
+        self._found_idx = None
         self._probability = None
 
-        # Process all available windows
-        while len(self._chunk_buffer) >= self._window_bytes:
-            # Process current audio
-            audio = buffer_to_audio(self._chunk_buffer)
-
-            # TODO: Implement different MFCC algorithms
-            mfccs = mfcc_spec(
-                audio,
-                self._params.sample_rate,
-                (self._params.window_samples, self._params.hop_samples),
-                num_filt=self._params.n_filt,
-                fft_size=self._params.n_fft,
-                num_coeffs=self._params.n_mfcc,
-            )
+        if not self._window.add_audio(buffer_to_audio(chunk)):
+            return self._is_found
 
-            num_timesteps = mfccs.shape[0]
-
-            # Remove processed audio from buffer
-            self._chunk_buffer = self._chunk_buffer[num_timesteps * self._hop_bytes :]
-
-            # Check if we have a full set of inputs yet
-            inputs_end_idx = self._inputs_idx + num_timesteps
-            if inputs_end_idx > self._inputs.shape[1]:
-                # Full set, need to roll back existing inputs
-                self._inputs = np.roll(self._inputs, -num_timesteps, axis=1)
-                inputs_end_idx = self._inputs.shape[1]
-                self._inputs_idx = inputs_end_idx - num_timesteps
-
-            # Insert new MFCCs at the end
-            self._inputs[0, self._inputs_idx : inputs_end_idx, :] = mfccs
-            self._inputs_idx += num_timesteps
-            if inputs_end_idx < self._inputs.shape[1]:
-                # Don't have a full set of inputs yet
-                continue
-
-            # TODO: Add deltas
-
-            # raw_output
-            self._interpreter.set_tensor(self._input_details[0]["index"], self._inputs)
-            self._interpreter.invoke()
-            raw_output = self._interpreter.get_tensor(self._output_details[0]["index"])
-            prob = raw_output[0][0]
-
-            if (prob < 0.0) or (prob > 1.0):
-                # TODO: Handle out of range.
-                # Not seeing these currently, so ignoring.
-                continue
-
-            self._probability = prob.item()
-
-            # Decode
-            activated = prob > 1.0 - self.sensitivity
-            triggered = False
-            if activated or (self._activation < 0):
-                # Increase activation
-                self._activation += 1
-
-                triggered = self._activation > self.trigger_level
-                if triggered or (activated and (self._activation < 0)):
-                    # Push activation down far to avoid an accidental re-activation
-                    self._activation = -(8 * 2048) // self.chunk_size
-            elif self._activation > 0:
-                # Decrease activation
-                self._activation -= 1
-
-            if triggered:
-                self._is_found = True
-                _log.debug("Triggered")
-                break
+        # TODO: Add deltas
+
+        # Every model sees the same window of MFCCs
+        inputs = self._window.inputs[np.newaxis, :, :]
+        probabilities = [model.predict(inputs)[0].item() for model in self._models]
+        self._probability = max(probabilities)
+
+        self._found_idx = decode_probabilities(self._decoders, probabilities)
+        if self._found_idx is not None:
+            self._is_found = True
+            _log.debug("Triggered: %s", self.model_paths[self._found_idx].name)
 
         return self._is_found
 
@@ -235,22 +384,157 @@ class TFLiteHotWordEngine:
         return self._is_found
 
     def reset(self):
-        self._inputs = np.zeros(
-            (1, self._params.n_features, self._params.n_mfcc), dtype=np.float32
-        )
-        self._activation = 0
+        self._window.reset()
+        for decoder in self._decoders:
+            decoder.activation = 0
+
         self._is_found = False
-        self._inputs_idx = 0
-        self._chunk_buffer = bytes()
+        self._found_idx = None
+        self._probability = None
+
+    @property
+    def found_model_path(self) -> Optional[Path]:
+        """Path of model that triggered during last update."""
+        if self._found_idx is None:
+            return None
+
+        return self.model_paths[self._found_idx]
 
     @property
     def probability(self) -> Optional[float]:
+        """Highest model probability from last update."""
         return self._probability
 
 
 # -----------------------------------------------------------------------------
 
 
+class MfccFeatures:
+    """Computes MFCCs for each new hop of audio.
+
+    Produces the same output as sonopy.mfcc_spec, but the mel filterbank and
+    DCT matrices are computed once and only new windows are transformed.
+    """
+
+    def __init__(self, params: "ListenerParams"):
+        self.params = params
+
+        num_bins = (params.n_fft // 2) + 1
+        self._filters_t = mel_filterbanks(params.sample_rate, params.n_filt, num_bins).T
+        self._dct = dct_matrix(params.n_filt)[:, : params.n_mfcc]
+
+        # Audio left over from last call (less than a window)
+        self._samples = np.zeros(0, dtype=np.float32)
+
+        self._use_sonopy = False
+        if not self._matches_sonopy():
+            _log.warning("MFCCs don't match sonopy. Falling back to mfcc_spec.")
+            self._use_sonopy = True
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """Returns MFCCs (timesteps x n_mfcc) for all complete windows."""
+        window_samples = self.params.window_samples
+        hop_samples = self.params.hop_samples
+
+        if self._samples.size > 0:
+            audio = np.concatenate((self._samples, audio))
+
+        if audio.shape[0] < window_samples:
+            self._samples = audio
+            return np.zeros((0, self.params.n_mfcc), dtype=np.float32)
+
+        num_timesteps = 1 + (audio.shape[0] - window_samples) // hop_samples
+        self._samples = audio[num_timesteps * hop_samples :].copy()
+
+        if self._use_sonopy:
+            return mfcc_spec(
+                audio[: ((num_timesteps - 1) * hop_samples) + window_samples],
+                self.params.sample_rate,
+                (window_samples, hop_samples),
+                num_filt=self.params.n_filt,
+                fft_size=self.params.n_fft,
+                num_coeffs=self.params.n_mfcc,
+            )
+
+        windows = sliding_window_view(audio, window_samples)[::hop_samples]
+        return self._mfccs(windows[:num_timesteps])
+
+    def reset(self):
+        self._samples = np.zeros(0, dtype=np.float32)
+
+    def _mfccs(self, windows: np.ndarray) -> np.ndarray:
+        fft = np.fft.rfft(windows, n=self.params.n_fft)
+        powers = (fft.real**2 + fft.imag**2) / self.params.n_fft
+        mfccs = safe_log(powers @ self._filters_t) @ self._dct
+
+        # Replace first band with log energies
+        mfccs[:, 0] = safe_log(np.sum(powers, axis=1))
+
+        return mfccs
+
+    def _matches_sonopy(self) -> bool:
+        """Check cached matrices against sonopy, which the models were trained with."""
+        audio_len = self.params.window_samples + (2 * self.params.hop_samples)
+        audio = np.random.default_rng(0).uniform(-0.5, 0.5, audio_len)
+        expected = mfcc_spec(
+            audio,
+            self.params.sample_rate,
+            (self.params.window_samples, self.params.hop_samples),
+            num_filt=self.params.n_filt,
+            fft_size=self.params.n_fft,
+            num_coeffs=self.params.n_mfcc,
+        )
+        windows = sliding_window_view(audio, self.params.window_samples)[
+            :: self.params.hop_samples
+        ]
+        actual = self._mfccs(windows)
+
+        return (actual.shape == expected.shape) and np.allclose(
+            actual, expected, rtol=1e-4, atol=1e-4
+        )
+
+
+def mel_filterbanks(sample_rate: int, num_filt: int, fft_len: int) -> np.ndarray:
+    """Triangle filters on mel-spaced frequencies (same as sonopy)"""
+    grid_mels = np.linspace(
+        hertz_to_mels(0), hertz_to_mels(sample_rate), num_filt + 2, True
+    )
+    grid_hertz = mels_to_hertz(grid_mels)
+    grid_indices = (grid_hertz * fft_len / sample_rate).astype(int)
+    banks = np.zeros([num_filt, fft_len])
+    for i in range(num_filt):
+        left, middle, right = grid_indices[i : i + 3]
+        banks[i, left:middle] = np.linspace(0.0, 1.0, middle - left, False)
+        banks[i, middle:right] = np.linspace(1.0, 0.0, right - middle, False)
+
+    return banks
+
+
+def dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II as a matrix: dct(x, norm="ortho") == x @ dct_matrix(n)"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * np.outer(2 * n + 1, n) / (2 * size)) * np.sqrt(2 / size)
+    matrix[:, 0] /= np.sqrt(2)
+
+    return matrix
+
+
+def hertz_to_mels(f):
+    return 1127.0 * np.log(1.0 + f / 700.0)
+
+
+def mels_to_hertz(mel):
+    return 700.0 * (np.exp(mel / 1127.0) - 1.0)
+
+
+def safe_log(x: np.ndarray) -> np.ndarray:
+    """Prevents error on log(0) or log(-1)"""
+    return np.log(np.clip(x, np.finfo(float).eps, None))
+
+
+# -----------------------------------------------------------------------------
+
+
 class Vectorizer(IntEnum):
     """
     Chooses which function to call to vectorize audio
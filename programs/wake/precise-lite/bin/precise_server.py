@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Wake word server for many audio streams with shared precise-lite models.
+
+Each connection is one audio stream with its own MFCC window and activation
+state. Windows from all streams are run through the models in batches.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from concurrent.futures import Future
+from typing import IO, List, Optional, Tuple
+
+import numpy as np
+from precise import (
+    ActivationDecoder,
+    HotWordModel,
+    ListenerParams,
+    MfccWindow,
+    buffer_to_audio,
+    decode_probabilities,
+)
+
+_LOGGER = logging.getLogger("precise_server")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", nargs="+", help="Path to TFLite model(s)")
+    parser.add_argument(
+        "--socketfile", required=True, help="Path to Unix domain socket file"
+    )
+    parser.add_argument(
+        "--sensitivity",
+        type=float,
+        default=0.8,
+        help="Model sensitivity (0-1, default: 0.8)",
+    )
+    parser.add_argument(
+        "--trigger-level",
+        type=int,
+        default=4,
+        help="Number of activations before detection occurs (default: 4)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=2048,
+        help="Typical number of audio bytes per chunk (used for activation)",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=16,
+        help="Maximum number of streams to run through a model at once",
+    )
+    parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    # Need to unlink socket if it exists
+    try:
+        os.unlink(args.socketfile)
+    except OSError:
+        pass
+
+    try:
+        # Create socket server
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(args.socketfile)
+        sock.listen()
+
+        # Load models once for all streams
+        models = [HotWordModel(model_path) for model_path in args.model]
+        batcher = InferenceBatcher(models, max(1, args.max_batch_size))
+        threading.Thread(target=batcher.run, daemon=True).start()
+
+        # Listen for connections
+        while True:
+            try:
+                connection, client_address = sock.accept()
+                _LOGGER.debug("Connection from %s", client_address)
+
+                # Start new thread for client
+                threading.Thread(
+                    target=handle_client,
+                    args=(connection, batcher, args),
+                    daemon=True,
+                ).start()
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                _LOGGER.exception("Error communicating with socket client")
+    finally:
+        os.unlink(args.socketfile)
+
+
+class InferenceBatcher:
+    """Runs MFCC windows from all streams through the models in batches."""
+
+    def __init__(self, models: List[HotWordModel], max_batch_size: int):
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self._requests: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        """Get a probability from each model for one window. Blocks until done."""
+        future: Future = Future()
+        self._requests.put((inputs.copy(), future))
+        return future.result()
+
+    def run(self):
+        while True:
+            # Batch whatever is waiting when the models are free
+            requests = [self._requests.get()]
+            while len(requests) < self.max_batch_size:
+                try:
+                    requests.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                batch = np.stack([inputs for inputs, _future in requests])
+
+                # models x batch
+                probabilities = np.stack(
+                    [model.predict(batch) for model in self.models]
+                )
+                for request_idx, (_inputs, future) in enumerate(requests):
+                    future.set_result(probabilities[:, request_idx])
+            except Exception as err:
+                _LOGGER.exception("Unexpected error during inference")
+                for _inputs, future in requests:
+                    future.set_exception(err)
+
+
+def handle_client(
+    connection: socket.socket, batcher: InferenceBatcher, args: argparse.Namespace
+) -> None:
+    try:
+        # Per-stream state
+        window = MfccWindow(ListenerParams())
+        decoders = [
+            ActivationDecoder(args.sensitivity, args.trigger_level, args.chunk_size)
+            for _model in batcher.models
+        ]
+        names = [model.path.name for model in batcher.models]
+        is_first_audio = True
+        is_detected = False
+
+        with connection, connection.makefile(mode="rwb") as conn_file:
+            while True:
+                line = conn_file.readline()
+                if not line:
+                    break
+
+                event_info = json.loads(line)
+                event_type = event_info["type"]
+
+                payload: Optional[bytes] = None
+                payload_length = event_info.get("payload_length")
+                if payload_length is not None:
+                    payload = conn_file.read(payload_length)
+
+                if (event_type == "audio-chunk") and payload:
+                    if is_first_audio:
+                        _LOGGER.debug("Receiving audio")
+                        is_first_audio = False
+
+                    if not window.add_audio(buffer_to_audio(payload)):
+                        continue
+
+                    probabilities = batcher.predict(window.inputs)
+                    found_idx = decode_probabilities(decoders, probabilities.tolist())
+                    if found_idx is not None:
+                        _LOGGER.debug("Detected %s", names[found_idx])
+                        timestamp = (event_info.get("data") or {}).get("timestamp")
+                        write_event(
+                            conn_file,
+                            "detection",
+                            {"name": names[found_idx], "timestamp": timestamp},
+                        )
+                        is_detected = True
+                elif event_type == "audio-stop":
+                    _LOGGER.debug("Audio stopped")
+                    if not is_detected:
+                        write_event(conn_file, "not-detected")
+
+                    break
+    except Exception:
+        _LOGGER.exception("Unexpected error in client thread")
+
+
+def write_event(conn_file: IO[bytes], event_type: str, data: Optional[dict] = None):
+    event_str = json.dumps({"type": event_type, "data": data or {}}) + "\n"
+    conn_file.write(event_str.encode())
+    conn_file.flush()
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
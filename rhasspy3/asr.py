@@ -1,15 +1,42 @@
 """Speech to text."""
 import asyncio
+import io
 import logging
+import time
 import wave
-from dataclasses import dataclass
-from typing import IO, AsyncIterable, Optional, Union
-
-from .audio import AudioChunk, AudioStart, AudioStop, wav_to_chunks
-from .config import PipelineProgramConfig
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import (
+    IO,
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .audio import (
+    LIVE_CHUNK_SECONDS,
+    AudioChunk,
+    AudioChunkCoalescer,
+    AudioStart,
+    AudioStop,
+    wav_to_chunks,
+)
+from .config import AsrRaceConfig, PipelineProgramConfig
 from .core import Rhasspy
-from .event import Event, Eventable, async_read_event, async_write_event
-from .program import create_process
+from .event import Event, Eventable, EventWriter, async_read_event, async_write_event
+from .program import create_process, create_processes
+from .scheduler import Priority, set_priority
+from .stream import StreamMux
 from .vad import DOMAIN as VAD_DOMAIN
 from .vad import VoiceStarted, VoiceStopped
 
@@ -18,6 +45,18 @@ _TRANSCRIPT_TYPE = "transcript"
 
 _LOGGER = logging.getLogger(__name__)
 
+AcceptTranscript = Callable[["Transcript"], Awaitable[bool]]
+
+
+class AsrRacePolicy(str, Enum):
+    """How transcripts from raced asr programs are used."""
+
+    RACE = "race"
+    """Use the first fast transcript that is accepted (e.g., has an intent)."""
+
+    FALLBACK = "fallback"
+    """Use a fast transcript only if the main asr program has none in time."""
+
 
 @dataclass
 class Transcript(Eventable):
@@ -40,8 +79,15 @@ async def transcribe(
     rhasspy: Rhasspy,
     program: Union[str, PipelineProgramConfig],
     wav_in: IO[bytes],
-    samples_per_chunk: int,
+    samples_per_chunk: Optional[int] = None,
+    race: Optional[AsrRaceConfig] = None,
+    accept: Optional[AcceptTranscript] = None,
 ) -> Optional[Transcript]:
+    """Transcribe a WAV file (sent in FILE_CHUNK_SECONDS chunks by default).
+
+    With race, the same audio is sent to each of its programs too (see
+    wait_for_transcript).
+    """
     transcript: Optional[Transcript] = None
     wav_file: wave.Wave_read = wave.open(wav_in, "rb")
     with wav_file:
@@ -49,14 +95,13 @@ async def transcribe(
         width = wav_file.getsampwidth()
         channels = wav_file.getnchannels()
 
-        async with (await create_process(rhasspy, DOMAIN, program)) as asr_proc:
-            assert asr_proc.stdin is not None
-            assert asr_proc.stdout is not None
+        async with AsyncExitStack() as stack:
+            asr_procs = await start_asr_processes(rhasspy, stack, program, race)
 
             timestamp = 0
-            await async_write_event(
+            await write_to_asr_processes(
                 AudioStart(rate, width, channels, timestamp=timestamp).event(),
-                asr_proc.stdin,
+                asr_procs,
             )
 
             is_first_chunk = True
@@ -66,29 +111,386 @@ async def transcribe(
                     is_first_chunk = False
                     _LOGGER.debug("transcribe: processing audio")
 
-                await async_write_event(chunk.event(), asr_proc.stdin)
+                await write_to_asr_processes(chunk.event(), asr_procs)
                 if chunk.timestamp is not None:
                     timestamp = chunk.timestamp
                 else:
                     timestamp += chunk.milliseconds
 
-            await async_write_event(
-                AudioStop(timestamp=timestamp).event(), asr_proc.stdin
+            await write_to_asr_processes(
+                AudioStop(timestamp=timestamp).event(), asr_procs
             )
 
             _LOGGER.debug("transcribe: audio finished")
 
+            transcript = await wait_for_transcript(asr_procs, race, accept)
+            _LOGGER.debug("transcribe: %s", transcript)
+
+    return transcript
+
+
+@dataclass
+class AsrProcess:
+    """Streams of an asr program started by start_asr_processes."""
+
+    name: str
+    stdin: EventWriter
+    stdout: asyncio.StreamReader
+
+
+async def start_asr_processes(
+    rhasspy: Rhasspy,
+    stack: AsyncExitStack,
+    program: Union[str, PipelineProgramConfig],
+    race: Optional[AsrRaceConfig] = None,
+) -> List[AsrProcess]:
+    """Start asr program followed by the programs raced against it.
+
+    All programs wait for scheduler slots together, so raced programs can't
+    deadlock on a domain limit. Processes are stopped when stack is closed.
+    """
+    programs: List[Union[str, PipelineProgramConfig]] = [program]
+    if race is not None:
+        programs.extend(race.programs.values())
+
+    proc_managers = await create_processes(rhasspy, DOMAIN, programs)
+    asr_procs: List[AsrProcess] = []
+    for proc_manager_idx, proc_manager in enumerate(proc_managers):
+        try:
+            asr_proc = await stack.enter_async_context(proc_manager)
+        except BaseException:
+            # Stop programs that aren't owned by stack yet
+            for other_manager in proc_managers[proc_manager_idx + 1 :]:
+                await other_manager.__aexit__(None, None, None)
+
+            raise
+
+        assert asr_proc.stdin is not None
+        assert asr_proc.stdout is not None
+        asr_procs.append(
+            AsrProcess(
+                name=proc_manager.name, stdin=asr_proc.stdin, stdout=asr_proc.stdout
+            )
+        )
+
+    return asr_procs
+
+
+async def write_to_asr_processes(event: Event, asr_procs: List[AsrProcess]) -> None:
+    """Write event to processes started with start_asr_processes.
+
+    Raced programs that can't be written to are dropped from asr_procs, so
+    only an error from the main program (the first) is raised.
+    """
+    results = await asyncio.gather(
+        *(async_write_event(event, asr_proc.stdin) for asr_proc in asr_procs),
+        return_exceptions=True,
+    )
+    failed: List[AsrProcess] = []
+    for asr_proc_idx, (asr_proc, result) in enumerate(zip(asr_procs, results)):
+        if not isinstance(result, BaseException):
+            continue
+
+        if (asr_proc_idx == 0) or (not isinstance(result, Exception)):
+            raise result
+
+        _LOGGER.warning(
+            "Dropping raced asr program %s after write error: %s",
+            asr_proc.name,
+            result,
+        )
+        failed.append(asr_proc)
+
+    for asr_proc in failed:
+        asr_procs.remove(asr_proc)
+
+
+async def wait_for_transcript(
+    asr_procs: Sequence[AsrProcess],
+    race: Optional[AsrRaceConfig] = None,
+    accept: Optional[AcceptTranscript] = None,
+) -> Optional[Transcript]:
+    """Read transcript from processes started with start_asr_processes."""
+    asr_stdout = asr_procs[0].stdout
+    if (race is None) or (len(asr_procs) < 2):
+        return await read_transcript(asr_stdout)
+
+    return await race_transcripts(
+        asr_stdout,
+        [asr_proc.stdout for asr_proc in asr_procs[1:]],
+        policy=AsrRacePolicy(race.policy),
+        deadline_seconds=race.deadline_seconds,
+        accept=accept,
+    )
+
+
+async def read_transcript(asr_stdout: asyncio.StreamReader) -> Optional[Transcript]:
+    """Read events until a transcript or the end of the stream."""
+    while True:
+        event = await async_read_event(asr_stdout)
+        if event is None:
+            return None
+
+        if Transcript.is_type(event.type):
+            return Transcript.from_event(event)
+
+
+async def race_transcripts(
+    main_stdout: asyncio.StreamReader,
+    fast_stdouts: Sequence[asyncio.StreamReader],
+    policy: AsrRacePolicy = AsrRacePolicy.RACE,
+    deadline_seconds: Optional[float] = None,
+    accept: Optional[AcceptTranscript] = None,
+) -> Optional[Transcript]:
+    """Read transcripts from the main (accurate) and fast asr programs at once.
+
+    With the race policy, the first fast transcript that accept returns True
+    for is used right away (any transcript if accept is None). Otherwise, the
+    main transcript is used if it arrives within deadline_seconds. After the
+    deadline, or if the main program has no transcript, the first fast
+    transcript is used instead.
+
+    Empty transcripts are ignored.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = (
+        (loop.time() + deadline_seconds) if deadline_seconds is not None else None
+    )
+
+    main_task = asyncio.create_task(read_transcript(main_stdout))
+    fast_tasks = [
+        asyncio.create_task(read_transcript(fast_stdout))
+        for fast_stdout in fast_stdouts
+    ]
+    pending: Set["asyncio.Task[Optional[Transcript]]"] = {main_task, *fast_tasks}
+    fallback: Optional[Transcript] = None
+
+    try:
+        while pending:
+            timeout: Optional[float] = None
+            if (fallback is not None) and (deadline is not None):
+                # Only give up on the main program if there's something else
+                timeout = max(0.0, deadline - loop.time())
+
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                _LOGGER.debug("race_transcripts: deadline passed, using fast result")
+                return fallback
+
+            if main_task in done:
+                transcript = _get_transcript(main_task)
+                if transcript is not None:
+                    _LOGGER.debug("race_transcripts: using main result")
+                    return transcript
+
+                if fallback is not None:
+                    return fallback
+
+            for fast_task in fast_tasks:
+                if fast_task not in done:
+                    continue
+
+                transcript = _get_transcript(fast_task)
+                if transcript is None:
+                    continue
+
+                if main_task.done():
+                    # Main program has nothing better
+                    return transcript
+
+                if (policy == AsrRacePolicy.RACE) and (
+                    (accept is None) or (await accept(transcript))
+                ):
+                    _LOGGER.debug("race_transcripts: using fast result")
+                    return transcript
+
+                if fallback is None:
+                    fallback = transcript
+    finally:
+        for task in (main_task, *fast_tasks):
+            task.cancel()
+
+        await asyncio.gather(main_task, *fast_tasks, return_exceptions=True)
+
+    return fallback
+
+
+def _get_transcript(
+    task: "asyncio.Task[Optional[Transcript]]",
+) -> Optional[Transcript]:
+    """Get non-empty transcript from a finished task, or None."""
+    try:
+        transcript = task.result()
+    except Exception:
+        _LOGGER.exception("Unexpected error reading transcript")
+        return None
+
+    if (transcript is None) or (not transcript.text.strip()):
+        return None
+
+    return transcript
+
+
+@dataclass
+class BatchTranscript:
+    """Result of transcribing one WAV file in a batch."""
+
+    name: str
+    """Name of WAV file (path, form field, etc.)"""
+
+    transcript: Optional[Transcript] = None
+
+    audio_seconds: float = 0.0
+    """Duration of WAV audio."""
+
+    transcribe_seconds: float = 0.0
+    """Time taken to transcribe."""
+
+    error: Optional[str] = None
+    """Error message if transcription failed."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "name": self.name,
+            "text": self.transcript.text if self.transcript is not None else None,
+            "audio_seconds": self.audio_seconds,
+            "transcribe_seconds": self.transcribe_seconds,
+        }
+        if self.error is not None:
+            result["error"] = self.error
+
+        return result
+
+
+@dataclass
+class BatchStats:
+    """Throughput statistics for a batch transcription."""
+
+    count: int = 0
+    errors: int = 0
+    audio_seconds: float = 0.0
+    transcribe_seconds: float = 0.0
+    start_time: float = field(default_factory=time.monotonic)
+
+    def add(self, result: BatchTranscript) -> None:
+        self.count += 1
+        if result.error is not None:
+            self.errors += 1
+
+        self.audio_seconds += result.audio_seconds
+        self.transcribe_seconds += result.transcribe_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall_seconds = time.monotonic() - self.start_time
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "audio_seconds": self.audio_seconds,
+            "transcribe_seconds": self.transcribe_seconds,
+            "wall_seconds": wall_seconds,
+            "files_per_second": (self.count / wall_seconds) if wall_seconds > 0 else 0,
+            "real_time_factor": (wall_seconds / self.audio_seconds)
+            if self.audio_seconds > 0
+            else 0,
+        }
+
+
+async def transcribe_batch(
+    rhasspy: Rhasspy,
+    program: Union[str, PipelineProgramConfig],
+    wavs: Iterable[Tuple[str, bytes]],
+    samples_per_chunk: Optional[int] = None,
+    concurrency: int = 1,
+    priority: Priority = Priority.BATCH,
+) -> AsyncIterable[BatchTranscript]:
+    """Transcribe (name, WAV bytes) pairs with up to concurrency asr programs.
+
+    Results are yielded as they complete, not in input order. wavs is
+    iterated in a thread, so it may read files as it goes.
+    Programs are started with batch priority by default, so they yield to
+    interactive requests when the asr program has a concurrency limit.
+    """
+    assert concurrency > 0, "Concurrency must be at least 1"
+
+    # Bounded so that only a few WAV files are held in memory at a time
+    wav_queue: "asyncio.Queue[Optional[Tuple[str, bytes]]]" = asyncio.Queue(
+        maxsize=concurrency
+    )
+    result_queue: "asyncio.Queue[Optional[BatchTranscript]]" = asyncio.Queue()
+
+    async def feed_wavs() -> None:
+        loop = asyncio.get_running_loop()
+        wav_iter = iter(wavs)
+
+        def next_wav() -> Optional[Tuple[str, bytes]]:
+            return next(wav_iter, None)
+
+        try:
             while True:
-                event = await async_read_event(asr_proc.stdout)
-                if event is None:
+                # WAV files may be read from disk as they're iterated
+                name_wav = await loop.run_in_executor(None, next_wav)
+                if name_wav is None:
                     break
 
-                if Transcript.is_type(event.type):
-                    transcript = Transcript.from_event(event)
-                    _LOGGER.debug("transcribe: %s", transcript)
-                    break
+                await wav_queue.put(name_wav)
+        except Exception:
+            _LOGGER.exception("transcribe_batch: error reading WAV files")
+        finally:
+            for _ in range(concurrency):
+                await wav_queue.put(None)
 
-    return transcript
+    async def transcribe_wavs() -> None:
+        # Only affects this task
+        set_priority(priority)
+
+        while True:
+            name_wav = await wav_queue.get()
+            if name_wav is None:
+                break
+
+            name, wav_bytes = name_wav
+            result = BatchTranscript(name=name)
+            start_time = time.monotonic()
+            try:
+                with io.BytesIO(wav_bytes) as wav_in:
+                    with wave.open(wav_in, "rb") as wav_file:
+                        result.audio_seconds = (
+                            wav_file.getnframes() / wav_file.getframerate()
+                        )
+
+                    wav_in.seek(0)
+                    result.transcript = await transcribe(
+                        rhasspy, program, wav_in, samples_per_chunk
+                    )
+            except Exception as err:
+                _LOGGER.exception("transcribe_batch: error transcribing %s", name)
+                result.error = f"{err.__class__.__name__}: {err}"
+
+            result.transcribe_seconds = time.monotonic() - start_time
+            await result_queue.put(result)
+
+        # Signal that this worker is done
+        await result_queue.put(None)
+
+    tasks = [asyncio.create_task(feed_wavs())]
+    tasks.extend(asyncio.create_task(transcribe_wavs()) for _ in range(concurrency))
+
+    try:
+        workers_left = concurrency
+        while workers_left > 0:
+            result = await result_queue.get()
+            if result is None:
+                workers_left -= 1
+                continue
+
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def transcribe_stream(
@@ -124,55 +526,55 @@ async def transcribe_stream(
             ),
         )
 
-        async def next_chunk():
-            """Get the next chunk from audio stream."""
-            async for chunk_bytes in audio_stream:
-                return chunk_bytes
-
-        is_first_chunk = True
-        audio_task = asyncio.create_task(next_chunk())
-        vad_task = asyncio.create_task(async_read_event(vad_proc.stdout))
-        pending = {audio_task, vad_task}
-
-        while True:
-            done, pending = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED
-            )
-
-            if vad_task in done:
-                vad_event = vad_task.result()
-                if vad_event is None:
-                    break
-
-                if VoiceStarted.is_type(vad_event.type):
-                    _LOGGER.debug("transcribe: voice started")
-                elif VoiceStopped.is_type(vad_event.type):
-                    _LOGGER.debug("transcribe: voice stopped")
-                    break
+        # Live audio for VAD: merge tiny chunks and split large ones
+        coalescer = AudioChunkCoalescer(LIVE_CHUNK_SECONDS)
 
-                vad_task = asyncio.create_task(async_read_event(vad_proc.stdout))
-                pending.add(vad_task)
+        async with StreamMux() as mux:
+            mux.add_iterable(audio_stream)
+            mux.add_reader(vad_proc.stdout)
+            is_first_chunk = True
 
-            if audio_task in done:
-                chunk_bytes = audio_task.result()
-                if not chunk_bytes:
-                    # End of audio stream
-                    break
+            while True:
+                source, item = await mux.get()
+                if source is audio_stream:
+                    if not item:
+                        # End of audio stream
+                        chunks = coalescer.flush()
+                    else:
+                        chunks = coalescer.process(
+                            AudioChunk(rate, width, channels, item)
+                        )
+
+                    if is_first_chunk and chunks:
+                        _LOGGER.debug("transcribe: processing audio")
+                        is_first_chunk = False
+
+                    for chunk in chunks:
+                        chunk_event = chunk.event()
+                        await asyncio.gather(
+                            async_write_event(chunk_event, asr_proc.stdin),
+                            async_write_event(chunk_event, vad_proc.stdin),
+                        )
+                        timestamp += chunk.milliseconds
+
+                    if not item:
+                        break
+                else:
+                    vad_event = item
+                    if vad_event is None:
+                        break
 
-                if is_first_chunk:
-                    _LOGGER.debug("transcribe: processing audio")
-                    is_first_chunk = False
+                    if VoiceStarted.is_type(vad_event.type):
+                        _LOGGER.debug("transcribe: voice started")
+                    elif VoiceStopped.is_type(vad_event.type):
+                        _LOGGER.debug("transcribe: voice stopped")
 
-                chunk = AudioChunk(rate, width, channels, chunk_bytes)
-                chunk_event = chunk.event()
-                await asyncio.gather(
-                    async_write_event(chunk_event, asr_proc.stdin),
-                    async_write_event(chunk_event, vad_proc.stdin),
-                )
-                timestamp += chunk.milliseconds
+                        # Audio that's still being merged goes to asr only
+                        for chunk in coalescer.flush():
+                            await async_write_event(chunk.event(), asr_proc.stdin)
+                            timestamp += chunk.milliseconds
 
-                audio_task = asyncio.create_task(next_chunk())
-                pending.add(audio_task)
+                        break
 
         await async_write_event(AudioStop(timestamp=timestamp).event(), asr_proc.stdin)
         _LOGGER.debug("transcribe: audio finished")
@@ -1,8 +1,13 @@
 """Audio input/output."""
-import audioop
+import struct
 import wave
-from dataclasses import dataclass
-from typing import Iterable, Optional
+from dataclasses import dataclass, field
+from functools import lru_cache
+from math import gcd
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
 
 from .event import Event, Eventable
 
@@ -21,6 +26,31 @@ DEFAULT_OUT_CHANNELS = 1  # mono
 
 DEFAULT_SAMPLES_PER_CHUNK = 1024
 
+# Target chunk durations for AudioChunkCoalescer.
+# Live audio (wake, VAD) needs small chunks for low latency, while files
+# (ASR, playback) are sent faster with fewer, larger chunks.
+LIVE_CHUNK_SECONDS = DEFAULT_SAMPLES_PER_CHUNK / DEFAULT_IN_RATE
+FILE_CHUNK_SECONDS = 1.0
+
+_WAV_RIFF_HEADER = struct.Struct("<4sI4s")
+_WAV_CHUNK_HEADER = struct.Struct("<4sI")
+_WAV_FMT = struct.Struct("<HHIIHH")
+_WAV_FORMAT_PCM = 1
+_WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Data size written when streaming WAV before knowing its length
+_WAV_STREAMING_SIZE = 0xFFFFFFFF
+
+# RIFF sizes written by servers that stream WAV before knowing its length.
+# Some also write 0 for the data size, but a real empty WAV has a RIFF size.
+_WAV_UNKNOWN_SIZES = (0, _WAV_STREAMING_SIZE)
+
+_WIDTH_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+_WIDTH_SCALES = {1: 2.0**7, 2: 2.0**15, 3: 2.0**23, 4: 2.0**31}
+
+# (frames, channels) float32 array
+Samples = npt.NDArray[np.float32]
+
 
 @dataclass
 class AudioChunk(Eventable):
@@ -99,21 +129,24 @@ class AudioStart(Eventable):
     timestamp: Optional[int] = None
     """Milliseconds"""
 
+    codec: Optional[str] = None
+    """Codec of audio that follows (see rhasspy3.codec). None is PCM."""
+
     @staticmethod
     def is_type(event_type: str) -> bool:
         return event_type == _START_TYPE
 
     def event(self) -> Event:
+        data: Dict[str, Any] = {
+            "rate": self.rate,
+            "width": self.width,
+            "channels": self.channels,
+            "timestamp": self.timestamp,
+        }
+        if self.codec is not None:
+            data["codec"] = self.codec
 
-        return Event(
-            type=_START_TYPE,
-            data={
-                "rate": self.rate,
-                "width": self.width,
-                "channels": self.channels,
-                "timestamp": self.timestamp,
-            },
-        )
+        return Event(type=_START_TYPE, data=data)
 
     @staticmethod
     def from_event(event: Event) -> "AudioStart":
@@ -123,6 +156,7 @@ class AudioStart(Eventable):
             width=event.data["width"],
             channels=event.data["channels"],
             timestamp=event.data.get("timestamp"),
+            codec=event.data.get("codec"),
         )
 
 
@@ -150,12 +184,15 @@ class AudioStop(Eventable):
 
 @dataclass
 class AudioChunkConverter:
-    """Converts audio chunks using audioop."""
+    """Converts audio chunks using numpy."""
 
     rate: Optional[int] = None
     width: Optional[int] = None
     channels: Optional[int] = None
-    _ratecv_state = None
+    _resampler: Optional["PolyphaseResampler"] = field(
+        default=None, init=False, repr=False
+    )
+    _resampler_width: int = field(default=DEFAULT_OUT_WIDTH, init=False, repr=False)
 
     def convert(self, chunk: AudioChunk) -> AudioChunk:
         """Converts sample rate, width, and channels as necessary."""
@@ -166,49 +203,356 @@ class AudioChunkConverter:
         ):
             return chunk
 
-        audio_bytes = chunk.audio
-        width = chunk.width
-
-        if (self.width is not None) and (chunk.width != self.width):
-            # Convert sample width
-            audio_bytes = audioop.lin2lin(audio_bytes, chunk.width, self.width)
-            width = self.width
-
-        channels = chunk.channels
-        if (self.channels is not None) and (chunk.channels != self.channels):
-            # Convert to mono or stereo
-            if self.channels == 1:
-                audio_bytes = audioop.tomono(audio_bytes, width, 1.0, 1.0)
-            elif self.channels == 2:
-                audio_bytes = audioop.tostereo(audio_bytes, width, 1.0, 1.0)
-            else:
-                raise ValueError(f"Cannot convert to channels: {self.channels}")
-
-            channels = self.channels
-
-        rate = chunk.rate
-        if (self.rate is not None) and (chunk.rate != self.rate):
-            # Resample
-            audio_bytes, self._ratecv_state = audioop.ratecv(
-                audio_bytes,
-                width,
-                channels,
-                chunk.rate,
-                self.rate,
-                self._ratecv_state,
+        rate = self.rate if self.rate is not None else chunk.rate
+        width = self.width if self.width is not None else chunk.width
+        channels = self.channels if self.channels is not None else chunk.channels
+
+        samples = bytes_to_samples(chunk.audio, chunk.width, chunk.channels)
+        samples = convert_channels(samples, channels)
+
+        if chunk.rate != rate:
+            if (
+                (self._resampler is None)
+                or (self._resampler.in_rate != chunk.rate)
+                or (self._resampler.out_rate != rate)
+                or (self._resampler.channels != channels)
+            ):
+                self._resampler = PolyphaseResampler(chunk.rate, rate, channels)
+
+            self._resampler_width = width
+            samples = self._resampler.process(samples)
+
+        return AudioChunk(
+            rate,
+            width,
+            channels,
+            samples_to_bytes(samples, width),
+            timestamp=chunk.timestamp,
+        )
+
+    def flush(self) -> Optional[AudioChunk]:
+        """Returns audio still held by the resampler at the end of a stream.
+
+        Call when the stream stops so that the converted audio isn't shorter
+        than the original.
+        """
+        if self._resampler is None:
+            return None
+
+        samples = self._resampler.flush()
+        if len(samples) == 0:
+            return None
+
+        return AudioChunk(
+            self._resampler.out_rate,
+            self._resampler_width,
+            self._resampler.channels,
+            samples_to_bytes(samples, self._resampler_width),
+        )
+
+    def convert_audio(
+        self, audio_bytes: bytes, rate: int, width: int, channels: int
+    ) -> bytes:
+        """Converts a whole buffer of audio at once (batch mode).
+
+        Unlike convert, the resampler delay is compensated so the output has
+        the same duration as the input.
+        """
+        out_rate = self.rate if self.rate is not None else rate
+        out_width = self.width if self.width is not None else width
+        out_channels = self.channels if self.channels is not None else channels
+
+        samples = bytes_to_samples(audio_bytes, width, channels)
+        samples = convert_channels(samples, out_channels)
+
+        if rate != out_rate:
+            resampler = PolyphaseResampler(rate, out_rate, out_channels)
+            samples = resampler.process_all(samples)
+
+        return samples_to_bytes(samples, out_width)
+
+
+@dataclass
+class AudioChunkCoalescer:
+    """Merges or splits audio chunks to a target duration.
+
+    This keeps the event rate of a stream bounded, independent of how large
+    the incoming chunks are.
+    """
+
+    seconds: float
+    """Target duration of each output chunk."""
+
+    _chunks: List[AudioChunk] = field(default_factory=list, init=False, repr=False)
+    _buffered_bytes: int = field(default=0, init=False, repr=False)
+
+    def process(self, chunk: AudioChunk) -> List[AudioChunk]:
+        """Add a chunk. Returns chunks of the target duration that are ready."""
+        ready: List[AudioChunk] = []
+        if self._chunks and (
+            (self._chunks[0].rate, self._chunks[0].width, self._chunks[0].channels)
+            != (chunk.rate, chunk.width, chunk.channels)
+        ):
+            # Audio format changed
+            ready.extend(self.flush())
+
+        self._chunks.append(chunk)
+        self._buffered_bytes += len(chunk.audio)
+
+        bytes_per_chunk = self._bytes_per_chunk(chunk)
+        if self._buffered_bytes < bytes_per_chunk:
+            return ready
+
+        # Split into chunks of the target size and keep the remainder
+        first_chunk = self._chunks[0]
+        audio = b"".join(c.audio for c in self._chunks)
+        offset = 0
+        while (len(audio) - offset) >= bytes_per_chunk:
+            ready.append(self._make_chunk(first_chunk, audio, offset, bytes_per_chunk))
+            offset += bytes_per_chunk
+
+        self._chunks.clear()
+        self._buffered_bytes = 0
+        if offset < len(audio):
+            remainder = self._make_chunk(
+                first_chunk, audio, offset, len(audio) - offset
             )
-            rate = self.rate
+            self._chunks.append(remainder)
+            self._buffered_bytes = len(remainder.audio)
+
+        return ready
+
+    def flush(self) -> List[AudioChunk]:
+        """Returns any remaining audio as a (shorter) chunk."""
+        if not self._chunks:
+            return []
+
+        first_chunk = self._chunks[0]
+        audio = b"".join(c.audio for c in self._chunks)
+        self._chunks.clear()
+        self._buffered_bytes = 0
+
+        return [self._make_chunk(first_chunk, audio, 0, len(audio))]
+
+    def _bytes_per_chunk(self, chunk: AudioChunk) -> int:
+        bytes_per_sample = chunk.width * chunk.channels
+        return max(1, int(chunk.rate * self.seconds)) * bytes_per_sample
+
+    def _make_chunk(
+        self, first_chunk: AudioChunk, audio: bytes, offset: int, length: int
+    ) -> AudioChunk:
+        timestamp: Optional[int] = None
+        if first_chunk.timestamp is not None:
+            # Timestamp of first sample in this chunk
+            bytes_per_second = (
+                first_chunk.rate * first_chunk.width * first_chunk.channels
+            )
+            timestamp = first_chunk.timestamp + ((offset * 1_000) // bytes_per_second)
+
+        return AudioChunk(
+            first_chunk.rate,
+            first_chunk.width,
+            first_chunk.channels,
+            audio[offset : offset + length],
+            timestamp=timestamp,
+        )
+
+
+class PolyphaseResampler:
+    """Stateful windowed-sinc polyphase resampler.
+
+    Output sample n is taken from input position n * down / up, using the
+    filter phase for (n * down) mod up.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.up, self.down, self.table = get_resample_filter(in_rate, out_rate)
+        self.taps = np.shape(self.table)[1]
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear state to start a new stream."""
+        # Last (taps - 1) input samples from the previous call
+        self._history = np.zeros((self.taps - 1, self.channels), dtype=np.float32)
+
+        # Position of the next output sample relative to the first new input
+        # sample, in units of 1/up input samples. Starting at the filter's
+        # center aligns output sample 0 with input sample 0.
+        self._position = self.delay
+
+        # Totals since the stream started, for flush
+        self._frames_in = 0
+        self._frames_out = 0
+
+    @property
+    def delay(self) -> int:
+        """Group delay of the filter in units of 1/up input samples."""
+        return (self.up * self.taps) // 2
+
+    def process(self, samples: Samples) -> Samples:
+        """Resample (frames, channels) float32 array with state kept between calls."""
+        num_frames = len(samples)
+        history_frames = len(self._history)
+        end_position = num_frames * self.up
+
+        if self._position >= end_position:
+            num_out = 0
+        else:
+            num_out = -((self._position - end_position) // self.down)
+
+        extended = np.concatenate((self._history, samples), axis=0)
+
+        if num_out > 0:
+            positions = self._position + (np.arange(num_out) * self.down)
+            indexes = history_frames + (positions // self.up)
+            phases = positions % self.up
+
+            # (num_out, taps) indexes of input samples for each output sample
+            windows = indexes[:, None] - np.arange(self.taps)[None, :]
+            output = np.einsum(
+                "ok,okc->oc", self.table[phases], extended[windows], optimize=True
+            ).astype(np.float32, copy=False)
+        else:
+            output = np.zeros((0, self.channels), dtype=np.float32)
+
+        self._position += (num_out * self.down) - end_position
+        self._history = extended[len(extended) - history_frames :]
+        self._frames_in += num_frames
+        self._frames_out += len(output)
+
+        return output
+
+    def flush(self) -> Samples:
+        """Returns the filter's tail and resets for a new stream.
+
+        Output from process and flush together has the same duration as the
+        input.
+        """
+        num_expected = -((-self._frames_in * self.up) // self.down)
+        num_remaining = max(0, num_expected - self._frames_out)
+        padding = np.zeros(
+            ((self.delay // self.up) + 1, self.channels), dtype=np.float32
+        )
+        output = self.process(padding)[:num_remaining]
+        self.reset()
+
+        return output
+
+    def process_all(self, samples: Samples) -> Samples:
+        """Resample a complete buffer, including the filter's tail."""
+        return np.concatenate((self.process(samples), self.flush()), axis=0)
+
+
+@lru_cache(maxsize=None)
+def get_resample_filter(
+    in_rate: int,
+    out_rate: int,
+    zero_crossings: int = 16,
+    rolloff: float = 0.945,
+    kaiser_beta: float = 8.6,
+) -> Tuple[int, int, npt.NDArray[np.float32]]:
+    """Returns (up, down, table) where table[phase] holds the filter taps for phase.
+
+    Tables are cached per (in_rate, out_rate).
+    """
+    divisor = gcd(in_rate, out_rate)
+    up = out_rate // divisor
+    down = in_rate // divisor
+
+    # Cutoff relative to input Nyquist (anti-aliasing when downsampling)
+    cutoff = rolloff * min(1.0, up / down)
+    taps = int(np.ceil((2 * zero_crossings) / cutoff))
+    length = up * taps
+
+    # Prototype filter in units of input samples
+    center = length // 2
+    times = (np.arange(length) - center) / up
+    prototype = cutoff * np.sinc(cutoff * times) * np.kaiser(length, kaiser_beta)
+
+    # table[p, k] = prototype[p + k * up]
+    table = np.ascontiguousarray(prototype.reshape(taps, up).T)
+
+    # Unity gain at DC for every phase
+    table /= table.sum(axis=1, keepdims=True)
+    table = table.astype(np.float32)
+    table.flags.writeable = False
+
+    return up, down, table
+
+
+def bytes_to_samples(audio_bytes: bytes, width: int, channels: int) -> Samples:
+    """Converts signed PCM to a (frames, channels) float32 array in [-1, 1)."""
+    if width == 3:
+        raw = np.frombuffer(audio_bytes, dtype=np.uint8).reshape(-1, 3)
+        int_samples = (
+            raw[:, 0].astype(np.int32)
+            | (raw[:, 1].astype(np.int32) << 8)
+            | (raw[:, 2].astype(np.int32) << 16)
+        )
+        int_samples = (int_samples << 8) >> 8  # sign extend
+    elif width in _WIDTH_DTYPES:
+        int_samples = np.frombuffer(audio_bytes, dtype=_WIDTH_DTYPES[width])
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+
+    samples = int_samples.astype(np.float32) / _WIDTH_SCALES[width]
+
+    return samples.reshape(-1, channels)
+
+
+def samples_to_bytes(samples: Samples, width: int) -> bytes:
+    """Converts a (frames, channels) float32 array to signed PCM."""
+    scale = _WIDTH_SCALES[width]
+
+    # float64, since float32 rounds 2**31 - 1 up to 2**31
+    int_samples = np.clip(
+        np.rint(samples.reshape(-1).astype(np.float64) * scale), -scale, scale - 1
+    )
+
+    if width == 3:
+        int_samples = int_samples.astype(np.int32)
+        raw = np.empty((len(int_samples), 3), dtype=np.uint8)
+        raw[:, 0] = int_samples & 0xFF
+        raw[:, 1] = (int_samples >> 8) & 0xFF
+        raw[:, 2] = (int_samples >> 16) & 0xFF
+        return raw.tobytes()
+
+    if width not in _WIDTH_DTYPES:
+        raise ValueError(f"Unsupported sample width: {width}")
+
+    return int_samples.astype(_WIDTH_DTYPES[width]).tobytes()
 
-        return AudioChunk(rate, width, channels, audio_bytes, timestamp=chunk.timestamp)
+
+def convert_channels(samples: Samples, channels: int) -> Samples:
+    """Averages down to mono or duplicates mono to multiple channels."""
+    in_channels = np.shape(samples)[1]
+    if in_channels == channels:
+        return samples
+
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True, dtype=np.float32)
+
+    if in_channels == 1:
+        return np.repeat(samples, channels, axis=1)
+
+    raise ValueError(f"Cannot convert from {in_channels} to {channels} channel(s)")
 
 
 def wav_to_chunks(
-    wav_file: wave.Wave_read, samples_per_chunk: int, timestamp: int = 0
+    wav_file: wave.Wave_read,
+    samples_per_chunk: Optional[int] = None,
+    timestamp: int = 0,
 ) -> Iterable[AudioChunk]:
-    """Splits WAV file into AudioChunks."""
+    """Splits WAV file into AudioChunks (FILE_CHUNK_SECONDS by default)."""
     rate = wav_file.getframerate()
     width = wav_file.getsampwidth()
     channels = wav_file.getnchannels()
+    if not samples_per_chunk:
+        samples_per_chunk = int(rate * FILE_CHUNK_SECONDS)
+
     audio_bytes = wav_file.readframes(samples_per_chunk)
     while audio_bytes:
         chunk = AudioChunk(
@@ -221,3 +565,103 @@ def wav_to_chunks(
         yield chunk
         timestamp += chunk.milliseconds
         audio_bytes = wav_file.readframes(samples_per_chunk)
+
+
+@dataclass
+class WavHeader:
+    rate: int
+    width: int
+    channels: int
+
+    data_size: Optional[int] = None
+    """Bytes of audio, or None if unknown (streamed)."""
+
+    def to_bytes(self) -> bytes:
+        """PCM WAV header, with placeholder sizes if data_size is None."""
+        if self.data_size is None:
+            riff_size = data_size = _WAV_STREAMING_SIZE
+        else:
+            data_size = self.data_size
+            riff_size = (
+                4  # WAVE
+                + _WAV_CHUNK_HEADER.size
+                + _WAV_FMT.size
+                + _WAV_CHUNK_HEADER.size
+                + data_size
+            )
+
+        return b"".join(
+            (
+                _WAV_RIFF_HEADER.pack(b"RIFF", riff_size, b"WAVE"),
+                _WAV_CHUNK_HEADER.pack(b"fmt ", _WAV_FMT.size),
+                _WAV_FMT.pack(
+                    _WAV_FORMAT_PCM,
+                    self.channels,
+                    self.rate,
+                    self.rate * self.width * self.channels,  # byte rate
+                    self.width * self.channels,  # block align
+                    self.width * 8,  # bits per sample
+                ),
+                _WAV_CHUNK_HEADER.pack(b"data", data_size),
+            )
+        )
+
+
+def read_wav_header(wav_in: IO[bytes]) -> WavHeader:
+    """Read a WAV header, stopping at the start of the audio data.
+
+    Unlike the wave module, this works with streams whose size isn't known
+    in advance and doesn't need to seek.
+    """
+    riff_id, riff_size, wave_id = _WAV_RIFF_HEADER.unpack(
+        _read_exactly(wav_in, _WAV_RIFF_HEADER.size)
+    )
+    if (riff_id != b"RIFF") or (wave_id != b"WAVE"):
+        raise wave.Error("Not a WAV file")
+
+    fmt_bytes: Optional[bytes] = None
+    while True:
+        chunk_id, chunk_size = _WAV_CHUNK_HEADER.unpack(
+            _read_exactly(wav_in, _WAV_CHUNK_HEADER.size)
+        )
+        if chunk_id == b"data":
+            break
+
+        # Chunks are padded to an even number of bytes
+        chunk_bytes = _read_exactly(wav_in, chunk_size + (chunk_size % 2))
+        if chunk_id == b"fmt ":
+            fmt_bytes = chunk_bytes
+
+    if fmt_bytes is None:
+        raise wave.Error("Missing fmt chunk")
+
+    format_tag, channels, rate, _byte_rate, _block_align, bits = _WAV_FMT.unpack_from(
+        fmt_bytes
+    )
+    if format_tag not in (_WAV_FORMAT_PCM, _WAV_FORMAT_EXTENSIBLE):
+        raise wave.Error(f"Unsupported WAV format: {format_tag}")
+
+    data_size: Optional[int] = chunk_size
+    if (chunk_size == _WAV_STREAMING_SIZE) or (
+        (chunk_size == 0) and (riff_size in _WAV_UNKNOWN_SIZES)
+    ):
+        data_size = None
+
+    return WavHeader(
+        rate=rate,
+        width=(bits + 7) // 8,
+        channels=channels,
+        data_size=data_size,
+    )
+
+
+def _read_exactly(reader: IO[bytes], num_bytes: int) -> bytes:
+    data = reader.read(num_bytes)
+    while len(data) < num_bytes:
+        more_data = reader.read(num_bytes - len(data))
+        if not more_data:
+            raise EOFError("Unexpected end of WAV header")
+
+        data += more_data
+
+    return data
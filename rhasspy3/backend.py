@@ -0,0 +1,311 @@
+"""Programs served over TCP by a group of load-balanced backends."""
+import asyncio
+import logging
+import signal
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .config import BackendGroupConfig
+from .event import EventWriter
+
+# Bytes read at a time when relaying connections
+_RELAY_BYTES = 64 * 1024
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NoBackendError(ConnectionError):
+    """No backend in a group could be connected to."""
+
+
+def parse_endpoint(endpoint: str) -> Tuple[str, int]:
+    """Parse host:port"""
+    host, port_str = endpoint.rsplit(":", maxsplit=1)
+    return host.strip("[]"), int(port_str)
+
+
+@dataclass
+class EndpointStatus:
+    label: str
+    host: str
+    port: int
+    healthy: bool = True
+    outstanding: int = 0
+    """Requests currently using this endpoint."""
+
+    requests: int = 0
+    failures: int = 0
+    """Connections that failed."""
+
+    last_error: Optional[str] = None
+    retry_time: float = 0.0
+    """Monotonic time after which an unhealthy endpoint is tried again."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        status_dict = asdict(self)
+        status_dict.pop("retry_time")
+        return status_dict
+
+
+class _HalfCloseWriter:
+    """Stream writer whose close() only ends the sending side.
+
+    Programs signal the end of their input by closing stdin, but a backend
+    still has to be able to send its result back over the same connection.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+
+    def write(self, data: bytes) -> None:
+        self.writer.write(data)
+
+    def writelines(self, data) -> None:
+        self.writer.writelines(data)
+
+    async def drain(self) -> None:
+        await self.writer.drain()
+
+    def can_write_eof(self) -> bool:
+        return self.writer.can_write_eof()
+
+    def write_eof(self) -> None:
+        self.writer.write_eof()
+
+    def is_closing(self) -> bool:
+        return self.writer.is_closing()
+
+    def close(self) -> None:
+        if (not self.writer.is_closing()) and self.writer.can_write_eof():
+            self.writer.write_eof()
+
+    async def wait_closed(self) -> None:
+        await self.writer.wait_closed()
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        return self.writer.get_extra_info(name, default)
+
+
+class RemoteProcess:
+    """TCP connection to a backend that stands in for a program's process.
+
+    There is no exit code: wait() closes the connection and returns 0.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        endpoint: EndpointStatus,
+    ) -> None:
+        self.stdout = reader
+        self.stdin: EventWriter = _HalfCloseWriter(writer)
+        self.endpoint = endpoint
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self._writer = writer
+
+    def terminate(self) -> None:
+        self._close(-signal.SIGTERM)
+
+    def kill(self) -> None:
+        self._close(-signal.SIGKILL)
+
+    async def wait(self) -> int:
+        self._close(0)
+        try:
+            await self._writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+        assert self.returncode is not None
+        return self.returncode
+
+    def _close(self, returncode: int) -> None:
+        if self.returncode is not None:
+            return
+
+        self.returncode = returncode
+        self.endpoint.outstanding -= 1
+        self._writer.close()
+
+
+class BackendBalancer:
+    """Connects programs to the backend with the fewest outstanding requests.
+
+    Endpoints that can't be connected to are skipped until their retry time
+    has passed, and the next best endpoint is tried instead. The first
+    connection after the retry time is the health check.
+    """
+
+    def __init__(self) -> None:
+        # domain/name -> label -> status
+        self._endpoints: Dict[str, Dict[str, EndpointStatus]] = {}
+
+        # domain/name -> requests started, used to break ties
+        self._turns: Dict[str, int] = {}
+
+    async def connect(
+        self, domain: str, name: str, config: BackendGroupConfig
+    ) -> RemoteProcess:
+        """Connect to the best endpoint, failing over to the others.
+
+        Raises NoBackendError if no endpoint could be connected to.
+        """
+        key = f"{domain}/{name}"
+        errors: List[str] = []
+        for endpoint in self._get_candidates(key, config):
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(endpoint.host, endpoint.port),
+                    timeout=config.connect_timeout,
+                )
+            except asyncio.CancelledError:
+                endpoint.outstanding -= 1
+                raise
+            except (OSError, asyncio.TimeoutError) as err:
+                endpoint.outstanding -= 1
+                self._failed(endpoint, config, err)
+                errors.append(f"{endpoint.label}: {endpoint.last_error}")
+                continue
+
+            if not endpoint.healthy:
+                _LOGGER.info("Backend %s %s is back", key, endpoint.label)
+
+            endpoint.healthy = True
+            endpoint.last_error = None
+            _LOGGER.debug("Connected to backend %s %s", key, endpoint.label)
+            return RemoteProcess(reader, writer, endpoint)
+
+        raise NoBackendError(f"No backend available for {key} ({errors})")
+
+    def get_status(self) -> Dict[str, Dict[str, EndpointStatus]]:
+        """Status of each endpoint by domain/name and label."""
+        return self._endpoints
+
+    def _get_candidates(
+        self, key: str, config: BackendGroupConfig
+    ) -> List[EndpointStatus]:
+        """Endpoints in the order they should be tried."""
+        endpoints = self._endpoints.setdefault(key, {})
+        addresses = {
+            label: parse_endpoint(endpoint_str)
+            for label, endpoint_str in config.endpoints.items()
+        }
+        if addresses != {
+            label: (endpoint.host, endpoint.port)
+            for label, endpoint in endpoints.items()
+        }:
+            # Config has changed, but keep status of unchanged endpoints
+            old_endpoints = dict(endpoints)
+            endpoints.clear()
+            for label, (host, port) in addresses.items():
+                endpoint = old_endpoints.get(label)
+                if (endpoint is None) or (
+                    (endpoint.host, endpoint.port) != (host, port)
+                ):
+                    endpoint = EndpointStatus(label=label, host=host, port=port)
+
+                endpoints[label] = endpoint
+
+        turn = self._turns.get(key, 0)
+        self._turns[key] = turn + 1
+
+        # Rotate so ties go to each endpoint in turn
+        labels = list(endpoints)
+        if labels:
+            offset = turn % len(labels)
+            labels = labels[offset:] + labels[:offset]
+
+        now = time.monotonic()
+        healthy: List[EndpointStatus] = []
+        retry: List[EndpointStatus] = []
+        for label in labels:
+            endpoint = endpoints[label]
+            if endpoint.healthy:
+                healthy.append(endpoint)
+            elif now >= endpoint.retry_time:
+                retry.append(endpoint)
+
+        healthy.sort(key=lambda e: e.outstanding)
+        retry.sort(key=lambda e: e.outstanding)
+        candidates = healthy + retry
+
+        if not candidates:
+            # Everything is down, so try anyway instead of failing outright
+            candidates = sorted(
+                (endpoints[label] for label in labels), key=lambda e: e.retry_time
+            )
+
+        return candidates
+
+    def _failed(
+        self, endpoint: EndpointStatus, config: BackendGroupConfig, err: Exception
+    ) -> None:
+        endpoint.failures += 1
+        endpoint.last_error = f"{err.__class__.__name__}: {err}"
+        endpoint.retry_time = time.monotonic() + config.retry_seconds
+        if endpoint.healthy:
+            _LOGGER.warning(
+                "Backend %s:%s is down (%s), retrying in %s second(s)",
+                endpoint.host,
+                endpoint.port,
+                endpoint.last_error,
+                config.retry_seconds,
+            )
+
+        endpoint.healthy = False
+
+
+# -----------------------------------------------------------------------------
+
+
+async def serve_tcp(
+    socket_path: Union[str, Path], host: str, port: int
+) -> asyncio.AbstractServer:
+    """Accept TCP connections and relay them to a server's Unix socket."""
+
+    async def handle_connection(
+        tcp_reader: asyncio.StreamReader, tcp_writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            unix_reader, unix_writer = await asyncio.open_unix_connection(
+                str(socket_path)
+            )
+        except OSError:
+            _LOGGER.exception("Can't connect to %s", socket_path)
+            tcp_writer.close()
+            return
+
+        try:
+            await asyncio.gather(
+                _relay(tcp_reader, unix_writer), _relay(unix_reader, tcp_writer)
+            )
+        finally:
+            unix_writer.close()
+            tcp_writer.close()
+
+    return await asyncio.start_server(handle_connection, host, port)
+
+
+async def _relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Copy bytes until EOF, then pass the EOF along."""
+    try:
+        while True:
+            data = await reader.read(_RELAY_BYTES)
+            if not data:
+                break
+
+            writer.write(data)
+            await writer.drain()
+
+        if writer.can_write_eof():
+            writer.write_eof()
+        else:
+            writer.close()
+    except (ConnectionError, OSError):
+        writer.close()
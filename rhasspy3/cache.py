@@ -0,0 +1,111 @@
+"""Least-recently-used cache for program results."""
+import copy
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+_T = TypeVar("_T")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    """Results dropped to stay under max size."""
+
+    expirations: int = 0
+    """Results dropped because they were too old."""
+
+    invalidations: int = 0
+    """Results dropped because their program changed."""
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return (self.hits / lookups) if lookups > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats_dict = asdict(self)
+        stats_dict["hit_rate"] = self.hit_rate
+        return stats_dict
+
+
+class ResultCache(Generic[_T]):
+    """Caches results by (namespace, key), dropping the least recently used.
+
+    Each namespace (e.g., a program) has a version (e.g., its resolved
+    command). Results from an older version are dropped when it changes.
+
+    Results are copied in and out, so callers can't change what's cached.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+        # (namespace, key) -> (time added, result)
+        self._items: "OrderedDict[Tuple[str, Hashable], Tuple[float, _T]]" = (
+            OrderedDict()
+        )
+        self._versions: Dict[str, Hashable] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, namespace: str, version: Hashable, key: Hashable) -> Optional[_T]:
+        """Get a cached result or None."""
+        self._check_version(namespace, version)
+        item_key = (namespace, key)
+        item = self._items.get(item_key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+
+        added_time, result = item
+        if (self.ttl_seconds is not None) and (
+            (time.monotonic() - added_time) > self.ttl_seconds
+        ):
+            del self._items[item_key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._items.move_to_end(item_key)
+        self.stats.hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, namespace: str, version: Hashable, key: Hashable, result: _T):
+        """Cache a result, dropping the least recently used if full."""
+        if self.max_size < 1:
+            return
+
+        self._check_version(namespace, version)
+        item_key = (namespace, key)
+        self._items[item_key] = (time.monotonic(), copy.deepcopy(result))
+        self._items.move_to_end(item_key)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._versions.clear()
+
+    def _check_version(self, namespace: str, version: Hashable) -> None:
+        current_version = self._versions.get(namespace)
+        if current_version == version:
+            return
+
+        self._versions[namespace] = version
+        if current_version is None:
+            return
+
+        old_keys = [item_key for item_key in self._items if item_key[0] == namespace]
+        for item_key in old_keys:
+            del self._items[item_key]
+
+        self.stats.invalidations += len(old_keys)
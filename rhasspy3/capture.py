@@ -0,0 +1,306 @@
+"""Event streams recorded with their arrival times, for replay.
+
+A capture file is the magic bytes followed by records. Each record is a
+header (time since capture started in nanoseconds, stream id, length) and the
+event exactly as it was sent (see RawEvent). The first record for each stream
+holds its name, so a capture that wasn't closed can still be read.
+
+When the capture is closed, an index of (time, file offset) for every record
+is written at the end so replay can start at any time.
+"""
+import asyncio
+import bisect
+import io
+import json
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import (
+    IO,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .event import Event, RawEvent
+
+MAGIC = b"RHCAP\x01"
+WEBSOCKET_CONNECT_TYPE = "websocket-connect"
+"""First event in a websocket client stream (data has the path)."""
+
+WEBSOCKET_BINARY_TYPE = "websocket-binary"
+"""Binary websocket message (payload)."""
+
+WEBSOCKET_TEXT_TYPE = "websocket-text"
+"""Text websocket message that isn't an event (data has the text)."""
+
+# time (ns), stream id, length
+_RECORD = struct.Struct("<qHI")
+
+# index offset, record count, metadata length
+_TRAILER = struct.Struct("<QQI")
+
+# time (ns), record offset
+_INDEX_ENTRY = struct.Struct("<qQ")
+
+# Stream id for records that name a stream
+_STREAM_NAME_ID = 0xFFFF
+
+
+class CaptureFormatError(Exception):
+    """File is not a capture."""
+
+
+@dataclass
+class CaptureRecord:
+    time_ns: int
+    """Nanoseconds since capture started."""
+
+    stream: str
+    event: RawEvent
+
+    @property
+    def seconds(self) -> float:
+        return self.time_ns / 1e9
+
+
+class CaptureWriter:
+    """Writes events from one or more streams to a capture file.
+
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self, capture_file: IO[bytes]) -> None:
+        self.capture_file = capture_file
+        self.start_ns = time.monotonic_ns()
+        self.start_time = time.time()
+        self._stream_ids: Dict[str, int] = {}
+        self._index: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+        self.capture_file.write(MAGIC)
+
+    def write_event(
+        self,
+        stream: str,
+        event: RawEvent,
+        time_ns: Optional[int] = None,
+    ) -> None:
+        """Record event on stream (time defaults to now)."""
+        data = [event.header]
+        if event.payload:
+            data.append(event.payload)
+
+        with self._lock:
+            if time_ns is None:
+                # Inside lock so records stay in time order
+                time_ns = time.monotonic_ns() - self.start_ns
+
+            stream_id = self._stream_ids.get(stream)
+            if stream_id is None:
+                stream_id = len(self._stream_ids)
+                assert stream_id < _STREAM_NAME_ID, "Too many streams"
+                self._stream_ids[stream] = stream_id
+                self._write_record(time_ns, _STREAM_NAME_ID, [stream.encode()])
+
+            self._index.append((time_ns, self.capture_file.tell()))
+            self._write_record(time_ns, stream_id, data)
+
+    def close(self) -> None:
+        """Write index and close file."""
+        with self._lock:
+            index_offset = self.capture_file.tell()
+            for time_ns, offset in self._index:
+                self.capture_file.write(_INDEX_ENTRY.pack(time_ns, offset))
+
+            metadata = json.dumps(
+                {"start_time": self.start_time, "streams": list(self._stream_ids)}
+            ).encode()
+            self.capture_file.write(metadata)
+            self.capture_file.write(
+                _TRAILER.pack(index_offset, len(self._index), len(metadata))
+            )
+            self.capture_file.write(MAGIC)
+            self.capture_file.close()
+
+    def _write_record(self, time_ns: int, stream_id: int, data: List[bytes]) -> None:
+        length = sum(len(d) for d in data)
+        self.capture_file.write(_RECORD.pack(time_ns, stream_id, length))
+        self.capture_file.writelines(data)
+        self.capture_file.flush()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class CaptureReader:
+    """Reads records from a capture file."""
+
+    def __init__(self, capture_file: IO[bytes]) -> None:
+        self.capture_file = capture_file
+        if capture_file.read(len(MAGIC)) != MAGIC:
+            raise CaptureFormatError("Not a capture file")
+
+        self.start_time: Optional[float] = None
+        self.streams: List[str] = []
+        self._index: Optional[List[Tuple[int, int]]] = None
+        self._end_offset: Optional[int] = None
+        self._read_trailer()
+
+    @property
+    def is_complete(self) -> bool:
+        """True if capture was closed (and has an index)."""
+        return self._index is not None
+
+    def __len__(self) -> int:
+        if self._index is not None:
+            return len(self._index)
+
+        return sum(1 for _record in self.records())
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        return self.records()
+
+    def records(
+        self, start_seconds: float = 0.0, streams: Optional[Iterable[str]] = None
+    ) -> Iterator[CaptureRecord]:
+        """Records in time order, starting at start_seconds.
+
+        Only records from streams are returned if given.
+        """
+        stream_filter = set(streams) if streams is not None else None
+        start_ns = int(start_seconds * 1e9)
+
+        # Without metadata, stream names come from the first record of each
+        stream_names: Dict[int, str] = dict(enumerate(self.streams))
+        offset = len(MAGIC)
+        if (self._index is not None) and (start_ns > 0):
+            index_times = [time_ns for time_ns, _offset in self._index]
+            position = bisect.bisect_left(index_times, start_ns)
+            if position >= len(self._index):
+                return
+
+            offset = self._index[position][1]
+
+        self.capture_file.seek(offset)
+        while (self._end_offset is None) or (
+            self.capture_file.tell() < self._end_offset
+        ):
+            record_header = self.capture_file.read(_RECORD.size)
+            if len(record_header) < _RECORD.size:
+                # End of a capture that wasn't closed
+                break
+
+            time_ns, stream_id, length = _RECORD.unpack(record_header)
+            data = self.capture_file.read(length)
+            if len(data) < length:
+                break
+
+            if stream_id == _STREAM_NAME_ID:
+                if not self.is_complete:
+                    stream_names[len(stream_names)] = data.decode()
+
+                continue
+
+            if time_ns < start_ns:
+                continue
+
+            stream = stream_names[stream_id]
+            if (stream_filter is not None) and (stream not in stream_filter):
+                continue
+
+            header, _newline, payload = data.partition(b"\n")
+            yield CaptureRecord(
+                time_ns=time_ns,
+                stream=stream,
+                event=RawEvent(header=header + b"\n", payload=payload or None),
+            )
+
+    def _read_trailer(self) -> None:
+        trailer_size = _TRAILER.size + len(MAGIC)
+        self.capture_file.seek(0, io.SEEK_END)
+        file_size = self.capture_file.tell()
+        if file_size >= (len(MAGIC) + trailer_size):
+            self.capture_file.seek(file_size - trailer_size)
+            trailer = self.capture_file.read(trailer_size)
+            if trailer.endswith(MAGIC):
+                index_offset, record_count, metadata_length = _TRAILER.unpack(
+                    trailer[: _TRAILER.size]
+                )
+                self.capture_file.seek(index_offset)
+                index_bytes = self.capture_file.read(record_count * _INDEX_ENTRY.size)
+                self._index = [
+                    (time_ns, offset)
+                    for time_ns, offset in _INDEX_ENTRY.iter_unpack(index_bytes)
+                ]
+                metadata = json.loads(self.capture_file.read(metadata_length))
+                self.start_time = metadata.get("start_time")
+                self.streams = metadata.get("streams", [])
+                self._end_offset = index_offset
+
+        self.capture_file.seek(len(MAGIC))
+
+
+async def replay(
+    records: Iterable[CaptureRecord], speed: float = 1.0
+) -> AsyncIterator[CaptureRecord]:
+    """Yield records at their original times divided by speed.
+
+    A speed of 0 yields records as fast as possible.
+    """
+    start_time: Optional[float] = None
+    first_ns: Optional[int] = None
+    for record in records:
+        if speed > 0:
+            if (start_time is None) or (first_ns is None):
+                start_time = time.monotonic()
+                first_ns = record.time_ns
+
+            delay = (
+                start_time
+                + ((record.time_ns - first_ns) / 1e9 / speed)
+                - time.monotonic()
+            )
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        yield record
+
+
+def websocket_event(message: Union[str, bytes]) -> RawEvent:
+    """Convert a websocket message to an event for capture."""
+    if isinstance(message, bytes):
+        return RawEvent.from_event(Event(type=WEBSOCKET_BINARY_TYPE, payload=message))
+
+    text = message.strip()
+    if "\n" not in text:
+        try:
+            message_dict = json.loads(text)
+            if isinstance(message_dict, dict) and isinstance(
+                message_dict.get("type"), str
+            ):
+                # Already an event
+                return RawEvent(header=text.encode() + b"\n")
+        except ValueError:
+            pass
+
+    return RawEvent.from_event(Event(type=WEBSOCKET_TEXT_TYPE, data={"text": message}))
+
+
+def websocket_message(event: RawEvent) -> Union[str, bytes]:
+    """Convert a captured event back to a websocket message."""
+    if event.type == WEBSOCKET_BINARY_TYPE:
+        return event.payload or bytes()
+
+    if event.type == WEBSOCKET_TEXT_TYPE:
+        return event.event().data["text"]
+
+    return event.header.decode().rstrip("\n")
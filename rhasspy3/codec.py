@@ -0,0 +1,410 @@
+"""Audio codecs for sending 16-bit PCM between satellites and a base station.
+
+Audio inside rhasspy3 is always PCM. Codecs are only used on the wire, and
+the codec in use is declared in the audio-start event. Each call to encode()
+produces a block that must be passed as-is to decode() on the other side
+(e.g., one websocket message or UDP datagram).
+"""
+import logging
+import struct
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+CODEC_PCM = "pcm"
+CODEC_MULAW = "mulaw"
+CODEC_ALAW = "alaw"
+CODEC_ADPCM = "adpcm"
+CODEC_OPUS = "opus"
+
+# Preferred order when negotiating (smallest first, except that ADPCM is
+# encoded in pure Python and costs far more CPU than G.711)
+CODEC_PREFERENCE = [CODEC_OPUS, CODEC_MULAW, CODEC_ALAW, CODEC_ADPCM, CODEC_PCM]
+
+
+class AudioEncoder(ABC):
+    """Encodes 16-bit PCM audio."""
+
+    @abstractmethod
+    def encode(self, audio: bytes) -> bytes:
+        pass
+
+    def flush(self) -> bytes:
+        """Encode any buffered audio at the end of a stream."""
+        return bytes()
+
+
+class AudioDecoder(ABC):
+    """Decodes audio back to 16-bit PCM."""
+
+    @abstractmethod
+    def decode(self, data: bytes) -> bytes:
+        pass
+
+
+# -----------------------------------------------------------------------------
+
+
+class PcmEncoder(AudioEncoder):
+    def encode(self, audio: bytes) -> bytes:
+        return audio
+
+
+class PcmDecoder(AudioDecoder):
+    def decode(self, data: bytes) -> bytes:
+        return data
+
+
+# -----------------------------------------------------------------------------
+# G.711 (2x compression)
+# -----------------------------------------------------------------------------
+
+_MULAW_BIAS = 0x84
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Number of bits needed for each non-negative value."""
+    return np.where(values > 0, np.floor(np.log2(np.maximum(values, 1))) + 1, 0).astype(
+        np.int32
+    )
+
+
+def _samples(audio: bytes) -> np.ndarray:
+    return np.frombuffer(audio, dtype="<i2").astype(np.int32)
+
+
+def _mulaw_decode_table() -> np.ndarray:
+    ulaw = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (ulaw >> 4) & 0x07
+    mantissa = ulaw & 0x0F
+    magnitude = (((mantissa << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+    return np.where(ulaw & 0x80, -magnitude, magnitude).astype("<i2")
+
+
+def _alaw_decode_table() -> np.ndarray:
+    alaw = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (alaw >> 4) & 0x07
+    mantissa = alaw & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0),
+    )
+    return np.where(alaw & 0x80, magnitude, -magnitude).astype("<i2")
+
+
+_MULAW_TABLE = _mulaw_decode_table()
+_ALAW_TABLE = _alaw_decode_table()
+
+
+class MuLawEncoder(AudioEncoder):
+    """G.711 mu-law from 14-bit linear (same as audioop.lin2ulaw)."""
+
+    def encode(self, audio: bytes) -> bytes:
+        samples = _samples(audio) >> 2
+        mask = np.where(samples < 0, 0x7F, 0xFF)
+        magnitude = np.minimum(np.abs(samples), 8159) + (_MULAW_BIAS >> 2)
+        segment = np.maximum(_bit_length(magnitude) - 6, 0)
+        ulaw = np.where(
+            segment >= 8,
+            0x7F,
+            (segment << 4) | ((magnitude >> (np.minimum(segment, 7) + 1)) & 0x0F),
+        )
+        return (ulaw ^ mask).astype(np.uint8).tobytes()
+
+
+class MuLawDecoder(AudioDecoder):
+    def decode(self, data: bytes) -> bytes:
+        return _MULAW_TABLE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+class ALawEncoder(AudioEncoder):
+    """G.711 A-law from 13-bit linear (same as audioop.lin2alaw)."""
+
+    def encode(self, audio: bytes) -> bytes:
+        samples = _samples(audio) >> 3
+        mask = np.where(samples >= 0, 0xD5, 0x55)
+        magnitude = np.where(samples >= 0, samples, -samples - 1)
+        segment = np.maximum(_bit_length(magnitude) - 5, 0)
+        shift = np.where(segment < 2, 1, np.minimum(segment, 7))
+        alaw = np.where(
+            segment >= 8,
+            0x7F,
+            (segment << 4) | ((magnitude >> shift) & 0x0F),
+        )
+        return (alaw ^ mask).astype(np.uint8).tobytes()
+
+
+class ALawDecoder(AudioDecoder):
+    def decode(self, data: bytes) -> bytes:
+        return _ALAW_TABLE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+# -----------------------------------------------------------------------------
+# IMA ADPCM (4x compression)
+# -----------------------------------------------------------------------------
+
+_ADPCM_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8] * 2
+_ADPCM_STEP_TABLE = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+]  # fmt: skip
+
+# Block header: predicted value, step index
+_ADPCM_HEADER = struct.Struct("<hBx")
+
+
+def _lin2adpcm(audio: bytes, state: Tuple[int, int]) -> Tuple[bytes, Tuple[int, int]]:
+    """Same output as audioop.lin2adpcm (16-bit, high nibble first)."""
+    valpred, index = state
+    step = _ADPCM_STEP_TABLE[index]
+    output = bytearray()
+    high_nibble = 0
+    for sample_idx, (val,) in enumerate(struct.iter_unpack("<h", audio)):
+        diff = val - valpred
+        sign = 8 if diff < 0 else 0
+        if sign:
+            diff = -diff
+
+        delta = 0
+        vpdiff = step >> 3
+        if diff >= step:
+            delta = 4
+            diff -= step
+            vpdiff += step
+
+        step >>= 1
+        if diff >= step:
+            delta |= 2
+            diff -= step
+            vpdiff += step
+
+        step >>= 1
+        if diff >= step:
+            delta |= 1
+            vpdiff += step
+
+        valpred = max(
+            -32768, min(32767, valpred - vpdiff if sign else valpred + vpdiff)
+        )
+        delta |= sign
+        index = max(0, min(88, index + _ADPCM_INDEX_TABLE[delta]))
+        step = _ADPCM_STEP_TABLE[index]
+
+        if (sample_idx % 2) == 0:
+            high_nibble = (delta << 4) & 0xF0
+        else:
+            output.append(high_nibble | (delta & 0x0F))
+
+    return bytes(output), (valpred, index)
+
+
+def _adpcm2lin(data: bytes, state: Tuple[int, int]) -> bytes:
+    """Same output as audioop.adpcm2lin (16-bit, high nibble first)."""
+    valpred, index = state
+    step = _ADPCM_STEP_TABLE[index]
+    samples: List[int] = []
+    for byte in data:
+        for delta in (byte >> 4, byte & 0x0F):
+            index = max(0, min(88, index + _ADPCM_INDEX_TABLE[delta]))
+            vpdiff = step >> 3
+            if delta & 4:
+                vpdiff += step
+            if delta & 2:
+                vpdiff += step >> 1
+            if delta & 1:
+                vpdiff += step >> 2
+
+            if delta & 8:
+                valpred = max(-32768, valpred - vpdiff)
+            else:
+                valpred = min(32767, valpred + vpdiff)
+
+            step = _ADPCM_STEP_TABLE[index]
+            samples.append(valpred)
+
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+class AdpcmEncoder(AudioEncoder):
+    """IMA ADPCM with a small header on each block.
+
+    The header holds the decoder state, so every block can be decoded on its
+    own even if earlier blocks were lost (UDP). Blocks hold an even number of
+    samples (two per byte), so an odd sample is carried over to the next block.
+    """
+
+    def __init__(self) -> None:
+        self._state: Tuple[int, int] = (0, 0)
+        self._buffer = bytes()
+
+    def encode(self, audio: bytes) -> bytes:
+        audio = self._buffer + audio
+        num_bytes = len(audio) - (len(audio) % 4)
+        audio, self._buffer = audio[:num_bytes], audio[num_bytes:]
+        if not audio:
+            return bytes()
+
+        header = _ADPCM_HEADER.pack(*self._state)
+        data, self._state = _lin2adpcm(audio, self._state)
+        return header + data
+
+    def flush(self) -> bytes:
+        if not self._buffer:
+            return bytes()
+
+        # Pad last sample with silence
+        self._buffer += bytes(4 - len(self._buffer))
+        return self.encode(bytes())
+
+
+class AdpcmDecoder(AudioDecoder):
+    def decode(self, data: bytes) -> bytes:
+        if len(data) < _ADPCM_HEADER.size:
+            return bytes()
+
+        valpred, index = _ADPCM_HEADER.unpack_from(data)
+        return _adpcm2lin(data[_ADPCM_HEADER.size :], (valpred, index))
+
+
+# -----------------------------------------------------------------------------
+# Opus (optional)
+# -----------------------------------------------------------------------------
+
+_OPUS_RATES = {8000, 12000, 16000, 24000, 48000}
+_OPUS_FRAME_SECONDS = 0.02
+
+# Each packet is prefixed with its length
+_OPUS_LENGTH = struct.Struct("<H")
+
+try:
+    import opuslib  # type: ignore[import]
+except ImportError:
+    opuslib = None  # type: ignore[assignment]
+
+
+class OpusEncoder(AudioEncoder):
+    """Opus packets in 20 ms frames, each prefixed with its length."""
+
+    def __init__(self, rate: int, channels: int) -> None:
+        self._encoder = opuslib.Encoder(rate, channels, opuslib.APPLICATION_VOIP)
+        self._frame_samples = int(rate * _OPUS_FRAME_SECONDS)
+        self._frame_bytes = self._frame_samples * 2 * channels
+        self._buffer = bytes()
+
+    def encode(self, audio: bytes) -> bytes:
+        self._buffer += audio
+        packets: List[bytes] = []
+        while len(self._buffer) >= self._frame_bytes:
+            frame = self._buffer[: self._frame_bytes]
+            self._buffer = self._buffer[self._frame_bytes :]
+            packet = self._encoder.encode(frame, self._frame_samples)
+            packets.append(_OPUS_LENGTH.pack(len(packet)) + packet)
+
+        return b"".join(packets)
+
+    def flush(self) -> bytes:
+        if not self._buffer:
+            return bytes()
+
+        # Pad last frame with silence
+        self._buffer += bytes(self._frame_bytes - len(self._buffer))
+        return self.encode(bytes())
+
+
+class OpusDecoder(AudioDecoder):
+    def __init__(self, rate: int, channels: int) -> None:
+        self._decoder = opuslib.Decoder(rate, channels)
+        self._frame_samples = int(rate * _OPUS_FRAME_SECONDS)
+
+    def decode(self, data: bytes) -> bytes:
+        frames: List[bytes] = []
+        offset = 0
+        while (offset + _OPUS_LENGTH.size) <= len(data):
+            (packet_length,) = _OPUS_LENGTH.unpack_from(data, offset)
+            offset += _OPUS_LENGTH.size
+            packet = data[offset : offset + packet_length]
+            offset += packet_length
+            frames.append(self._decoder.decode(packet, self._frame_samples))
+
+        return b"".join(frames)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _check_format(codec: str, rate: int, width: int, channels: int) -> None:
+    if codec == CODEC_PCM:
+        return
+
+    if codec not in available_codecs():
+        raise ValueError(f"Codec not available: {codec}")
+
+    if width != 2:
+        raise ValueError(f"Codec {codec} requires 16-bit audio, got width={width}")
+
+    if (codec == CODEC_ADPCM) and (channels != 1):
+        raise ValueError(f"Codec {codec} requires mono audio, got {channels}")
+
+    if (codec == CODEC_OPUS) and (rate not in _OPUS_RATES):
+        raise ValueError(f"Codec {codec} doesn't support rate={rate}")
+
+
+_ENCODERS: Dict[str, Callable[[int, int], AudioEncoder]] = {
+    CODEC_PCM: lambda rate, channels: PcmEncoder(),
+    CODEC_MULAW: lambda rate, channels: MuLawEncoder(),
+    CODEC_ALAW: lambda rate, channels: ALawEncoder(),
+    CODEC_ADPCM: lambda rate, channels: AdpcmEncoder(),
+    CODEC_OPUS: OpusEncoder,
+}
+
+_DECODERS: Dict[str, Callable[[int, int], AudioDecoder]] = {
+    CODEC_PCM: lambda rate, channels: PcmDecoder(),
+    CODEC_MULAW: lambda rate, channels: MuLawDecoder(),
+    CODEC_ALAW: lambda rate, channels: ALawDecoder(),
+    CODEC_ADPCM: lambda rate, channels: AdpcmDecoder(),
+    CODEC_OPUS: OpusDecoder,
+}
+
+
+def available_codecs() -> List[str]:
+    """Names of codecs that can be used here, most compact first."""
+    return [
+        codec
+        for codec in CODEC_PREFERENCE
+        if (codec != CODEC_OPUS) or (opuslib is not None)
+    ]
+
+
+def negotiate_codec(
+    offered: Iterable[str], rate: int, width: int, channels: int
+) -> str:
+    """Choose the first offered codec that's available for this audio format."""
+    for codec in offered:
+        try:
+            _check_format(codec, rate, width, channels)
+            return codec
+        except ValueError:
+            _LOGGER.debug("Skipping codec: %s", codec)
+
+    return CODEC_PCM
+
+
+def get_encoder(codec: str, rate: int, width: int, channels: int) -> AudioEncoder:
+    """Create an encoder for 16-bit PCM. Raises ValueError if not possible."""
+    _check_format(codec, rate, width, channels)
+    return _ENCODERS[codec](rate, channels)
+
+
+def get_decoder(codec: str, rate: int, width: int, channels: int) -> AudioDecoder:
+    """Create a decoder back to PCM. Raises ValueError if not possible."""
+    _check_format(codec, rate, width, channels)
+    return _DECODERS[codec](rate, channels)
@@ -26,12 +26,95 @@ class ProgramInstallConfig(CommandConfig):
     downloads: Optional[Dict[str, ProgramDownloadConfig]] = None
 
 
+@dataclass
+class BackpressureConfig(DataClassJsonMixin):
+    policy: str = "block"
+    """What to do when a program can't keep up with live audio.
+
+    One of: block, drop-oldest, drop-newest, disconnect
+    """
+
+    max_events: int = 32
+    """Events buffered for the program before the policy is applied."""
+
+    max_lag_seconds: float = 0.5
+    """Warn when audio written to the program falls this far behind real time."""
+
+
+@dataclass
+class ConcurrencyConfig(DataClassJsonMixin):
+    max_running: int = 1
+    """Instances that may run at once."""
+
+    max_batch: Optional[int] = None
+    """Instances that may run at once for batch work.
+
+    Defaults to one less than max_running, so interactive requests don't have
+    to wait behind a batch job. With a max_running of 1, batch work shares the
+    only slot, and waiting interactive requests get it first when it's freed.
+    """
+
+    queue_timeout: Optional[float] = None
+    """Seconds to wait for a free slot before giving up (None = forever)."""
+
+    def get_max_batch(self) -> int:
+        if self.max_batch is not None:
+            return self.max_batch
+
+        return max(1, self.max_running - 1)
+
+
+@dataclass
+class CacheConfig(DataClassJsonMixin):
+    enabled: bool = True
+    max_size: int = 256
+    """Maximum number of cached results."""
+
+    ttl_seconds: Optional[float] = 3600.0
+    """Seconds before a cached result is recomputed (None = never)."""
+
+    casefold: bool = False
+    """Ignore case and surrounding punctuation when matching text.
+
+    Only safe if the program ignores them too, since the cached result (e.g.,
+    entity values) comes from the first text that was seen.
+    """
+
+
+@dataclass
+class BackendGroupConfig(DataClassJsonMixin):
+    endpoints: Dict[str, str] = field(default_factory=dict)
+    """label -> host:port of a server (see ServerConfig.port)"""
+
+    connect_timeout: float = 5.0
+    """Seconds to wait for a connection before trying the next endpoint."""
+
+    retry_seconds: float = 10.0
+    """Seconds before an endpoint that failed is tried again."""
+
+
+@dataclass
+class SharedMemoryConfig(DataClassJsonMixin):
+    buffer_bytes: int = 1024 * 1024
+    """Size of ring buffer for audio sent to the program."""
+
+
 @dataclass
 class ProgramConfig(CommandConfig):
+    command: str = ""
+    """Not used if program has backends."""
+
     adapter: Optional[str] = None
     template_args: Optional[Dict[str, Any]] = None
     installed: bool = True
     install: Optional[ProgramInstallConfig] = None
+    backpressure: Optional[BackpressureConfig] = None
+    concurrency: Optional[ConcurrencyConfig] = None
+    backends: Optional[BackendGroupConfig] = None
+    """Connect to one of these servers over TCP instead of running command."""
+
+    shared_memory: Optional[SharedMemoryConfig] = None
+    """Send audio through shared memory instead of stdin (see rhasspy3.shm)."""
 
 
 @dataclass
@@ -41,6 +124,33 @@ class PipelineProgramConfig(DataClassJsonMixin):
     after: Optional[CommandConfig] = None
 
 
+@dataclass
+class AsrRaceConfig(DataClassJsonMixin):
+    programs: Dict[str, PipelineProgramConfig] = field(default_factory=dict)
+    """label -> fast asr program that gets the same audio as the pipeline's asr"""
+
+    policy: str = "race"
+    """race or fallback (see rhasspy3.asr.AsrRacePolicy)"""
+
+    deadline_seconds: Optional[float] = 5.0
+    """Seconds after audio ends to wait for the pipeline's asr program"""
+
+
+@dataclass
+class HandleGroupProgramConfig(PipelineProgramConfig):
+    timeout_seconds: Optional[float] = None
+    """Seconds to wait for this program (default: group timeout)"""
+
+
+@dataclass
+class HandleGroupConfig(DataClassJsonMixin):
+    programs: Dict[str, HandleGroupProgramConfig] = field(default_factory=dict)
+    """label -> handle program, highest priority first"""
+
+    timeout_seconds: Optional[float] = None
+    """Seconds to wait for each program"""
+
+
 @dataclass
 class PipelineConfig(DataClassJsonMixin):
     inherit: Optional[str] = None
@@ -48,8 +158,14 @@ class PipelineConfig(DataClassJsonMixin):
     wake: Optional[PipelineProgramConfig] = None
     vad: Optional[PipelineProgramConfig] = None
     asr: Optional[PipelineProgramConfig] = None
+    asr_race: Optional[AsrRaceConfig] = None
+    """Run more asr programs on the same audio and take the best transcript"""
+
     intent: Optional[PipelineProgramConfig] = None
     handle: Optional[PipelineProgramConfig] = None
+    handle_group: Optional[HandleGroupConfig] = None
+    """Run several handle programs at once instead of handle"""
+
     tts: Optional[PipelineProgramConfig] = None
     snd: Optional[PipelineProgramConfig] = None
 
@@ -58,16 +174,54 @@ class PipelineConfig(DataClassJsonMixin):
 class SatelliteConfig(DataClassJsonMixin):
     mic: Optional[PipelineProgramConfig] = None
     wake: Optional[PipelineProgramConfig] = None
+    vad: Optional[PipelineProgramConfig] = None
+    """Optional local voice activity detection (avoids streaming silence)"""
+
     remote: Optional[PipelineProgramConfig] = None
     snd: Optional[PipelineProgramConfig] = None
 
 
+@dataclass
+class ServerWarmupConfig(DataClassJsonMixin):
+    enabled: bool = True
+
+    program: Optional[str] = None
+    """Program used to send the warm-up request (default: <name>.client)."""
+
+    text: str = "This is a test."
+    """Text synthesized by tts servers."""
+
+    seconds: float = 1.0
+    """Seconds of silence sent to wake/asr servers."""
+
+
 @dataclass
 class ServerConfig(DataClassJsonMixin):
     command: str
     shell: bool = False
     template_args: Optional[Dict[str, Any]] = None
 
+    socket: Optional[str] = None
+    """Unix socket created by the server, relative to its program directory.
+
+    Defaults to var/run/<name>.socket.
+    """
+
+    ready_timeout: float = 300.0
+    """Seconds to wait for the server to load its model and warm up."""
+
+    warmup: Optional[ServerWarmupConfig] = None
+    """Request sent once the server starts (defaults used if missing)."""
+
+    restart: bool = True
+    """Restart the server if it exits."""
+
+    port: Optional[int] = None
+    """TCP port where the server also accepts connections while it's ready."""
+
+    host: str = "0.0.0.0"
+    """Address to bind TCP port to."""
+
 
 @dataclass
 class Config(DataClassJsonMixin):
@@ -83,6 +237,12 @@ class Config(DataClassJsonMixin):
     servers: Dict[str, Dict[str, ServerConfig]] = field(default_factory=dict)
     """domain -> name -> server"""
 
+    concurrency: Dict[str, ConcurrencyConfig] = field(default_factory=dict)
+    """domain -> limit shared by all programs in the domain"""
+
+    intent_cache: CacheConfig = field(default_factory=CacheConfig)
+    """Cache of intent recognition results by transcript"""
+
     def __post_init__(self):
         # Handle inheritance
         # TODO: Catch loops
@@ -100,8 +260,14 @@ class Config(DataClassJsonMixin):
                 child_pipeline.wake = child_pipeline.wake or parent_pipeline.wake
                 child_pipeline.vad = child_pipeline.vad or parent_pipeline.vad
                 child_pipeline.asr = child_pipeline.asr or parent_pipeline.asr
+                child_pipeline.asr_race = (
+                    child_pipeline.asr_race or parent_pipeline.asr_race
+                )
                 child_pipeline.intent = child_pipeline.intent or parent_pipeline.intent
                 child_pipeline.handle = child_pipeline.handle or parent_pipeline.handle
+                child_pipeline.handle_group = (
+                    child_pipeline.handle_group or parent_pipeline.handle_group
+                )
                 child_pipeline.tts = child_pipeline.tts or parent_pipeline.tts
                 child_pipeline.snd = child_pipeline.snd or parent_pipeline.snd
 
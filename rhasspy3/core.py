@@ -1,9 +1,12 @@
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, Union
 
+from .backend import BackendBalancer
+from .cache import ResultCache
 from .config import Config
+from .scheduler import ProgramScheduler
 from .util import merge_dict
 from .util.jaml import safe_load
 
@@ -18,6 +21,22 @@ class Rhasspy:
     config_dir: Path
     base_dir: Path
     config_dict: Dict[str, Any]
+    scheduler: ProgramScheduler = field(init=False, repr=False)
+    """Limits how many programs run at once."""
+
+    intent_cache: ResultCache = field(init=False, repr=False)
+    """Intent recognition results by transcript."""
+
+    backends: BackendBalancer = field(init=False, repr=False)
+    """Connections to programs served over TCP."""
+
+    def __post_init__(self):
+        self.scheduler = ProgramScheduler(self.config.concurrency)
+        self.intent_cache = ResultCache(
+            max_size=self.config.intent_cache.max_size,
+            ttl_seconds=self.config.intent_cache.ttl_seconds,
+        )
+        self.backends = BackendBalancer()
 
     @property
     def programs_dir(self) -> Path:
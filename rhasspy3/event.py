@@ -1,15 +1,30 @@
 import asyncio
+import errno
 import json
+import os
+import re
 import sys
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import IO, Any, Dict, Iterable, Optional
+from typing import IO, Any, Dict, Iterable, Optional, Protocol
 
 _TYPE = "type"
 _DATA = "data"
 _PAYLOAD_LENGTH = "payload_length"
 _NEWLINE = "\n".encode()
 
+# Payload is in shared memory (see rhasspy3.shm)
+_SHM = "shm"
+
+_PAYLOAD_LENGTH_KEY = f'"{_PAYLOAD_LENGTH}"'.encode()
+
+# Fast paths for headers written by write_event (other key orders are parsed)
+_RAW_TYPE = re.compile(rb'^\s*\{\s*"type"\s*:\s*"([^"\\]*)"')
+_RAW_PAYLOAD_LENGTH = re.compile(rb'"payload_length"\s*:\s*(\d+)\s*\}\s*$')
+
+# Bytes copied at a time by forward_events
+_FORWARD_BYTES = 64 * 1024
+
 
 @dataclass
 class Event:
@@ -25,6 +40,51 @@ class Event:
         return Event(type=event_dict["type"], data=event_dict.get("data", {}))
 
 
+@dataclass
+class RawEvent:
+    """Event as it was read, so it can be forwarded without re-encoding.
+
+    Only the type is parsed out of the header, and only when it's needed.
+    """
+
+    header: bytes
+    """JSON line, including newline."""
+
+    payload: Optional[bytes] = None
+    _type: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @property
+    def type(self) -> str:
+        if self._type is None:
+            match = _RAW_TYPE.match(self.header)
+            if match is not None:
+                self._type = match.group(1).decode()
+            else:
+                self._type = json.loads(self.header)[_TYPE]
+
+        return self._type
+
+    @staticmethod
+    def from_event(event: Event) -> "RawEvent":
+        """Encode event the same way as write_event."""
+        event_dict: Dict[str, Any] = event.to_dict()
+        if event.payload:
+            event_dict[_PAYLOAD_LENGTH] = len(event.payload)
+
+        header = json.dumps(event_dict, ensure_ascii=False).encode() + _NEWLINE
+        return RawEvent(header=header, payload=event.payload or None)
+
+    def event(self) -> Event:
+        """Fully decode event."""
+        event_dict = json.loads(self.header)
+        data = event_dict.get(_DATA)
+        payload = self.payload
+        if data and (_SHM in data):
+            payload = _read_shared_payload(data)
+
+        return Event(type=event_dict[_TYPE], data=data, payload=payload)
+
+
 class Eventable(ABC):
     @abstractmethod
     def event(self) -> Event:
@@ -39,9 +99,56 @@ class Eventable(ABC):
         return self.event().data
 
 
+class EventWriter(Protocol):
+    """Where events are written: asyncio.StreamWriter, or a wrapper around one.
+
+    Wrappers may also have encode_event to move payloads elsewhere (see
+    rhasspy3.shm).
+    """
+
+    def write(self, data: bytes) -> None:
+        ...
+
+    def writelines(self, data: Iterable[bytes]) -> None:
+        ...
+
+    async def drain(self) -> None:
+        ...
+
+    def can_write_eof(self) -> bool:
+        ...
+
+    def write_eof(self) -> None:
+        ...
+
+    def is_closing(self) -> bool:
+        ...
+
+    def close(self) -> None:
+        ...
+
+    async def wait_closed(self) -> None:
+        ...
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        ...
+
+
 async def async_read_event(reader: asyncio.StreamReader) -> Optional[Event]:
     try:
         json_line = await reader.readline()
+        return await async_read_event_from_line(json_line, reader)
+    except KeyboardInterrupt:
+        pass
+
+    return None
+
+
+async def async_read_event_from_line(
+    json_line: bytes, reader: asyncio.StreamReader
+) -> Optional[Event]:
+    """Parse an event whose JSON line was already read, reading its payload."""
+    try:
         if not json_line:
             return None
 
@@ -52,16 +159,19 @@ async def async_read_event(reader: asyncio.StreamReader) -> Optional[Event]:
         if payload_length is not None:
             payload = await reader.readexactly(payload_length)
 
-        return Event(
-            type=event_dict[_TYPE], data=event_dict.get(_DATA), payload=payload
-        )
+        data = event_dict.get(_DATA)
+        if data and (_SHM in data):
+            payload = _read_shared_payload(data)
+
+        return Event(type=event_dict[_TYPE], data=data, payload=payload)
     except KeyboardInterrupt:
         pass
 
     return None
 
 
-async def async_write_event(event: Event, writer: asyncio.StreamWriter):
+async def async_write_event(event: Event, writer: EventWriter):
+    event = _encode_event(event, writer)
     event_dict: Dict[str, Any] = event.to_dict()
     if event.payload:
         event_dict[_PAYLOAD_LENGTH] = len(event.payload)
@@ -79,9 +189,10 @@ async def async_write_event(event: Event, writer: asyncio.StreamWriter):
         pass
 
 
-async def async_write_events(events: Iterable[Event], writer: asyncio.StreamWriter):
+async def async_write_events(events: Iterable[Event], writer: EventWriter):
     coros = []
     for event in events:
+        event = _encode_event(event, writer)
         event_dict: Dict[str, Any] = event.to_dict()
         if event.payload:
             event_dict[_PAYLOAD_LENGTH] = len(event.payload)
@@ -100,6 +211,42 @@ async def async_write_events(events: Iterable[Event], writer: asyncio.StreamWrit
         pass
 
 
+async def async_read_raw_event(reader: asyncio.StreamReader) -> Optional[RawEvent]:
+    """Read an event without decoding it (see RawEvent)."""
+    try:
+        header = await reader.readline()
+        if not header:
+            return None
+
+        payload: Optional[bytes] = None
+        payload_length = _get_payload_length(header)
+        if payload_length is not None:
+            payload = await reader.readexactly(payload_length)
+
+        return RawEvent(header=header, payload=payload)
+    except KeyboardInterrupt:
+        pass
+
+    return None
+
+
+async def async_write_raw_event(raw_event: RawEvent, writer: EventWriter):
+    """Write an event exactly as it was read."""
+    if hasattr(writer, "encode_event"):
+        # Writer moves payloads elsewhere
+        await async_write_event(raw_event.event(), writer)
+        return
+
+    try:
+        writer.write(raw_event.header)
+        if raw_event.payload:
+            writer.write(raw_event.payload)
+
+        await writer.drain()
+    except KeyboardInterrupt:
+        pass
+
+
 def read_event(reader: Optional[IO[bytes]] = None) -> Optional[Event]:
     if reader is None:
         reader = sys.stdin.buffer
@@ -117,9 +264,11 @@ def read_event(reader: Optional[IO[bytes]] = None) -> Optional[Event]:
         if payload_length is not None:
             payload = reader.read(payload_length)
 
-        return Event(
-            type=event_dict[_TYPE], data=event_dict.get(_DATA), payload=payload
-        )
+        data = event_dict.get(_DATA)
+        if data and (_SHM in data):
+            payload = _read_shared_payload(data)
+
+        return Event(type=event_dict[_TYPE], data=data, payload=payload)
     except KeyboardInterrupt:
         pass
 
@@ -145,3 +294,98 @@ def write_event(event: Event, writer: Optional[IO[bytes]] = None):
         writer.flush()
     except KeyboardInterrupt:
         pass
+
+
+def read_raw_event(reader: Optional[IO[bytes]] = None) -> Optional[RawEvent]:
+    """Read an event without decoding it (see RawEvent)."""
+    if reader is None:
+        reader = sys.stdin.buffer
+
+    try:
+        header = reader.readline()
+        if not header:
+            return None
+
+        payload: Optional[bytes] = None
+        payload_length = _get_payload_length(header)
+        if payload_length is not None:
+            payload = reader.read(payload_length)
+
+        return RawEvent(header=header, payload=payload)
+    except KeyboardInterrupt:
+        pass
+
+    return None
+
+
+def write_raw_event(raw_event: RawEvent, writer: Optional[IO[bytes]] = None):
+    """Write an event exactly as it was read."""
+    if writer is None:
+        writer = sys.stdout.buffer
+
+    try:
+        writer.write(raw_event.header)
+        if raw_event.payload:
+            writer.write(raw_event.payload)
+
+        writer.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def forward_events(in_fd: int, out_fd: int) -> None:
+    """Copy an event stream from one file descriptor to another until EOF.
+
+    Events are copied as bytes without being read. On Linux, os.splice moves
+    them in the kernel when either side is a pipe (e.g., stdin/stdout).
+    """
+    splice = getattr(os, "splice", None)
+    while True:
+        if splice is not None:
+            try:
+                num_bytes = splice(in_fd, out_fd, _FORWARD_BYTES)
+            except OSError as err:
+                if err.errno not in (errno.EINVAL, errno.ENOSYS):
+                    raise
+
+                # Neither side is a pipe
+                splice = None
+                continue
+
+            if num_bytes == 0:
+                break
+        else:
+            data = os.read(in_fd, _FORWARD_BYTES)
+            if not data:
+                break
+
+            view = memoryview(data)
+            while view:
+                view = view[os.write(out_fd, view) :]
+
+
+def _get_payload_length(header: bytes) -> Optional[int]:
+    if _PAYLOAD_LENGTH_KEY not in header:
+        return None
+
+    match = _RAW_PAYLOAD_LENGTH.search(header)
+    if match is not None:
+        return int(match.group(1))
+
+    return json.loads(header).get(_PAYLOAD_LENGTH)
+
+
+def _encode_event(event: Event, writer: EventWriter) -> Event:
+    """Let writer move the payload elsewhere (see rhasspy3.shm)."""
+    encode_event = getattr(writer, "encode_event", None)
+    if encode_event is None:
+        return event
+
+    return encode_event(event)
+
+
+def _read_shared_payload(data: Dict[str, Any]) -> bytes:
+    # Only programs that use shared memory pay for the import
+    from .shm import read_shared_payload  # pylint: disable=import-outside-toplevel
+
+    return read_shared_payload(data.pop(_SHM))
@@ -1,10 +1,11 @@
 """Intent recognition and handling."""
+import asyncio
 import logging
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 from .asr import Transcript
-from .config import PipelineProgramConfig
+from .config import HandleGroupConfig, PipelineProgramConfig
 from .core import Rhasspy
 from .event import Event, Eventable, async_read_event, async_write_event
 from .intent import Intent, NotRecognized
@@ -78,9 +79,81 @@ async def handle(
 
             if Handled.is_type(event.type):
                 handle_result = Handled.from_event(event)
-            elif NotHandled.is_type(event.type):
+                break
+
+            if NotHandled.is_type(event.type):
                 handle_result = NotHandled.from_event(event)
+                break
 
     _LOGGER.debug("handle: %s", handle_result)
 
     return handle_result
+
+
+async def handle_group(
+    rhasspy: Rhasspy,
+    group: HandleGroupConfig,
+    handle_input: Union[Intent, NotRecognized, Transcript],
+) -> Optional[Union[Handled, NotHandled]]:
+    """Run all handle programs in a group at once.
+
+    A program's Handled result is used as soon as every program before it has
+    finished without one (NotHandled, timeout, or error), so a fast program
+    never waits on a slower one with lower priority. Remaining programs are
+    stopped once a result is chosen.
+
+    Returns the first NotHandled if no program handled the input.
+    """
+    handle_tasks: List["asyncio.Task[Optional[Union[Handled, NotHandled]]]"] = [
+        asyncio.create_task(
+            _handle_with_timeout(
+                rhasspy,
+                label,
+                program,
+                handle_input,
+                (
+                    program.timeout_seconds
+                    if program.timeout_seconds is not None
+                    else group.timeout_seconds
+                ),
+            )
+        )
+        for label, program in group.programs.items()
+    ]
+
+    not_handled: Optional[NotHandled] = None
+    try:
+        for label, handle_task in zip(group.programs, handle_tasks):
+            handle_result = await handle_task
+            if isinstance(handle_result, Handled):
+                _LOGGER.debug("handle_group: handled by %s", label)
+                return handle_result
+
+            if (not_handled is None) and isinstance(handle_result, NotHandled):
+                not_handled = handle_result
+    finally:
+        for handle_task in handle_tasks:
+            handle_task.cancel()
+
+        await asyncio.gather(*handle_tasks, return_exceptions=True)
+
+    return not_handled
+
+
+async def _handle_with_timeout(
+    rhasspy: Rhasspy,
+    label: str,
+    program: PipelineProgramConfig,
+    handle_input: Union[Intent, NotRecognized, Transcript],
+    timeout_seconds: Optional[float],
+) -> Optional[Union[Handled, NotHandled]]:
+    try:
+        return await asyncio.wait_for(
+            handle(rhasspy, program, handle_input), timeout=timeout_seconds
+        )
+    except asyncio.TimeoutError:
+        _LOGGER.warning("handle_group: %s timed out", label)
+    except Exception:
+        _LOGGER.exception("handle_group: unexpected error from %s", label)
+
+    return None
@@ -1,12 +1,14 @@
 """Intent recognition and handling."""
+import json
 import logging
+import string
 from dataclasses import asdict, dataclass, field
 from typing import Any, Dict, List, Optional, Union
 
 from .config import PipelineProgramConfig
 from .core import Rhasspy
 from .event import Event, Eventable, async_read_event, async_write_event
-from .program import create_process
+from .program import create_process, get_program_config, resolve_command
 
 DOMAIN = "intent"
 _RECOGNIZE_TYPE = "recognize"
@@ -108,8 +110,35 @@ class NotRecognized(Eventable):
 
 
 async def recognize(
-    rhasspy: Rhasspy, program: Union[str, PipelineProgramConfig], text: str
+    rhasspy: Rhasspy,
+    program: Union[str, PipelineProgramConfig],
+    text: str,
+    use_cache: bool = False,
 ) -> Optional[Union[Intent, NotRecognized]]:
+    """Recognize intent from text.
+
+    With use_cache, a cached result for the same text (ignoring whitespace)
+    is returned without starting the intent program (see intent_cache in
+    config).
+    """
+    use_cache = use_cache and rhasspy.config.intent_cache.enabled
+    if use_cache:
+        program_name = (
+            program.name if isinstance(program, PipelineProgramConfig) else program
+        )
+        cache_version = json.dumps(
+            get_program_config(rhasspy, DOMAIN, program_name).to_dict(),
+            sort_keys=True,
+        )
+        cache_key = (
+            resolve_command(rhasspy, DOMAIN, program),
+            normalize_text(text, casefold=rhasspy.config.intent_cache.casefold),
+        )
+        cached_result = rhasspy.intent_cache.get(program_name, cache_version, cache_key)
+        if cached_result is not None:
+            _LOGGER.debug("recognize: %s (cached)", cached_result)
+            return cached_result
+
     result: Optional[Union[Intent, NotRecognized]] = None
     async with (await create_process(rhasspy, DOMAIN, program)) as intent_proc:
         assert intent_proc.stdin is not None
@@ -132,4 +161,15 @@ async def recognize(
 
     _LOGGER.debug("recognize: %s", result)
 
+    if use_cache and (result is not None):
+        rhasspy.intent_cache.put(program_name, cache_version, cache_key, result)
+
     return result
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """Normalize whitespace, and optionally case and surrounding punctuation."""
+    if not casefold:
+        return " ".join(text.split())
+
+    return " ".join(text.casefold().split()).strip(string.punctuation + " ")
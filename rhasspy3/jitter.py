@@ -0,0 +1,120 @@
+"""Reordering and loss detection for audio packets sent over UDP."""
+import logging
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, Generic, List, Optional, TypeVar
+
+_LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
+
+UDP_HEADER = struct.Struct("<IQ")
+"""Sequence number (wraps at 2^32), timestamp (milliseconds since start of stream)"""
+
+_SEQUENCE_MOD = 2**32
+
+
+@dataclass
+class JitterBuffer(Generic[_T]):
+    """Puts packets back in order by sequence number.
+
+    Packets are held until the next one in sequence arrives. Once depth
+    packets are waiting, missing packets are given up on and reported as None
+    so they can be concealed.
+    """
+
+    depth: int
+    """Number of packets to wait for a missing packet."""
+
+    max_gap: int = 500
+    """Jumps in sequence number larger than this restart the stream."""
+
+    packets_late: int = 0
+    """Packets dropped because they arrived too late (or twice)."""
+
+    packets_lost: int = 0
+    """Packets that never arrived."""
+
+    _packets: Dict[int, _T] = field(default_factory=dict)
+    """Packets waiting to be released."""
+
+    _next_sequence: Optional[int] = None
+    """Sequence number of next packet to release."""
+
+    def add(self, sequence: int, packet: _T) -> List[Optional[_T]]:
+        """Add a packet. Returns packets that are ready (None if lost)."""
+        ready: List[Optional[_T]] = []
+        if self._next_sequence is None:
+            # Start from the earliest of the first few packets
+            self._packets.setdefault(sequence, packet)
+            if len(self._packets) <= self.depth:
+                return ready
+
+            first_sequence = next(iter(self._packets))
+            self._next_sequence = min(
+                self._packets,
+                key=lambda other: _signed_offset(first_sequence, other),
+            )
+            return self._release()
+
+        offset = (sequence - self._next_sequence) % _SEQUENCE_MOD
+        if offset >= (_SEQUENCE_MOD // 2):
+            # Behind next sequence number
+            if (_SEQUENCE_MOD - offset) <= self.max_gap:
+                self.packets_late += 1
+                return ready
+
+            offset = self.max_gap + 1
+
+        if offset > self.max_gap:
+            # Sender probably restarted
+            _LOGGER.debug(
+                "Restarting at sequence %s (expected %s)",
+                sequence,
+                self._next_sequence,
+            )
+            ready.extend(self._packets[key] for key in sorted(self._packets))
+            self._packets.clear()
+            self._next_sequence = sequence
+
+        if sequence in self._packets:
+            self.packets_late += 1
+        else:
+            self._packets[sequence] = packet
+
+        ready.extend(self._release())
+        return ready
+
+    def _release(self) -> List[Optional[_T]]:
+        """Release packets in order, giving up on missing packets if needed."""
+        assert self._next_sequence is not None
+        ready: List[Optional[_T]] = []
+        while self._packets:
+            if self._next_sequence not in self._packets:
+                if len(self._packets) < self.depth:
+                    # Wait for missing packet
+                    break
+
+                # Give up on packets before the earliest one waiting
+                next_sequence = self._next_sequence
+                earliest_sequence = min(
+                    self._packets,
+                    key=lambda other: _signed_offset(next_sequence, other),
+                )
+                num_missing = _signed_offset(next_sequence, earliest_sequence)
+                if 0 < num_missing <= self.max_gap:
+                    self.packets_lost += num_missing
+                    ready.extend([None] * num_missing)
+
+                self._next_sequence = earliest_sequence
+                continue
+
+            ready.append(self._packets.pop(self._next_sequence))
+            self._next_sequence = (self._next_sequence + 1) % _SEQUENCE_MOD
+
+        return ready
+
+
+def _signed_offset(from_sequence: int, to_sequence: int) -> int:
+    """Distance between sequence numbers, taking wrapping into account."""
+    half = _SEQUENCE_MOD // 2
+    return ((to_sequence - from_sequence + half) % _SEQUENCE_MOD) - half
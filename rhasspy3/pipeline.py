@@ -2,16 +2,23 @@
 import io
 import logging
 from collections import deque
+from contextlib import AsyncExitStack
 from dataclasses import dataclass, fields
 from enum import Enum
 from typing import IO, Any, Deque, Dict, Optional, Union
 
-from .asr import DOMAIN as ASR_DOMAIN
-from .asr import Transcript, transcribe
-from .config import CommandConfig, PipelineConfig, PipelineProgramConfig
+from .asr import (
+    AcceptTranscript,
+    AsrRacePolicy,
+    Transcript,
+    start_asr_processes,
+    transcribe,
+    wait_for_transcript,
+)
+from .config import AsrRaceConfig, CommandConfig, PipelineConfig, PipelineProgramConfig
 from .core import Rhasspy
-from .event import Event, Eventable, async_read_event
-from .handle import Handled, NotHandled, handle
+from .event import Event, Eventable
+from .handle import Handled, NotHandled, handle, handle_group
 from .intent import Intent, NotRecognized, recognize
 from .mic import DOMAIN as MIC_DOMAIN
 from .program import create_process, run_command
@@ -57,7 +64,7 @@ class StopAfterDomain(str, Enum):
 async def run(
     rhasspy: Rhasspy,
     pipeline: Union[str, PipelineConfig],
-    samples_per_chunk: int,
+    samples_per_chunk: Optional[int] = None,
     asr_chunks_to_buffer: int = 0,
     mic_program: Optional[Union[str, PipelineProgramConfig]] = None,
     wake_program: Optional[Union[str, PipelineProgramConfig]] = None,
@@ -86,15 +93,28 @@ async def run(
     wake_program = wake_program or pipeline.wake
     wake_after = pipeline.wake.after if pipeline.wake else None
 
+    asr_race = pipeline.asr_race
+    if (asr_program is not None) and (asr_program != pipeline.asr):
+        # Only race the pipeline's own asr program
+        asr_race = None
+
     asr_program = asr_program or pipeline.asr
     asr_after = pipeline.asr.after if pipeline.asr else None
 
     vad_program = vad_program or pipeline.vad
     intent_program = intent_program or pipeline.intent
+    handle_group_config = pipeline.handle_group
+    if (handle_program is not None) and (handle_program != pipeline.handle):
+        # Explicit program replaces the pipeline's group
+        handle_group_config = None
+
     handle_program = handle_program or pipeline.handle
+    has_handle = (handle_program is not None) or (handle_group_config is not None)
     tts_program = tts_program or pipeline.tts
     snd_program = snd_program or pipeline.snd
 
+    asr_accept = _get_asr_accept(rhasspy, asr_race, intent_program)
+
     skip_asr = (
         (intent_result is not None)
         or (handle_result is not None)
@@ -111,7 +131,12 @@ async def run(
             asr_wav_in.seek(0)
             assert asr_program is not None, "No asr program"
             asr_transcript = await transcribe(
-                rhasspy, asr_program, asr_wav_in, samples_per_chunk
+                rhasspy,
+                asr_program,
+                asr_wav_in,
+                samples_per_chunk,
+                race=asr_race,
+                accept=asr_accept,
             )
 
             if asr_after is not None:
@@ -125,7 +150,13 @@ async def run(
                 assert asr_program is not None, "No asr program"
                 assert vad_program is not None, "No vad program"
                 await _mic_asr(
-                    rhasspy, mic_program, asr_program, vad_program, pipeline_result
+                    rhasspy,
+                    mic_program,
+                    asr_program,
+                    vad_program,
+                    pipeline_result,
+                    asr_race=asr_race,
+                    asr_accept=asr_accept,
                 )
             elif stop_after == StopAfterDomain.WAKE:
                 # Audio input, wake word detection, segmentation, speech to text
@@ -152,6 +183,8 @@ async def run(
                     asr_chunks_to_buffer=asr_chunks_to_buffer,
                     wake_detection=wake_detection,
                     wake_after=wake_after,
+                    asr_race=asr_race,
+                    asr_accept=asr_accept,
                 )
 
             if asr_after is not None:
@@ -161,7 +194,7 @@ async def run(
             pipeline_result.asr_transcript = asr_transcript
 
     if (stop_after == StopAfterDomain.ASR) or (
-        (intent_program is None) and (handle_program is None)
+        (intent_program is None) and (not has_handle)
     ):
         return pipeline_result
 
@@ -169,7 +202,7 @@ async def run(
     if (asr_transcript is not None) and (intent_program is not None):
         pipeline_result.asr_transcript = asr_transcript
         intent_result = await recognize(
-            rhasspy, intent_program, asr_transcript.text or ""
+            rhasspy, intent_program, asr_transcript.text or "", use_cache=True
         )
         pipeline_result.intent_result = intent_result
 
@@ -181,12 +214,18 @@ async def run(
     elif asr_transcript is not None:
         handle_input = asr_transcript
 
-    if (stop_after == StopAfterDomain.INTENT) or (handle_program is None):
+    if (stop_after == StopAfterDomain.INTENT) or (not has_handle):
         return pipeline_result
 
     if (handle_input is not None) and (handle_result is None):
-        assert handle_program is not None, "Pipeline is missing handle"
-        handle_result = await handle(rhasspy, handle_program, handle_input)
+        if handle_group_config is not None:
+            handle_result = await handle_group(
+                rhasspy, handle_group_config, handle_input
+            )
+        else:
+            assert handle_program is not None, "Pipeline is missing handle"
+            handle_result = await handle(rhasspy, handle_program, handle_input)
+
         pipeline_result.handle_result = handle_result
 
     if (stop_after == StopAfterDomain.HANDLE) or (tts_program is None):
@@ -237,6 +276,32 @@ async def _mic_wake(
             _LOGGER.debug("run: no wake word detected")
 
 
+def _get_asr_accept(
+    rhasspy: Rhasspy,
+    asr_race: Optional[AsrRaceConfig],
+    intent_program: Optional[Union[str, PipelineProgramConfig]],
+) -> Optional[AcceptTranscript]:
+    """Accept fast transcripts that the intent program recognizes."""
+    if (
+        (asr_race is None)
+        or (AsrRacePolicy(asr_race.policy) != AsrRacePolicy.RACE)
+        or (intent_program is None)
+    ):
+        return None
+
+    # Narrowed here, since mypy doesn't carry it into is_recognized
+    recognize_program: Union[str, PipelineProgramConfig] = intent_program
+
+    async def is_recognized(transcript: Transcript) -> bool:
+        # Cached, so it isn't recognized again when the pipeline continues
+        intent_result = await recognize(
+            rhasspy, recognize_program, transcript.text, use_cache=True
+        )
+        return isinstance(intent_result, Intent)
+
+    return is_recognized
+
+
 async def _mic_asr(
     rhasspy: Rhasspy,
     mic_program: Union[str, PipelineProgramConfig],
@@ -244,29 +309,26 @@ async def _mic_asr(
     vad_program: Union[str, PipelineProgramConfig],
     pipeline_result: PipelineResult,
     asr_chunks_to_buffer: int = 0,
+    asr_race: Optional[AsrRaceConfig] = None,
+    asr_accept: Optional[AcceptTranscript] = None,
 ):
     """Just asr transcription (+ silence detection)."""
-    async with (await create_process(rhasspy, MIC_DOMAIN, mic_program)) as mic_proc, (
-        await create_process(rhasspy, ASR_DOMAIN, asr_program)
-    ) as asr_proc:
+    async with AsyncExitStack() as stack:
+        mic_proc = await stack.enter_async_context(
+            await create_process(rhasspy, MIC_DOMAIN, mic_program)
+        )
         assert mic_proc.stdout is not None
-        assert asr_proc.stdin is not None
-        assert asr_proc.stdout is not None
+        asr_procs = await start_asr_processes(rhasspy, stack, asr_program, asr_race)
 
         await segment(
             rhasspy,
             vad_program,
             mic_proc.stdout,
-            asr_proc.stdin,
+            [asr_proc.stdin for asr_proc in asr_procs],
+        )
+        pipeline_result.asr_transcript = await wait_for_transcript(
+            asr_procs, asr_race, asr_accept
         )
-        while True:
-            asr_event = await async_read_event(asr_proc.stdout)
-            if asr_event is None:
-                break
-
-            if Transcript.is_type(asr_event.type):
-                pipeline_result.asr_transcript = Transcript.from_event(asr_event)
-                break
 
 
 async def _mic_wake_asr(
@@ -279,18 +341,20 @@ async def _mic_wake_asr(
     asr_chunks_to_buffer: int = 0,
     wake_detection: Optional[Detection] = None,
     wake_after: Optional[CommandConfig] = None,
+    asr_race: Optional[AsrRaceConfig] = None,
+    asr_accept: Optional[AcceptTranscript] = None,
 ):
     """Wake word detect + asr transcription (+ silence detection)."""
     chunk_buffer: Optional[Deque[Event]] = (
         deque(maxlen=asr_chunks_to_buffer) if asr_chunks_to_buffer > 0 else None
     )
 
-    async with (await create_process(rhasspy, MIC_DOMAIN, mic_program)) as mic_proc, (
-        await create_process(rhasspy, ASR_DOMAIN, asr_program)
-    ) as asr_proc:
+    async with AsyncExitStack() as stack:
+        mic_proc = await stack.enter_async_context(
+            await create_process(rhasspy, MIC_DOMAIN, mic_program)
+        )
         assert mic_proc.stdout is not None
-        assert asr_proc.stdin is not None
-        assert asr_proc.stdout is not None
+        asr_procs = await start_asr_processes(rhasspy, stack, asr_program, asr_race)
 
         if wake_detection is None:
             wake_detection = await detect(
@@ -306,16 +370,11 @@ async def _mic_wake_asr(
                 rhasspy,
                 vad_program,
                 mic_proc.stdout,
-                asr_proc.stdin,
+                [asr_proc.stdin for asr_proc in asr_procs],
                 chunk_buffer,
             )
-            while True:
-                asr_event = await async_read_event(asr_proc.stdout)
-                if asr_event is None:
-                    break
-
-                if Transcript.is_type(asr_event.type):
-                    pipeline_result.asr_transcript = Transcript.from_event(asr_event)
-                    break
+            pipeline_result.asr_transcript = await wait_for_transcript(
+                asr_procs, asr_race, asr_accept
+            )
         else:
             _LOGGER.debug("run: no wake word detected")
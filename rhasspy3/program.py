@@ -5,12 +5,19 @@ import os
 import shlex
 import string
 from asyncio.subprocess import PIPE, Process
-from typing import Optional, Union
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
 
+from .backend import RemoteProcess
 from .config import CommandConfig, PipelineProgramConfig, ProgramConfig
 from .core import Rhasspy
+from .event import EventWriter
+from .scheduler import Priority, SchedulerSlot
+from .stream import BufferedEventWriter, OverflowPolicy
 from .util import merge_dict
 
+if TYPE_CHECKING:
+    from .shm import SharedAudioBuffer
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -19,14 +26,41 @@ class MissingProgramConfigError(Exception):
 
 
 class ProcessContextManager:
-    """Wrapper for an async process that terminates on exit."""
-
-    def __init__(self, proc: Process, name: str):
+    """Wrapper for an async process that terminates on exit.
+
+    Programs are talked to through stdin/stdout of this wrapper, since stdin
+    may be wrapped too (e.g., to send audio through shared memory).
+    """
+
+    def __init__(
+        self,
+        proc: Union[Process, RemoteProcess],
+        name: str,
+        slot: Optional[SchedulerSlot] = None,
+        shared_buffer: "Optional[SharedAudioBuffer]" = None,
+    ):
         self.proc = proc
         self.name = name
+        self.slot = slot
+        self.shared_buffer = shared_buffer
+
+        self.stdin: Optional[EventWriter] = proc.stdin
+        self.stdout: Optional[asyncio.StreamReader] = proc.stdout
+        if (shared_buffer is not None) and (proc.stdin is not None):
+            # pylint: disable=import-outside-toplevel
+            from .shm import SharedMemoryWriter
+
+            self.stdin = SharedMemoryWriter(proc.stdin, shared_buffer)
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.proc.returncode
 
-    async def __aenter__(self):
-        return self.proc
+    async def wait(self) -> int:
+        return await self.proc.wait()
+
+    async def __aenter__(self) -> "ProcessContextManager":
+        return self
 
     async def __aexit__(self, exc_type, exc, tb):
         try:
@@ -38,76 +72,123 @@ class ProcessContextManager:
             pass
         except Exception:
             _LOGGER.exception("Unexpected error stopping process: %s", self.name)
+        finally:
+            if self.shared_buffer is not None:
+                self.shared_buffer.close()
+
+            if self.slot is not None:
+                self.slot.release()
 
 
 async def create_process(
-    rhasspy: Rhasspy, domain: str, name: Union[str, PipelineProgramConfig]
+    rhasspy: Rhasspy,
+    domain: str,
+    name: Union[str, PipelineProgramConfig],
+    priority: Optional[Priority] = None,
 ) -> ProcessContextManager:
-    pipeline_config: Optional[PipelineProgramConfig] = None
-    if isinstance(name, PipelineProgramConfig):
-        pipeline_config = name
-        name = pipeline_config.name
+    """Start a program once the scheduler has a free slot for it.
+
+    Priority defaults to the current task's (see rhasspy3.scheduler).
+    Programs with backends are connected to over TCP instead of started.
+    Local programs with shared_memory get audio through a ring buffer.
+    """
+    proc_managers = await create_processes(rhasspy, domain, [name], priority)
+    return proc_managers[0]
+
+
+async def create_processes(
+    rhasspy: Rhasspy,
+    domain: str,
+    names: Sequence[Union[str, PipelineProgramConfig]],
+    priority: Optional[Priority] = None,
+) -> List[ProcessContextManager]:
+    """Start programs that are needed together (see create_process).
+
+    Waits until the scheduler has slots for all of them at once.
+    """
+    programs: List[Tuple[str, Optional[PipelineProgramConfig], ProgramConfig]] = []
+    for name in names:
+        pipeline_config: Optional[PipelineProgramConfig] = None
+        if isinstance(name, PipelineProgramConfig):
+            pipeline_config = name
+            name = pipeline_config.name
+
+        assert name, f"No program name for domain {domain}"
+        programs.append(
+            (name, pipeline_config, get_program_config(rhasspy, domain, name))
+        )
 
-    assert name, f"No program name for domain {domain}"
+    slots = await rhasspy.scheduler.acquire_all(
+        domain,
+        [(name, program_config.concurrency) for name, _, program_config in programs],
+        priority,
+    )
+    proc_managers: List[ProcessContextManager] = []
+    try:
+        for (name, pipeline_config, program_config), slot in zip(programs, slots):
+            proc_managers.append(
+                await _create_process(
+                    rhasspy, domain, name, pipeline_config, program_config, slot
+                )
+            )
+    except BaseException:
+        # Stop programs that did start, and release the rest of the slots
+        for proc_manager in proc_managers:
+            await proc_manager.__aexit__(None, None, None)
 
-    # The "." is special in program names:
-    # it means to use the directory of "base" in <base>.<name>.
-    #
-    # This is used for <base>.client programs, which are just scripts in the
-    # "base" directory that communicate with their respective servers.
-    if "." in name:
-        base_name = name.split(".", maxsplit=1)[0]
-    else:
-        base_name = name
+        for slot in slots[len(proc_managers) :]:
+            slot.release()
 
-    program_config: Optional[ProgramConfig] = rhasspy.config.programs.get(
-        domain, {}
-    ).get(name)
-    assert program_config is not None, f"No config for program {domain}/{name}"
-    assert isinstance(program_config, ProgramConfig)
+        raise
 
-    # Directory where this program is installed
-    program_dir = rhasspy.programs_dir / domain / base_name
+    return proc_managers
 
-    # Directory where this program should store data
-    data_dir = rhasspy.data_dir / domain / base_name
 
-    # ${variables} available within program/pipeline template_args
-    default_mapping = {
-        "program_dir": str(program_dir.absolute()),
-        "data_dir": str(data_dir.absolute()),
-    }
+async def _create_process(
+    rhasspy: Rhasspy,
+    domain: str,
+    name: str,
+    pipeline_config: Optional[PipelineProgramConfig],
+    program_config: ProgramConfig,
+    slot: SchedulerSlot,
+) -> ProcessContextManager:
+    """Start a program in a slot that's already been acquired."""
+    base_name = _get_base_name(name)
+    shared_buffer: "Optional[SharedAudioBuffer]" = None
+    proc: Union[Process, RemoteProcess]
+    if program_config.backends is not None:
+        proc = await rhasspy.backends.connect(domain, name, program_config.backends)
+    else:
+        proc = await _start_process(
+            rhasspy, domain, name, base_name, program_config, pipeline_config
+        )
+        if program_config.shared_memory is not None:
+            shared_buffer = _get_shared_buffer(
+                program_config.shared_memory.buffer_bytes
+            )
 
-    command_str = program_config.command.strip()
-    command_mapping = dict(default_mapping)
-    if program_config.template_args:
-        # Substitute within program template args
-        args_mapping = dict(program_config.template_args)
-        for arg_name, arg_str in args_mapping.items():
-            if not isinstance(arg_str, str):
-                continue
+    return ProcessContextManager(
+        proc, name=name, slot=slot, shared_buffer=shared_buffer
+    )
 
-            arg_template = string.Template(arg_str)
-            args_mapping[arg_name] = arg_template.safe_substitute(default_mapping)
 
-        command_mapping.update(args_mapping)
+def _get_shared_buffer(buffer_bytes: int) -> "Optional[SharedAudioBuffer]":
+    """Create a buffer for sending audio chunks through shared memory."""
+    # pylint: disable=import-outside-toplevel
+    from .shm import get_shared_buffer
 
-    if pipeline_config is not None:
-        if pipeline_config.template_args:
-            # Substitute within pipeline template args
-            args_mapping = dict(pipeline_config.template_args)
-            for arg_name, arg_str in args_mapping.items():
-                if not isinstance(arg_str, str):
-                    continue
-
-                arg_template = string.Template(arg_str)
-                args_mapping[arg_name] = arg_template.safe_substitute(default_mapping)
+    return get_shared_buffer(buffer_bytes)
 
-            merge_dict(command_mapping, args_mapping)
 
-    # Substitute template args
-    command_template = string.Template(command_str)
-    command_str = command_template.safe_substitute(command_mapping)
+async def _start_process(
+    rhasspy: Rhasspy,
+    domain: str,
+    name: str,
+    base_name: str,
+    program_config: ProgramConfig,
+    pipeline_config: Optional[PipelineProgramConfig],
+) -> Process:
+    command_str = resolve_command(rhasspy, domain, pipeline_config or name)
 
     working_dir = rhasspy.programs_dir / domain / base_name
     env = dict(os.environ)
@@ -161,7 +242,112 @@ async def create_process(
             env=env,
         )
 
-    return ProcessContextManager(proc, name=name)
+    return proc
+
+
+def resolve_command(
+    rhasspy: Rhasspy, domain: str, name: Union[str, PipelineProgramConfig]
+) -> str:
+    """Substitute program and pipeline template args into program command."""
+    pipeline_config: Optional[PipelineProgramConfig] = None
+    if isinstance(name, PipelineProgramConfig):
+        pipeline_config = name
+        name = pipeline_config.name
+
+    base_name = _get_base_name(name)
+    program_config = get_program_config(rhasspy, domain, name)
+
+    # Directory where this program is installed
+    program_dir = rhasspy.programs_dir / domain / base_name
+
+    # Directory where this program should store data
+    data_dir = rhasspy.data_dir / domain / base_name
+
+    # ${variables} available within program/pipeline template_args
+    default_mapping = {
+        "program_dir": str(program_dir.absolute()),
+        "data_dir": str(data_dir.absolute()),
+    }
+
+    command_str = program_config.command.strip()
+    command_mapping = dict(default_mapping)
+    if program_config.template_args:
+        # Substitute within program template args
+        args_mapping = dict(program_config.template_args)
+        for arg_name, arg_str in args_mapping.items():
+            if not isinstance(arg_str, str):
+                continue
+
+            arg_template = string.Template(arg_str)
+            args_mapping[arg_name] = arg_template.safe_substitute(default_mapping)
+
+        command_mapping.update(args_mapping)
+
+    if pipeline_config is not None:
+        if pipeline_config.template_args:
+            # Substitute within pipeline template args
+            args_mapping = dict(pipeline_config.template_args)
+            for arg_name, arg_str in args_mapping.items():
+                if not isinstance(arg_str, str):
+                    continue
+
+                arg_template = string.Template(arg_str)
+                args_mapping[arg_name] = arg_template.safe_substitute(default_mapping)
+
+            merge_dict(command_mapping, args_mapping)
+
+    # Substitute template args
+    command_template = string.Template(command_str)
+    return command_template.safe_substitute(command_mapping)
+
+
+def _get_base_name(name: str) -> str:
+    # The "." is special in program names:
+    # it means to use the directory of "base" in <base>.<name>.
+    #
+    # This is used for <base>.client programs, which are just scripts in the
+    # "base" directory that communicate with their respective servers.
+    if "." in name:
+        return name.split(".", maxsplit=1)[0]
+
+    return name
+
+
+def get_program_config(
+    rhasspy: Rhasspy, domain: str, name: Union[str, PipelineProgramConfig]
+) -> ProgramConfig:
+    if isinstance(name, PipelineProgramConfig):
+        name = name.name
+
+    program_config: Optional[ProgramConfig] = rhasspy.config.programs.get(
+        domain, {}
+    ).get(name)
+    assert program_config is not None, f"No config for program {domain}/{name}"
+    assert isinstance(program_config, ProgramConfig)
+
+    return program_config
+
+
+def create_event_writer(
+    rhasspy: Rhasspy,
+    domain: str,
+    name: Union[str, PipelineProgramConfig],
+    writer: EventWriter,
+) -> BufferedEventWriter:
+    """Create a buffered writer for live events using program's backpressure."""
+    program_config = get_program_config(rhasspy, domain, name)
+    program_name = name.name if isinstance(name, PipelineProgramConfig) else name
+    backpressure = program_config.backpressure
+    if backpressure is None:
+        return BufferedEventWriter(writer, name=f"{domain}/{program_name}")
+
+    return BufferedEventWriter(
+        writer,
+        name=f"{domain}/{program_name}",
+        max_events=backpressure.max_events,
+        policy=OverflowPolicy(backpressure.policy),
+        max_lag_seconds=backpressure.max_lag_seconds,
+    )
 
 
 async def run_command(rhasspy: Rhasspy, command_config: CommandConfig) -> int:
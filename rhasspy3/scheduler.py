@@ -0,0 +1,310 @@
+"""Limits on how many programs run at once, with priority classes."""
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from .config import ConcurrencyConfig
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Priority class of a request. Lower values are scheduled first."""
+
+    INTERACTIVE = 0
+    """Someone is waiting for the result (voice commands, etc.)"""
+
+    BATCH = 1
+    """Bulk work that can wait (transcribing many files, etc.)"""
+
+
+_PRIORITY: ContextVar[Priority] = ContextVar("priority", default=Priority.INTERACTIVE)
+
+
+def parse_priority(name: str) -> Optional[Priority]:
+    """Priority from its name (case insensitive), or None if unknown."""
+    return Priority.__members__.get(name.upper())
+
+
+def get_priority() -> Priority:
+    """Priority of the current task (interactive by default)."""
+    return _PRIORITY.get()
+
+
+def set_priority(priority: Priority) -> None:
+    """Set priority for programs started by the current task."""
+    _PRIORITY.set(priority)
+
+
+class ProgramBusyError(Exception):
+    """No slot was free before the queue timeout."""
+
+
+@dataclass
+class QueueStats:
+    running: int = 0
+    running_batch: int = 0
+    waiting: int = 0
+    started: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    """Total time spent waiting for a slot."""
+
+    max_wait_seconds: float = 0.0
+    """Longest time spent waiting for a slot."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _Limit:
+    key: str
+    config: ConcurrencyConfig
+    stats: QueueStats = field(default_factory=QueueStats)
+
+    def can_run(self, priority: Priority, count: int = 1) -> bool:
+        if (self.stats.running + count) > self.config.max_running:
+            return False
+
+        if priority == Priority.BATCH:
+            return (self.stats.running_batch + count) <= self.config.get_max_batch()
+
+        return True
+
+    def can_ever_run(self, priority: Priority, count: int) -> bool:
+        """False if count programs at once would never fit in this limit."""
+        max_running = self.config.max_running
+        if priority == Priority.BATCH:
+            max_running = min(max_running, self.config.get_max_batch())
+
+        return count <= max_running
+
+
+@dataclass
+class _Waiter:
+    limits: List[_Limit]
+    """Limits to take a slot from (repeated for each program that needs it)."""
+
+    priority: Priority
+    future: "asyncio.Future[None]"
+    start_time: float = field(default_factory=time.monotonic)
+
+
+class SchedulerSlot:
+    """Permission to run a program. Must be released when the program exits."""
+
+    def __init__(
+        self, scheduler: "ProgramScheduler", limits: List[_Limit], priority: Priority
+    ) -> None:
+        self.scheduler = scheduler
+        self.limits = limits
+        self.priority = priority
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self)  # pylint: disable=protected-access
+
+
+class ProgramScheduler:
+    """Hands out slots to run programs under per-domain/per-program limits.
+
+    Waiters are served in priority order, then first come, first served.
+    A waiter may go ahead of an earlier one only if they don't share a limit
+    that's too full for the earlier one.
+    """
+
+    def __init__(
+        self, domain_limits: Optional[Dict[str, ConcurrencyConfig]] = None
+    ) -> None:
+        self.domain_limits: Dict[str, ConcurrencyConfig] = dict(domain_limits or {})
+        self._limits: Dict[str, _Limit] = {}
+        self._waiters: Dict[Priority, Deque[_Waiter]] = {
+            priority: deque() for priority in Priority
+        }
+
+    async def acquire(
+        self,
+        domain: str,
+        name: str,
+        program_limit: Optional[ConcurrencyConfig] = None,
+        priority: Optional[Priority] = None,
+    ) -> SchedulerSlot:
+        """Wait for a slot to run a program.
+
+        Raises ProgramBusyError if queue_timeout expires first.
+        """
+        slots = await self.acquire_all(domain, [(name, program_limit)], priority)
+        return slots[0]
+
+    async def acquire_all(
+        self,
+        domain: str,
+        programs: Sequence[Tuple[str, Optional[ConcurrencyConfig]]],
+        priority: Optional[Priority] = None,
+    ) -> List[SchedulerSlot]:
+        """Wait for slots to run several programs at once (one per program).
+
+        Slots are granted together, so programs that only work together
+        (e.g., raced asr programs) can't each hold part of a limit while
+        waiting for the rest.
+
+        Raises ProgramBusyError if queue_timeout expires first, and ValueError
+        if the programs can never fit in a limit together.
+        """
+        if priority is None:
+            priority = get_priority()
+
+        slots: List[SchedulerSlot] = []
+        all_limits: List[_Limit] = []
+        timeout: Optional[float] = None
+        domain_limit = self.domain_limits.get(domain)
+        for name, program_limit in programs:
+            limits: List[_Limit] = []
+            for key, config in (
+                (domain, domain_limit),
+                (f"{domain}/{name}", program_limit),
+            ):
+                if config is None:
+                    continue
+
+                limits.append(self._get_limit(key, config))
+                if config.queue_timeout is not None:
+                    timeout = (
+                        config.queue_timeout
+                        if timeout is None
+                        else min(timeout, config.queue_timeout)
+                    )
+
+            slots.append(SchedulerSlot(self, limits, priority))
+            all_limits.extend(limits)
+
+        if not all_limits:
+            return slots
+
+        limit_counts = Counter(limit.key for limit in all_limits)
+        for limit in all_limits:
+            count = limit_counts[limit.key]
+            if not limit.can_ever_run(priority, count):
+                raise ValueError(
+                    f"{count} {priority.name.lower()} program(s) must run at once, "
+                    f"but {limit.key} is limited to fewer"
+                )
+
+        names = ", ".join(name for name, _program_limit in programs)
+        waiter = _Waiter(
+            limits=all_limits,
+            priority=priority,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._waiters[priority].append(waiter)
+        for limit in all_limits:
+            limit.stats.waiting += 1
+
+        self._schedule()
+        if not waiter.future.done():
+            _LOGGER.debug(
+                "Waiting for %s/%s (priority=%s, stats=%s)",
+                domain,
+                names,
+                priority.name,
+                [limit.stats for limit in all_limits],
+            )
+
+        try:
+            await asyncio.wait_for(waiter.future, timeout=timeout)
+        except asyncio.TimeoutError as err:
+            if waiter.future.done() and (not waiter.future.cancelled()):
+                # Granted just as we timed out
+                return slots
+
+            self._remove_waiter(waiter)
+            for limit in all_limits:
+                limit.stats.timeouts += 1
+
+            raise ProgramBusyError(
+                f"No slot for {domain}/{names} after {timeout} second(s)"
+            ) from err
+        except BaseException:
+            if waiter.future.done() and (not waiter.future.cancelled()):
+                # Granted just as we were cancelled
+                for slot in slots:
+                    slot.release()
+            else:
+                self._remove_waiter(waiter)
+
+            raise
+
+        return slots
+
+    def get_stats(self) -> Dict[str, QueueStats]:
+        """Queue statistics for each domain/program with a limit."""
+        return {key: limit.stats for key, limit in self._limits.items()}
+
+    def _get_limit(self, key: str, config: ConcurrencyConfig) -> _Limit:
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = _Limit(key=key, config=config)
+            self._limits[key] = limit
+
+        return limit
+
+    def _schedule(self) -> None:
+        """Grant slots to waiters in priority order."""
+        # Limits that an earlier waiter is waiting on, so later waiters don't
+        # take the slots it needs one at a time.
+        blocked: Set[str] = set()
+        for priority in Priority:
+            waiters = self._waiters[priority]
+            for waiter in list(waiters):
+                if waiter.future.done():
+                    # Timed out or cancelled, removed by acquire_all()
+                    continue
+
+                limit_counts = Counter(limit.key for limit in waiter.limits)
+                full_keys = {
+                    limit.key
+                    for limit in waiter.limits
+                    if (limit.key in blocked)
+                    or (not limit.can_run(priority, limit_counts[limit.key]))
+                }
+                if full_keys:
+                    blocked.update(full_keys)
+                    continue
+
+                waiters.remove(waiter)
+                wait_seconds = time.monotonic() - waiter.start_time
+                for limit in waiter.limits:
+                    stats = limit.stats
+                    stats.waiting -= 1
+                    stats.running += 1
+                    stats.started += 1
+                    if priority == Priority.BATCH:
+                        stats.running_batch += 1
+
+                    stats.wait_seconds += wait_seconds
+                    stats.max_wait_seconds = max(stats.max_wait_seconds, wait_seconds)
+
+                waiter.future.set_result(None)
+
+    def _remove_waiter(self, waiter: _Waiter) -> None:
+        waiters = self._waiters[waiter.priority]
+        if waiter in waiters:
+            waiters.remove(waiter)
+            for limit in waiter.limits:
+                limit.stats.waiting -= 1
+
+    def _release(self, slot: SchedulerSlot) -> None:
+        for limit in slot.limits:
+            limit.stats.running -= 1
+            if slot.priority == Priority.BATCH:
+                limit.stats.running_batch -= 1
+
+        self._schedule()
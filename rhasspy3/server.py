@@ -0,0 +1,431 @@
+"""Supervised servers that keep models loaded between requests."""
+import asyncio
+import io
+import logging
+import os
+import signal
+import time
+import wave
+from asyncio.subprocess import Process
+from dataclasses import asdict, dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .asr import DOMAIN as ASR_DOMAIN
+from .asr import transcribe
+from .audio import (
+    DEFAULT_IN_CHANNELS,
+    DEFAULT_IN_RATE,
+    DEFAULT_IN_WIDTH,
+    DEFAULT_SAMPLES_PER_CHUNK,
+    AudioChunk,
+    AudioStart,
+    AudioStop,
+)
+from .backend import serve_tcp
+from .config import ServerConfig, ServerWarmupConfig
+from .core import Rhasspy
+from .event import async_read_event, async_write_event
+from .program import create_process
+from .tts import DOMAIN as TTS_DOMAIN
+from .tts import synthesize
+from .wake import DOMAIN as WAKE_DOMAIN
+
+MIN_RESTART_SECONDS = 1.0
+MAX_RESTART_SECONDS = 60.0
+
+# Time between checks for the server socket
+_POLL_SECONDS = 0.5
+
+# Time to wait for a server to exit before killing it
+_STOP_SECONDS = 5.0
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class WarmupError(Exception):
+    """Server didn't answer a warm-up request."""
+
+
+class ServerState(str, Enum):
+    STOPPED = "stopped"
+    STARTING = "starting"
+    """Waiting for server socket."""
+
+    WARMING_UP = "warming-up"
+    """Waiting for the answer to the warm-up request."""
+
+    READY = "ready"
+    RESTARTING = "restarting"
+    """Server exited (or didn't warm up) and will be restarted after a delay."""
+
+
+@dataclass
+class ServerStatus:
+    domain: str
+    name: str
+    state: ServerState = ServerState.STOPPED
+    pid: Optional[int] = None
+    restarts: int = 0
+    ready_seconds: Optional[float] = None
+    """Seconds from start until the server was ready."""
+
+    restart_seconds: float = MIN_RESTART_SECONDS
+    """Delay before the next restart (doubles each time, reset when ready)."""
+
+    last_exit_code: Optional[int] = None
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        status_dict = asdict(self)
+        status_dict["state"] = self.state.value
+        return status_dict
+
+
+class ServerSupervisor:
+    """Runs servers, warms them up, and restarts them if they exit."""
+
+    def __init__(self, rhasspy: Rhasspy, servers: Iterable[Tuple[str, str]]) -> None:
+        self.rhasspy = rhasspy
+        self.status: Dict[str, ServerStatus] = {
+            f"{domain}/{name}": ServerStatus(domain=domain, name=name)
+            for domain, name in servers
+        }
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    async def start(self) -> None:
+        """Start supervising all servers."""
+        for key, status in self.status.items():
+            ready_event = asyncio.Event()
+            self._ready[key] = ready_event
+            self._tasks.append(
+                asyncio.create_task(self._supervise(status, ready_event))
+            )
+
+    async def wait_ready(self) -> bool:
+        """Wait until all servers are warmed up or have timed out.
+
+        Returns True if all servers are ready.
+        """
+        results = await asyncio.gather(
+            *(self._wait_server_ready(key) for key in self._ready)
+        )
+        return all(results)
+
+    async def stop(self) -> None:
+        """Stop all servers."""
+        tasks = list(self._tasks)
+        self._tasks.clear()
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _wait_server_ready(self, key: str) -> bool:
+        status = self.status[key]
+        server_config = self._get_config(status)
+        try:
+            await asyncio.wait_for(
+                self._ready[key].wait(), timeout=server_config.ready_timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Server %s is not ready (status=%s)", key, status)
+
+        return False
+
+    async def _supervise(self, status: ServerStatus, ready_event: asyncio.Event):
+        try:
+            await self._run_server(status, ready_event)
+        finally:
+            status.state = ServerState.STOPPED
+
+    async def _run_server(self, status: ServerStatus, ready_event: asyncio.Event):
+        server_config = self._get_config(status)
+        socket_path = self._get_socket_path(status, server_config)
+        status.restart_seconds = MIN_RESTART_SECONDS
+
+        while True:
+            # A crashed server may have left its socket behind
+            socket_path.unlink(missing_ok=True)
+
+            _LOGGER.info("Starting %s %s", status.domain, status.name)
+            start_time = time.monotonic()
+            status.state = ServerState.STARTING
+            proc = await self._start_server(status)
+            status.pid = proc.pid
+
+            tcp_server: Optional[asyncio.AbstractServer] = None
+            try:
+                warmup_task = asyncio.create_task(
+                    self._warm_up(status, server_config, socket_path, start_time)
+                )
+                wait_task = asyncio.create_task(proc.wait())
+                try:
+                    await asyncio.wait(
+                        {warmup_task, wait_task}, return_when=asyncio.FIRST_COMPLETED
+                    )
+
+                    if warmup_task.done() and warmup_task.result():
+                        status.state = ServerState.READY
+                        status.ready_seconds = time.monotonic() - start_time
+                        status.last_error = None
+                        status.restart_seconds = MIN_RESTART_SECONDS
+                        ready_event.set()
+                        _LOGGER.info(
+                            "Server %s %s is ready after %0.2f second(s)",
+                            status.domain,
+                            status.name,
+                            status.ready_seconds,
+                        )
+
+                        if server_config.port is not None:
+                            tcp_server = await self._serve_tcp(
+                                status, server_config, socket_path
+                            )
+
+                        await wait_task
+                    elif warmup_task.done():
+                        # Server is running but unusable, so treat it like a crash
+                        _LOGGER.warning(
+                            "Server %s %s didn't warm up: %s",
+                            status.domain,
+                            status.name,
+                            status.last_error,
+                        )
+                finally:
+                    warmup_task.cancel()
+                    await asyncio.gather(warmup_task, return_exceptions=True)
+            finally:
+                if tcp_server is not None:
+                    tcp_server.close()
+
+                await _stop_process(proc)
+                status.pid = None
+
+            ready_event.clear()
+            status.last_exit_code = proc.returncode
+            if not server_config.restart:
+                _LOGGER.warning(
+                    "Server %s %s exited with code %s",
+                    status.domain,
+                    status.name,
+                    proc.returncode,
+                )
+                break
+
+            status.state = ServerState.RESTARTING
+            status.restarts += 1
+            _LOGGER.warning(
+                "Server %s %s exited with code %s, restarting in %s second(s)",
+                status.domain,
+                status.name,
+                proc.returncode,
+                status.restart_seconds,
+            )
+            await asyncio.sleep(status.restart_seconds)
+            status.restart_seconds = min(
+                MAX_RESTART_SECONDS, status.restart_seconds * 2
+            )
+
+    async def _warm_up(
+        self,
+        status: ServerStatus,
+        server_config: ServerConfig,
+        socket_path: Path,
+        start_time: float,
+    ) -> bool:
+        """Wait for the server socket, then send a warm-up request."""
+        deadline = start_time + server_config.ready_timeout
+        while not socket_path.exists():
+            if time.monotonic() > deadline:
+                status.last_error = f"No socket at {socket_path}"
+                return False
+
+            await asyncio.sleep(_POLL_SECONDS)
+
+        warmup = server_config.warmup or ServerWarmupConfig()
+        program = warmup.program or f"{status.name}.client"
+        if (not warmup.enabled) or (
+            program not in self.rhasspy.config.programs.get(status.domain, {})
+        ):
+            return True
+
+        # Servers may accept connections before their model is loaded, so the
+        # warm-up request is the real readiness check.
+        status.state = ServerState.WARMING_UP
+        while True:
+            try:
+                await asyncio.wait_for(
+                    warm_up(self.rhasspy, status.domain, program, warmup),
+                    timeout=max(0.0, deadline - time.monotonic()),
+                )
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                status.last_error = f"{err.__class__.__name__}: {err}"
+                if time.monotonic() > deadline:
+                    _LOGGER.error(
+                        "Warm-up failed for %s %s: %s",
+                        status.domain,
+                        status.name,
+                        status.last_error,
+                    )
+                    return False
+
+                _LOGGER.debug("Retrying warm-up: %s", status.last_error)
+                await asyncio.sleep(_POLL_SECONDS)
+
+    async def _serve_tcp(
+        self, status: ServerStatus, server_config: ServerConfig, socket_path: Path
+    ) -> Optional[asyncio.AbstractServer]:
+        """Accept remote clients while the server is ready.
+
+        A failed connection then means that this node is down (see
+        rhasspy3.backend).
+        """
+        assert server_config.port is not None
+        try:
+            tcp_server = await serve_tcp(
+                socket_path, server_config.host, server_config.port
+            )
+        except OSError as err:
+            status.last_error = f"{err.__class__.__name__}: {err}"
+            _LOGGER.error(
+                "Can't listen on port %s for %s %s: %s",
+                server_config.port,
+                status.domain,
+                status.name,
+                status.last_error,
+            )
+            return None
+
+        _LOGGER.info(
+            "Server %s %s is listening on %s:%s",
+            status.domain,
+            status.name,
+            server_config.host,
+            server_config.port,
+        )
+        return tcp_server
+
+    async def _start_server(self, status: ServerStatus) -> Process:
+        env = dict(os.environ)
+        env["PATH"] = f'{self.rhasspy.base_dir}/bin:{env["PATH"]}'
+
+        # New session so the whole process group can be stopped
+        return await asyncio.create_subprocess_exec(
+            "server_run.py",
+            "--config",
+            str(self.rhasspy.config_dir),
+            status.domain,
+            status.name,
+            cwd=self.rhasspy.base_dir,
+            env=env,
+            start_new_session=True,
+        )
+
+    def _get_config(self, status: ServerStatus) -> ServerConfig:
+        server_config = self.rhasspy.config.servers.get(status.domain, {}).get(
+            status.name
+        )
+        assert server_config is not None, f"No config for server {status}"
+        return server_config
+
+    def _get_socket_path(
+        self, status: ServerStatus, server_config: ServerConfig
+    ) -> Path:
+        program_dir = self.rhasspy.programs_dir / status.domain / status.name
+        return program_dir / (server_config.socket or f"var/run/{status.name}.socket")
+
+
+async def warm_up(
+    rhasspy: Rhasspy, domain: str, program: str, warmup: ServerWarmupConfig
+) -> None:
+    """Send a request through a server's client program.
+
+    Raises WarmupError if no answer comes back.
+    """
+    silence = bytes(
+        int(warmup.seconds * DEFAULT_IN_RATE) * DEFAULT_IN_WIDTH * DEFAULT_IN_CHANNELS
+    )
+
+    if domain == ASR_DOMAIN:
+        with io.BytesIO() as wav_io:
+            wav_out: wave.Wave_write = wave.open(wav_io, "wb")
+            with wav_out:
+                wav_out.setframerate(DEFAULT_IN_RATE)
+                wav_out.setsampwidth(DEFAULT_IN_WIDTH)
+                wav_out.setnchannels(DEFAULT_IN_CHANNELS)
+                wav_out.writeframes(silence)
+
+            wav_io.seek(0)
+            transcript = await transcribe(rhasspy, program, wav_io)
+
+        if transcript is None:
+            raise WarmupError(f"No transcript from {program}")
+    elif domain == TTS_DOMAIN:
+        with io.BytesIO() as wav_io:
+            await synthesize(rhasspy, program, warmup.text, wav_io)
+            wav_io.seek(0)
+            wav_in: wave.Wave_read = wave.open(wav_io, "rb")
+            with wav_in:
+                if wav_in.getnframes() < 1:
+                    raise WarmupError(f"No audio from {program}")
+    elif domain == WAKE_DOMAIN:
+        async with (await create_process(rhasspy, domain, program)) as wake_proc:
+            assert wake_proc.stdin is not None
+            assert wake_proc.stdout is not None
+
+            chunk_bytes = DEFAULT_SAMPLES_PER_CHUNK * DEFAULT_IN_WIDTH
+            await async_write_event(
+                AudioStart(
+                    DEFAULT_IN_RATE, DEFAULT_IN_WIDTH, DEFAULT_IN_CHANNELS
+                ).event(),
+                wake_proc.stdin,
+            )
+            for offset in range(0, len(silence), chunk_bytes):
+                await async_write_event(
+                    AudioChunk(
+                        DEFAULT_IN_RATE,
+                        DEFAULT_IN_WIDTH,
+                        DEFAULT_IN_CHANNELS,
+                        silence[offset : offset + chunk_bytes],
+                    ).event(),
+                    wake_proc.stdin,
+                )
+
+            await async_write_event(AudioStop().event(), wake_proc.stdin)
+            wake_proc.stdin.close()
+
+            # Nothing is expected to be detected
+            while (await async_read_event(wake_proc.stdout)) is not None:
+                pass
+
+            if (await wake_proc.wait()) != 0:
+                raise WarmupError(f"{program} exited with code {wake_proc.returncode}")
+
+
+async def _stop_process(proc: Process) -> None:
+    """Stop a server and anything it started."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        # Already exited
+        pass
+
+    if proc.returncode is None:
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=_STOP_SECONDS)
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Killing server process %s", proc.pid)
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+            await proc.wait()
@@ -0,0 +1,192 @@
+"""Audio payloads passed through shared memory instead of pipes.
+
+The producer of a stream writes audio into a ring buffer and its events only
+carry a reference (see SHM_KEY). Readers in rhasspy3.event copy the audio
+back out, so programs that use them get the same events either way.
+"""
+import logging
+import struct
+from collections import OrderedDict
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from .event import Event, EventWriter
+
+SHM_KEY = "shm"
+"""Key in event data with the shared memory name, offset, and length."""
+
+DEFAULT_BUFFER_BYTES = 1024 * 1024
+
+# Total bytes read so far (written by the reader)
+_HEADER = struct.Struct("<Q")
+_HEADER_BYTES = 64
+
+# Buffers opened for reading, closed when they are least recently used
+_MAX_OPEN_BUFFERS = 16
+_OPEN_BUFFERS: "OrderedDict[str, SharedMemory]" = OrderedDict()
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SharedAudioBuffer:
+    """Ring buffer for the audio of one stream (single reader).
+
+    Audio is only written when the reader has made room for it, so unread
+    audio is never overwritten. Otherwise, the payload stays in the event.
+    """
+
+    def __init__(self, size: int = DEFAULT_BUFFER_BYTES) -> None:
+        self.size = size
+        self._shm = SharedMemory(create=True, size=_HEADER_BYTES + size)
+        _HEADER.pack_into(self._shm.buf, 0, 0)
+        self._written = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def unread_bytes(self) -> int:
+        """Bytes of audio the reader hasn't copied out yet."""
+        (read_bytes,) = _HEADER.unpack_from(self._shm.buf, 0)
+        return self._written - read_bytes
+
+    def encode(self, event: "Event") -> "Event":
+        """Move audio payload into shared memory if there is room."""
+        from .event import Event  # pylint: disable=import-outside-toplevel
+
+        payload = event.payload
+        if (not payload) or (event.type != "audio-chunk"):
+            return event
+
+        if (self.unread_bytes + len(payload)) > self.size:
+            # Reader is behind (or gone)
+            return event
+
+        offset = self._written
+        _copy_in(self._shm.buf, self.size, offset, payload)
+        self._written += len(payload)
+
+        data = dict(event.data)
+        data[SHM_KEY] = {"name": self.name, "offset": offset, "length": len(payload)}
+        return Event(type=event.type, data=data)
+
+    def close(self) -> None:
+        """Release and remove shared memory."""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def read_shared_payload(shm_info: Dict[str, Any]) -> bytes:
+    """Copy audio out of a producer's ring buffer and make room for more."""
+    name = shm_info["name"]
+    shm = _OPEN_BUFFERS.get(name)
+    if shm is None:
+        shm = _open(name)
+        _OPEN_BUFFERS[name] = shm
+        while len(_OPEN_BUFFERS) > _MAX_OPEN_BUFFERS:
+            _old_name, old_shm = _OPEN_BUFFERS.popitem(last=False)
+            old_shm.close()
+    else:
+        _OPEN_BUFFERS.move_to_end(name)
+
+    offset = shm_info["offset"]
+    length = shm_info["length"]
+    size = shm.size - _HEADER_BYTES
+    start = offset % size
+    end = start + length
+    data = shm.buf[_HEADER_BYTES:]
+    try:
+        if end <= size:
+            payload = bytes(data[start:end])
+        else:
+            payload = bytes(data[start:]) + bytes(data[: end - size])
+    finally:
+        data.release()
+
+    _HEADER.pack_into(shm.buf, 0, offset + length)
+    return payload
+
+
+def _copy_in(buf: memoryview, size: int, offset: int, payload: bytes) -> None:
+    start = _HEADER_BYTES + (offset % size)
+    first_length = min(len(payload), _HEADER_BYTES + size - start)
+    buf[start : start + first_length] = payload[:first_length]
+    if first_length < len(payload):
+        # Wrap around
+        rest_length = len(payload) - first_length
+        buf[_HEADER_BYTES : _HEADER_BYTES + rest_length] = payload[first_length:]
+
+
+def _open(name: str) -> SharedMemory:
+    """Open existing shared memory without taking ownership of it."""
+    try:
+        return SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        # Python < 3.13 always tracks shared memory, and would remove it when
+        # this process exits.
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(
+            shm._name, "shared_memory"  # type: ignore[attr-defined]
+        )
+        return shm
+
+
+class SharedMemoryWriter:
+    """Stream writer that sends audio through a shared memory buffer.
+
+    Used as a program's stdin (see rhasspy3.program.ProcessContextManager), so
+    rhasspy3.event.async_write_event moves the payloads of audio chunks through shared memory (see encode_event).
+    """
+
+    def __init__(self, writer: "EventWriter", buffer: SharedAudioBuffer) -> None:
+        self.writer = writer
+        self.buffer = buffer
+
+    def encode_event(self, event: "Event") -> "Event":
+        return self.buffer.encode(event)
+
+    def write(self, data: bytes) -> None:
+        self.writer.write(data)
+
+    def writelines(self, data) -> None:
+        self.writer.writelines(data)
+
+    async def drain(self) -> None:
+        await self.writer.drain()
+
+    def can_write_eof(self) -> bool:
+        return self.writer.can_write_eof()
+
+    def write_eof(self) -> None:
+        self.writer.write_eof()
+
+    def is_closing(self) -> bool:
+        return self.writer.is_closing()
+
+    def close(self) -> None:
+        self.writer.close()
+
+    async def wait_closed(self) -> None:
+        await self.writer.wait_closed()
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        return self.writer.get_extra_info(name, default)
+
+
+def get_shared_buffer(size: Optional[int]) -> Optional[SharedAudioBuffer]:
+    """Create a buffer, or None if shared memory isn't available."""
+    if size is None:
+        return None
+
+    try:
+        return SharedAudioBuffer(size)
+    except OSError:
+        _LOGGER.exception("Can't create shared memory, sending audio through pipe")
+
+    return None
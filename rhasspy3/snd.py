@@ -3,7 +3,13 @@ import wave
 from dataclasses import dataclass
 from typing import IO, AsyncIterable, Optional, Union
 
-from .audio import AudioChunk, AudioStop, wav_to_chunks
+from .audio import (
+    LIVE_CHUNK_SECONDS,
+    AudioChunk,
+    AudioChunkCoalescer,
+    AudioStop,
+    wav_to_chunks,
+)
 from .config import PipelineProgramConfig
 from .core import Rhasspy
 from .event import Event, Eventable, async_read_event, async_write_event
@@ -31,8 +37,9 @@ async def play(
     rhasspy: Rhasspy,
     program: Union[str, PipelineProgramConfig],
     wav_in: IO[bytes],
-    samples_per_chunk: int,
+    samples_per_chunk: Optional[int] = None,
 ) -> Optional[Played]:
+    """Play a WAV file (sent in FILE_CHUNK_SECONDS chunks by default)."""
     wav_file: wave.Wave_read = wave.open(wav_in, "rb")
     with wav_file:
         async with (await create_process(rhasspy, DOMAIN, program)) as snd_proc:
@@ -72,9 +79,15 @@ async def play_stream(
         assert snd_proc.stdin is not None
         assert snd_proc.stdout is not None
 
+        # Live audio: merge tiny chunks without delaying playback much
+        coalescer = AudioChunkCoalescer(LIVE_CHUNK_SECONDS)
         async for audio_bytes in audio_stream:
             chunk = AudioChunk(rate, width, channels, audio_bytes)
-            await async_write_event(chunk.event(), snd_proc.stdin)
+            for coalesced_chunk in coalescer.process(chunk):
+                await async_write_event(coalesced_chunk.event(), snd_proc.stdin)
+
+        for coalesced_chunk in coalescer.flush():
+            await async_write_event(coalesced_chunk.event(), snd_proc.stdin)
 
         await async_write_event(AudioStop().event(), snd_proc.stdin)
 
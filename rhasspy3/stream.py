@@ -0,0 +1,416 @@
+"""Reading and writing event streams with long-lived tasks."""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import (
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from .audio import AudioChunk
+from .event import Event, EventWriter, async_read_event_from_line, async_write_event
+
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_MAX_LAG_SECONDS = 0.5
+
+# Don't repeat lag warnings more often than this
+_LAG_WARNING_SECONDS = 5.0
+
+_LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
+
+# Readers and iterables are used as their own source, so sources only need to
+# be usable as dict keys (Hashable would reject protocols like AsyncIterable).
+Source = object
+
+
+class StreamMux:
+    """Reads several streams at once with one long-lived task per stream.
+
+    Items are delivered through a single bounded queue as (source, item) in
+    the order they arrived. None is delivered once when a stream ends.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE) -> None:
+        self._queue: "asyncio.Queue[Tuple[Source, Any]]" = asyncio.Queue(
+            maxsize=maxsize
+        )
+        self._tasks: Dict[Source, "asyncio.Task[None]"] = {}
+
+        # Items taken off the queue while stopping another source
+        self._held: Deque[Tuple[Source, Any]] = deque()
+
+        # Sources that will stop after their current read
+        self._stopping: Set[Source] = set()
+
+        # Sources waiting for the start of their next event (safe to cancel)
+        self._waiting: Set[Source] = set()
+
+        # source -> item being put on the (full) queue
+        self._putting: Dict[Source, Any] = {}
+
+        # source -> item read after stop was requested
+        self._stopped_items: Dict[Source, Any] = {}
+
+    def add(self, source: Source, read_next: Callable[[], Awaitable[Any]]) -> None:
+        """Start a reader task that calls read_next until it returns None."""
+        assert source not in self._tasks, f"Source already added: {source}"
+        self._tasks[source] = asyncio.create_task(self._read_loop(source, read_next))
+
+    def add_reader(self, reader: asyncio.StreamReader) -> None:
+        """Read events from a stream. The reader is the source."""
+
+        async def read_next() -> Any:
+            # Nothing is consumed from the reader until a full line is
+            # available, so stop() can cancel while we're waiting for it.
+            self._waiting.add(reader)
+            try:
+                json_line = await reader.readline()
+            finally:
+                self._waiting.discard(reader)
+
+            return await async_read_event_from_line(json_line, reader)
+
+        self.add(reader, read_next)
+
+    def add_iterable(self, items: AsyncIterable[Any]) -> None:
+        """Read items from an async iterable. The iterable is the source."""
+        iterator = items.__aiter__()
+
+        async def read_next() -> Any:
+            try:
+                return await iterator.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        self.add(items, read_next)
+
+    async def get(self) -> Tuple[Source, Any]:
+        """Get the next (source, item). Item is None when source has ended."""
+        if self._held:
+            return self._held.popleft()
+
+        return await self._queue.get()
+
+    async def stop(self, source: Source) -> List[Any]:
+        """Stop reading from source without losing a partially read item.
+
+        Returns items from source that were read but not yet delivered, so the
+        underlying stream can be handed to someone else without losing data.
+        """
+        task = self._tasks.pop(source, None)
+        if task is None:
+            return []
+
+        self._stopping.add(source)
+        leftovers: List[Any] = []
+
+        # Take undelivered items for source off the queue, keeping the rest
+        while not self._queue.empty():
+            item_source, item = self._queue.get_nowait()
+            if item_source == source:
+                leftovers.append(item)
+            else:
+                self._held.append((item_source, item))
+
+        if (source in self._putting) or (source in self._waiting):
+            # Blocked on a full queue or waiting for data, so it's safe to cancel
+            task.cancel()
+
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        self._stopping.discard(source)
+        if source in self._putting:
+            leftovers.append(self._putting.pop(source))
+
+        if source in self._stopped_items:
+            leftovers.append(self._stopped_items.pop(source))
+
+        return [item for item in leftovers if item is not None]
+
+    async def close(self) -> None:
+        """Cancel all reader tasks."""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _read_loop(
+        self, source: Source, read_next: Callable[[], Awaitable[Any]]
+    ) -> None:
+        try:
+            while True:
+                item = await read_next()
+                if source in self._stopping:
+                    self._stopped_items[source] = item
+                    break
+
+                self._putting[source] = item
+                await self._queue.put((source, item))
+                self._putting.pop(source, None)
+
+                if item is None:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            _LOGGER.exception("Unexpected error reading from %s", source)
+            self._putting.pop(source, None)
+            await self._queue.put((source, None))
+
+    async def __aenter__(self) -> "StreamMux":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
+class OverflowPolicy(str, Enum):
+    """What to do with audio when a program can't keep up."""
+
+    BLOCK = "block"
+    """Wait for the program (stalls the caller)."""
+
+    DROP_OLDEST = "drop-oldest"
+    """Drop the oldest buffered audio chunk."""
+
+    DROP_NEWEST = "drop-newest"
+    """Drop the audio chunk being written."""
+
+    DISCONNECT = "disconnect"
+    """Stop writing to the program."""
+
+
+@dataclass
+class WriterStats:
+    events_written: int = 0
+    chunks_dropped: int = 0
+    max_lag_seconds: float = 0.0
+    """Furthest that written audio fell behind real time."""
+
+    audio_seconds: float = 0.0
+    """Seconds of audio written."""
+
+
+class BufferedEventWriter:
+    """Writes events to a program through a bounded buffer.
+
+    A separate task writes buffered events, so a slow program only stalls the
+    caller (e.g., the mic reader) when the policy is to block. Only audio
+    chunks are dropped; other events are always written.
+
+    Lag is measured on the audio's own clock (chunk timestamps, or the audio
+    seen so far without them). Whenever the program has caught up, audio
+    time is lined up with the wall clock. Each chunk should then be written
+    by the time that much audio could have played, and lag is how late it
+    was. Unlike time spent in the buffer, this doesn't count sources that are
+    faster than real time (e.g., files) as lag, and dropping audio lets the
+    program catch up.
+    """
+
+    def __init__(
+        self,
+        writer: EventWriter,
+        name: str = "",
+        max_events: int = DEFAULT_QUEUE_SIZE,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        max_lag_seconds: float = DEFAULT_MAX_LAG_SECONDS,
+    ) -> None:
+        self.writer = writer
+        self.name = name
+        self.max_events = max_events
+        self.policy = policy
+        self.max_lag_seconds = max_lag_seconds
+        self.stats = WriterStats()
+        self.disconnected = False
+
+        # (event, audio chunk if event is one, wall time to write chunk by)
+        self._buffer: Deque[
+            Tuple[Event, Optional[AudioChunk], Optional[float]]
+        ] = deque()
+
+        # (wall time, audio time) when the program was last caught up
+        self._clock_anchor: Optional[Tuple[float, float]] = None
+
+        # Audio seconds seen, for chunks without timestamps
+        self._audio_seconds_in = 0.0
+        self._has_events = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._is_empty = asyncio.Event()
+        self._is_empty.set()
+        self._last_warning_time: Optional[float] = None
+        self._task = asyncio.create_task(self._write_loop())
+
+    async def write(self, event: Event) -> bool:
+        """Buffer an event. Returns False if the program is disconnected."""
+        if self.disconnected:
+            return False
+
+        chunk: Optional[AudioChunk] = None
+        deadline: Optional[float] = None
+        if AudioChunk.is_type(event.type):
+            chunk = AudioChunk.from_event(event)
+            deadline = self._deadline(chunk)
+
+        if (chunk is not None) and (len(self._buffer) >= self.max_events):
+            if self.policy == OverflowPolicy.BLOCK:
+                while (len(self._buffer) >= self.max_events) and (
+                    not self.disconnected
+                ):
+                    self._has_space.clear()
+                    await self._has_space.wait()
+            elif self.policy == OverflowPolicy.DROP_OLDEST:
+                for i, (_buffered_event, buffered_chunk, _deadline) in enumerate(
+                    self._buffer
+                ):
+                    if buffered_chunk is not None:
+                        del self._buffer[i]
+                        self._dropped()
+                        break
+                else:
+                    # Only control events are buffered, so this chunk is oldest
+                    self._dropped()
+                    return True
+            elif self.policy == OverflowPolicy.DROP_NEWEST:
+                self._dropped()
+                return True
+            elif self.policy == OverflowPolicy.DISCONNECT:
+                _LOGGER.warning("%s can't keep up, disconnecting", self.name)
+                await self.close()
+                return False
+
+        if self.disconnected:
+            return False
+
+        self._buffer.append((event, chunk, deadline))
+        self._has_events.set()
+        self._is_empty.clear()
+        return True
+
+    async def flush(self) -> None:
+        """Wait until all buffered events have been written."""
+        if not self.disconnected:
+            await self._is_empty.wait()
+
+    async def close(self) -> None:
+        """Stop writing without waiting for buffered events."""
+        self.disconnected = True
+        self._has_space.set()
+        self._is_empty.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                while not self._buffer:
+                    self._is_empty.set()
+                    self._has_events.clear()
+                    await self._has_events.wait()
+
+                event, chunk, deadline = self._buffer.popleft()
+                self._has_space.set()
+
+                await async_write_event(event, self.writer)
+                self._written(chunk, deadline)
+        except asyncio.CancelledError:
+            raise
+        except (BrokenPipeError, ConnectionResetError):
+            _LOGGER.warning("%s stopped reading events", self.name)
+        except Exception:
+            _LOGGER.exception("Unexpected error writing events to %s", self.name)
+
+        self.disconnected = True
+        self._has_space.set()
+        self._is_empty.set()
+
+    def _deadline(self, chunk: AudioChunk) -> float:
+        """Wall time by which chunk should be written to keep up."""
+        now = time.monotonic()
+        if chunk.timestamp is not None:
+            audio_time = chunk.timestamp / 1_000
+        else:
+            audio_time = self._audio_seconds_in
+
+        self._audio_seconds_in += chunk.seconds
+
+        if (
+            (self._clock_anchor is None)
+            or self._is_empty.is_set()
+            or (audio_time < self._clock_anchor[1])
+        ):
+            # Caught up (or audio restarted), so nothing buffered is late
+            self._clock_anchor = (now, audio_time)
+
+        anchor_time, anchor_audio_time = self._clock_anchor
+        return anchor_time + (audio_time - anchor_audio_time) + chunk.seconds
+
+    def _written(self, chunk: Optional[AudioChunk], deadline: Optional[float]) -> None:
+        self.stats.events_written += 1
+        if (chunk is None) or (deadline is None):
+            return
+
+        self.stats.audio_seconds += chunk.seconds
+        lag_seconds = max(0.0, time.monotonic() - deadline)
+        self.stats.max_lag_seconds = max(self.stats.max_lag_seconds, lag_seconds)
+
+        if lag_seconds > self.max_lag_seconds:
+            self._warn(
+                "%s is %0.2f second(s) behind real time (stats=%s)",
+                self.name,
+                lag_seconds,
+                self.stats,
+            )
+
+    def _dropped(self) -> None:
+        self.stats.chunks_dropped += 1
+        self._warn("%s can't keep up, dropping audio (stats=%s)", self.name, self.stats)
+
+    def _warn(self, message: str, *args) -> None:
+        now = time.monotonic()
+        if (self._last_warning_time is None) or (
+            (now - self._last_warning_time) >= _LAG_WARNING_SECONDS
+        ):
+            _LOGGER.warning(message, *args)
+            self._last_warning_time = now
+
+    async def __aenter__(self) -> "BufferedEventWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
+def run(main: Coroutine[Any, Any, _T]) -> _T:
+    """Run main coroutine, using uvloop for the event loop if it's installed."""
+    try:
+        # pylint: disable=import-outside-toplevel
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+    return asyncio.run(main)
@@ -2,14 +2,17 @@
 import asyncio
 import logging
 import time
-from dataclasses import dataclass
-from typing import Iterable, Optional, Union
+from collections import deque
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, List, Optional, Sequence, Union
 
 from .audio import AudioChunk, AudioStop
 from .config import PipelineProgramConfig
 from .core import Rhasspy
-from .event import Event, Eventable, async_read_event, async_write_event
-from .program import create_process
+from .event import Event, Eventable, EventWriter
+from .program import create_event_writer, create_process
+from .stream import BufferedEventWriter, StreamMux
 
 DOMAIN = "vad"
 _STARTED_TYPE = "voice-started"
@@ -164,91 +167,157 @@ class Segmenter:
                     self._silence_seconds_left = self.silence_seconds
 
 
+@dataclass
+class SpeechGate:
+    """Holds back audio until a voice command has started.
+
+    Used on satellites to avoid streaming silence to the base station. Audio
+    from just before speech started is kept and released with the speech.
+    """
+
+    buffer_seconds: float
+    """Seconds of audio to keep from before speech started."""
+
+    started: bool = False
+    """True if user has started speaking (audio is passed through)."""
+
+    stopped: bool = False
+    """True if user has stopped speaking (audio is dropped)."""
+
+    _buffer: Deque[AudioChunk] = field(default_factory=deque)
+    """Audio from before speech started."""
+
+    _buffered_seconds: float = 0.0
+    """Seconds of audio in buffer."""
+
+    _timestamp: int = 0
+    """Milliseconds of audio seen so far."""
+
+    def process_chunk(self, chunk: AudioChunk) -> List[AudioChunk]:
+        """Process a single chunk of audio. Returns chunks to send on."""
+        if chunk.timestamp is None:
+            # Keep timing of audio, even if silence isn't sent
+            chunk.timestamp = self._timestamp
+
+        self._timestamp += chunk.milliseconds
+
+        if self.stopped:
+            return []
+
+        if self.started:
+            return [chunk]
+
+        self._buffer.append(chunk)
+        self._buffered_seconds += chunk.seconds
+        while (
+            self._buffer
+            and (self._buffered_seconds - self._buffer[0].seconds)
+            >= self.buffer_seconds
+        ):
+            self._buffered_seconds -= self._buffer.popleft().seconds
+
+        return []
+
+    def start(self) -> List[AudioChunk]:
+        """Speech has started. Returns buffered chunks to send on."""
+        self.started = True
+        return self._take_buffer()
+
+    def stop(self) -> List[AudioChunk]:
+        """Speech has stopped. Returns buffered chunks to send on."""
+        self.stopped = True
+        return self._take_buffer()
+
+    def _take_buffer(self) -> List[AudioChunk]:
+        chunks = list(self._buffer)
+        self._buffer.clear()
+        self._buffered_seconds = 0.0
+        return chunks
+
+
 async def segment(
     rhasspy: Rhasspy,
     program: Union[str, PipelineProgramConfig],
     mic_in: asyncio.StreamReader,
-    asr_out: asyncio.StreamWriter,
+    asr_out: Union[EventWriter, Sequence[EventWriter]],
     chunk_buffer: Optional[Iterable[Event]] = None,
 ):
-    """Segments an audio input stream, passing audio chunks to asr."""
+    """Segments an audio input stream, passing audio chunks to asr.
+
+    Audio is read once and written to every asr_out (e.g., raced asr programs).
+    """
+    if not isinstance(asr_out, Sequence):
+        asr_out = [asr_out]
+
     async with (await create_process(rhasspy, DOMAIN, program)) as vad_proc:
         assert vad_proc.stdin is not None
         assert vad_proc.stdout is not None
 
-        if chunk_buffer:
-            # Buffered chunks from wake word detection
-            for buffered_event in chunk_buffer:
-                await asyncio.gather(
-                    async_write_event(buffered_event, vad_proc.stdin),
-                    async_write_event(buffered_event, asr_out),
-                )
-
-        mic_task = asyncio.create_task(async_read_event(mic_in))
-        vad_task = asyncio.create_task(async_read_event(vad_proc.stdout))
-        pending = {mic_task, vad_task}
-
-        timestamp = 0
-        in_command = False
-        is_first_chunk = True
-
-        while True:
-            done, pending = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED
-            )
-            if mic_task in done:
-                mic_event = mic_task.result()
-                if mic_event is None:
+        # ASR must get all of the audio, so it's never dropped
+        asr_writers = [
+            BufferedEventWriter(asr_writer, name="asr") for asr_writer in asr_out
+        ]
+        vad_writer = create_event_writer(rhasspy, DOMAIN, program, vad_proc.stdin)
+
+        async def write_asr(asr_event: Event) -> None:
+            for asr_writer in asr_writers:
+                await asr_writer.write(asr_event)
+
+        async with AsyncExitStack() as stack:
+            mux = await stack.enter_async_context(StreamMux())
+            for writer in (*asr_writers, vad_writer):
+                await stack.enter_async_context(writer)
+
+            if chunk_buffer:
+                # Buffered chunks from wake word detection
+                for buffered_event in chunk_buffer:
+                    await vad_writer.write(buffered_event)
+                    await write_asr(buffered_event)
+
+            mux.add_reader(mic_in)
+            mux.add_reader(vad_proc.stdout)
+
+            timestamp = 0
+            in_command = False
+            is_first_chunk = True
+
+            while True:
+                source, event = await mux.get()
+                if event is None:
                     break
 
-                # Process chunk
-                if AudioChunk.is_type(mic_event.type):
-                    if is_first_chunk:
-                        is_first_chunk = False
-                        _LOGGER.debug("segment: processing audio")
-
-                    chunk = AudioChunk.from_event(mic_event)
-                    timestamp = (
-                        chunk.timestamp
-                        if chunk.timestamp is not None
-                        else time.monotonic_ns()
-                    )
-
-                    if in_command:
-                        # Speech recognition and silence detection
-                        await asyncio.gather(
-                            async_write_event(mic_event, asr_out),
-                            async_write_event(mic_event, vad_proc.stdin),
+                if source is mic_in:
+                    # Process chunk
+                    if AudioChunk.is_type(event.type):
+                        if is_first_chunk:
+                            is_first_chunk = False
+                            _LOGGER.debug("segment: processing audio")
+
+                        chunk = AudioChunk.from_event(event)
+                        timestamp = (
+                            chunk.timestamp
+                            if chunk.timestamp is not None
+                            else time.monotonic_ns()
                         )
-                    else:
-                        # Voice detection
-                        await asyncio.gather(
-                            async_write_event(mic_event, asr_out),
-                            async_write_event(mic_event, vad_proc.stdin),
-                        )
-
-                # Next chunk
-                mic_task = asyncio.create_task(async_read_event(mic_in))
-                pending.add(mic_task)
 
-            if vad_task in done:
-                vad_event = vad_task.result()
-                if vad_event is None:
-                    break
-
-                if VoiceStarted.is_type(vad_event.type):
+                        # Speech recognition and silence detection
+                        await write_asr(event)
+                        if not await vad_writer.write(event):
+                            # End voice command early
+                            _LOGGER.error("segment: vad program disconnected")
+                            await write_asr(AudioStop(timestamp=timestamp).event())
+                            break
+                elif VoiceStarted.is_type(event.type):
                     if not in_command:
                         # Start of voice command
                         in_command = True
                         _LOGGER.debug("segment: speaking started")
-                elif VoiceStopped.is_type(vad_event.type):
+                elif VoiceStopped.is_type(event.type):
                     # End of voice command
                     _LOGGER.debug("segment: speaking ended")
-                    await async_write_event(
-                        AudioStop(timestamp=timestamp).event(), asr_out
-                    )
+                    await write_asr(AudioStop(timestamp=timestamp).event())
                     break
 
-                # Next VAD event
-                vad_task = asyncio.create_task(async_read_event(vad_proc.stdout))
-                pending.add(vad_task)
+            # Make sure asr has everything before its transcript is read
+            for asr_writer in asr_writers:
+                await asr_writer.flush()
@@ -7,8 +7,9 @@ from typing import AsyncIterable, MutableSequence, Optional, Union
 from .audio import AudioChunk, AudioStart, AudioStop
 from .config import PipelineProgramConfig
 from .core import Rhasspy
-from .event import Event, Eventable, async_read_event, async_write_event
-from .program import create_process
+from .event import Event, Eventable, async_write_event
+from .program import create_event_writer, create_process
+from .stream import StreamMux
 
 DOMAIN = "wake"
 _DETECTION_TYPE = "detection"
@@ -72,51 +73,42 @@ async def detect(
         assert wake_proc.stdin is not None
         assert wake_proc.stdout is not None
 
-        mic_task = asyncio.create_task(async_read_event(mic_in))
-        wake_task = asyncio.create_task(async_read_event(wake_proc.stdout))
-        pending = {mic_task, wake_task}
-        is_first_chunk = True
-
-        while True:
-            done, pending = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED
-            )
-            if mic_task in done:
-                mic_event = mic_task.result()
-                if mic_event is None:
-                    break
-
-                if AudioChunk.is_type(mic_event.type):
-                    if is_first_chunk:
-                        is_first_chunk = False
-                        _LOGGER.debug("detect: processing audio")
-
-                    await async_write_event(mic_event, wake_proc.stdin)
-                    if chunk_buffer is not None:
-                        # Buffer chunks for asr
-                        chunk_buffer.append(mic_event)
+        wake_writer = create_event_writer(rhasspy, DOMAIN, program, wake_proc.stdin)
+        async with StreamMux() as mux, wake_writer:
+            mux.add_reader(mic_in)
+            mux.add_reader(wake_proc.stdout)
+            is_first_chunk = True
 
-                if detection is None:
-                    # Next chunk
-                    mic_task = asyncio.create_task(async_read_event(mic_in))
-                    pending.add(mic_task)
+            while True:
+                source, event = await mux.get()
+                if event is None:
+                    break
 
-            if detection is not None:
-                # Ensure last mic task is finished
-                break
+                if source is mic_in:
+                    if AudioChunk.is_type(event.type):
+                        if is_first_chunk:
+                            is_first_chunk = False
+                            _LOGGER.debug("detect: processing audio")
+
+                        if not await wake_writer.write(event):
+                            _LOGGER.error("detect: wake program disconnected")
+                            break
+
+                        if chunk_buffer is not None:
+                            # Buffer chunks for asr
+                            chunk_buffer.append(event)
+                elif Detection.is_type(event.type):
+                    detection = Detection.from_event(event)
+
+                    # Stop reading mic without losing audio that was in flight
+                    for mic_event in await mux.stop(mic_in):
+                        if (chunk_buffer is not None) and AudioChunk.is_type(
+                            mic_event.type
+                        ):
+                            chunk_buffer.append(mic_event)
 
-            if wake_task in done:
-                wake_event = wake_task.result()
-                if wake_event is None:
                     break
 
-                if Detection.is_type(wake_event.type):
-                    detection = Detection.from_event(wake_event)
-                else:
-                    # Next wake event
-                    wake_task = asyncio.create_task(async_read_event(wake_proc.stdout))
-                    pending.add(wake_task)
-
     _LOGGER.debug("detect: %s", detection)
 
     return detection
@@ -141,36 +133,29 @@ async def detect_stream(
             wake_proc.stdin,
         )
 
-        async def next_chunk():
-            """Get the next chunk from audio stream."""
-            async for chunk_bytes in audio_stream:
-                return chunk_bytes
-
-        audio_task = asyncio.create_task(next_chunk())
-        wake_task = asyncio.create_task(async_read_event(wake_proc.stdout))
-        pending = {audio_task, wake_task}
-
-        while True:
-            done, pending = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED
-            )
-            if audio_task in done:
-                chunk_bytes = audio_task.result()
-                if chunk_bytes:
-                    chunk = AudioChunk(rate, width, channels, chunk_bytes)
-                    await async_write_event(chunk.event(), wake_proc.stdin)
-                    timestamp += chunk.milliseconds
-
-                    audio_task = asyncio.create_task(next_chunk())
-                    pending.add(audio_task)
-                else:
-                    wake_task.cancel()
-                    await async_write_event(AudioStop().event(), wake_proc.stdin)
-                    wake_task = asyncio.create_task(async_read_event(wake_proc.stdout))
-                    pending = {wake_task}
-
-            if wake_task in done:
-                wake_event = wake_task.result()
+        async with StreamMux() as mux:
+            mux.add_iterable(audio_stream)
+            mux.add_reader(wake_proc.stdout)
+            audio_stopped = False
+
+            while True:
+                source, item = await mux.get()
+                if source is audio_stream:
+                    if audio_stopped:
+                        continue
+
+                    if item:
+                        chunk = AudioChunk(rate, width, channels, item)
+                        await async_write_event(chunk.event(), wake_proc.stdin)
+                        timestamp += chunk.milliseconds
+                    else:
+                        # End of audio stream
+                        await async_write_event(AudioStop().event(), wake_proc.stdin)
+                        audio_stopped = True
+
+                    continue
+
+                wake_event = item
                 if wake_event is None:
                     break
 
@@ -182,9 +167,6 @@ async def detect_stream(
                 if NotDetected.is_type(wake_event.type):
                     break
 
-                wake_task = asyncio.create_task(async_read_event(wake_proc.stdout))
-                pending.add(wake_task)
-
         _LOGGER.debug("Not detected")
 
     return None
@@ -1,19 +1,25 @@
 import argparse
-import asyncio
 import logging
-import os
-import subprocess
-import threading
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 from uuid import uuid4
 
 import hypercorn
 import quart_cors
-from quart import Quart, Response, jsonify, render_template, send_from_directory
+from quart import (
+    Quart,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    send_from_directory,
+    websocket,
+)
 
-from rhasspy3.audio import DEFAULT_SAMPLES_PER_CHUNK
 from rhasspy3.core import Rhasspy
+from rhasspy3.scheduler import ProgramBusyError, parse_priority, set_priority
+from rhasspy3.server import ServerSupervisor
+from rhasspy3.stream import run
 
 from .asr import add_asr
 from .handle import add_handle
@@ -52,9 +58,17 @@ def main():
         "--port", type=int, default=13331, help="Port of HTTP server (default: 13331)"
     )
     parser.add_argument(
-        "--samples-per-chunk", type=int, default=DEFAULT_SAMPLES_PER_CHUNK
+        "--samples-per-chunk",
+        type=int,
+        help="Samples per audio chunk when sending WAV files (default: 1 second)",
     )
     parser.add_argument("--asr-chunks-to-buffer", type=int, default=0)
+    parser.add_argument(
+        "--batch-concurrency",
+        type=int,
+        default=4,
+        help="Default number of concurrent asr programs for batch transcription",
+    )
     parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
     args = parser.parse_args()
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
@@ -88,6 +102,21 @@ def main():
     add_tts(app, rhasspy, pipeline, args)
     add_pipeline(app, rhasspy, pipeline, args)
 
+    @app.before_request
+    async def set_request_priority() -> Optional[Tuple[str, int]]:
+        """Programs started by a request with ?priority=batch can wait."""
+        return _set_priority(request.args.get("priority"))
+
+    @app.before_websocket
+    async def set_websocket_priority() -> Optional[Tuple[str, int]]:
+        return _set_priority(websocket.args.get("priority"))
+
+    @app.errorhandler(ProgramBusyError)
+    async def handle_busy(err) -> Tuple[str, int]:
+        """Too many requests are waiting for a program."""
+        _LOGGER.warning(err)
+        return (f"{err.__class__.__name__}: {err}", 503)
+
     @app.errorhandler(Exception)
     async def handle_error(err) -> Tuple[str, int]:
         """Return error as text."""
@@ -123,6 +152,43 @@ def main():
     async def http_config() -> Response:
         return jsonify(rhasspy.config)
 
+    @app.route("/scheduler/stats", methods=["GET"])
+    async def http_scheduler_stats() -> Response:
+        """Queue statistics for programs with a concurrency limit."""
+        return jsonify(
+            {
+                key: stats.to_dict()
+                for key, stats in rhasspy.scheduler.get_stats().items()
+            }
+        )
+
+    supervisor = ServerSupervisor(rhasspy, args.server or [])
+
+    @app.before_serving
+    async def start_servers() -> None:
+        """Don't take requests until servers are warmed up."""
+        await supervisor.start()
+        await supervisor.wait_ready()
+
+    @app.after_serving
+    async def stop_servers() -> None:
+        await supervisor.stop()
+
+    @app.route("/servers/status", methods=["GET"])
+    async def http_servers_status() -> Response:
+        return jsonify(
+            {key: status.to_dict() for key, status in supervisor.status.items()}
+        )
+
+    @app.route("/backends/status", methods=["GET"])
+    async def http_backends_status() -> Response:
+        return jsonify(
+            {
+                key: {label: status.to_dict() for label, status in endpoints.items()}
+                for key, endpoints in rhasspy.backends.get_status().items()
+            }
+        )
+
     @app.route("/version", methods=["POST"])
     async def http_version() -> str:
         return "3.0.0"
@@ -130,42 +196,23 @@ def main():
     hyp_config = hypercorn.config.Config()
     hyp_config.bind = [f"{args.host}:{args.port}"]
 
-    if args.server:
-        run_servers(rhasspy, args.server)
-
     try:
-        asyncio.run(hypercorn.asyncio.serve(app, hyp_config))
+        run(hypercorn.asyncio.serve(app, hyp_config))
     except KeyboardInterrupt:
         pass
 
 
-# -----------------------------------------------------------------------------
+def _set_priority(priority_arg: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Set priority from a query argument. Returns an error for unknown names."""
+    if priority_arg is None:
+        return None
 
+    priority = parse_priority(priority_arg)
+    if priority is None:
+        return (f"Unknown priority: {priority_arg}", 400)
 
-def run_servers(rhasspy, servers):
-    def run_server(domain: str, name: str):
-        try:
-            command = [
-                "server_run.py",
-                "--config",
-                str(rhasspy.config_dir),
-                domain,
-                name,
-            ]
-            env = dict(os.environ)
-            env["PATH"] = f'{rhasspy.base_dir}/bin:{env["PATH"]}'
-            _LOGGER.debug(command)
-            _LOGGER.info("Starting %s %s", domain, name)
-            subprocess.run(command, check=True, cwd=rhasspy.base_dir, env=env)
-        except Exception:
-            _LOGGER.exception(
-                "Unexpected error running server: domain=%s, name=%s", domain, name
-            )
-
-    for domain, server_name in servers:
-        threading.Thread(
-            target=run_server, args=(domain, server_name), daemon=True
-        ).start()
+    set_priority(priority)
+    return None
 
 
 # -----------------------------------------------------------------------------
@@ -2,10 +2,11 @@ import argparse
 import io
 import json
 import logging
+from typing import Tuple, Union
 
 from quart import Quart, Response, jsonify, render_template, request, websocket
 
-from rhasspy3.asr import transcribe, transcribe_stream
+from rhasspy3.asr import BatchStats, transcribe, transcribe_batch, transcribe_stream
 from rhasspy3.audio import (
     DEFAULT_IN_CHANNELS,
     DEFAULT_IN_RATE,
@@ -15,6 +16,7 @@ from rhasspy3.audio import (
 from rhasspy3.config import PipelineConfig
 from rhasspy3.core import Rhasspy
 from rhasspy3.event import Event
+from rhasspy3.scheduler import parse_priority
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -39,8 +41,8 @@ def add_asr(
         asr_program = request.args.get("asr_program") or asr_pipeline.asr
         assert asr_program, "Missing program for asr"
 
-        samples_per_chunk = int(
-            request.args.get("samples_per_chunk", args.samples_per_chunk)
+        samples_per_chunk = request.args.get(
+            "samples_per_chunk", args.samples_per_chunk, type=int
         )
 
         _LOGGER.debug("transcribe: asr=%s, wav=%s byte(s)", asr_program, len(wav_bytes))
@@ -53,6 +55,66 @@ def add_asr(
         _LOGGER.debug("transcribe: transcript='%s'", transcript)
         return jsonify(transcript.event().to_dict() if transcript is not None else {})
 
+    @app.route("/asr/transcribe-batch", methods=["POST"])
+    async def http_asr_transcribe_batch() -> Union[Response, Tuple[str, int]]:
+        """Transcribe WAV files from a multipart form.
+
+        Returns newline-delimited JSON with one line per file as it completes,
+        followed by a line with throughput statistics.
+        """
+        files = await request.files
+        wavs = [
+            (wav_file.filename or name, wav_file.read())
+            for name, wav_file in files.items(multi=True)
+        ]
+
+        asr_pipeline = (
+            rhasspy.config.pipelines[request.args["pipeline"]]
+            if "pipeline" in request.args
+            else pipeline
+        )
+
+        asr_program = request.args.get("asr_program") or asr_pipeline.asr
+        assert asr_program, "Missing program for asr"
+
+        samples_per_chunk = request.args.get(
+            "samples_per_chunk", args.samples_per_chunk, type=int
+        )
+        concurrency_arg = request.args.get("concurrency", str(args.batch_concurrency))
+        if (not concurrency_arg.isdigit()) or (int(concurrency_arg) < 1):
+            return (f"concurrency must be at least 1, got {concurrency_arg}", 400)
+
+        concurrency = int(concurrency_arg)
+        priority_arg = request.args.get("priority", "batch")
+        priority = parse_priority(priority_arg)
+        if priority is None:
+            return (f"Unknown priority: {priority_arg}", 400)
+
+        _LOGGER.debug(
+            "transcribe-batch: asr=%s, wavs=%s, concurrency=%s",
+            asr_program,
+            len(wavs),
+            concurrency,
+        )
+
+        async def results():
+            stats = BatchStats()
+            async for result in transcribe_batch(
+                rhasspy,
+                asr_program,
+                wavs,
+                samples_per_chunk,
+                concurrency=concurrency,
+                priority=priority,
+            ):
+                stats.add(result)
+                yield (json.dumps(result.to_dict(), ensure_ascii=False) + "\n").encode()
+
+            _LOGGER.debug("transcribe-batch: %s", stats)
+            yield (json.dumps({"stats": stats.to_dict()}) + "\n").encode()
+
+        return Response(results(), mimetype="application/x-ndjson")
+
     @app.websocket("/asr/transcribe")
     async def ws_asr_transcribe():
         """Transcribe a websocket audio stream."""
@@ -6,10 +6,10 @@ from typing import Optional, Union
 from quart import Quart, Response, jsonify, request
 
 from rhasspy3.asr import Transcript
-from rhasspy3.config import PipelineConfig
+from rhasspy3.config import PipelineConfig, PipelineProgramConfig
 from rhasspy3.core import Rhasspy
 from rhasspy3.event import Event
-from rhasspy3.handle import handle
+from rhasspy3.handle import handle, handle_group
 from rhasspy3.intent import Intent, NotRecognized
 
 _LOGGER = logging.getLogger(__name__)
@@ -48,11 +48,24 @@ def add_handle(
 
         assert handle_input is not None, "Invalid input"
 
-        handle_program = request.args.get("handle_program") or handle_pipeline.handle
-        assert handle_program is not None, "Missing program for handle"
-        _LOGGER.debug("handle: handle=%s, input='%s'", handle_program, handle_input)
+        handle_program: Optional[Union[str, PipelineProgramConfig]] = request.args.get(
+            "handle_program"
+        )
+        if (not handle_program) and (handle_pipeline.handle_group is not None):
+            _LOGGER.debug(
+                "handle: group=%s, input='%s'",
+                list(handle_pipeline.handle_group.programs),
+                handle_input,
+            )
+            result = await handle_group(
+                rhasspy, handle_pipeline.handle_group, handle_input
+            )
+        else:
+            handle_program = handle_program or handle_pipeline.handle
+            assert handle_program is not None, "Missing program for handle"
+            _LOGGER.debug("handle: handle=%s, input='%s'", handle_program, handle_input)
+            result = await handle(rhasspy, handle_program, handle_input)
 
-        result = await handle(rhasspy, handle_program, handle_input)
         _LOGGER.debug("handle: result=%s", result)
 
         return jsonify(result.event().to_dict() if result is not None else {})
@@ -30,7 +30,18 @@ def add_intent(
         assert intent_program, "Missing program for intent"
         _LOGGER.debug("recognize: intent=%s, text='%s'", intent_program, text)
 
-        result = await recognize(rhasspy, intent_program, text)
+        use_cache = request.args.get("cache", "true").lower() != "false"
+        result = await recognize(rhasspy, intent_program, text, use_cache=use_cache)
         _LOGGER.debug("recognize: result=%s", result)
 
         return jsonify(result.event().to_dict() if result is not None else {})
+
+    @app.route("/intent/cache", methods=["GET"])
+    async def http_intent_cache() -> Response:
+        """Hit rate and size of intent cache."""
+        return jsonify(
+            {
+                "size": len(rhasspy.intent_cache),
+                **rhasspy.intent_cache.stats.to_dict(),
+            }
+        )
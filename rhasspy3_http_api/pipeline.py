@@ -1,6 +1,7 @@
 import argparse
 import asyncio
 import io
+import json
 import logging
 from enum import Enum
 from typing import IO, Optional, Union
@@ -21,6 +22,7 @@ from rhasspy3.audio import (
     AudioStart,
     AudioStop,
 )
+from rhasspy3.codec import CODEC_PCM, get_decoder, get_encoder, negotiate_codec
 from rhasspy3.config import PipelineConfig
 from rhasspy3.core import Rhasspy
 from rhasspy3.event import Event, async_read_event, async_write_event
@@ -29,6 +31,7 @@ from rhasspy3.intent import Intent, NotRecognized
 from rhasspy3.pipeline import StopAfterDomain
 from rhasspy3.pipeline import run as run_pipeline
 from rhasspy3.program import create_process
+from rhasspy3.stream import StreamMux
 from rhasspy3.tts import synthesize_stream
 from rhasspy3.vad import DOMAIN as VAD_DOMAIN
 from rhasspy3.vad import VoiceStarted, VoiceStopped
@@ -71,8 +74,8 @@ def add_pipeline(
         start_after = request.args.get("start_after")
         stop_after = request.args.get("stop_after")
         #
-        samples_per_chunk = int(
-            request.args.get("samples_per_chunk", args.samples_per_chunk)
+        samples_per_chunk = request.args.get(
+            "samples_per_chunk", args.samples_per_chunk, type=int
         )
         asr_chunks_to_buffer = int(
             request.args.get("asr_chunks_to_buffer", args.asr_chunks_to_buffer)
@@ -154,7 +157,7 @@ def add_pipeline(
 
         pipeline_result = await run_pipeline(
             rhasspy,
-            pipeline,
+            running_pipeline,
             samples_per_chunk,
             asr_chunks_to_buffer=asr_chunks_to_buffer,
             mic_program=mic_program,
@@ -199,6 +202,8 @@ def add_pipeline(
         in_rate = int(websocket.args.get("in_rate", DEFAULT_IN_RATE))
         in_width = int(websocket.args.get("in_width", DEFAULT_IN_WIDTH))
         in_channels = int(websocket.args.get("in_channels", DEFAULT_IN_CHANNELS))
+        in_codec = websocket.args.get("in_codec", CODEC_PCM)
+        decoder = get_decoder(in_codec, in_rate, in_width, in_channels)
 
         out_rate = int(websocket.args.get("out_rate", DEFAULT_OUT_RATE))
         out_width = int(websocket.args.get("out_width", DEFAULT_OUT_WIDTH))
@@ -215,32 +220,48 @@ def add_pipeline(
             assert vad_proc.stdin is not None
             assert vad_proc.stdout is not None
 
-            mic_task = asyncio.create_task(websocket.receive())
-            vad_task = asyncio.create_task(async_read_event(vad_proc.stdout))
-            pending = {mic_task, vad_task}
-
-            while True:
-                done, pending = await asyncio.wait(
-                    pending, return_when=asyncio.FIRST_COMPLETED
-                )
-
-                if mic_task in done:
-                    audio_bytes = mic_task.result()
-                    if isinstance(audio_bytes, bytes) and audio_bytes:
-                        mic_chunk = AudioChunk(
-                            in_rate, in_width, in_channels, audio_bytes
-                        )
-                        mic_chunk_event = mic_chunk.event()
-                        await asyncio.gather(
-                            async_write_event(mic_chunk_event, asr_proc.stdin),
-                            async_write_event(mic_chunk_event, vad_proc.stdin),
-                        )
-
-                    mic_task = asyncio.create_task(websocket.receive())
-                    pending.add(mic_task)
-
-                if vad_task in done:
-                    vad_event = vad_task.result()
+            async with StreamMux() as mux:
+                mux.add("websocket", websocket.receive)
+                mux.add_reader(vad_proc.stdout)
+
+                while True:
+                    source, item = await mux.get()
+                    if source == "websocket":
+                        if isinstance(item, str):
+                            client_event = _parse_event(item)
+                            if client_event is None:
+                                continue
+
+                            if AudioStop.is_type(client_event.type):
+                                # Client detected the end of speech itself
+                                _LOGGER.debug("stream-to-stream: audio stopped")
+                                break
+
+                            if AudioStart.is_type(client_event.type):
+                                # Client may declare its audio format and codec
+                                in_start = AudioStart.from_event(client_event)
+                                in_rate = in_start.rate
+                                in_width = in_start.width
+                                in_channels = in_start.channels
+                                in_codec = in_start.codec or CODEC_PCM
+                                decoder = get_decoder(
+                                    in_codec, in_rate, in_width, in_channels
+                                )
+                                _LOGGER.debug("stream-to-stream: codec=%s", in_codec)
+                        elif isinstance(item, bytes) and item:
+                            mic_audio = decoder.decode(item)
+                            mic_chunk = AudioChunk(
+                                in_rate, in_width, in_channels, mic_audio
+                            )
+                            mic_chunk_event = mic_chunk.event()
+                            await asyncio.gather(
+                                async_write_event(mic_chunk_event, asr_proc.stdin),
+                                async_write_event(mic_chunk_event, vad_proc.stdin),
+                            )
+
+                        continue
+
+                    vad_event = item
                     if vad_event is None:
                         break
 
@@ -253,9 +274,6 @@ def add_pipeline(
                         _LOGGER.debug("stream-to-stream: voice stopped")
                         break
 
-                    vad_task = asyncio.create_task(async_read_event(vad_proc.stdout))
-                    pending.add(vad_task)
-
             # Get transcript from asr
             await async_write_event(AudioStop().event(), asr_proc.stdin)
             transcript: Optional[Transcript] = None
@@ -281,17 +299,53 @@ def add_pipeline(
                 # Forward to websocket
                 await websocket.send_json(handle_result.event().to_dict())
 
-                _LOGGER.debug("stream-to-stream: sending tts")
+                # Reply with the same codec as the client unless asked otherwise
+                out_codec = negotiate_codec(
+                    [websocket.args.get("out_codec", in_codec)],
+                    out_rate,
+                    out_width,
+                    out_channels,
+                )
+                encoder = get_encoder(out_codec, out_rate, out_width, out_channels)
+
+                _LOGGER.debug("stream-to-stream: sending tts (codec=%s)", out_codec)
                 await websocket.send_json(
-                    AudioStart(out_rate, out_width, out_channels).event().to_dict()
+                    AudioStart(
+                        out_rate,
+                        out_width,
+                        out_channels,
+                        codec=out_codec if out_codec != CODEC_PCM else None,
+                    )
+                    .event()
+                    .to_dict()
                 )
                 converter = AudioChunkConverter(out_rate, out_width, out_channels)
                 async for tts_chunk in synthesize_stream(
                     rhasspy, tts_program, handle_result.text
                 ):
                     tts_chunk = converter.convert(tts_chunk)
-                    await websocket.send(tts_chunk.audio)
+                    tts_data = encoder.encode(tts_chunk.audio)
+                    if tts_data:
+                        await websocket.send(tts_data)
+
+                tail_chunk = converter.flush()
+                if tail_chunk is not None:
+                    tts_data = encoder.encode(tail_chunk.audio)
+                    if tts_data:
+                        await websocket.send(tts_data)
+
+                tts_data = encoder.flush()
+                if tts_data:
+                    await websocket.send(tts_data)
 
                 _LOGGER.debug("stream-to-stream: tts done")
 
             await websocket.send_json(AudioStop().event().to_dict())
+
+
+def _parse_event(text: str) -> Optional[Event]:
+    """Parse an event sent as a websocket text message."""
+    try:
+        return Event.from_dict(json.loads(text))
+    except (ValueError, KeyError, TypeError):
+        return None
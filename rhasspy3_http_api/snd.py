@@ -34,8 +34,8 @@ def add_snd(
         snd_program = request.args.get("snd_program") or snd_pipeline.snd
         assert snd_program, "Missing program for snd"
 
-        samples_per_chunk = int(
-            request.args.get("samples_per_chunk", args.samples_per_chunk)
+        samples_per_chunk = request.args.get(
+            "samples_per_chunk", args.samples_per_chunk, type=int
         )
 
         _LOGGER.debug("play: snd=%s, wav=%s byte(s)", snd_program, len(wav_bytes))
@@ -1,13 +1,24 @@
 import argparse
 import io
 import logging
+from typing import AsyncIterable, Optional, Union
 
-from quart import Quart, Response, jsonify, render_template, request
+from quart import Quart, Response, jsonify, render_template, request, websocket
 
-from rhasspy3.config import PipelineConfig
+from rhasspy3.audio import (
+    DEFAULT_OUT_CHANNELS,
+    DEFAULT_OUT_RATE,
+    DEFAULT_OUT_WIDTH,
+    AudioChunk,
+    AudioChunkConverter,
+    AudioStart,
+    AudioStop,
+    WavHeader,
+)
+from rhasspy3.config import PipelineConfig, PipelineProgramConfig
 from rhasspy3.core import Rhasspy
 from rhasspy3.snd import play
-from rhasspy3.tts import synthesize
+from rhasspy3.tts import synthesize, synthesize_stream
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -36,6 +47,15 @@ def add_tts(
         assert tts_program, "No tts program"
         _LOGGER.debug("synthesize: tts=%s, text='%s'", tts_program, text)
 
+        if request.args.get("stream", "").lower() in ("1", "true"):
+            return await _stream_response(
+                rhasspy,
+                tts_program,
+                text,
+                audio_format=request.args.get("format", "wav"),
+                converter=_get_converter(request.args),
+            )
+
         with io.BytesIO() as wav_out:
             await synthesize(rhasspy, tts_program, text, wav_out)
             wav_bytes = wav_out.getvalue()
@@ -58,8 +78,8 @@ def add_tts(
         )
         tts_program = request.args.get("tts_program") or tts_pipeline.tts
         snd_program = request.args.get("snd_program") or tts_pipeline.snd
-        samples_per_chunk = int(
-            request.args.get("samples_per_chunk", args.samples_per_chunk)
+        samples_per_chunk = request.args.get(
+            "samples_per_chunk", args.samples_per_chunk, type=int
         )
 
         assert tts_program, "No tts program"
@@ -77,3 +97,135 @@ def add_tts(
             played = await play(rhasspy, snd_program, wav_out, samples_per_chunk)
 
         return jsonify(played.event().to_dict() if played is not None else {})
+
+    @app.websocket("/tts/synthesize")
+    async def ws_tts_synthesize() -> None:
+        """Synthesize text messages to a websocket audio stream."""
+        tts_pipeline = (
+            rhasspy.config.pipelines[websocket.args["pipeline"]]
+            if "pipeline" in websocket.args
+            else pipeline
+        )
+        tts_program = websocket.args.get("tts_program") or tts_pipeline.tts
+        assert tts_program, "No tts program"
+
+        while True:
+            text = await websocket.receive()
+            if not text:
+                # Empty message signals stop
+                break
+
+            if isinstance(text, bytes):
+                text = text.decode()
+
+            _LOGGER.debug("synthesize: tts=%s, text='%s'", tts_program, text)
+
+            converter = _get_converter(websocket.args)
+            is_first_chunk = True
+            timestamp = 0
+            async for chunk in synthesize_stream(rhasspy, tts_program, text):
+                chunk = converter.convert(chunk)
+                if is_first_chunk:
+                    await websocket.send_json(
+                        AudioStart(chunk.rate, chunk.width, chunk.channels, timestamp=0)
+                        .event()
+                        .to_dict()
+                    )
+                    is_first_chunk = False
+
+                await websocket.send(chunk.audio)
+                timestamp += chunk.milliseconds
+
+            if is_first_chunk:
+                # No audio, but clients still expect start before stop
+                _LOGGER.warning("No audio from tts program: %s", tts_program)
+                await websocket.send_json(
+                    AudioStart(
+                        converter.rate or DEFAULT_OUT_RATE,
+                        converter.width or DEFAULT_OUT_WIDTH,
+                        converter.channels or DEFAULT_OUT_CHANNELS,
+                        timestamp=0,
+                    )
+                    .event()
+                    .to_dict()
+                )
+
+            tail_chunk = converter.flush()
+            if tail_chunk is not None:
+                await websocket.send(tail_chunk.audio)
+                timestamp += tail_chunk.milliseconds
+
+            await websocket.send_json(AudioStop(timestamp=timestamp).event().to_dict())
+
+
+def _get_converter(request_args) -> AudioChunkConverter:
+    """Optional output format from rate, width, and channels arguments."""
+    rate = request_args.get("rate")
+    width = request_args.get("width")
+    channels = request_args.get("channels")
+
+    return AudioChunkConverter(
+        rate=int(rate) if rate else None,
+        width=int(width) if width else None,
+        channels=int(channels) if channels else None,
+    )
+
+
+async def _stream_response(
+    rhasspy: Rhasspy,
+    tts_program: Union[str, PipelineProgramConfig],
+    text: str,
+    audio_format: str,
+    converter: AudioChunkConverter,
+) -> Response:
+    """Stream synthesized audio as it's produced using chunked encoding.
+
+    The audio format comes from the first chunk, so headers are sent as soon
+    as synthesis starts producing audio.
+    """
+    assert audio_format in ("wav", "raw"), f"Unsupported format: {audio_format}"
+
+    chunks = synthesize_stream(rhasspy, tts_program, text).__aiter__()
+    first_chunk: Optional[AudioChunk] = None
+    try:
+        first_chunk = converter.convert(await chunks.__anext__())
+    except StopAsyncIteration:
+        pass
+
+    if first_chunk is None:
+        raise RuntimeError(f"No audio from tts program: {tts_program}")
+
+    async def audio_stream(first_chunk: AudioChunk) -> AsyncIterable[bytes]:
+        num_bytes = 0
+        if audio_format == "wav":
+            yield WavHeader(
+                first_chunk.rate, first_chunk.width, first_chunk.channels
+            ).to_bytes()
+
+        yield first_chunk.audio
+        num_bytes += len(first_chunk.audio)
+
+        async for chunk in chunks:
+            chunk = converter.convert(chunk)
+            yield chunk.audio
+            num_bytes += len(chunk.audio)
+
+        tail_chunk = converter.flush()
+        if tail_chunk is not None:
+            yield tail_chunk.audio
+            num_bytes += len(tail_chunk.audio)
+
+        _LOGGER.debug("synthesize: streamed %s byte(s)", num_bytes)
+
+    if audio_format == "wav":
+        return Response(audio_stream(first_chunk), mimetype="audio/wav")
+
+    return Response(
+        audio_stream(first_chunk),
+        mimetype="application/octet-stream",
+        headers={
+            "X-Audio-Rate": str(first_chunk.rate),
+            "X-Audio-Width": str(first_chunk.width),
+            "X-Audio-Channels": str(first_chunk.channels),
+        },
+    )
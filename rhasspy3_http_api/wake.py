@@ -10,6 +10,7 @@ from rhasspy3.audio import (
     DEFAULT_IN_CHANNELS,
     DEFAULT_IN_RATE,
     DEFAULT_IN_WIDTH,
+    DEFAULT_SAMPLES_PER_CHUNK,
     AudioStop,
 )
 from rhasspy3.config import PipelineConfig
@@ -39,8 +40,11 @@ def add_wake(
 
         if wav_bytes:
             # Detect from WAV
-            samples_per_chunk = int(
-                request.args.get("samples_per_chunk", args.samples_per_chunk)
+            # Small chunks so detection can stop early
+            samples_per_chunk = request.args.get(
+                "samples_per_chunk",
+                args.samples_per_chunk or DEFAULT_SAMPLES_PER_CHUNK,
+                type=int,
             )
 
             _LOGGER.debug(
@@ -0,0 +1,34 @@
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pytest
+
+from rhasspy3.config import Config
+from rhasspy3.core import Rhasspy
+
+
+@pytest.fixture
+def sine() -> Callable[..., np.ndarray]:
+    """Factory for 16-bit sine waves: sine(rate, seconds, hz=440.0)."""
+
+    def make_sine(rate: int, seconds: float, hz: float = 440.0) -> np.ndarray:
+        times = np.arange(int(rate * seconds)) / rate
+        return (np.sin(2 * np.pi * hz * times) * 10000).astype(np.int16)
+
+    return make_sine
+
+
+@pytest.fixture
+def make_rhasspy(tmp_path: Path) -> Callable[[Dict[str, Any]], Rhasspy]:
+    """Factory for Rhasspy from a configuration dict (tmp_path is the base)."""
+
+    def make(config_dict: Dict[str, Any]) -> Rhasspy:
+        return Rhasspy(
+            config=Config.from_dict(config_dict),
+            config_dir=tmp_path,
+            base_dir=tmp_path,
+            config_dict=config_dict,
+        )
+
+    return make
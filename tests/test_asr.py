@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import io
+import json
+import shlex
+import sys
+import wave
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytest
+
+from rhasspy3.asr import (
+    AsrProcess,
+    AsrRacePolicy,
+    BatchStats,
+    BatchTranscript,
+    Transcript,
+    race_transcripts,
+    transcribe,
+    transcribe_batch,
+    transcribe_stream,
+    write_to_asr_processes,
+)
+from rhasspy3.config import AsrRaceConfig, PipelineConfig, PipelineProgramConfig
+from rhasspy3.event import Event, write_event
+
+# asr program that answers with the number of audio bytes it received
+_COUNT_AUDIO = """
+import json, sys
+audio_bytes = 0
+while True:
+    line = sys.stdin.buffer.readline()
+    if not line:
+        break
+    event = json.loads(line)
+    payload = sys.stdin.buffer.read(event.get("payload_length") or 0)
+    if event["type"] == "audio-chunk":
+        audio_bytes += len(payload)
+    elif event["type"] == "audio-stop":
+        print(json.dumps({"type": "transcript", "data": {"text": str(audio_bytes)}}))
+        break
+"""
+
+# vad program that says voice stopped after the first audio chunk
+_STOP_AFTER_CHUNK = """
+import json, sys
+while True:
+    event = json.loads(sys.stdin.buffer.readline())
+    sys.stdin.buffer.read(event.get("payload_length") or 0)
+    if event["type"] == "audio-chunk":
+        print(json.dumps({"type": "voice-stopped", "data": {}}), flush=True)
+        break
+"""
+
+_BATCH_CONFIG: Dict[str, Any] = {
+    "programs": {
+        "asr": {"count": {"command": shlex.join([sys.executable, "-c", _COUNT_AUDIO])}}
+    }
+}
+
+
+def _asr_stdout(text: Optional[str], delay: float) -> asyncio.StreamReader:
+    """Stream with a transcript that arrives after a delay."""
+    reader = asyncio.StreamReader()
+
+    def feed() -> None:
+        if text is not None:
+            with io.BytesIO() as event_io:
+                write_event(Transcript(text=text).event(), event_io)
+                reader.feed_data(event_io.getvalue())
+
+        reader.feed_eof()
+
+    asyncio.get_running_loop().call_later(delay, feed)
+    return reader
+
+
+def test_race_accepts_fast_transcript():
+    async def run_race():
+        accepted = []
+
+        async def accept(transcript: Transcript) -> bool:
+            accepted.append(transcript.text)
+            return transcript.text == "turn on the light"
+
+        return (
+            await race_transcripts(
+                _asr_stdout("turn on the lite", 10),
+                [
+                    _asr_stdout("turn of the light", 0.01),
+                    _asr_stdout("turn on the light", 0.02),
+                ],
+                deadline_seconds=10,
+                accept=accept,
+            ),
+            accepted,
+        )
+
+    transcript, accepted = asyncio.run(run_race())
+    assert transcript == Transcript(text="turn on the light")
+    assert accepted == ["turn of the light", "turn on the light"]
+
+
+def test_race_waits_for_main_transcript():
+    async def run_race():
+        async def accept(transcript: Transcript) -> bool:
+            return False
+
+        return await race_transcripts(
+            _asr_stdout("main", 0.05),
+            [_asr_stdout("fast", 0.01)],
+            deadline_seconds=10,
+            accept=accept,
+        )
+
+    assert asyncio.run(run_race()) == Transcript(text="main")
+
+
+def test_fallback_after_deadline():
+    async def run_race():
+        return await race_transcripts(
+            _asr_stdout("main", 10),
+            [_asr_stdout("fast", 0.01)],
+            policy=AsrRacePolicy.FALLBACK,
+            deadline_seconds=0.05,
+        )
+
+    assert asyncio.run(run_race()) == Transcript(text="fast")
+
+
+def test_fallback_when_main_has_nothing():
+    async def run_race():
+        return await race_transcripts(
+            _asr_stdout("", 0.01),
+            [_asr_stdout(None, 0.01), _asr_stdout("fast", 0.05)],
+            policy=AsrRacePolicy.FALLBACK,
+            deadline_seconds=None,
+        )
+
+    assert asyncio.run(run_race()) == Transcript(text="fast")
+
+
+def _wav_bytes(num_samples: int) -> bytes:
+    with io.BytesIO() as wav_io:
+        wav_file: wave.Wave_write = wave.open(wav_io, "wb")
+        with wav_file:
+            wav_file.setframerate(16000)
+            wav_file.setsampwidth(2)
+            wav_file.setnchannels(1)
+            wav_file.writeframes(bytes(num_samples * 2))
+
+        return wav_io.getvalue()
+
+
+def test_race_with_domain_limit(make_rhasspy):
+    rhasspy = make_rhasspy(
+        {
+            "programs": {
+                "asr": {
+                    "count": _BATCH_CONFIG["programs"]["asr"]["count"],
+                    "fast": _BATCH_CONFIG["programs"]["asr"]["count"],
+                }
+            },
+            "concurrency": {"asr": {"max_running": 2}},
+        }
+    )
+    race = AsrRaceConfig(
+        programs={"fast": PipelineProgramConfig(name="fast")}, policy="fallback"
+    )
+
+    async def transcribe_wav() -> Optional[Transcript]:
+        with io.BytesIO(_wav_bytes(1600)) as wav_io:
+            return await transcribe(rhasspy, "count", wav_io, race=race)
+
+    async def transcribe_both() -> List[Optional[Transcript]]:
+        return await asyncio.wait_for(
+            asyncio.gather(transcribe_wav(), transcribe_wav()), timeout=10
+        )
+
+    # Each would hold one slot and wait forever for the other if slots for
+    # the main and raced programs weren't acquired together.
+    assert asyncio.run(transcribe_both()) == [Transcript(text="3200")] * 2
+    assert rhasspy.scheduler.get_stats()["asr"].running == 0
+
+
+class _BrokenWriter:
+    """Stdin of a program that has exited."""
+
+    def __init__(self) -> None:
+        self.data = bytes()
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    def writelines(self, data: Iterable[bytes]) -> None:
+        for line in data:
+            self.write(line)
+
+    async def drain(self) -> None:
+        raise BrokenPipeError()
+
+
+class _Writer(_BrokenWriter):
+    async def drain(self) -> None:
+        pass
+
+
+def test_write_drops_failed_raced_program():
+    main_writer = _Writer()
+
+    async def write_events() -> None:
+        main_proc = AsrProcess("main", main_writer, asyncio.StreamReader())
+        fast_proc = AsrProcess("fast", _BrokenWriter(), asyncio.StreamReader())
+        asr_procs = [main_proc, fast_proc]
+
+        await write_to_asr_processes(Event("test"), asr_procs)
+        assert asr_procs == [main_proc]
+
+        # Main program still fails
+        with pytest.raises(BrokenPipeError):
+            await write_to_asr_processes(Event("test"), [fast_proc, main_proc])
+
+    asyncio.run(write_events())
+    assert main_writer.data
+
+
+def test_race_with_dead_program(make_rhasspy):
+    rhasspy = make_rhasspy(
+        {
+            "programs": {
+                "asr": {
+                    "count": _BATCH_CONFIG["programs"]["asr"]["count"],
+                    "dead": {"command": shlex.join([sys.executable, "-c", "pass"])},
+                }
+            }
+        }
+    )
+    race = AsrRaceConfig(programs={"dead": PipelineProgramConfig(name="dead")})
+
+    async def run_transcribe() -> Optional[Transcript]:
+        with io.BytesIO(_wav_bytes(16000 * 10)) as wav_io:
+            return await transcribe(rhasspy, "count", wav_io, race=race)
+
+    assert asyncio.run(run_transcribe()) == Transcript(text=str(16000 * 10 * 2))
+
+
+def test_transcribe_stream_flushes_audio(make_rhasspy):
+    rhasspy = make_rhasspy(
+        {
+            "programs": {
+                "asr": _BATCH_CONFIG["programs"]["asr"],
+                "vad": {
+                    "stop": {
+                        "command": shlex.join([sys.executable, "-c", _STOP_AFTER_CHUNK])
+                    }
+                },
+            }
+        }
+    )
+
+    async def audio_stream():
+        # One live chunk (1024 samples) and some left over
+        yield bytes((1024 + 50) * 2)
+        await asyncio.sleep(10)
+
+    async def run_transcribe() -> Optional[Transcript]:
+        return await asyncio.wait_for(
+            transcribe_stream(rhasspy, "count", "stop", audio_stream(), 16000, 2, 1),
+            timeout=10,
+        )
+
+    # Left over audio is sent to asr when voice stops
+    assert asyncio.run(run_transcribe()) == Transcript(text=str((1024 + 50) * 2))
+
+
+def test_race_never_fits_domain_limit(make_rhasspy):
+    rhasspy = make_rhasspy(
+        {**_BATCH_CONFIG, "concurrency": {"asr": {"max_running": 1}}}
+    )
+    race = AsrRaceConfig(programs={"fast": PipelineProgramConfig(name="count")})
+
+    async def run_transcribe():
+        with io.BytesIO(_wav_bytes(1600)) as wav_io:
+            await transcribe(rhasspy, "count", wav_io, race=race)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_transcribe())
+
+
+def test_transcribe_batch(make_rhasspy):
+    rhasspy = make_rhasspy(_BATCH_CONFIG)
+    read_names: List[str] = []
+
+    def get_wavs() -> Iterable[Tuple[str, bytes]]:
+        for i in range(1, 6):
+            read_names.append(f"wav_{i}")
+            yield f"wav_{i}", _wav_bytes(i * 1600)
+
+        yield "not_a_wav", b"not a wav"
+
+    async def run_batch() -> List[BatchTranscript]:
+        return [
+            result
+            async for result in transcribe_batch(
+                rhasspy, "count", get_wavs(), concurrency=2
+            )
+        ]
+
+    results = {result.name: result for result in asyncio.run(run_batch())}
+    assert len(read_names) == 5
+    assert set(results) == set(read_names) | {"not_a_wav"}
+
+    for i in range(1, 6):
+        result = results[f"wav_{i}"]
+        assert result.error is None
+        assert result.transcript == Transcript(text=str(i * 1600 * 2))
+        assert result.audio_seconds == pytest.approx(i * 0.1)
+
+    assert results["not_a_wav"].transcript is None
+    assert results["not_a_wav"].error is not None
+
+    stats = BatchStats()
+    for result in results.values():
+        stats.add(result)
+
+    stats_dict = stats.to_dict()
+    assert stats_dict["count"] == 6
+    assert stats_dict["errors"] == 1
+    assert stats_dict["audio_seconds"] == pytest.approx(1.5)
+    assert stats_dict["files_per_second"] > 0
+    assert stats_dict["real_time_factor"] > 0
+
+
+def test_batch_stats_empty():
+    stats_dict = BatchStats().to_dict()
+    assert stats_dict["count"] == 0
+    assert stats_dict["real_time_factor"] == 0
+
+
+def test_transcribe_batch_route(make_rhasspy):
+    pytest.importorskip("quart")
+
+    # pylint: disable=import-outside-toplevel
+    from quart import Quart
+    from werkzeug.datastructures import FileStorage
+
+    from rhasspy3_http_api.asr import add_asr
+
+    app = Quart(__name__)
+    add_asr(
+        app,
+        make_rhasspy(_BATCH_CONFIG),
+        PipelineConfig(asr=PipelineProgramConfig(name="count")),
+        argparse.Namespace(samples_per_chunk=None, batch_concurrency=2),
+    )
+
+    async def post_wavs(query: str) -> Tuple[int, bytes]:
+        files = {
+            f"wav_{i}": FileStorage(io.BytesIO(_wav_bytes(i * 1600)), f"{i}.wav")
+            for i in range(1, 4)
+        }
+        response = await app.test_client().post(
+            f"/asr/transcribe-batch{query}", files=files
+        )
+        return response.status_code, await response.get_data()
+
+    status, body = asyncio.run(post_wavs(""))
+    assert status == 200
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert {line["name"]: line["text"] for line in lines[:-1]} == {
+        "1.wav": "3200",
+        "2.wav": "6400",
+        "3.wav": "9600",
+    }
+    assert lines[-1]["stats"]["count"] == 3
+
+    for concurrency in ("0", "-1", "many"):
+        status, _body = asyncio.run(post_wavs(f"?concurrency={concurrency}"))
+        assert status == 400
+
+    status, body = asyncio.run(post_wavs("?priority=urgent"))
+    assert status == 400
+    assert b"urgent" in body
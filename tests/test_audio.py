@@ -0,0 +1,221 @@
+import io
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from rhasspy3.audio import (
+    DEFAULT_SAMPLES_PER_CHUNK,
+    AudioChunk,
+    AudioChunkCoalescer,
+    AudioChunkConverter,
+    WavHeader,
+    bytes_to_samples,
+    read_wav_header,
+    samples_to_bytes,
+    wav_to_chunks,
+)
+
+
+def test_convert_width_channels():
+    audio = np.array([[100, 300], [-200, -400]], dtype=np.int16).tobytes()
+    chunk = AudioChunk(16000, 2, 2, audio, timestamp=123)
+
+    mono = AudioChunkConverter(channels=1).convert(chunk)
+    assert (mono.rate, mono.width, mono.channels) == (16000, 2, 1)
+    assert mono.timestamp == 123
+    assert np.frombuffer(mono.audio, dtype=np.int16).tolist() == [200, -300]
+
+    wide = AudioChunkConverter(width=4).convert(chunk)
+    assert np.frombuffer(wide.audio, dtype=np.int32).tolist() == [
+        100 << 16,
+        300 << 16,
+        -200 << 16,
+        -400 << 16,
+    ]
+
+    stereo = AudioChunkConverter(channels=2).convert(mono)
+    assert np.frombuffer(stereo.audio, dtype=np.int16).tolist() == [
+        200,
+        200,
+        -300,
+        -300,
+    ]
+
+
+def test_full_scale_width_4():
+    full_scale = [2**31 - 1, -(2**31)]
+    audio = np.array(full_scale, dtype=np.int32).tobytes()
+    samples = bytes_to_samples(audio, 4, 1)
+    assert np.frombuffer(samples_to_bytes(samples, 4), dtype=np.int32).tolist() == (
+        full_scale
+    )
+
+    # Out of range is clipped instead of wrapping around
+    samples = np.array([[1.0], [-1.0], [2.0]], dtype=np.float32)
+    assert np.frombuffer(samples_to_bytes(samples, 4), dtype=np.int32).tolist() == [
+        2**31 - 1,
+        -(2**31),
+        2**31 - 1,
+    ]
+
+
+def test_resample_stream_matches_batch(sine):
+    in_rate, out_rate = 22050, 16000
+    audio = sine(in_rate, 1.0).tobytes()
+    bytes_per_chunk = 1024 * 2
+
+    converter = AudioChunkConverter(rate=out_rate)
+    streamed = b"".join(
+        converter.convert(
+            AudioChunk(in_rate, 2, 1, audio[i : i + bytes_per_chunk])
+        ).audio
+        for i in range(0, len(audio), bytes_per_chunk)
+    )
+    batch = AudioChunkConverter(rate=out_rate).convert_audio(audio, in_rate, 2, 1)
+
+    # Batch includes the filter tail
+    assert len(batch) == out_rate * 2
+    assert batch[: len(streamed)] == streamed
+
+    # Flushing the stream gets the tail
+    tail = converter.flush()
+    assert tail is not None
+    assert (tail.rate, tail.width, tail.channels) == (out_rate, 2, 1)
+    assert streamed + tail.audio == batch
+    assert converter.flush() is None
+
+    # Resampled sine should be close to an ideal one
+    actual = np.frombuffer(batch, dtype=np.int16).astype(np.float64)
+    expected = sine(out_rate, 1.0).astype(np.float64)
+    error = np.sqrt(np.mean((actual[100:-100] - expected[100:-100]) ** 2))
+    assert error < 5
+
+
+def test_coalesce_merge_and_split():
+    coalescer = AudioChunkCoalescer(seconds=0.1)
+
+    # 10 ms chunks are merged into 100 ms chunks
+    chunks = []
+    for i in range(25):
+        chunks.extend(
+            coalescer.process(AudioChunk(16000, 2, 1, bytes(320), timestamp=i * 10))
+        )
+
+    assert [len(c.audio) for c in chunks] == [3200, 3200]
+    assert [c.timestamp for c in chunks] == [0, 100]
+
+    # 280 ms chunk is split
+    chunks = coalescer.process(AudioChunk(16000, 2, 1, bytes(8960), timestamp=250))
+    assert [len(c.audio) for c in chunks] == [3200, 3200, 3200]
+    assert [c.timestamp for c in chunks] == [200, 300, 400]
+
+    # Remaining 30 ms
+    chunks = coalescer.flush()
+    assert [len(c.audio) for c in chunks] == [960]
+    assert [c.timestamp for c in chunks] == [500]
+    assert coalescer.flush() == []
+
+
+def test_coalesce_format_change():
+    coalescer = AudioChunkCoalescer(seconds=1.0)
+    assert coalescer.process(AudioChunk(16000, 2, 1, bytes(320))) == []
+
+    chunks = coalescer.process(AudioChunk(22050, 2, 1, bytes(320)))
+    assert [(c.rate, len(c.audio)) for c in chunks] == [(16000, 320)]
+
+
+def test_wav_file_chunks():
+    with io.BytesIO() as wav_io:
+        wav_write: wave.Wave_write = wave.open(wav_io, "wb")
+        with wav_write:
+            wav_write.setframerate(16000)
+            wav_write.setsampwidth(2)
+            wav_write.setnchannels(1)
+            wav_write.writeframes(bytes(16000 * 2 * 10))
+
+        # 10 seconds of audio
+        wav_io.seek(0)
+        with wave.open(wav_io, "rb") as wav_file:
+            small_chunks = list(wav_to_chunks(wav_file, DEFAULT_SAMPLES_PER_CHUNK))
+
+        wav_io.seek(0)
+        with wave.open(wav_io, "rb") as wav_file:
+            file_chunks = list(wav_to_chunks(wav_file))
+
+    assert len(small_chunks) == 157
+    assert len(file_chunks) == 10
+    assert sum(len(c.audio) for c in file_chunks) == 16000 * 2 * 10
+
+
+def test_read_wav_header(sine):
+    audio = sine(22050, 0.1).tobytes()
+    with io.BytesIO() as wav_io:
+        wav_out: wave.Wave_write = wave.open(wav_io, "wb")
+        with wav_out:
+            wav_out.setframerate(22050)
+            wav_out.setsampwidth(2)
+            wav_out.setnchannels(1)
+            wav_out.writeframes(audio)
+
+        wav_io.seek(0)
+        header = read_wav_header(wav_io)
+        assert (header.rate, header.width, header.channels) == (22050, 2, 1)
+        assert header.data_size == len(audio)
+        assert wav_io.read() == audio
+
+
+def test_read_streamed_wav_header():
+    # Unknown sizes and an extra chunk before the data, as some servers send
+    wav_bytes = (
+        struct.pack("<4sI4s", b"RIFF", 0xFFFFFFFF, b"WAVE")
+        + struct.pack("<4sIHHIIHH", b"fmt ", 16, 1, 2, 16000, 64000, 4, 16)
+        + struct.pack("<4sI", b"LIST", 3)
+        + b"abc\0"
+        + struct.pack("<4sI", b"data", 0xFFFFFFFF)
+        + b"audio"
+    )
+    with io.BytesIO(wav_bytes) as wav_io:
+        header = read_wav_header(wav_io)
+        assert (header.rate, header.width, header.channels) == (16000, 2, 2)
+        assert header.data_size is None
+        assert wav_io.read() == b"audio"
+
+    with pytest.raises(wave.Error), io.BytesIO(b"not a WAV file") as wav_io:
+        read_wav_header(wav_io)
+
+
+@pytest.mark.parametrize(
+    "riff_size,expected_data_size",
+    [
+        # Placeholder sizes from a server that's streaming
+        (0, None),
+        (0xFFFFFFFF, None),
+        # Real empty WAV
+        (36, 0),
+    ],
+)
+def test_read_wav_header_zero_data_size(riff_size, expected_data_size):
+    wav_bytes = (
+        struct.pack("<4sI4s", b"RIFF", riff_size, b"WAVE")
+        + struct.pack("<4sIHHIIHH", b"fmt ", 16, 1, 1, 16000, 32000, 2, 16)
+        + struct.pack("<4sI", b"data", 0)
+    )
+    with io.BytesIO(wav_bytes) as wav_io:
+        assert read_wav_header(wav_io).data_size == expected_data_size
+
+
+def test_write_wav_header():
+    audio = bytes(range(100))
+    wav_bytes = WavHeader(16000, 2, 1, data_size=len(audio)).to_bytes() + audio
+    with io.BytesIO(wav_bytes) as wav_io:
+        wav_file: wave.Wave_read = wave.open(wav_io, "rb")
+        with wav_file:
+            assert wav_file.getframerate() == 16000
+            assert wav_file.readframes(wav_file.getnframes()) == audio
+
+    # Streamed
+    with io.BytesIO(WavHeader(22050, 2, 2).to_bytes() + audio) as wav_io:
+        assert read_wav_header(wav_io) == WavHeader(22050, 2, 2)
+        assert wav_io.read() == audio
@@ -0,0 +1,149 @@
+import asyncio
+import io
+import socket
+import wave
+from pathlib import Path
+from typing import Any, Dict, List
+
+from rhasspy3.asr import Transcript, transcribe
+from rhasspy3.audio import AudioStop
+from rhasspy3.backend import serve_tcp
+from rhasspy3.event import async_read_event, async_write_event
+from rhasspy3.program import create_process
+
+
+def _asr_handler(name: str):
+    """Stand-in for an asr server that answers with its name."""
+
+    async def handle_connection(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while True:
+            event = await async_read_event(reader)
+            if (event is None) or AudioStop.is_type(event.type):
+                break
+
+        await async_write_event(Transcript(text=name).event(), writer)
+        writer.close()
+
+    return handle_connection
+
+
+async def _asr_node(name: str) -> asyncio.AbstractServer:
+    return await asyncio.start_server(_asr_handler(name), "127.0.0.1", 0)
+
+
+def _port(server: asyncio.AbstractServer) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+def _unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _config(endpoints: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "programs": {
+            "asr": {
+                "remote": {
+                    "backends": {"endpoints": endpoints, "retry_seconds": 60},
+                }
+            }
+        }
+    }
+
+
+def _wav() -> io.BytesIO:
+    wav_io = io.BytesIO()
+    wav_file: wave.Wave_write = wave.open(wav_io, "wb")
+    with wav_file:
+        wav_file.setframerate(16000)
+        wav_file.setsampwidth(2)
+        wav_file.setnchannels(1)
+        wav_file.writeframes(bytes(3200))
+
+    wav_io.seek(0)
+    return wav_io
+
+
+def test_least_outstanding(make_rhasspy):
+    async def run_backends():
+        nodes = [await _asr_node(f"node_{i}") for i in range(3)]
+        rhasspy = make_rhasspy(
+            _config(
+                {
+                    f"node_{i}": f"127.0.0.1:{_port(node)}"
+                    for i, node in enumerate(nodes)
+                }
+            )
+        )
+
+        # Connections that are held open go to different nodes
+        held = [await create_process(rhasspy, "asr", "remote") for _ in range(2)]
+        held_nodes = {proc.proc.endpoint.label for proc in held}  # type: ignore
+        assert len(held_nodes) == 2
+
+        transcript = await transcribe(rhasspy, "remote", _wav())
+        assert transcript is not None
+        assert transcript.text not in held_nodes
+
+        for proc in held:
+            await proc.__aexit__(None, None, None)
+
+        status = rhasspy.backends.get_status()["asr/remote"]
+        assert all(endpoint.outstanding == 0 for endpoint in status.values())
+
+        for node in nodes:
+            node.close()
+
+    asyncio.run(run_backends())
+
+
+def test_failover(make_rhasspy):
+    async def run_backends():
+        node = await _asr_node("node_2")
+        rhasspy = make_rhasspy(
+            _config(
+                {
+                    "node_1": f"127.0.0.1:{_unused_port()}",
+                    "node_2": f"127.0.0.1:{_port(node)}",
+                }
+            )
+        )
+
+        texts: List[str] = []
+        for _ in range(3):
+            transcript = await transcribe(rhasspy, "remote", _wav())
+            assert transcript is not None
+            texts.append(transcript.text)
+
+        node.close()
+        return texts, rhasspy.backends.get_status()["asr/remote"]
+
+    texts, status = asyncio.run(run_backends())
+    assert texts == ["node_2"] * 3
+
+    # Down node isn't tried again until its retry time
+    assert not status["node_1"].healthy
+    assert status["node_1"].failures == 1
+    assert status["node_2"].requests == 3
+
+
+def test_relay_to_unix_socket(tmp_path: Path, make_rhasspy):
+    async def run_relay():
+        socket_path = tmp_path / "asr.socket"
+        unix_server = await asyncio.start_unix_server(
+            _asr_handler("unix"), str(socket_path)
+        )
+        tcp_server = await serve_tcp(socket_path, "127.0.0.1", 0)
+        rhasspy = make_rhasspy(_config({"node": f"127.0.0.1:{_port(tcp_server)}"}))
+
+        transcript = await transcribe(rhasspy, "remote", _wav())
+
+        tcp_server.close()
+        unix_server.close()
+        return transcript
+
+    assert asyncio.run(run_relay()) == Transcript(text="unix")
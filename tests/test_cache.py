@@ -0,0 +1,120 @@
+import asyncio
+import shlex
+import sys
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from rhasspy3.cache import ResultCache
+from rhasspy3.intent import Entity, Intent, normalize_text, recognize
+
+# intent program with the text it was sent as an entity
+_ECHO_INTENT = """
+import json, sys
+text = json.loads(sys.stdin.readline())["data"]["text"]
+intent = {"name": "Echo", "entities": [{"name": "text", "value": text}]}
+print(json.dumps({"type": "intent", "data": intent}), flush=True)
+"""
+
+
+def test_lru_eviction():
+    cache: ResultCache[str] = ResultCache(max_size=2)
+    cache.put("program", 1, "a", "result_a")
+    cache.put("program", 1, "b", "result_b")
+
+    # "a" is now the most recently used
+    assert cache.get("program", 1, "a") == "result_a"
+    cache.put("program", 1, "c", "result_c")
+
+    assert cache.get("program", 1, "b") is None
+    assert cache.get("program", 1, "a") == "result_a"
+    assert cache.get("program", 1, "c") == "result_c"
+    assert cache.stats.evictions == 1
+    assert cache.stats.hits == 3
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 0.75
+
+
+def test_ttl():
+    cache: ResultCache[str] = ResultCache(ttl_seconds=0.01)
+    cache.put("program", 1, "a", "result_a")
+    time.sleep(0.02)
+
+    assert cache.get("program", 1, "a") is None
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_version_change_invalidates():
+    cache: ResultCache[str] = ResultCache()
+    cache.put("program_1", 1, "a", "result_1")
+    cache.put("program_2", 1, "a", "result_2")
+
+    # Config for program_1 changed
+    assert cache.get("program_1", 2, "a") is None
+    assert cache.stats.invalidations == 1
+
+    assert cache.get("program_2", 1, "a") == "result_2"
+
+
+def test_results_copied():
+    cache: ResultCache[Dict[str, str]] = ResultCache()
+    result = {"name": "Bob"}
+    cache.put("program", 1, "a", result)
+    result["name"] = "changed before get"
+
+    cached_result = cache.get("program", 1, "a")
+    assert cached_result == {"name": "Bob"}
+    cached_result["name"] = "changed after get"
+    assert cache.get("program", 1, "a") == {"name": "Bob"}
+
+
+def test_normalize_text():
+    # Case and punctuation may matter to the intent program (e.g., names)
+    assert normalize_text("  Set timer for  Bob. ") == "Set timer for Bob."
+
+    assert normalize_text("  Turn on the  Kitchen lights. ", casefold=True) == (
+        "turn on the kitchen lights"
+    )
+    assert normalize_text("Set a timer for 1.5 minutes!", casefold=True) == (
+        "set a timer for 1.5 minutes"
+    )
+
+
+@pytest.mark.parametrize(
+    "casefold,expected",
+    [
+        (False, ["Set timer for Bob", "set timer for bob", "Set timer for Bob"]),
+        (True, ["Set timer for Bob", "Set timer for Bob", "Set timer for Bob"]),
+    ],
+)
+def test_recognize_cached(make_rhasspy, casefold: bool, expected: List[str]):
+    rhasspy = make_rhasspy(
+        {
+            "programs": {
+                "intent": {
+                    "echo": {
+                        "command": shlex.join([sys.executable, "-c", _ECHO_INTENT])
+                    }
+                }
+            },
+            "intent_cache": {"casefold": casefold},
+        }
+    )
+
+    async def recognize_all() -> List[Any]:
+        results = []
+        for text in ("Set timer for Bob", "set timer for bob", "Set  timer for Bob"):
+            result = await recognize(rhasspy, "echo", text, use_cache=True)
+            assert isinstance(result, Intent)
+            assert len(result.entities) == 1
+            results.append(result.entities[0].value)
+
+            # Doesn't change the cached result
+            result.entities.append(Entity(name="extra"))
+
+        return results
+
+    assert asyncio.run(recognize_all()) == expected
+    assert rhasspy.intent_cache.stats.hits == (2 if casefold else 1)
@@ -0,0 +1,95 @@
+import asyncio
+import io
+import time
+from typing import List
+
+from rhasspy3.audio import AudioChunk, AudioStop
+from rhasspy3.capture import (
+    CaptureReader,
+    CaptureRecord,
+    CaptureWriter,
+    replay,
+    websocket_event,
+    websocket_message,
+)
+from rhasspy3.event import Event, RawEvent
+
+
+class _KeepOpen(io.BytesIO):
+    def close(self) -> None:
+        pass
+
+
+def _capture(close: bool = True) -> _KeepOpen:
+    capture_file = _KeepOpen()
+    capture = CaptureWriter(capture_file)
+    for i in range(5):
+        capture.write_event(
+            "stdin",
+            RawEvent.from_event(AudioChunk(16000, 2, 1, bytes([i]) * 10).event()),
+            time_ns=i * 100_000_000,
+        )
+
+    capture.write_event(
+        "stdout",
+        RawEvent.from_event(Event(type="transcript", data={"text": "test"})),
+        time_ns=500_000_000,
+    )
+
+    if close:
+        capture.close()
+
+    capture_file.seek(0)
+    return capture_file
+
+
+def test_write_read():
+    reader = CaptureReader(_capture())
+    assert reader.is_complete
+    assert reader.streams == ["stdin", "stdout"]
+    assert len(reader) == 6
+
+    records = list(reader)
+    assert [record.stream for record in records] == ["stdin"] * 5 + ["stdout"]
+    assert records[2].seconds == 0.2
+    assert AudioChunk.from_event(records[2].event.event()).audio == bytes([2]) * 10
+    assert records[-1].event.event().data == {"text": "test"}
+
+    # Start from index
+    stdin_records = list(reader.records(start_seconds=0.3, streams=["stdin"]))
+    assert [record.time_ns for record in stdin_records] == [300_000_000, 400_000_000]
+
+
+def test_read_unclosed():
+    reader = CaptureReader(_capture(close=False))
+    assert not reader.is_complete
+    assert len(reader) == 6
+    assert [record.stream for record in reader.records(start_seconds=0.45)] == [
+        "stdout"
+    ]
+
+
+def test_websocket_messages():
+    for message in (b"\x01\x02", '{"type": "audio-stop"}', "not an event"):
+        assert websocket_message(websocket_event(message)) == message
+
+    assert websocket_event('{"type": "audio-stop"}').type == AudioStop().event().type
+
+
+def test_replay_speed():
+    records = [
+        CaptureRecord(time_ns=i * 100_000_000, stream="stdin", event=RawEvent(b"{}\n"))
+        for i in range(3)
+    ]
+
+    async def replay_records(speed: float) -> List[float]:
+        start_time = time.monotonic()
+        return [
+            time.monotonic() - start_time async for _record in replay(records, speed)
+        ]
+
+    times = asyncio.run(replay_records(2.0))
+    assert times[-1] >= 0.1
+
+    times = asyncio.run(replay_records(0))
+    assert times[-1] < 0.1
@@ -0,0 +1,115 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from rhasspy3 import codec
+from rhasspy3.audio import AudioStart
+from rhasspy3.codec import (
+    CODEC_ADPCM,
+    CODEC_ALAW,
+    CODEC_MULAW,
+    CODEC_OPUS,
+    CODEC_PCM,
+    ALawEncoder,
+    MuLawEncoder,
+    get_decoder,
+    get_encoder,
+    negotiate_codec,
+)
+
+
+def _snr(original: np.ndarray, decoded: np.ndarray) -> float:
+    noise = original.astype(np.float64) - decoded.astype(np.float64)
+    return 10 * np.log10(
+        np.sum(original.astype(np.float64) ** 2) / max(1.0, np.sum(noise**2))
+    )
+
+
+@pytest.mark.parametrize(
+    "codec_name,min_ratio,min_snr",
+    [
+        (CODEC_PCM, 1.0, 100.0),
+        (CODEC_MULAW, 2.0, 30.0),
+        (CODEC_ALAW, 2.0, 30.0),
+        (CODEC_ADPCM, 3.9, 15.0),
+    ],
+)
+def test_round_trip(codec_name: str, min_ratio: float, min_snr: float, sine):
+    rate = 16000
+    audio = sine(rate, 1.0)
+    encoder = get_encoder(codec_name, rate, 2, 1)
+    decoder = get_decoder(codec_name, rate, 2, 1)
+
+    # Blocks are decoded independently, as they would be on the wire
+    encoded_size = 0
+    decoded = bytes()
+    for offset in range(0, len(audio), 1024):
+        data = encoder.encode(audio[offset : offset + 1024].tobytes())
+        encoded_size += len(data)
+        decoded += decoder.decode(data)
+
+    decoded += decoder.decode(encoder.flush())
+
+    assert (audio.nbytes / encoded_size) >= min_ratio
+    assert len(decoded) == audio.nbytes
+    assert _snr(audio, np.frombuffer(decoded, dtype=np.int16)) >= min_snr
+
+
+def test_adpcm_odd_blocks(sine):
+    audio = sine(16000, 0.25).tobytes()
+    encoder = get_encoder(CODEC_ADPCM, 16000, 2, 1)
+    decoder = get_decoder(CODEC_ADPCM, 16000, 2, 1)
+
+    # Odd samples are carried over instead of padded with silence
+    decoded = bytes()
+    for offset in range(0, len(audio), 1022):
+        decoded += decoder.decode(encoder.encode(audio[offset : offset + 1022]))
+
+    decoded += decoder.decode(encoder.flush())
+
+    whole_encoder = get_encoder(CODEC_ADPCM, 16000, 2, 1)
+    assert decoded == decoder.decode(whole_encoder.encode(audio))
+
+    # Only the end of the stream is padded
+    encoder = get_encoder(CODEC_ADPCM, 16000, 2, 1)
+    assert encoder.encode(audio[:2]) == bytes()
+    assert len(decoder.decode(encoder.flush())) == 4
+
+
+def test_matches_audioop(sine):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")
+
+    audio = sine(16000, 0.25).tobytes()
+    assert MuLawEncoder().encode(audio) == audioop.lin2ulaw(audio, 2)
+    assert ALawEncoder().encode(audio) == audioop.lin2alaw(audio, 2)
+
+    state = (1234, 20)
+    expected_data, expected_state = audioop.lin2adpcm(audio, 2, state)
+    expected_audio = audioop.adpcm2lin(expected_data, 2, state)[0]
+    assert codec._lin2adpcm(audio, state) == (expected_data, expected_state)
+    assert codec._adpcm2lin(expected_data, state) == expected_audio
+
+
+def test_negotiate():
+    assert negotiate_codec([CODEC_ADPCM, CODEC_PCM], 16000, 2, 1) == CODEC_ADPCM
+
+    # ADPCM is mono only, Opus doesn't support 22050 Hz
+    assert negotiate_codec([CODEC_ADPCM, CODEC_MULAW], 16000, 2, 2) == CODEC_MULAW
+    assert negotiate_codec([CODEC_OPUS], 22050, 2, 1) == CODEC_PCM
+    assert negotiate_codec(["unknown"], 16000, 2, 1) == CODEC_PCM
+
+    with pytest.raises(ValueError):
+        get_encoder(CODEC_MULAW, 16000, 4, 1)
+
+
+def test_audio_start_codec():
+    start = AudioStart(16000, 2, 1, codec=CODEC_MULAW)
+    assert AudioStart.from_event(start.event()) == start
+
+    # Not included for plain PCM
+    event = AudioStart(16000, 2, 1).event()
+    assert "codec" not in event.data
+    assert AudioStart.from_event(event).codec is None
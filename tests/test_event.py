@@ -0,0 +1,84 @@
+import io
+import os
+import threading
+
+from rhasspy3.audio import AudioChunk, AudioStop
+from rhasspy3.event import (
+    Event,
+    forward_events,
+    read_event,
+    read_raw_event,
+    write_event,
+    write_raw_event,
+)
+
+
+def _events():
+    return [
+        AudioChunk(16000, 2, 1, b"\x01" * 100).event(),
+        Event(type="transcript", data={"text": '"payload_length": 5}'}),
+        AudioStop().event(),
+    ]
+
+
+def test_raw_event_round_trip():
+    events_in = io.BytesIO()
+    for event in _events():
+        write_event(event, events_in)
+
+    events_in.seek(0)
+    events_out = io.BytesIO()
+    types = []
+    while True:
+        raw_event = read_raw_event(events_in)
+        if raw_event is None:
+            break
+
+        types.append(raw_event.type)
+        write_raw_event(raw_event, events_out)
+
+    assert types == ["audio-chunk", "transcript", "audio-stop"]
+
+    # Bytes are forwarded unchanged
+    assert events_out.getvalue() == events_in.getvalue()
+
+
+def test_raw_event_other_key_order():
+    events_in = io.BytesIO(b'{"payload_length": 3, "data": {}, "type": "x"}\nabc')
+    raw_event = read_raw_event(events_in)
+    assert raw_event is not None
+    assert raw_event.type == "x"
+    assert raw_event.payload == b"abc"
+    assert raw_event.event() == Event(type="x", data={}, payload=b"abc")
+
+
+def test_forward_events():
+    events_bytes = io.BytesIO()
+    for event in _events():
+        write_event(event, events_bytes)
+
+    in_read, in_write = os.pipe()
+    out_read, out_write = os.pipe()
+
+    forward_thread = threading.Thread(
+        target=forward_events, args=(in_read, out_write), daemon=True
+    )
+    forward_thread.start()
+
+    with open(in_write, "wb") as in_file:
+        in_file.write(events_bytes.getvalue())
+
+    forward_thread.join()
+    os.close(in_read)
+    os.close(out_write)
+
+    with open(out_read, "rb") as out_file:
+        events_out = []
+        while True:
+            event = read_event(out_file)
+            if event is None:
+                break
+
+            events_out.append(event)
+
+    assert events_out == _events()
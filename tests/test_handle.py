@@ -0,0 +1,78 @@
+import asyncio
+import json
+import shlex
+import sys
+import time
+from typing import Optional
+
+from rhasspy3.asr import Transcript
+from rhasspy3.config import HandleGroupConfig, HandleGroupProgramConfig
+from rhasspy3.handle import Handled, NotHandled, handle_group
+
+
+def _handler(event_type: str, text: str, delay: float) -> dict:
+    """Program that answers after a delay."""
+    event_json = json.dumps({"type": event_type, "data": {"text": text}})
+    script = (
+        "import sys, time; sys.stdin.readline(); "
+        f"time.sleep({delay}); print({event_json!r}, flush=True)"
+    )
+    return {"command": shlex.join([sys.executable, "-c", script])}
+
+
+_CONFIG = {
+    "programs": {
+        "handle": {
+            "local_no": _handler("not-handled", "local no", 0),
+            "local_yes": _handler("handled", "local yes", 0),
+            "remote_yes": _handler("handled", "remote yes", 0.3),
+            "remote_slow": _handler("handled", "remote slow", 10),
+        }
+    }
+}
+
+
+def _group(*names: str, timeout_seconds: Optional[float] = None) -> HandleGroupConfig:
+    return HandleGroupConfig(
+        programs={name: HandleGroupProgramConfig(name=name) for name in names},
+        timeout_seconds=timeout_seconds,
+    )
+
+
+def test_first_handled_wins(make_rhasspy):
+    rhasspy = make_rhasspy(_CONFIG)
+    start_time = time.monotonic()
+    result = asyncio.run(
+        handle_group(
+            rhasspy,
+            _group("local_no", "local_yes", "remote_slow"),
+            Transcript(text="what time is it"),
+        )
+    )
+
+    # Lower priority program is stopped instead of waited for
+    assert result == Handled(text="local yes")
+    assert (time.monotonic() - start_time) < 5
+
+
+def test_priority_order(make_rhasspy):
+    rhasspy = make_rhasspy(_CONFIG)
+    result = asyncio.run(
+        handle_group(
+            rhasspy,
+            _group("remote_yes", "local_yes"),
+            Transcript(text="turn on the light"),
+        )
+    )
+    assert result == Handled(text="remote yes")
+
+
+def test_timeout(make_rhasspy):
+    rhasspy = make_rhasspy(_CONFIG)
+    group = _group("remote_slow", "local_no")
+    group.programs["remote_slow"].timeout_seconds = 0.1
+
+    result = asyncio.run(
+        handle_group(rhasspy, group, Transcript(text="turn on the light"))
+    )
+    assert result == NotHandled(text="local no")
@@ -0,0 +1,178 @@
+"""Tests for the Home Assistant handle server (programs/handle/home_assistant)."""
+import importlib
+import json
+import os
+import socket
+import threading
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+import pytest
+
+from rhasspy3.asr import Transcript
+from rhasspy3.event import read_event, write_event
+from rhasspy3.handle import Handled, NotHandled
+
+_PROGRAM_DIR = Path(__file__).parent.parent / "programs" / "handle" / "home_assistant"
+
+
+class _FakeHomeAssistant(ThreadingHTTPServer):
+    """Conversation API that answers with the text it was sent."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _ConversationHandler)
+        self.requests: List[Dict[str, Any]] = []
+        self.client_ports: Set[int] = set()
+        self.status = 200
+        self.close_after_response = False
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/conversation/process"
+
+
+class _ConversationHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _FakeHomeAssistant
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        request_body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.client_ports.add(self.client_address[1])
+        self.server.requests.append(
+            {
+                "path": self.path,
+                "authorization": self.headers["Authorization"],
+                "body": json.loads(request_body),
+            }
+        )
+
+        text = self.server.requests[-1]["body"]["text"]
+        speech = f"You said: {text}" if text else ""
+        response_body = json.dumps(
+            {"response": {"speech": {"plain": {"speech": speech}}}}
+        ).encode("utf-8")
+
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+        # Drop the connection without saying so, like an idle timeout
+        self.close_connection = self.server.close_after_response
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def home_assistant():
+    server = _FakeHomeAssistant()
+    threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    ).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def converse_server(monkeypatch):
+    monkeypatch.syspath_prepend(str(_PROGRAM_DIR / "bin"))
+    return importlib.import_module("converse_server")
+
+
+@pytest.fixture
+def token_file(tmp_path: Path) -> Path:
+    path = tmp_path / "token"
+    path.write_text("first-token\n", encoding="utf-8")
+    return path
+
+
+def test_process(converse_server, home_assistant, token_file: Path):
+    client = converse_server.ConversationClient(
+        home_assistant.url, token_file, language="en"
+    )
+    assert client.process("turn on the lights") == "You said: turn on the lights"
+    assert home_assistant.requests == [
+        {
+            "path": "/api/conversation/process",
+            "authorization": "Bearer first-token",
+            "body": {"text": "turn on the lights", "language": "en"},
+        }
+    ]
+
+
+def test_connection_reused(converse_server, home_assistant, token_file: Path):
+    client = converse_server.ConversationClient(home_assistant.url, token_file)
+    for i in range(5):
+        assert client.process(str(i)) == f"You said: {i}"
+
+    assert len(home_assistant.client_ports) == 1
+
+
+def test_token_reread(converse_server, home_assistant, token_file: Path):
+    client = converse_server.ConversationClient(home_assistant.url, token_file)
+    client.process("one")
+
+    token_file.write_text("second-token", encoding="utf-8")
+    stat = token_file.stat()
+    os.utime(token_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    client.process("two")
+
+    assert [r["authorization"] for r in home_assistant.requests] == [
+        "Bearer first-token",
+        "Bearer second-token",
+    ]
+
+
+def test_reconnect(converse_server, home_assistant, token_file: Path):
+    client = converse_server.ConversationClient(home_assistant.url, token_file)
+    home_assistant.close_after_response = True
+
+    # Pooled connection is closed by the server each time, so it's retried
+    for i in range(3):
+        assert client.process(str(i)) == f"You said: {i}"
+
+    assert len(home_assistant.requests) == 3
+    assert len(home_assistant.client_ports) == 3
+
+
+def test_error_status(converse_server, home_assistant, token_file: Path):
+    client = converse_server.ConversationClient(
+        home_assistant.url, token_file, max_connections=1
+    )
+    home_assistant.status = 500
+    with pytest.raises(HTTPException):
+        client.process("fail")
+
+    # Connection slot is returned to the pool
+    home_assistant.status = 200
+    assert client.process("ok") == "You said: ok"
+
+
+def test_handle_client(converse_server, home_assistant, token_file: Path):
+    client = converse_server.ConversationClient(home_assistant.url, token_file)
+
+    for text, expected in [("hello", Handled(text="You said: hello")), ("", None)]:
+        server_sock, client_sock = socket.socketpair()
+        thread = threading.Thread(
+            target=converse_server.handle_client, args=(server_sock, client)
+        )
+        thread.start()
+
+        with client_sock, client_sock.makefile(mode="rwb") as conn_file:
+            write_event(Transcript(text=text).event(), conn_file)
+            conn_file.flush()
+            event = read_event(conn_file)
+
+        thread.join(timeout=10)
+        assert event is not None
+        if expected is None:
+            assert NotHandled.is_type(event.type)
+        else:
+            assert Handled.from_event(event) == expected
@@ -0,0 +1,43 @@
+from rhasspy3.jitter import JitterBuffer
+
+
+def test_reorder():
+    jitter: JitterBuffer[int] = JitterBuffer(depth=2)
+
+    # Starts from earliest packet
+    assert jitter.add(1, 1) == []
+    assert jitter.add(0, 0) == []
+    assert jitter.add(2, 2) == [0, 1, 2]
+
+    assert jitter.add(4, 4) == []
+    assert jitter.add(3, 3) == [3, 4]
+
+    # Already released
+    assert jitter.add(3, 3) == []
+    assert jitter.packets_late == 1
+
+
+def test_lost():
+    jitter: JitterBuffer[int] = JitterBuffer(depth=2)
+    assert jitter.add(0, 0) == []
+    assert jitter.add(1, 1) == []
+    assert jitter.add(2, 2) == [0, 1, 2]
+    assert jitter.add(5, 5) == []
+
+    # Give up on packets 3 and 4
+    assert jitter.add(6, 6) == [None, None, 5, 6]
+    assert jitter.packets_lost == 2
+
+    # Too late
+    assert jitter.add(4, 4) == []
+    assert jitter.packets_late == 1
+
+
+def test_sequence_wrap_and_restart():
+    jitter: JitterBuffer[int] = JitterBuffer(depth=0, max_gap=10)
+    assert jitter.add(2**32 - 1, 1) == [1]
+    assert jitter.add(0, 2) == [2]
+
+    # Sender restarted
+    assert jitter.add(1000, 3) == [3]
+    assert jitter.add(1001, 4) == [4]
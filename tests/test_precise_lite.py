@@ -0,0 +1,262 @@
+"""Tests for the precise-lite wake word program (programs/wake/precise-lite)."""
+import importlib
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+sonopy = pytest.importorskip("sonopy")
+pytest.importorskip("tflite_runtime")
+
+_PROGRAM_DIR = Path(__file__).parent.parent / "programs" / "wake" / "precise-lite"
+
+
+@pytest.fixture
+def precise(monkeypatch):
+    monkeypatch.syspath_prepend(str(_PROGRAM_DIR / "bin"))
+    return importlib.import_module("precise")
+
+
+def _audio(num_samples: int) -> np.ndarray:
+    return (
+        np.random.default_rng(1234).uniform(-0.5, 0.5, num_samples).astype(np.float32)
+    )
+
+
+def _sonopy_mfccs(precise, audio: np.ndarray) -> np.ndarray:
+    params = precise.ListenerParams()
+    return sonopy.mfcc_spec(
+        audio,
+        params.sample_rate,
+        (params.window_samples, params.hop_samples),
+        num_filt=params.n_filt,
+        fft_size=params.n_fft,
+        num_coeffs=params.n_mfcc,
+    )
+
+
+def test_incremental_mfccs_match_sonopy(precise):
+    params = precise.ListenerParams()
+    features = precise.MfccFeatures(params)
+    assert not features._use_sonopy
+
+    # Uneven chunks that don't line up with windows or hops
+    audio = _audio(params.sample_rate * 2)
+    chunk_sizes = [100, 1024, 333, 1600, 2048, 7]
+    mfccs = []
+    offset = 0
+    chunk_idx = 0
+    while offset < len(audio):
+        chunk_size = chunk_sizes[chunk_idx % len(chunk_sizes)]
+        mfccs.append(features.process(audio[offset : offset + chunk_size]))
+        offset += chunk_size
+        chunk_idx += 1
+
+    actual = np.concatenate(mfccs)
+    expected = _sonopy_mfccs(precise, audio)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-4)
+
+
+def test_window_matches_sonopy(precise):
+    params = precise.ListenerParams()
+    window = precise.MfccWindow(params)
+
+    # More than one window's worth, so the ring buffer wraps around
+    audio = _audio(params.buffer_samples * 3)
+    is_full = False
+    for offset in range(0, len(audio), 2048 // 2):
+        is_full = window.add_audio(audio[offset : offset + (2048 // 2)]) or is_full
+
+    assert is_full
+    expected = _sonopy_mfccs(precise, audio)[-params.n_features :]
+    np.testing.assert_allclose(window.inputs, expected, rtol=1e-4, atol=1e-4)
+
+    window.reset()
+    assert not window.add_audio(audio[: params.window_samples])
+
+
+@pytest.fixture
+def model_path() -> Path:
+    if np.lib.NumpyVersion(np.__version__) >= "2.0.0":
+        # tflite_runtime 2.x is built against numpy 1.x
+        pytest.skip("tflite_runtime can't load models with numpy 2")
+
+    return _PROGRAM_DIR / "share" / "hey_mycroft.tflite"
+
+
+def test_decode_probabilities(precise):
+    decoders = [
+        precise.ActivationDecoder(sensitivity=0.5, trigger_level=1, chunk_size=2048)
+        for _ in range(3)
+    ]
+
+    # First activation for models 1 and 2
+    assert precise.decode_probabilities(decoders, [0.1, 0.8, 0.9]) is None
+    assert [decoder.activation for decoder in decoders] == [0, 1, 1]
+
+    # Both trigger, the more confident model wins
+    assert precise.decode_probabilities(decoders, [0.1, 0.95, 0.6]) == 1
+
+    # Activation is pushed down after triggering
+    assert all(decoder.activation < 0 for decoder in decoders[1:])
+    assert precise.decode_probabilities(decoders, [0.1, 0.9, 0.9]) is None
+
+    # Out of range probabilities are ignored
+    assert precise.decode_probabilities(decoders, [1.5, -1.0, 2.0]) is None
+
+
+def test_engine_shares_window_between_models(precise, model_path: Path):
+    engine = precise.TFLiteHotWordEngine([model_path, model_path])
+    assert len(engine.model_paths) == 2
+
+    silence = bytes(2048)
+    for _ in range(50):
+        assert not engine.update(silence)
+
+    assert engine.probability is not None
+    assert engine.found_model_path is None
+
+
+def test_command_line_models(model_path: Path):
+    # Two models from the command line, 1 second of silence on stdin
+    result = subprocess.run(
+        [
+            sys.executable,
+            str(_PROGRAM_DIR / "bin" / "precise.py"),
+            str(model_path),
+            str(model_path),
+        ],
+        input=bytes(16000 * 2),
+        capture_output=True,
+        timeout=60,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stdout == b""
+
+
+def _fake_model(precise, batch_offset: float = 0.0, batch_fails: bool = False):
+    """HotWordModel without an interpreter. Probability is the window's mean."""
+
+    class FakeModel(precise.HotWordModel):
+        def __init__(self):  # pylint: disable=super-init-not-called
+            self.path = Path("fake.tflite")
+            self.supports_batch = True
+            self._batch_checked = False
+            self.batch_sizes: List[int] = []
+
+        def _invoke(self, batch_size: int, inputs: np.ndarray) -> np.ndarray:
+            assert len(inputs) == batch_size
+            self.batch_sizes.append(batch_size)
+            if batch_size > 1:
+                if batch_fails:
+                    raise RuntimeError("Can't resize input")
+
+                return inputs.mean(axis=(1, 2)) + batch_offset
+
+            return inputs.mean(axis=(1, 2))
+
+    return FakeModel()
+
+
+def _windows(precise, batch_size: int) -> np.ndarray:
+    params = precise.ListenerParams()
+    return np.stack(
+        [
+            np.full((params.n_features, params.n_mfcc), i, dtype=np.float32)
+            for i in range(batch_size)
+        ]
+    )
+
+
+def test_batch_padded_to_power_of_two(precise):
+    model = _fake_model(precise)
+
+    # First batch is checked against one window at a time
+    np.testing.assert_allclose(model.predict(_windows(precise, 5)), np.arange(5))
+    assert model.supports_batch
+    assert model.batch_sizes == [1, 1, 1, 1, 1, 8]
+
+    for batch_size, padded_size in [(1, 1), (2, 2), (3, 4), (5, 8), (8, 8), (9, 16)]:
+        model.batch_sizes.clear()
+        probabilities = model.predict(_windows(precise, batch_size))
+        np.testing.assert_allclose(probabilities, np.arange(batch_size))
+        assert model.batch_sizes == [padded_size]
+
+
+def test_check_batch_mismatch(precise):
+    model = _fake_model(precise, batch_offset=0.1)
+    np.testing.assert_allclose(model.predict(_windows(precise, 3)), np.arange(3))
+    assert not model.supports_batch
+
+    # Falls back to one window at a time, without checking again
+    model.batch_sizes.clear()
+    np.testing.assert_allclose(model.predict(_windows(precise, 3)), np.arange(3))
+    assert model.batch_sizes == [1, 1, 1]
+
+
+def test_check_batch_failure(precise):
+    model = _fake_model(precise, batch_fails=True)
+    np.testing.assert_allclose(model.predict(_windows(precise, 2)), np.arange(2))
+    assert not model.supports_batch
+
+
+def test_inference_batcher(precise):
+    precise_server = importlib.import_module("precise_server")
+    models = [_fake_model(precise), _fake_model(precise)]
+    batcher = precise_server.InferenceBatcher(models, max_batch_size=4)
+
+    # Queue up requests before the batcher starts so they're batched together
+    windows = _windows(precise, 6)
+    results: List[np.ndarray] = [np.empty(0)] * len(windows)
+
+    def predict(window_idx: int):
+        results[window_idx] = batcher.predict(windows[window_idx])
+
+    threads = [
+        threading.Thread(target=predict, args=(i,), daemon=True)
+        for i in range(len(windows))
+    ]
+    for thread in threads:
+        thread.start()
+
+    while batcher._requests.qsize() < len(windows):
+        threading.Event().wait(0.01)
+
+    threading.Thread(target=batcher.run, daemon=True).start()
+    for thread in threads:
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+
+    # One probability from each model
+    for window_idx, probabilities in enumerate(results):
+        np.testing.assert_allclose(probabilities, [window_idx, window_idx])
+
+    # Full batch (checked first), then the 2 left over
+    assert models[0].batch_sizes == [1, 1, 1, 1, 4, 2]
+
+
+def test_model_batch_matches_single(precise, model_path: Path):
+    model = precise.HotWordModel(model_path)
+    params = precise.ListenerParams()
+    windows = np.stack(
+        [
+            _sonopy_mfccs(precise, _audio(params.buffer_samples))[
+                -params.n_features :
+            ].astype(np.float32)
+            * scale
+            for scale in (0.0, 0.5, 1.0)
+        ]
+    )
+
+    expected = np.concatenate([model.predict(window[None]) for window in windows])
+    np.testing.assert_allclose(model.predict(windows), expected, atol=1e-5)
+
+    # The GRU in this model has a fixed batch size of 1
+    assert not model.supports_batch
+    np.testing.assert_allclose(model.predict(windows), expected, atol=1e-5)
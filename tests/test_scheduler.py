@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+from rhasspy3.config import ConcurrencyConfig
+from rhasspy3.scheduler import (
+    Priority,
+    ProgramBusyError,
+    ProgramScheduler,
+    parse_priority,
+    set_priority,
+)
+
+
+def test_interactive_goes_first():
+    async def run_scheduler():
+        scheduler = ProgramScheduler()
+        limit = ConcurrencyConfig(max_running=2, max_batch=2)
+        order = []
+
+        running = [
+            await scheduler.acquire("asr", "test", limit, Priority.BATCH)
+            for _ in range(2)
+        ]
+
+        async def wait_for_slot(name, priority):
+            slot = await scheduler.acquire("asr", "test", limit, priority)
+            order.append(name)
+            slot.release()
+
+        tasks = [
+            asyncio.create_task(wait_for_slot("batch_1", Priority.BATCH)),
+            asyncio.create_task(wait_for_slot("batch_2", Priority.BATCH)),
+            asyncio.create_task(wait_for_slot("interactive", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.get_stats()["asr/test"].waiting == 3
+
+        for slot in running:
+            slot.release()
+
+        await asyncio.gather(*tasks)
+        return order, scheduler.get_stats()["asr/test"]
+
+    order, stats = asyncio.run(run_scheduler())
+    assert order == ["interactive", "batch_1", "batch_2"]
+    assert stats.running == 0
+    assert stats.started == 5
+
+
+def test_batch_leaves_slot_for_interactive():
+    async def run_scheduler():
+        scheduler = ProgramScheduler()
+        limit = ConcurrencyConfig(max_running=2)
+
+        # Only max_running - 1 batch jobs may run
+        batch_slot = await scheduler.acquire("asr", "test", limit, Priority.BATCH)
+        batch_task = asyncio.create_task(
+            scheduler.acquire("asr", "test", limit, Priority.BATCH)
+        )
+        await asyncio.sleep(0)
+        assert not batch_task.done()
+
+        # Priority comes from the task by default
+        set_priority(Priority.INTERACTIVE)
+        interactive_slot = await asyncio.wait_for(
+            scheduler.acquire("asr", "test", limit), timeout=1
+        )
+        assert interactive_slot.priority == Priority.INTERACTIVE
+
+        interactive_slot.release()
+        assert not batch_task.done()
+
+        batch_slot.release()
+        (await batch_task).release()
+
+    asyncio.run(run_scheduler())
+
+
+def test_domain_limit():
+    async def run_scheduler():
+        scheduler = ProgramScheduler({"tts": ConcurrencyConfig(max_running=1)})
+        slot = await scheduler.acquire("tts", "program_1")
+
+        # Different program, same domain
+        task = asyncio.create_task(scheduler.acquire("tts", "program_2"))
+        await asyncio.sleep(0)
+        assert not task.done()
+
+        # No limit for this domain
+        (await scheduler.acquire("asr", "program_1")).release()
+
+        slot.release()
+        (await task).release()
+        assert scheduler.get_stats()["tts"].running == 0
+
+    asyncio.run(run_scheduler())
+
+
+def test_queue_timeout():
+    async def run_scheduler():
+        scheduler = ProgramScheduler()
+        limit = ConcurrencyConfig(max_running=1, queue_timeout=0.01)
+        slot = await scheduler.acquire("asr", "test", limit)
+
+        with pytest.raises(ProgramBusyError):
+            await scheduler.acquire("asr", "test", limit)
+
+        stats = scheduler.get_stats()["asr/test"]
+        assert stats.timeouts == 1
+        assert stats.waiting == 0
+
+        slot.release()
+        slot.release()  # only released once
+        assert stats.running == 0
+
+    asyncio.run(run_scheduler())
+
+
+def test_parse_priority():
+    assert parse_priority("batch") == Priority.BATCH
+    assert parse_priority("Interactive") == Priority.INTERACTIVE
+    assert parse_priority("urgent") is None
+    assert parse_priority("") is None
+
+
+def test_acquire_all_together():
+    async def run_scheduler():
+        scheduler = ProgramScheduler({"asr": ConcurrencyConfig(max_running=2)})
+        slot = await scheduler.acquire("asr", "program_1")
+
+        # Needs both domain slots at once
+        both_task = asyncio.create_task(
+            scheduler.acquire_all("asr", [("main", None), ("fast", None)])
+        )
+        await asyncio.sleep(0)
+        assert not both_task.done()
+        assert scheduler.get_stats()["asr"].running == 1
+
+        # Can't take the free slot ahead of the earlier waiter
+        single_task = asyncio.create_task(scheduler.acquire("asr", "program_2"))
+        await asyncio.sleep(0)
+        assert not single_task.done()
+
+        slot.release()
+        both_slots = await asyncio.wait_for(both_task, timeout=1)
+        assert len(both_slots) == 2
+        assert not single_task.done()
+
+        # Slots are released one at a time
+        both_slots[0].release()
+        (await asyncio.wait_for(single_task, timeout=1)).release()
+        both_slots[1].release()
+        assert scheduler.get_stats()["asr"].running == 0
+
+    asyncio.run(run_scheduler())
+
+
+def test_acquire_all_never_fits():
+    async def run_scheduler():
+        scheduler = ProgramScheduler({"asr": ConcurrencyConfig(max_running=2)})
+        with pytest.raises(ValueError):
+            await scheduler.acquire_all(
+                "asr", [("main", None), ("fast_1", None), ("fast_2", None)]
+            )
+
+        # Batch work is limited to max_running - 1
+        with pytest.raises(ValueError):
+            await scheduler.acquire_all(
+                "asr", [("main", None), ("fast", None)], Priority.BATCH
+            )
+
+        assert scheduler.get_stats()["asr"].waiting == 0
+
+    asyncio.run(run_scheduler())
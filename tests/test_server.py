@@ -0,0 +1,185 @@
+import asyncio
+import shlex
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from rhasspy3 import server
+from rhasspy3.server import ServerState, ServerSupervisor
+
+# Stand-in for bin/server_run.py: server_run.py --config <dir> <domain> <name>
+_SERVER_RUN = """#!{python}
+import socket, sys, time
+from pathlib import Path
+config_dir, domain, name = sys.argv[2:5]
+with open(Path(config_dir) / "starts", "a") as starts_file:
+    print(name, file=starts_file)
+EXIT_CODE = {exit_code}
+if EXIT_CODE is not None:
+    sys.exit(EXIT_CODE)
+socket_path = Path(config_dir) / "programs" / domain / name / "var" / "run" / f"{{name}}.socket"
+socket_path.parent.mkdir(parents=True, exist_ok=True)
+sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+sock.bind(str(socket_path))
+sock.listen()
+while True:
+    time.sleep(1)
+"""
+
+# asr client used for warm-up
+_CLIENT = """
+import json, sys
+for line in sys.stdin.buffer:
+    event = json.loads(line)
+    sys.stdin.buffer.read(event.get("payload_length") or 0)
+    if event["type"] == "audio-stop":
+        if TRANSCRIBE:
+            print(json.dumps({"type": "transcript", "data": {"text": ""}}))
+        break
+"""
+
+
+@pytest.fixture(autouse=True)
+def fast_restarts(monkeypatch):
+    monkeypatch.setattr(server, "MIN_RESTART_SECONDS", 0.05)
+    monkeypatch.setattr(server, "MAX_RESTART_SECONDS", 0.2)
+    monkeypatch.setattr(server, "_POLL_SECONDS", 0.01)
+
+
+def _supervisor(
+    make_rhasspy,
+    tmp_path: Path,
+    exit_code=None,
+    transcribe: bool = True,
+    **server_config,
+) -> ServerSupervisor:
+    server_run = tmp_path / "bin" / "server_run.py"
+    server_run.parent.mkdir(parents=True, exist_ok=True)
+    server_run.write_text(
+        _SERVER_RUN.format(python=sys.executable, exit_code=exit_code),
+        encoding="utf-8",
+    )
+    server_run.chmod(0o755)
+
+    client = _CLIENT.replace("TRANSCRIBE", str(transcribe))
+    config: Dict[str, Any] = {
+        "programs": {
+            "asr": {
+                "test.client": {"command": shlex.join([sys.executable, "-c", client])}
+            }
+        },
+        "servers": {
+            "asr": {
+                "test": {
+                    "command": "unused",
+                    "warmup": {"seconds": 0.1},
+                    **server_config,
+                }
+            }
+        },
+    }
+    return ServerSupervisor(make_rhasspy(config), [("asr", "test")])
+
+
+async def _wait_for(condition, timeout: float = 10.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+
+    await asyncio.wait_for(poll(), timeout=timeout)
+
+
+def test_warm_up(make_rhasspy, tmp_path: Path):
+    supervisor = _supervisor(make_rhasspy, tmp_path, ready_timeout=10)
+    status = supervisor.status["asr/test"]
+
+    async def run_supervisor():
+        await supervisor.start()
+        try:
+            assert await supervisor.wait_ready()
+            assert status.state == ServerState.READY
+            assert status.pid is not None
+            assert status.ready_seconds is not None
+            assert status.last_error is None
+        finally:
+            await supervisor.stop()
+
+    asyncio.run(run_supervisor())
+    assert status.state == ServerState.STOPPED
+    assert status.pid is None
+    assert status.restarts == 0
+
+
+def test_warm_up_failure_restarts(make_rhasspy, tmp_path: Path):
+    supervisor = _supervisor(
+        make_rhasspy, tmp_path, transcribe=False, ready_timeout=0.3
+    )
+    status = supervisor.status["asr/test"]
+
+    async def run_supervisor():
+        await supervisor.start()
+        try:
+            assert not await supervisor.wait_ready()
+
+            # Server is restarted instead of staying in warming-up forever
+            await _wait_for(lambda: status.restarts >= 2)
+            assert status.last_error is not None
+        finally:
+            await supervisor.stop()
+
+    asyncio.run(run_supervisor())
+    assert len((tmp_path / "starts").read_text(encoding="utf-8").splitlines()) >= 2
+
+
+def test_warm_up_failure_without_restart(make_rhasspy, tmp_path: Path):
+    supervisor = _supervisor(
+        make_rhasspy, tmp_path, transcribe=False, ready_timeout=0.3, restart=False
+    )
+    status = supervisor.status["asr/test"]
+
+    async def run_supervisor():
+        await supervisor.start()
+        try:
+            assert not await supervisor.wait_ready()
+            await _wait_for(lambda: status.state == ServerState.STOPPED)
+        finally:
+            await supervisor.stop()
+
+    asyncio.run(run_supervisor())
+    assert status.restarts == 0
+    assert status.pid is None
+    assert status.last_error is not None
+
+
+def test_restart_backoff(make_rhasspy, tmp_path: Path):
+    supervisor = _supervisor(make_rhasspy, tmp_path, exit_code=3, ready_timeout=10)
+    status = supervisor.status["asr/test"]
+
+    # restarts -> delay before that restart
+    delays: Dict[int, float] = {}
+
+    async def run_supervisor():
+        await supervisor.start()
+        try:
+
+            def record_delay() -> bool:
+                if status.state == ServerState.RESTARTING:
+                    delays.setdefault(status.restarts, status.restart_seconds)
+
+                return status.restarts >= 5
+
+            await _wait_for(record_delay)
+        finally:
+            await supervisor.stop()
+
+    asyncio.run(run_supervisor())
+    assert status.last_exit_code == 3
+    assert status.state == ServerState.STOPPED
+
+    # Doubles each time, up to the maximum
+    expected = {1: 0.05, 2: 0.1, 3: 0.2, 4: 0.2, 5: 0.2}
+    assert delays
+    for restarts, delay in delays.items():
+        assert delay == pytest.approx(expected[restarts])
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import json
+import shlex
+import sys
+from typing import Any, Dict, Optional
+
+from rhasspy3.audio import AudioChunk, AudioStop
+from rhasspy3.event import (
+    Event,
+    async_read_event,
+    async_write_event,
+    read_event,
+    write_event,
+)
+from rhasspy3.program import create_process
+from rhasspy3.shm import SHM_KEY, SharedAudioBuffer, SharedMemoryWriter
+
+
+def _chunk(audio: bytes) -> Event:
+    return AudioChunk(16000, 2, 1, audio).event()
+
+
+def test_round_trip():
+    shared_buffer = SharedAudioBuffer(1024)
+    try:
+        event = shared_buffer.encode(_chunk(b"\x01" * 100))
+        assert event.payload is None
+        assert event.data[SHM_KEY]["length"] == 100
+
+        event_io = io.BytesIO()
+        write_event(event, event_io)
+        event_io.seek(0)
+
+        read_chunk = read_event(event_io)
+        assert read_chunk is not None
+        assert read_chunk.payload == b"\x01" * 100
+        assert SHM_KEY not in read_chunk.data
+        assert shared_buffer.unread_bytes == 0
+    finally:
+        shared_buffer.close()
+
+
+def test_wrap_around():
+    shared_buffer = SharedAudioBuffer(256)
+    event_io = io.BytesIO()
+    try:
+        for i in range(10):
+            write_event(shared_buffer.encode(_chunk(bytes([i]) * 100)), event_io)
+            event_io.seek(0)
+            read_chunk = read_event(event_io)
+            event_io.seek(0)
+            event_io.truncate()
+
+            assert read_chunk is not None
+            assert read_chunk.payload == bytes([i]) * 100
+    finally:
+        shared_buffer.close()
+
+
+def test_full_buffer_keeps_payload():
+    shared_buffer = SharedAudioBuffer(256)
+    try:
+        assert shared_buffer.encode(_chunk(bytes(200))).payload is None
+
+        # Reader hasn't caught up, so audio stays in the event
+        event = shared_buffer.encode(_chunk(b"\x02" * 100))
+        assert event.payload == b"\x02" * 100
+        assert SHM_KEY not in event.data
+
+        # Only audio goes through shared memory
+        stop_event = AudioStop().event()
+        assert shared_buffer.encode(stop_event) is stop_event
+    finally:
+        shared_buffer.close()
+
+
+def test_shared_memory_writer():
+    async def send_and_receive() -> Optional[Event]:
+        received: asyncio.Queue = asyncio.Queue()
+
+        async def handle_connection(reader, writer) -> None:
+            await received.put(await async_read_event(reader))
+            writer.close()
+
+        server = await asyncio.start_server(handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        _reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        shared_buffer = SharedAudioBuffer(1024)
+        try:
+            await async_write_event(
+                _chunk(b"\x03" * 100), SharedMemoryWriter(writer, shared_buffer)
+            )
+            event = await received.get()
+            assert shared_buffer.unread_bytes == 0
+            return event
+        finally:
+            writer.close()
+            server.close()
+            shared_buffer.close()
+
+    event = asyncio.run(send_and_receive())
+    assert event is not None
+    assert AudioChunk.from_event(event).audio == b"\x03" * 100
+
+
+def test_process_stdin(make_rhasspy):
+    # Echoes back the header of the event it's sent
+    echo = (
+        "import sys; line = sys.stdin.buffer.readline(); "
+        "sys.stdout.buffer.write(line); sys.stdout.buffer.flush()"
+    )
+    rhasspy = make_rhasspy(
+        {
+            "programs": {
+                "vad": {
+                    "echo": {
+                        "command": shlex.join([sys.executable, "-c", echo]),
+                        "shared_memory": {"buffer_bytes": 1024},
+                    }
+                }
+            }
+        }
+    )
+
+    async def send_and_receive() -> Dict[str, Any]:
+        async with (await create_process(rhasspy, "vad", "echo")) as echo_proc:
+            assert isinstance(echo_proc.stdin, SharedMemoryWriter)
+            assert echo_proc.stdout is not None
+
+            # Process itself is left alone
+            assert isinstance(echo_proc.proc.stdin, asyncio.StreamWriter)
+
+            await async_write_event(_chunk(b"\x04" * 100), echo_proc.stdin)
+            return json.loads(await echo_proc.stdout.readline())
+
+    # Audio went through shared memory instead of stdin
+    event_dict = asyncio.run(send_and_receive())
+    assert SHM_KEY in event_dict["data"]
+    assert not event_dict.get("payload_length")
@@ -0,0 +1,249 @@
+import asyncio
+import io
+
+import pytest
+
+from rhasspy3.audio import AudioChunk, AudioStart, AudioStop
+from rhasspy3.event import Event, async_read_event, read_event, write_event
+from rhasspy3.stream import BufferedEventWriter, OverflowPolicy, StreamMux
+
+
+async def _items(*items):
+    for item in items:
+        yield item
+        await asyncio.sleep(0)
+
+
+def test_mux_merges_sources():
+    async def run_mux():
+        stream_1 = _items(1, 2, 3)
+        stream_2 = _items("a", "b")
+        received = {stream_1: [], stream_2: []}
+
+        async with StreamMux() as mux:
+            mux.add_iterable(stream_1)
+            mux.add_iterable(stream_2)
+
+            sources_left = 2
+            while sources_left > 0:
+                source, item = await mux.get()
+                if item is None:
+                    sources_left -= 1
+                else:
+                    received[source].append(item)
+
+        return received[stream_1], received[stream_2]
+
+    assert asyncio.run(run_mux()) == ([1, 2, 3], ["a", "b"])
+
+
+def test_mux_stop_keeps_stream_intact():
+    """Events read ahead are returned by stop, and the stream can be reused."""
+
+    async def run_mux():
+        with io.BytesIO() as events_io:
+            for i in range(10):
+                write_event(Event("test", {"i": i}, payload=b"x" * (i + 1)), events_io)
+
+            reader = asyncio.StreamReader()
+            reader.feed_data(events_io.getvalue())
+            reader.feed_eof()
+
+        async with StreamMux(maxsize=2) as mux:
+            mux.add_reader(reader)
+            _source, first_event = await mux.get()
+
+            # Give reader task time to fill the queue
+            await asyncio.sleep(0.01)
+            leftovers = await mux.stop(reader)
+
+        numbers = [first_event.data["i"]] + [e.data["i"] for e in leftovers]
+
+        # Continue reading directly
+        while True:
+            event = await async_read_event(reader)
+            if event is None:
+                break
+
+            numbers.append(event.data["i"])
+
+        return numbers
+
+    assert asyncio.run(run_mux()) == list(range(10))
+
+
+def test_mux_stop_idle_reader():
+    """Stopping a reader that is waiting for data doesn't block."""
+
+    async def run_mux():
+        reader = asyncio.StreamReader()
+
+        async with StreamMux() as mux:
+            mux.add_reader(reader)
+            await asyncio.sleep(0.01)
+            leftovers = await asyncio.wait_for(mux.stop(reader), timeout=1)
+
+        # Data that arrives later is still there
+        with io.BytesIO() as events_io:
+            write_event(Event("test", {"i": 0}), events_io)
+            reader.feed_data(events_io.getvalue())
+
+        event = await async_read_event(reader)
+        return leftovers, event.data["i"]
+
+    assert asyncio.run(run_mux()) == ([], 0)
+
+
+class _SlowWriter:
+    """Stream writer that blocks in drain() until released."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.released = asyncio.Event()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.data.extend(line)
+
+    def write(self, data):
+        self.data.extend(data)
+
+    async def drain(self):
+        await self.released.wait()
+
+    def events(self):
+        events = []
+        with io.BytesIO(self.data) as data_io:
+            while True:
+                event = read_event(data_io)
+                if event is None:
+                    break
+
+                events.append(event)
+
+        return events
+
+
+def _chunk(value: int) -> Event:
+    return AudioChunk(16000, 2, 1, bytes([value]) * 2).event()
+
+
+@pytest.mark.parametrize(
+    "policy,expected",
+    [
+        (OverflowPolicy.DROP_OLDEST, [0, 3, 4]),
+        (OverflowPolicy.DROP_NEWEST, [0, 1, 2]),
+    ],
+)
+def test_writer_drop(policy, expected):
+    async def run_writer():
+        slow_writer = _SlowWriter()
+        async with BufferedEventWriter(
+            slow_writer, max_events=2, policy=policy
+        ) as writer:
+            # First chunk is stuck in drain()
+            assert await writer.write(_chunk(0))
+            await asyncio.sleep(0)
+
+            for value in range(1, 5):
+                assert await writer.write(_chunk(value))
+
+            # Control events are never dropped
+            assert await writer.write(AudioStop().event())
+            assert writer.stats.chunks_dropped == 2
+
+            slow_writer.released.set()
+            await writer.flush()
+
+        return slow_writer.events()
+
+    events = asyncio.run(run_writer())
+    assert [e.payload[0] for e in events if AudioChunk.is_type(e.type)] == expected
+    assert AudioStop.is_type(events[-1].type)
+
+
+def test_writer_block_and_disconnect():
+    async def run_writer():
+        slow_writer = _SlowWriter()
+        async with BufferedEventWriter(slow_writer, max_events=1) as writer:
+            assert await writer.write(_chunk(0))
+            await asyncio.sleep(0)
+            assert await writer.write(_chunk(1))
+
+            # Blocks until the program catches up
+            blocked = asyncio.create_task(writer.write(_chunk(2)))
+            await asyncio.sleep(0.01)
+            assert not blocked.done()
+
+            slow_writer.released.set()
+            assert await blocked
+            await writer.flush()
+
+        assert len(slow_writer.events()) == 3
+
+        slow_writer = _SlowWriter()
+        async with BufferedEventWriter(
+            slow_writer, max_events=1, policy=OverflowPolicy.DISCONNECT
+        ) as writer:
+            assert await writer.write(_chunk(0))
+            await asyncio.sleep(0)
+            assert await writer.write(_chunk(1))
+            assert not await writer.write(_chunk(2))
+            assert writer.disconnected
+
+    asyncio.run(run_writer())
+
+
+def test_writer_drop_oldest_without_buffered_audio():
+    async def run_writer():
+        slow_writer = _SlowWriter()
+        async with BufferedEventWriter(
+            slow_writer, max_events=2, policy=OverflowPolicy.DROP_OLDEST
+        ) as writer:
+            assert await writer.write(_chunk(0))
+            await asyncio.sleep(0)
+
+            # Only control events to drop, so the new chunk is dropped instead
+            assert await writer.write(AudioStart(16000, 2, 1).event())
+            assert await writer.write(AudioStart(16000, 2, 1).event())
+            assert await writer.write(_chunk(1))
+            assert len(writer._buffer) == 2
+            assert writer.stats.chunks_dropped == 1
+
+            slow_writer.released.set()
+            await writer.flush()
+
+    asyncio.run(run_writer())
+
+
+def _timed_chunk(timestamp: int) -> Event:
+    # 10 ms
+    return AudioChunk(16000, 2, 1, bytes(320), timestamp=timestamp).event()
+
+
+class _PacedWriter(_SlowWriter):
+    """Stream writer that takes 2 ms per event (5x faster than real time)."""
+
+    async def drain(self):
+        await asyncio.sleep(0.002)
+
+
+def test_writer_lag():
+    async def run_writer(slow_writer: _SlowWriter, num_chunks: int) -> float:
+        async with BufferedEventWriter(slow_writer, max_events=100) as writer:
+            # All audio arrives at once, faster than real time
+            for i in range(num_chunks):
+                assert await writer.write(_timed_chunk(i * 10))
+
+            await asyncio.sleep(0.2)
+            slow_writer.released.set()
+            await writer.flush()
+
+        return writer.stats.max_lag_seconds
+
+    # Last chunk waits ~0.2 seconds in the buffer, but isn't due for 1 second
+    assert asyncio.run(run_writer(_PacedWriter(), num_chunks=100)) == 0
+
+    # Written 0.2 seconds after 20 ms of audio was due
+    lag_seconds = asyncio.run(run_writer(_SlowWriter(), num_chunks=2))
+    assert 0.1 < lag_seconds < 1.0
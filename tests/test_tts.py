@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import io
+import json
+import shlex
+import sys
+import wave
+from typing import Any, Dict, List, Union
+
+import pytest
+
+from rhasspy3.audio import AudioStart, AudioStop, read_wav_header
+from rhasspy3.config import PipelineConfig, PipelineProgramConfig
+
+quart = pytest.importorskip("quart")
+
+# tts program that answers each synthesize event with audio
+_SYNTHESIZE = """
+import json, sys
+def write(event_type, payload=b""):
+    event = {"type": event_type, "data": {"rate": 22050, "width": 2, "channels": 1}}
+    if payload:
+        event["payload_length"] = len(payload)
+    sys.stdout.buffer.write(json.dumps(event).encode() + b"\\n" + payload)
+sys.stdin.readline()
+write("audio-start")
+for _ in range(NUM_CHUNKS):
+    write("audio-chunk", bytes(2205 * 2))
+write("audio-stop")
+sys.stdout.flush()
+"""
+
+
+def _tts_program(num_chunks: int) -> Dict[str, Any]:
+    script = _SYNTHESIZE.replace("NUM_CHUNKS", str(num_chunks))
+    return {"command": shlex.join([sys.executable, "-c", script])}
+
+
+@pytest.fixture
+def app(make_rhasspy):
+    # pylint: disable=import-outside-toplevel
+    from rhasspy3_http_api.tts import add_tts
+
+    rhasspy = make_rhasspy(
+        {"programs": {"tts": {"second": _tts_program(10), "silent": _tts_program(0)}}}
+    )
+    app = quart.Quart(__name__)
+    add_tts(
+        app,
+        rhasspy,
+        PipelineConfig(tts=PipelineProgramConfig(name="second")),
+        argparse.Namespace(samples_per_chunk=None),
+    )
+    return app
+
+
+def test_stream_wav(app):
+    async def synthesize() -> bytes:
+        response = await app.test_client().get(
+            "/tts/synthesize?text=test&stream=true&rate=16000"
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "audio/wav"
+        return await response.get_data()
+
+    with io.BytesIO(asyncio.run(synthesize())) as wav_io:
+        header = read_wav_header(wav_io)
+        assert (header.rate, header.width, header.channels) == (16000, 2, 1)
+        assert header.data_size is None
+
+        # 1 second, including the resampler's tail
+        assert len(wav_io.read()) == 16000 * 2
+
+
+def test_stream_raw(app):
+    async def synthesize():
+        response = await app.test_client().get(
+            "/tts/synthesize?text=test&stream=true&format=raw"
+        )
+        return response.headers, await response.get_data()
+
+    headers, audio = asyncio.run(synthesize())
+    assert headers["X-Audio-Rate"] == "22050"
+    assert len(audio) == 22050 * 2
+
+
+def test_stream_without_audio(app):
+    async def synthesize():
+        await app.test_client().get(
+            "/tts/synthesize?text=test&stream=true&tts_program=silent"
+        )
+
+    # Error is raised before the response starts
+    app.config["PROPAGATE_EXCEPTIONS"] = True
+    with pytest.raises(RuntimeError, match="silent"):
+        asyncio.run(synthesize())
+
+
+def test_not_streamed(app):
+    async def synthesize() -> bytes:
+        response = await app.test_client().get("/tts/synthesize?text=test")
+        return await response.get_data()
+
+    with io.BytesIO(asyncio.run(synthesize())) as wav_io:
+        wav_file: wave.Wave_read = wave.open(wav_io, "rb")
+        with wav_file:
+            assert wav_file.getnframes() == 22050
+
+
+def _receive_websocket(app, url: str) -> List[Union[str, bytes]]:
+    """Synthesize one message over a websocket, returning all messages."""
+
+    async def synthesize() -> List[Union[str, bytes]]:
+        messages: List[Union[str, bytes]] = []
+        async with app.test_client().websocket(url) as websocket:
+            await websocket.send("test")
+            while True:
+                message = await websocket.receive()
+                messages.append(message)
+                if isinstance(message, str) and AudioStop.is_type(
+                    json.loads(message)["type"]
+                ):
+                    break
+
+            await websocket.send("")
+
+        return messages
+
+    return asyncio.run(synthesize())
+
+
+def test_websocket(app):
+    start, *audio, stop = _receive_websocket(app, "/tts/synthesize?rate=16000")
+    assert isinstance(start, str) and isinstance(stop, str)
+    assert json.loads(start)["type"] == AudioStart(16000, 2, 1).event().type
+    assert json.loads(start)["data"]["rate"] == 16000
+    assert sum(len(data) for data in audio) == 16000 * 2
+    assert json.loads(stop)["data"]["timestamp"] == pytest.approx(1000, abs=10)
+
+
+def test_websocket_without_audio(app):
+    messages = _receive_websocket(app, "/tts/synthesize?tts_program=silent")
+
+    # Start and stop are still sent
+    assert [json.loads(message) for message in messages] == [
+        AudioStart(22050, 2, 1, timestamp=0).event().to_dict(),
+        AudioStop(timestamp=0).event().to_dict(),
+    ]
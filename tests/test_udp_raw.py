@@ -0,0 +1,164 @@
+import io
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO
+
+from rhasspy3.audio import AudioChunk, AudioStop
+from rhasspy3.event import read_event, write_event
+from rhasspy3.jitter import UDP_HEADER
+
+_BASE_DIR = Path(__file__).parent.parent
+_PROGRAM = _BASE_DIR / "programs" / "mic" / "udp_raw" / "bin" / "udp_raw.py"
+_SND_PROGRAM = _BASE_DIR / "programs" / "snd" / "udp_raw" / "bin" / "udp_raw.py"
+
+_SAMPLES_PER_PACKET = 160  # 10 ms
+_TIMEOUT = 10
+
+
+class _Sender(threading.Thread):
+    """Sends packets filled with value every 10 ms, with sender timestamps."""
+
+    def __init__(self, port: int, value: int, start_timestamp: int):
+        super().__init__(daemon=True)
+        self.port = port
+        self.value = value
+        self.start_timestamp = start_timestamp
+        self.stopped = threading.Event()
+
+    def run(self):
+        audio = bytes([self.value]) * (_SAMPLES_PER_PACKET * 2)
+        sequence = 0
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            while not self.stopped.is_set():
+                header = UDP_HEADER.pack(sequence, self.start_timestamp + sequence * 10)
+                sock.sendto(header + audio, ("127.0.0.1", self.port))
+                sequence += 1
+                time.sleep(0.01)
+
+
+def _read_chunks(stdout: IO[bytes], chunks: "queue.Queue[AudioChunk]"):
+    while True:
+        event = read_event(stdout)
+        if event is None:
+            break
+
+        chunks.put(AudioChunk.from_event(event))
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _next_chunk(chunks: "queue.Queue[AudioChunk]", value: int) -> AudioChunk:
+    deadline = time.monotonic() + _TIMEOUT
+    while True:
+        chunk = chunks.get(timeout=max(0, deadline - time.monotonic()))
+        if value in chunk.audio:
+            return chunk
+
+
+def _assert_relative(chunk: AudioChunk, start_time: float):
+    """Timestamp is relative to when the stream started."""
+    assert chunk.timestamp is not None
+    assert 0 <= chunk.timestamp <= ((time.monotonic() - start_time) * 1_000) + 500
+
+
+def test_one_sender_at_a_time():
+    port = _free_port()
+    with subprocess.Popen(
+        [
+            sys.executable,
+            str(_PROGRAM),
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--header",
+            "--jitter-packets",
+            "1",
+            "--samples-per-chunk",
+            str(_SAMPLES_PER_PACKET),
+            "--stream-timeout",
+            "0.5",
+        ],
+        stdout=subprocess.PIPE,
+        env={**os.environ, "PYTHONPATH": str(_BASE_DIR)},
+    ) as proc:
+        assert proc.stdout is not None
+        chunks: "queue.Queue[AudioChunk]" = queue.Queue()
+        reader = threading.Thread(
+            target=_read_chunks, args=(proc.stdout, chunks), daemon=True
+        )
+        reader.start()
+        try:
+
+            # Timestamps are relative to each sender
+            first = _Sender(port, value=1, start_timestamp=0)
+            second = _Sender(port, value=2, start_timestamp=10**9)
+            first.start()
+            first_start_time = time.monotonic()
+            first_chunk = _next_chunk(chunks, 1)
+            assert first_chunk.timestamp == 0
+            _assert_relative(first_chunk, first_start_time)
+
+            # Second sender is ignored while the first is still sending
+            second.start()
+            for _ in range(20):
+                chunk = chunks.get(timeout=_TIMEOUT)
+                assert 2 not in chunk.audio
+                _assert_relative(chunk, first_start_time)
+
+            # Second sender takes over once the first is idle
+            first.stopped.set()
+            second_start_time = time.monotonic()
+            _assert_relative(_next_chunk(chunks, 2), second_start_time)
+            second.stopped.set()
+        finally:
+            proc.terminate()
+            reader.join(timeout=_TIMEOUT)
+
+
+def test_snd_timestamps():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.settimeout(_TIMEOUT)
+        port = sock.getsockname()[1]
+
+        # 2 chunks of 20 ms, sent in 10 ms packets
+        events = io.BytesIO()
+        for _ in range(2):
+            write_event(AudioChunk(16000, 2, 1, bytes(320 * 2)).event(), events)
+
+        write_event(AudioStop().event(), events)
+        subprocess.run(
+            [
+                sys.executable,
+                str(_SND_PROGRAM),
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--rate",
+                "16000",
+                "--samples-per-packet",
+                str(_SAMPLES_PER_PACKET),
+                "--header",
+            ],
+            input=events.getvalue(),
+            stdout=subprocess.DEVNULL,
+            env={**os.environ, "PYTHONPATH": str(_BASE_DIR)},
+            check=True,
+            timeout=_TIMEOUT,
+        )
+
+        # Milliseconds since the start of the stream
+        headers = [UDP_HEADER.unpack_from(sock.recv(4096)) for _ in range(4)]
+        assert headers == [(0, 0), (1, 10), (2, 20), (3, 30)]
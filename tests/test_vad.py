@@ -0,0 +1,28 @@
+from rhasspy3.audio import AudioChunk
+from rhasspy3.vad import SpeechGate
+
+
+def _chunk(value: int) -> AudioChunk:
+    # 100 ms at 16Khz
+    return AudioChunk(16000, 2, 1, bytes([value]) * 3200)
+
+
+def test_speech_gate():
+    gate = SpeechGate(buffer_seconds=0.2)
+
+    # Silence is held back, keeping only the last 200 ms
+    for value in range(5):
+        assert gate.process_chunk(_chunk(value)) == []
+
+    buffered = gate.start()
+    assert [chunk.audio[0] for chunk in buffered] == [3, 4]
+
+    # Timestamps are kept even though earlier chunks were dropped
+    assert [chunk.timestamp for chunk in buffered] == [300, 400]
+
+    # Speech is passed through
+    assert [chunk.timestamp for chunk in gate.process_chunk(_chunk(5))] == [500]
+
+    # Nothing is sent after speech has stopped
+    assert gate.stop() == []
+    assert gate.process_chunk(_chunk(6)) == []
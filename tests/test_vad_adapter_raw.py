@@ -0,0 +1,112 @@
+import io
+import os
+import shlex
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+from rhasspy3.audio import AudioChunk, AudioStop
+from rhasspy3.event import Event, read_event, write_event
+from rhasspy3.vad import VoiceStarted, VoiceStopped
+
+_BASE_DIR = Path(__file__).parent.parent
+_ADAPTER = _BASE_DIR / "bin" / "vad_adapter_raw.py"
+
+_SAMPLES_PER_CHUNK = 512
+
+# VAD command: speech if a frame isn't silent, exits after EXIT_AFTER frames
+_VAD = """
+import sys
+frame_bytes, exit_after, num_frames = int(sys.argv[1]), int(sys.argv[2]), 0
+while True:
+    frame = sys.stdin.buffer.read(frame_bytes)
+    if len(frame) < frame_bytes:
+        break
+    print("1.0" if any(frame) else "0.0", flush=True)
+    num_frames += 1
+    if num_frames == exit_after:
+        break
+"""
+
+
+def _audio_events() -> bytes:
+    """1 second of silence, 1 second of "speech", then 1 second of silence."""
+    with io.BytesIO() as events_io:
+        timestamp = 0
+        for value in [0] * 10 + [1] * 10 + [0] * 10:
+            # 100 ms chunks, which don't line up with the adapter's frames
+            chunk = AudioChunk(16000, 2, 1, bytes([value]) * 3200, timestamp)
+            write_event(chunk.event(), events_io)
+            timestamp += chunk.milliseconds
+
+        write_event(AudioStop(timestamp=timestamp).event(), events_io)
+        return events_io.getvalue()
+
+
+def _run_adapter(max_frames_in_flight: int, exit_after: int = 0):
+    vad_command = shlex.join(
+        [sys.executable, "-c", _VAD, str(_SAMPLES_PER_CHUNK * 2), str(exit_after)]
+    )
+    return subprocess.run(
+        [
+            sys.executable,
+            str(_ADAPTER),
+            vad_command,
+            "--rate",
+            "16000",
+            "--width",
+            "2",
+            "--channels",
+            "1",
+            "--samples-per-chunk",
+            str(_SAMPLES_PER_CHUNK),
+            "--max-frames-in-flight",
+            str(max_frames_in_flight),
+        ],
+        input=_audio_events(),
+        capture_output=True,
+        env={**os.environ, "PYTHONPATH": str(_BASE_DIR)},
+        timeout=30,
+        check=False,
+    )
+
+
+def _events(stdout: bytes) -> List[Event]:
+    events: List[Event] = []
+    with io.BytesIO(stdout) as events_io:
+        while True:
+            event = read_event(events_io)
+            if event is None:
+                break
+
+            events.append(event)
+
+    return events
+
+
+def test_pipelined_matches_lock_step():
+    lock_step = _run_adapter(max_frames_in_flight=1)
+    assert lock_step.returncode == 0, lock_step.stderr.decode()
+
+    events = _events(lock_step.stdout)
+    assert [event.type for event in events] == [
+        VoiceStarted().event().type,
+        VoiceStopped().event().type,
+    ]
+    started = VoiceStarted.from_event(events[0])
+    stopped = VoiceStopped.from_event(events[1])
+    assert started.timestamp is not None and (1000 <= started.timestamp <= 1300)
+    assert stopped.timestamp is not None and (2000 <= stopped.timestamp <= 2500)
+
+    for max_frames_in_flight in (2, 8, 64):
+        pipelined = _run_adapter(max_frames_in_flight)
+        assert pipelined.returncode == 0, pipelined.stderr.decode()
+        assert _events(pipelined.stdout) == events
+
+
+def test_command_exits_early():
+    result = _run_adapter(max_frames_in_flight=8, exit_after=5)
+    assert result.returncode == 0
+    assert b"BrokenPipeError" not in result.stderr
+    assert b"Command exited unexpectedly" in result.stderr
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""Simulate many satellites streaming audio to the HTTP server's websockets.
+
+Satellites are added in steps until --satellites are running. Each satellite
+streams WAV files in real time, one session after another. A JSON line is
+printed after each step with latency percentiles for each stage, the error
+rate, and (with --server-pid) the server's CPU and memory usage.
+
+Stages are the types of messages from the server. They're timed from the end
+of speech (voice-stopped or the end of the WAV file), or from the start of the
+stream for messages that come before it and for /wake/detect.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import wave
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from websockets import connect
+from websockets.exceptions import ConnectionClosed
+
+_LOGGER = logging.getLogger("websocket_load")
+
+# Query parameters with the input audio format for each route
+_FORMAT_PARAMS = {
+    "/pipeline/asr-tts": ("in_rate", "in_width", "in_channels"),
+    "/asr/transcribe": ("rate", "width", "channels"),
+    "/wake/detect": ("rate", "width", "channels"),
+}
+
+_PERCENTILES = (50, 90, 99)
+
+# Seconds to wait for the server when closing a connection
+_CLOSE_SECONDS = 1.0
+
+# Messages that come while audio is streaming
+_VAD_TYPES = {"voice-started", "voice-stopped"}
+
+
+@dataclass
+class WavFixture:
+    path: str
+    rate: int
+    width: int
+    channels: int
+    chunks: List[bytes]
+
+
+@dataclass
+class SessionResult:
+    stages: Dict[str, float] = field(default_factory=dict)
+    """Stage name -> seconds (see module docstring)."""
+
+    error: Optional[str] = None
+
+
+class ServerStats:
+    """CPU and memory of a server process and its programs (Linux only)."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.ticks_per_second = os.sysconf("SC_CLK_TCK")
+        self._last_ticks: Optional[int] = None
+        self._last_time: Optional[float] = None
+        self.cpu_percents: List[float] = []
+        self.rss_bytes: List[int] = []
+
+    def sample(self) -> None:
+        ticks = 0
+        rss_pages = 0
+        for pid in self._get_tree():
+            try:
+                stat = Path(f"/proc/{pid}/stat").read_text(encoding="utf-8")
+                statm = Path(f"/proc/{pid}/statm").read_text(encoding="utf-8")
+            except OSError:
+                # Process exited
+                continue
+
+            # utime, stime, cutime, cstime (cutime/cstime include exited programs)
+            fields = stat.rsplit(")", maxsplit=1)[1].split()
+            ticks += sum(int(f) for f in fields[11:15])
+            rss_pages += int(statm.split()[1])
+
+        now = time.monotonic()
+        if (self._last_ticks is not None) and (self._last_time is not None):
+            cpu_seconds = (ticks - self._last_ticks) / self.ticks_per_second
+            self.cpu_percents.append(100 * cpu_seconds / (now - self._last_time))
+
+        self._last_ticks = ticks
+        self._last_time = now
+        self.rss_bytes.append(rss_pages * self.page_size)
+
+    def take(self) -> Dict[str, Any]:
+        """Summarize samples since last take."""
+        stats: Dict[str, Any] = {
+            "cpu_percent_mean": (
+                sum(self.cpu_percents) / len(self.cpu_percents)
+                if self.cpu_percents
+                else None
+            ),
+            "cpu_percent_max": max(self.cpu_percents, default=None),
+            "rss_mb_max": (
+                max(self.rss_bytes) / (1024 * 1024) if self.rss_bytes else None
+            ),
+        }
+        self.cpu_percents.clear()
+        self.rss_bytes.clear()
+        return stats
+
+    def _get_tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for proc_dir in Path("/proc").iterdir():
+            if not proc_dir.name.isdigit():
+                continue
+
+            try:
+                stat = (proc_dir / "stat").read_text(encoding="utf-8")
+            except OSError:
+                continue
+
+            ppid = int(stat.rsplit(")", maxsplit=1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(proc_dir.name))
+
+        tree = [self.pid]
+        for pid in tree:
+            tree.extend(children.get(pid, []))
+
+        return tree
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, fixtures: List[WavFixture]) -> None:
+        self.args = args
+        self.fixtures = fixtures
+        self.results: List[SessionResult] = []
+        self.satellites = 0
+        self.stopping = False
+        self.route = urlparse(args.url).path
+
+    async def run_satellite(self, satellite_id: int) -> None:
+        # Spread out sessions so satellites don't all speak at once
+        await asyncio.sleep(random.uniform(0, self.args.pause))
+        while not self.stopping:
+            fixture = random.choice(self.fixtures)
+            result = SessionResult()
+            try:
+                await asyncio.wait_for(
+                    self.run_session(fixture, result), timeout=self.args.timeout
+                )
+            except asyncio.TimeoutError:
+                result.error = "timeout"
+            except Exception as err:
+                result.error = f"{err.__class__.__name__}: {err}"
+
+            if result.error:
+                _LOGGER.debug("Satellite %s: %s", satellite_id, result.error)
+
+            self.results.append(result)
+            await asyncio.sleep(self.args.pause)
+
+    async def run_session(self, fixture: WavFixture, result: SessionResult) -> None:
+        url = self._get_url(fixture)
+        start_time = time.monotonic()
+        # Server may have stopped reading audio, so don't wait long to close
+        async with connect(url, close_timeout=_CLOSE_SECONDS) as websocket:
+            speech_end: Optional[float] = None
+
+            async def send_audio() -> None:
+                nonlocal speech_end
+                stream_start = time.monotonic()
+                sent_seconds = 0.0
+                try:
+                    for chunk in fixture.chunks:
+                        if speech_end is not None:
+                            # Server detected end of speech
+                            break
+
+                        if not self.args.fast:
+                            # Real-time pacing
+                            delay = stream_start + sent_seconds - time.monotonic()
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+
+                        await websocket.send(chunk)
+                        sent_seconds += len(chunk) / (
+                            fixture.rate * fixture.width * fixture.channels
+                        )
+
+                    # Signal stop with empty message
+                    await websocket.send(bytes())
+                except ConnectionClosed:
+                    # Server may finish before all audio is sent
+                    pass
+
+                if speech_end is None:
+                    speech_end = time.monotonic()
+
+            send_task = asyncio.create_task(send_audio())
+            try:
+                async for message in websocket:
+                    now = time.monotonic()
+                    if (speech_end is None) or (self.route == "/wake/detect"):
+                        seconds = now - start_time
+                    else:
+                        seconds = now - speech_end
+
+                    if isinstance(message, bytes):
+                        result.stages.setdefault("tts-first-audio", seconds)
+                        continue
+
+                    event_type = json.loads(message).get("type")
+                    if not event_type:
+                        # No transcript or detection
+                        result.error = "empty result"
+                        break
+
+                    result.stages[event_type] = seconds
+                    if event_type == "voice-stopped":
+                        speech_end = now
+
+                    if event_type in _VAD_TYPES:
+                        continue
+
+                    if (self.route != "/pipeline/asr-tts") or (
+                        event_type == "audio-stop"
+                    ):
+                        # Final message
+                        break
+            finally:
+                send_task.cancel()
+
+            if (
+                (self.route == "/pipeline/asr-tts")
+                and (not result.error)
+                and ("audio-stop" not in result.stages)
+            ):
+                result.error = "incomplete"
+
+    def _get_url(self, fixture: WavFixture) -> str:
+        parse_result = urlparse(self.args.url)
+        query = dict(parse_qsl(parse_result.query))
+        rate_param, width_param, channels_param = _FORMAT_PARAMS.get(
+            self.route, _FORMAT_PARAMS["/asr/transcribe"]
+        )
+        query.setdefault(rate_param, str(fixture.rate))
+        query.setdefault(width_param, str(fixture.width))
+        query.setdefault(channels_param, str(fixture.channels))
+        return urlunparse(parse_result._replace(query=urlencode(query)))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "url",
+        help="Websocket URL (e.g., ws://localhost:13331/pipeline/asr-tts)",
+    )
+    parser.add_argument("wav_file", nargs="+", help="Path(s) to WAV file(s)")
+    parser.add_argument("--samples-per-chunk", type=int, default=1024)
+    #
+    parser.add_argument(
+        "--satellites", type=int, default=10, help="Maximum number of satellites"
+    )
+    parser.add_argument(
+        "--ramp-step", type=int, default=1, help="Satellites added at each step"
+    )
+    parser.add_argument(
+        "--step-seconds", type=float, default=30.0, help="Seconds for each step"
+    )
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=1.0,
+        help="Seconds each satellite waits between sessions",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30.0, help="Seconds before a session fails"
+    )
+    parser.add_argument(
+        "--fast", action="store_true", help="Send audio as fast as possible"
+    )
+    #
+    parser.add_argument(
+        "--server-pid", type=int, help="Report CPU/memory of this server process"
+    )
+    parser.add_argument(
+        "--slo-stage",
+        help="Stop adding satellites once this stage's p90 exceeds --slo-seconds",
+    )
+    parser.add_argument("--slo-seconds", type=float, default=1.0)
+    parser.add_argument(
+        "--slo-error-rate",
+        type=float,
+        default=0.01,
+        help="Stop adding satellites once the error rate exceeds this",
+    )
+    parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    fixtures = [
+        _load_wav(wav_path, args.samples_per_chunk) for wav_path in args.wav_file
+    ]
+    load_test = LoadTest(args, fixtures)
+    server_stats = ServerStats(args.server_pid) if args.server_pid else None
+
+    tasks: List[asyncio.Task] = []
+    max_satellites: Optional[int] = None
+    try:
+        while load_test.satellites < args.satellites:
+            for _ in range(min(args.ramp_step, args.satellites - load_test.satellites)):
+                load_test.satellites += 1
+                tasks.append(
+                    asyncio.create_task(load_test.run_satellite(load_test.satellites))
+                )
+
+            _LOGGER.info("Running %s satellite(s)", load_test.satellites)
+            step_start = len(load_test.results)
+            step_end_time = time.monotonic() + args.step_seconds
+            if server_stats is not None:
+                server_stats.sample()
+
+            while time.monotonic() < step_end_time:
+                await asyncio.sleep(min(1.0, max(0, step_end_time - time.monotonic())))
+                if server_stats is not None:
+                    server_stats.sample()
+
+            report = _report_step(
+                load_test.satellites, load_test.results[step_start:], args
+            )
+            if server_stats is not None:
+                report["server"] = server_stats.take()
+
+            print(json.dumps(report), flush=True)
+
+            if not report["meets_slo"]:
+                _LOGGER.info("Service level not met, stopping")
+                break
+
+            max_satellites = load_test.satellites
+    except KeyboardInterrupt:
+        pass
+    finally:
+        load_test.stopping = True
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(json.dumps({"max_satellites": max_satellites}), flush=True)
+
+
+def _report_step(
+    satellites: int, results: List[SessionResult], args: argparse.Namespace
+) -> Dict[str, Any]:
+    errors = [result for result in results if result.error]
+    error_rate = (len(errors) / len(results)) if results else 0.0
+
+    stage_seconds: Dict[str, List[float]] = {}
+    for result in results:
+        if result.error:
+            continue
+
+        for stage, seconds in result.stages.items():
+            stage_seconds.setdefault(stage, []).append(seconds)
+
+    stages = {
+        stage: {
+            **{f"p{p}": _percentile(seconds, p) for p in _PERCENTILES},
+            "count": len(seconds),
+        }
+        for stage, seconds in stage_seconds.items()
+    }
+
+    meets_slo = bool(results) and (error_rate <= args.slo_error_rate)
+    if args.slo_stage:
+        slo_p90 = stages.get(args.slo_stage, {}).get("p90")
+        meets_slo = (
+            meets_slo and (slo_p90 is not None) and (slo_p90 <= args.slo_seconds)
+        )
+
+    return {
+        "satellites": satellites,
+        "sessions": len(results),
+        "errors": len(errors),
+        "error_rate": error_rate,
+        "error_types": sorted({str(result.error) for result in errors}),
+        "stages": stages,
+        "meets_slo": meets_slo,
+    }
+
+
+def _percentile(values: List[float], percent: int) -> float:
+    """Nearest-rank percentile."""
+    sorted_values = sorted(values)
+    rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(values)) - 1))
+    return sorted_values[rank]
+
+
+def _load_wav(wav_path: str, samples_per_chunk: int) -> WavFixture:
+    wav_file: wave.Wave_read = wave.open(wav_path, "rb")
+    with wav_file:
+        chunks: List[bytes] = []
+        chunk = wav_file.readframes(samples_per_chunk)
+        while chunk:
+            chunks.append(chunk)
+            chunk = wav_file.readframes(samples_per_chunk)
+
+        return WavFixture(
+            path=wav_path,
+            rate=wav_file.getframerate(),
+            width=wav_file.getsampwidth(),
+            channels=wav_file.getnchannels(),
+            chunks=chunks,
+        )
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass